@@ -5,10 +5,85 @@
 from __future__ import (absolute_import, division, generators, nested_scopes, print_function,
                         unicode_literals, with_statement)
 
+import binascii
 import os
 import shutil
+from hashlib import sha1
 
+from six.moves import cPickle as pickle
+
+from pants.source.file_digest_cache import FileDigestCache
 from pants.util.contextutil import temporary_dir
+from pants.util.dirutil import safe_concurrent_creation, safe_delete
+
+
+class ParsedAnalysisCache(object):
+  """Caches the results of parsing analysis files, keyed by the digest of each file's content.
+
+  Entries are pickled with the highest protocol, which loads many times faster than the text
+  analysis it was parsed from, so an analysis file that hasn't changed since it was last parsed is
+  never parsed again. Only the entry for the latest content of each file is kept.
+
+  The digests of analysis files are looked up in a FileDigestCache (sharing the database of the
+  global instance, if it is persistent), so a file whose stats are unchanged is not read to find
+  its entry.
+  """
+
+  def __init__(self, cache_dir):
+    """
+    :param string cache_dir: The directory to store entries under.
+    """
+    self._cache_dir = cache_dir
+    self._file_digest_cache = None
+    self._file_digest_cache_pid = None
+
+  def __getstate__(self):
+    # The FileDigestCache may hold a database handle, which must not cross processes.
+    state = self.__dict__.copy()
+    state['_file_digest_cache'] = None
+    state['_file_digest_cache_pid'] = None
+    return state
+
+  def get(self, path, parse, *key):
+    """Returns `parse(path)`, reusing the result of a previous call for the same file content.
+
+    :param string path: The path of the analysis file to parse.
+    :param parse: A function of `path` returning a picklable result.
+    :param key: Strings distinguishing different parses of the same file.
+    """
+    entry_id = sha1('\0'.join((path,) + key).encode('utf-8')).hexdigest()
+    entry_dir = os.path.join(self._cache_dir, entry_id)
+    digest = self._digest(path)
+    entry_path = os.path.join(entry_dir, digest)
+    if os.path.exists(entry_path):
+      try:
+        with open(entry_path, 'rb') as infile:
+          return pickle.load(infile)
+      except Exception:
+        # A truncated or otherwise unreadable entry: parse the analysis again.
+        safe_delete(entry_path)
+
+    result = parse(path)
+    with safe_concurrent_creation(entry_path) as tmp_path:
+      with open(tmp_path, 'wb') as outfile:
+        pickle.dump(result, outfile, pickle.HIGHEST_PROTOCOL)
+    for name in os.listdir(entry_dir):
+      if name != digest and '.tmp.' not in name:
+        safe_delete(os.path.join(entry_dir, name))
+    return result
+
+  def _digest(self, path):
+    pid = os.getpid()
+    if self._file_digest_cache_pid != pid:
+      self._file_digest_cache = FileDigestCache(path=FileDigestCache.global_instance().path)
+      self._file_digest_cache_pid = pid
+    return binascii.hexlify(self._file_digest_cache.digest(os.path.realpath(path))).decode('ascii')
+
+
+def _call_analysis_tools(args):
+  """Calls a method of an AnalysisTools instance: a picklable work function for subprocesses."""
+  tools, method_name, method_args = args
+  return getattr(tools, method_name)(*method_args)
 
 
 class AnalysisTools(object):
@@ -21,12 +96,63 @@ class AnalysisTools(object):
   _PANTS_BUILDROOT_PLACEHOLDER = b'/_PANTS_BUILDROOT_PLACEHOLDER'
   _PANTS_WORKDIR_PLACEHOLDER = b'/_PANTS_WORKDIR_PLACEHOLDER'
 
-  def __init__(self, java_home, parser, analysis_cls, pants_buildroot, pants_workdir):
+  def __init__(self, java_home, parser, analysis_cls, pants_buildroot, pants_workdir,
+               parsed_analysis_cache=None, map_fn=None):
+    """
+    :param ParsedAnalysisCache parsed_analysis_cache: A cache of parsed analysis to reuse across
+                                                      runs, or None to always parse.
+    :param map_fn: A function (f, items) -> results with which to process the analysis files of
+                   many targets concurrently, such as `Context.subproc_map`; or None to process
+                   them serially.
+    """
     self.parser = parser
     self._java_home = java_home
     self._pants_buildroot = pants_buildroot.encode('utf-8')
     self._pants_workdir = pants_workdir.encode('utf-8')
     self._analysis_cls = analysis_cls
+    self._parsed_analysis_cache = parsed_analysis_cache
+    self._map_fn = map_fn
+
+  def __getstate__(self):
+    # The map function is only ever used by the parent process, and may not be picklable.
+    state = self.__dict__.copy()
+    state['_map_fn'] = None
+    return state
+
+  def _map(self, method_name, args_list):
+    """Calls the named method once for each tuple of args, concurrently if possible."""
+    args_list = list(args_list)
+    if self._map_fn is None or len(args_list) < 2:
+      return [getattr(self, method_name)(*args) for args in args_list]
+    return self._map_fn(_call_analysis_tools,
+                        [(self, method_name, args) for args in args_list])
+
+  def parse_from_path(self, analysis_path):
+    """Parse an analysis file, reusing the result of a previous parse if it is unchanged."""
+    if self._parsed_analysis_cache is None:
+      return self.parser.parse_from_path(analysis_path)
+    return self._parsed_analysis_cache.get(analysis_path, self.parser.parse_from_path, 'analysis')
+
+  def parse_products_from_path(self, analysis_path, classes_dir):
+    """Parse the src->class mappings of an analysis file, as the parser's method of that name."""
+    parse = lambda path: self.parser.parse_products_from_path(path, classes_dir)
+    if self._parsed_analysis_cache is None:
+      return parse(analysis_path)
+    return self._parsed_analysis_cache.get(analysis_path, parse, 'products', classes_dir)
+
+  def parse_deps_from_path(self, analysis_path):
+    """Parse the src->dep mappings of an analysis file, as the parser's method of that name."""
+    if self._parsed_analysis_cache is None:
+      return self.parser.parse_deps_from_path(analysis_path)
+    return self._parsed_analysis_cache.get(analysis_path, self.parser.parse_deps_from_path, 'deps')
+
+  def parse_products_from_paths(self, analysis_path_classes_dir_pairs):
+    """Like `parse_products_from_path`, for many (analysis_path, classes_dir) pairs at once."""
+    return self._map('parse_products_from_path', analysis_path_classes_dir_pairs)
+
+  def parse_deps_from_paths(self, analysis_paths):
+    """Like `parse_deps_from_path`, for many analysis files at once."""
+    return self._map('parse_deps_from_path', [(path,) for path in analysis_paths])
 
   def split_to_paths(self, analysis_path, split_path_pairs, catchall_path=None):
     """Split an analysis file.
@@ -38,7 +164,7 @@ class AnalysisTools(object):
     If catchall_path is specified, the analysis for any sources not mentioned in the splits is
     split out to that path.
     """
-    analysis = self.parser.parse_from_path(analysis_path)
+    analysis = self.parse_from_path(analysis_path)
     splits, output_paths = zip(*split_path_pairs)
     split_analyses = analysis.split(splits, catchall_path is not None)
     if catchall_path is not None:
@@ -48,10 +174,26 @@ class AnalysisTools(object):
 
   def merge_from_paths(self, analysis_paths, merged_analysis_path):
     """Merge multiple analysis files into one."""
-    analyses = [self.parser.parse_from_path(path) for path in analysis_paths]
+    analyses = [self.parse_from_path(path) for path in analysis_paths]
     merged_analysis = self._analysis_cls.merge(analyses)
     merged_analysis.write_to_path(merged_analysis_path)
 
+  def split_many_to_paths(self, split_args_list):
+    """Performs many splits at once.
+
+    :param split_args_list: A list of (analysis_path, split_path_pairs, catchall_path) tuples, each
+                            the arguments of a call to `split_to_paths`.
+    """
+    self._map('split_to_paths', split_args_list)
+
+  def merge_many_from_paths(self, merge_args_list):
+    """Performs many merges at once.
+
+    :param merge_args_list: A list of (analysis_paths, merged_analysis_path) tuples, each the
+                            arguments of a call to `merge_from_paths`.
+    """
+    self._map('merge_from_paths', merge_args_list)
+
   def rebase_from_path(self, infile_path, outfile_path, old_base, new_base):
     self.parser.rebase_from_path(infile_path, outfile_path, old_base, new_base, java_home=None)
 
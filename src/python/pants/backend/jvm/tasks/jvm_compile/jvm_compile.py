@@ -16,6 +16,7 @@ from pants.backend.jvm.subsystems.scala_platform import ScalaPlatform
 from pants.backend.jvm.targets.jar_library import JarLibrary
 from pants.backend.jvm.targets.javac_plugin import JavacPlugin
 from pants.backend.jvm.tasks.classpath_util import ClasspathUtil
+from pants.backend.jvm.tasks.jvm_compile.analysis_tools import ParsedAnalysisCache
 from pants.backend.jvm.tasks.jvm_compile.compile_context import CompileContext, DependencyContext
 from pants.backend.jvm.tasks.jvm_compile.execution_graph import (ExecutionFailure, ExecutionGraph,
                                                                  Job)
@@ -147,6 +148,13 @@ class JvmCompile(NailgunTaskBase):
                   'constraints). Choose \'random\' to choose random sizes for each target, which '
                   'may be useful for distributed builds.')
 
+    register('--parallel-analysis', advanced=True, type=bool,
+             help='Parse the analysis files of many targets concurrently, in subprocesses.')
+
+    register('--cache-parsed-analysis', advanced=True, type=bool, default=True,
+             help='Cache parsed analysis in a binary form under the workdir, so that analysis '
+                  'files that are unchanged since they were last parsed are never parsed again.')
+
     register('--capture-log', advanced=True, type=bool,
              fingerprint=True,
              help='Capture compilation output to per-target logs.')
@@ -244,10 +252,21 @@ class JvmCompile(NailgunTaskBase):
   def create_analysis_tools(self):
     """Returns an AnalysisTools implementation.
 
+    Implementations should pass `analysis_tools_options` to the AnalysisTools they create.
+
     Subclasses must implement.
     """
     raise NotImplementedError()
 
+  @property
+  def analysis_tools_options(self):
+    """The keyword arguments configuring caching and parallelism for AnalysisTools."""
+    parsed_analysis_cache = None
+    if self.get_options().cache_parsed_analysis:
+      parsed_analysis_cache = ParsedAnalysisCache(os.path.join(self.workdir, 'parsed_analysis'))
+    map_fn = self.context.subproc_map if self.get_options().parallel_analysis else None
+    return dict(parsed_analysis_cache=parsed_analysis_cache, map_fn=map_fn)
+
   def compile(self, args, classpath, sources, classes_output_dir, upstream_analysis, analysis_file,
               log_file, settings, fatal_warnings, javac_plugins_to_exclude):
     """Invoke the compiler.
@@ -549,6 +568,12 @@ class JvmCompile(NailgunTaskBase):
     classes (or due to bugs in classfile tracking in zinc/jmake.)
     """
     buildroot = get_buildroot()
+    # Grab the analysis' view of which classfiles were generated, for all contexts at once.
+    analyzed_contexts = [cc for cc in compile_contexts if os.path.exists(cc.analysis_file)]
+    products = self._analysis_tools.parse_products_from_paths(
+      [(cc.analysis_file, cc.classes_dir) for cc in analyzed_contexts])
+    products_by_context = dict(zip(analyzed_contexts, products))
+
     # Build a mapping of srcs to classes for each context.
     classes_by_src_by_context = defaultdict(dict)
     for compile_context in compile_contexts:
@@ -559,15 +584,11 @@ class JvmCompile(NailgunTaskBase):
           if not name.endswith('/'):
             unclaimed_classes.add(os.path.join(compile_context.classes_dir, name))
 
-      # Grab the analysis' view of which classfiles were generated.
       classes_by_src = classes_by_src_by_context[compile_context]
-      if os.path.exists(compile_context.analysis_file):
-        products = self._analysis_parser.parse_products_from_path(compile_context.analysis_file,
-                                                                  compile_context.classes_dir)
-        for src, classes in products.items():
-          relsrc = os.path.relpath(src, buildroot)
-          classes_by_src[relsrc] = classes
-          unclaimed_classes.difference_update(classes)
+      for src, classes in products_by_context.get(compile_context, {}).items():
+        relsrc = os.path.relpath(src, buildroot)
+        classes_by_src[relsrc] = classes
+        unclaimed_classes.difference_update(classes)
 
       # Any remaining classfiles were unclaimed by sources/analysis.
       classes_by_src[None] = list(unclaimed_classes)
@@ -594,9 +615,10 @@ class JvmCompile(NailgunTaskBase):
 
     # Register classfile product dependencies (if requested).
     if product_deps_by_src is not None:
-      for compile_context in compile_contexts:
-        product_deps_by_src[compile_context.target] = \
-            self._analysis_parser.parse_deps_from_path(compile_context.analysis_file)
+      analysis_files = [cc.analysis_file for cc in compile_contexts]
+      deps = self._analysis_tools.parse_deps_from_paths(analysis_files)
+      for compile_context, deps_by_src in zip(compile_contexts, deps):
+        product_deps_by_src[compile_context.target] = deps_by_src
 
   def _check_unused_deps(self, compile_context):
     """Uses `product_deps_by_src` to check unused deps and warn or error."""
@@ -41,6 +41,14 @@ class ZincAnalysisParser(AnalysisParser):
       except UnderlyingParser.ParseError as e:
         raise ParseError(e)
 
+  def parse_products_from_path(self, infile_path, classes_dir):
+    """An efficient parser of just the products section, which reads only that section."""
+    with raise_on_eof(infile_path):
+      try:
+        return self._underlying_parser.parse_products_from_path(infile_path)
+      except UnderlyingParser.ParseError as e:
+        raise ParseError(e)
+
   def parse_deps(self, infile):
     with raise_on_eof(infile):
       try:
@@ -48,6 +56,14 @@ class ZincAnalysisParser(AnalysisParser):
       except UnderlyingParser.ParseError as e:
         raise ParseError(e)
 
+  def parse_deps_from_path(self, infile_path):
+    """An efficient parser of just the deps sections, which reads only those sections."""
+    with raise_on_eof(infile_path):
+      try:
+        return self._underlying_parser.parse_deps_from_path(infile_path, "")
+      except UnderlyingParser.ParseError as e:
+        raise ParseError(e)
+
   def rebase(self, infile, outfile, pants_home_from, pants_home_to, java_home=None):
     with raise_on_eof(infile):
       try:
@@ -265,7 +265,8 @@ class BaseZincCompile(JvmCompile):
 
   def create_analysis_tools(self):
     return AnalysisTools(self.dist.real_home, ZincAnalysisParser(), ZincAnalysis,
-                         get_buildroot(), self.get_options().pants_workdir)
+                         get_buildroot(), self.get_options().pants_workdir,
+                         **self.analysis_tools_options)
 
   def zinc_classpath(self):
     return self.tool_classpath('zinc') + self._tools_jar
@@ -0,0 +1,136 @@
+# coding=utf-8
+# Copyright 2016 Pants project contributors (see CONTRIBUTORS.md).
+# Licensed under the Apache License, Version 2.0 (see LICENSE).
+
+from __future__ import (absolute_import, division, generators, nested_scopes, print_function,
+                        unicode_literals, with_statement)
+
+import mmap
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from pants.backend.jvm.zinc.zinc_analysis import ZincAnalysis
+from pants.backend.jvm.zinc.zinc_analysis_element_types import (APIs, Compilations, CompileSetup,
+                                                                Relations, SourceInfos, Stamps)
+from pants.source.file_digest_cache import FileDigestCache
+
+
+class ZincAnalysisIndex(object):
+  """The byte offsets of the sections of a zinc analysis file.
+
+  Sections appear in a fixed order, so the offset of a section is found by searching forward for
+  its header from the offset of the section before it. Searching happens on demand and stops at
+  the requested section: finding a section near the start of a large analysis file, such as
+  'products', costs in proportion to the sections before it, not to the size of the file.
+
+  Use `for_path` to share indexes, which are valid for as long as their file is unchanged. At most
+  `MAX_INDEXES` are shared, the least recently used being dropped first.
+  """
+
+  class Error(Exception):
+    pass
+
+  # The (element type, header) of each section, in file order. Note that a header alone does not
+  # identify a section: both Relations and Stamps have a 'class names' section.
+  SECTIONS = tuple((cls, header)
+                   for cls in (CompileSetup, Relations, Stamps, APIs, SourceInfos, Compilations)
+                   for header in cls.headers)
+
+  _num_items_re = re.compile(br'\d+ items\n')
+
+  MAX_INDEXES = 10000
+
+  # Maps path to the (stat key, index) for it, least recently used first.
+  _indexes = OrderedDict()
+  _indexes_lock = threading.Lock()
+
+  @classmethod
+  def for_path(cls, path):
+    """Returns the index for the analysis file at `path`, reusing it if the file is unchanged.
+
+    As for file digests, the index of a file modified within `FileDigestCache.RACY_SECONDS` is not
+    shared, since a later edit within the resolution of its mtime would go unnoticed.
+    """
+    stat = os.stat(path)
+    key = (stat.st_size, stat.st_mtime, stat.st_ino)
+    with cls._indexes_lock:
+      cached = cls._indexes.pop(path, None)
+      if cached is not None and cached[0] == key:
+        cls._indexes[path] = cached
+        return cached[1]
+      index = cls(stat.st_size)
+      if time.time() - stat.st_mtime > FileDigestCache.RACY_SECONDS:
+        cls._indexes[path] = (key, index)
+        while len(cls._indexes) > cls.MAX_INDEXES:
+          cls._indexes.popitem(last=False)
+      return index
+
+  def __init__(self, size):
+    """
+    :param int size: The size of the indexed file, in bytes.
+    """
+    self._size = size
+    self._offsets = []
+    self._lock = threading.Lock()
+
+  @staticmethod
+  def _header_line(header):
+    return '{}:\n'.format(header).encode('utf-8')
+
+  def offset(self, mm, cls, header):
+    """Returns the offset of the header line of the given section.
+
+    :param mm: A memory map of the indexed file.
+    :param cls: The type of the element the section belongs to.
+    :param header: The header of the section.
+    """
+    section_index = self.SECTIONS.index((cls, header))
+    with self._lock:
+      while len(self._offsets) <= section_index:
+        self._offsets.append(self._find(mm, len(self._offsets)))
+      return self._offsets[section_index]
+
+  def _find(self, mm, section_index):
+    if section_index == 0:
+      version_line = ZincAnalysis.FORMAT_VERSION_LINE
+      if mm[:len(version_line)] != version_line:
+        raise self.Error('Unrecognized version line: {}'.format(mm[:len(version_line)]))
+      # Search from the newline ending the version line.
+      offset = len(version_line) - 1
+    else:
+      offset = self._offsets[section_index - 1]
+
+    cls, header = self.SECTIONS[section_index]
+    header_line = self._header_line(header)
+    while True:
+      offset = mm.find(b'\n' + header_line, offset)
+      if offset == -1:
+        raise self.Error('Section "{}" not found.'.format(header))
+      offset += 1
+      # Skip any value that happens to look like the header.
+      if self._has_num_items(mm, offset, header_line):
+        return offset
+
+  def _has_num_items(self, mm, offset, header_line):
+    items_start = offset + len(header_line)
+    return self._num_items_re.match(mm[items_start:mm.find(b'\n', items_start) + 1]) is not None
+
+  @contextmanager
+  def open_section(self, path, cls, header):
+    """Yields an iterator over the lines of the indexed file, starting at the given section.
+
+    :param string path: The path of the indexed file.
+    """
+    if self._size == 0:
+      raise self.Error('Empty analysis file: {}'.format(path))
+    with open(path, 'rb') as infile:
+      mm = mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ)
+      try:
+        mm.seek(self.offset(mm, cls, header))
+        yield iter(mm.readline, b'')
+      finally:
+        mm.close()
@@ -14,6 +14,7 @@ from six.moves import range
 
 from pants.backend.jvm.zinc.zinc_analysis import (APIs, Compilations, CompileSetup, Relations,
                                                   SourceInfos, Stamps, ZincAnalysis)
+from pants.backend.jvm.zinc.zinc_analysis_index import ZincAnalysisIndex
 
 
 class ZincAnalysisParser(object):
@@ -47,13 +48,32 @@ class ZincAnalysisParser(object):
     self._verify_version(infile)
     return self._find_repeated_at_header(infile, b'products')
 
+  def parse_products_from_path(self, infile_path):
+    """An efficient parser of just the products section of an analysis file.
+
+    Seeks straight to the section, rather than reading the file up to it.
+    """
+    return self._parse_indexed_section(infile_path, Relations, b'products')
+
   def parse_deps(self, infile, classes_dir):
     self._verify_version(infile)
     # Note: relies on the fact that these headers appear in this order in the file.
     bin_deps = self._find_repeated_at_header(infile, b'binary dependencies')
     src_deps = self._find_repeated_at_header(infile, b'direct source dependencies')
     ext_deps = self._find_repeated_at_header(infile, b'direct external dependencies')
+    return self._combine_deps(bin_deps, src_deps, ext_deps, classes_dir)
+
+  def parse_deps_from_path(self, infile_path, classes_dir):
+    """An efficient parser of just the dependency sections of an analysis file.
 
+    Seeks straight to each section, rather than reading the file up to it.
+    """
+    bin_deps = self._parse_indexed_section(infile_path, Relations, b'binary dependencies')
+    src_deps = self._parse_indexed_section(infile_path, Relations, b'direct source dependencies')
+    ext_deps = self._parse_indexed_section(infile_path, Relations, b'direct external dependencies')
+    return self._combine_deps(bin_deps, src_deps, ext_deps, classes_dir)
+
+  def _combine_deps(self, bin_deps, src_deps, ext_deps, classes_dir):
     # TODO(benjy): Temporary hack until we inject a dep on the scala runtime jar.
     scalalib_re = re.compile(r'scala-library-\d+\.\d+\.\d+\.jar$')
     filtered_bin_deps = defaultdict(list)
@@ -72,6 +92,14 @@ class ZincAnalysisParser(object):
         ret[src].extend(deps)
     return ret
 
+  def _parse_indexed_section(self, infile_path, cls, header):
+    index = ZincAnalysisIndex.for_path(infile_path)
+    try:
+      with index.open_section(infile_path, cls, header) as lines_iter:
+        return self._parse_section(lines_iter, expected_header=header)
+    except ZincAnalysisIndex.Error as e:
+      raise self.ParseError(e)
+
   def rebase_from_path(self, infile_path, outfile_path, pants_home_from, pants_home_to, java_home=None):
     with open(infile_path, 'rb') as infile:
       with open(outfile_path, 'wb') as outfile:
@@ -66,6 +66,9 @@ class FileSystemProjectTree(ProjectTree):
   def _relative_readlink_raw(self, relpath):
     return os.readlink(self._join(relpath))
 
+  def _local_path_raw(self, relpath):
+    return self._join(relpath)
+
   def _walk_raw(self, relpath, topdown=True):
     def onerror(error):
       raise OSError(getattr(error, 'errno', None), 'Failed to walk below {}'.format(relpath), error)
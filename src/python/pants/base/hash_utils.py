@@ -6,6 +6,7 @@ from __future__ import (absolute_import, division, generators, nested_scopes, pr
                         unicode_literals, with_statement)
 
 import hashlib
+import types
 
 
 def hash_all(strs, digest=None):
@@ -33,6 +34,22 @@ def hash_file(path, digest=None):
   return digest.hexdigest()
 
 
+def fingerprint_code(digest, code):
+  """Updates the given hashlib message digest with a fingerprint of a code object.
+
+  Unlike its repr, the fingerprint of a code object is the same in every process that loads the
+  same code.
+  """
+  digest.update(code.co_code)
+  digest.update(repr((code.co_names, code.co_varnames, code.co_freevars)))
+  for const in code.co_consts:
+    # The repr of a code object includes its address, so nested code is fingerprinted instead.
+    if isinstance(const, types.CodeType):
+      fingerprint_code(digest, const)
+    else:
+      digest.update(repr(const))
+
+
 class Sharder(object):
   """Assigns strings to shards pseudo-randomly, but stably."""
 
@@ -71,6 +71,10 @@ class ProjectTree(AbstractClass):
   def _walk_raw(self, relpath, topdown=True):
     """Walk the file tree rooted at `path`.  Works like os.walk but returned root value is relative path."""
 
+  def _local_path_raw(self, relpath):
+    """Returns the absolute path of path on the local filesystem, or None if it is not local."""
+    return None
+
   def glob1(self, dir_relpath, glob):
     """Returns a list of paths in path that match glob and are not ignored."""
     if self.isignored(dir_relpath, directory=True):
@@ -85,7 +89,10 @@ class ProjectTree(AbstractClass):
     if self.isignored(relpath, directory=True):
       self._raise_access_ignored(relpath)
 
-    return self._filter_ignored(self._scandir_raw(relpath), selector=lambda e: e.path)
+    # The type of each Stat says whether it is a directory, so only Links need to be stat'd.
+    return self._filter_ignored(self._scandir_raw(relpath), selector=lambda e: e.path,
+                                is_dir=lambda e: type(e) is Dir or (type(e) is Link and
+                                                                    self._isdir_raw(e.path)))
 
   def isdir(self, relpath):
     """Returns True if path is a directory and is not ignored."""
@@ -117,6 +124,15 @@ class ProjectTree(AbstractClass):
 
     return self._content_raw(file_relpath)
 
+  def local_path(self, file_relpath):
+    """
+    Returns the absolute path of the file at path on the local filesystem, or None if the files of
+    this ProjectTree are not local. Raises exception if path is ignored.
+    """
+    if self.isignored(file_relpath):
+      self._raise_access_ignored(file_relpath)
+    return self._local_path_raw(file_relpath)
+
   def relative_readlink(self, relpath):
     """
     Execute `readlink` for the given path, which may result in a relative path.
@@ -162,15 +178,22 @@ class ProjectTree(AbstractClass):
     match_result = list(self.ignore.match_files([relpath]))
     return len(match_result) > 0
 
-  def _filter_ignored(self, entries, selector=None):
+  def _filter_ignored(self, entries, selector=None, is_dir=None):
     """Given an opaque entry list, filter any ignored entries.
 
     :param entries: A list or generator that produces entries to filter.
     :param selector: A function that computes a path for an entry relative to the root of the
       ProjectTree, or None to use identity.
+    :param is_dir: A function that returns whether an entry is a directory, or None to stat the
+      path of each entry.
     """
     selector = selector or (lambda x: x)
-    prefixed_entries = [(self._append_slash_if_dir_path(selector(entry)), entry)
+    if is_dir is None:
+      prefixed_entries = [(self._append_slash_if_dir_path(selector(entry)), entry)
+                          for entry in entries]
+    else:
+      prefixed_entries = [(self._append_trailing_slash(selector(entry)) if is_dir(entry)
+                           else selector(entry), entry)
                           for entry in entries]
     ignored_paths = set(self.ignore.match_files(path for path, _ in prefixed_entries))
     return [entry for path, entry in prefixed_entries if path not in ignored_paths]
@@ -5,15 +5,18 @@
 from __future__ import (absolute_import, division, generators, nested_scopes, print_function,
                         unicode_literals, with_statement)
 
+import hashlib
 import logging
+import os
 from collections import namedtuple
 from contextlib import contextmanager
 
 from pants.base.build_environment import get_buildroot
 from pants.base.cmd_line_spec_parser import CmdLineSpecParser
 from pants.base.file_system_project_tree import FileSystemProjectTree
+from pants.base.hash_utils import fingerprint_code
 from pants.bin.options_initializer import OptionsInitializer
-from pants.engine.engine import LocalSerialEngine
+from pants.engine.engine import ThreadHybridEngine
 from pants.engine.fs import create_fs_tasks
 from pants.engine.graph import create_graph_tasks
 from pants.engine.legacy.graph import LegacyBuildGraph, create_legacy_graph_tasks
@@ -24,7 +27,9 @@ from pants.engine.parser import SymbolTable
 from pants.engine.scheduler import LocalScheduler
 from pants.engine.storage import Storage
 from pants.option.options_bootstrapper import OptionsBootstrapper
+from pants.util.dirutil import safe_mkdir, safe_rmtree
 from pants.util.memo import memoized_method
+from pants.version import VERSION
 
 
 logger = logging.getLogger(__name__)
@@ -75,6 +80,63 @@ class LegacyGraphHelper(namedtuple('LegacyGraphHelper', ['scheduler',
 class EngineInitializer(object):
   """Constructs the components necessary to run the v2 engine with v1 BuildGraph compatibility."""
 
+  # Bump this to discard the persistent engine caches of earlier versions of this code.
+  ENGINE_CACHE_VERSION = '2'
+
+  @staticmethod
+  def engine_cache_dir(pants_workdir):
+    """Return the directory of the persistent engine caches under the given workdir.
+
+    It lives in the workdir, so `clean-all` discards it.
+    """
+    return os.path.join(pants_workdir, 'engine', 'cache')
+
+  @staticmethod
+  def rules_fingerprint(tasks, symbol_table_cls):
+    """Return a fingerprint of the given tasks and symbol table.
+
+    The results cached by the engine are only valid for the rules that produced them, which plugins
+    and backends may change without changing the version of pants. Task functions are
+    fingerprinted by their code, and types and selectors by their reprs.
+    """
+    hasher = hashlib.sha1()
+    for output_type, input_selects, func in tasks:
+      hasher.update(repr((output_type, tuple(input_selects))))
+      code = getattr(func, '__code__', None)
+      if code is not None:
+        hasher.update('{}.{}'.format(func.__module__, func.__name__))
+        fingerprint_code(hasher, code)
+      else:
+        hasher.update(repr(func) if isinstance(func, type) else type(func).__name__)
+    hasher.update(repr(sorted(symbol_table_cls.table().items())))
+    return hasher.hexdigest()
+
+  @classmethod
+  def _create_engine(cls, scheduler, engine_cache_dir=None, engine_cache_max_size=None,
+                     io_pool_size=None, io_batch_size=16, rules_fingerprint=None):
+    # FilesystemNodes are run (in batches of siblings) by a pool of threads, and everything else
+    # inline.
+    def create(storage, use_cache=False):
+      return ThreadHybridEngine(scheduler, storage, pool_size=io_pool_size,
+                                io_batch_size=io_batch_size, debug=False, use_cache=use_cache)
+
+    if engine_cache_dir is None:
+      return create(Storage.create(debug=False))
+
+    # The results cached by one version of pants, or for one set of rules, are not valid for
+    # another.
+    cache_name = '{}-{}-{}'.format(VERSION, cls.ENGINE_CACHE_VERSION, rules_fingerprint)
+    # Caches of other versions and rules are unlikely to be used again: discard them.
+    if os.path.isdir(engine_cache_dir):
+      for name in os.listdir(engine_cache_dir):
+        if name != cache_name:
+          safe_rmtree(os.path.join(engine_cache_dir, name))
+    cache_path = os.path.join(engine_cache_dir, cache_name)
+    safe_mkdir(cache_path)
+    storage = Storage.create(path=cache_path, in_memory=False, debug=False,
+                             max_size=engine_cache_max_size)
+    return create(storage, use_cache=True)
+
   @staticmethod
   def parse_commandline_to_spec_roots(options=None, args=None, build_root=None):
     if not options:
@@ -83,14 +145,22 @@ class EngineInitializer(object):
     spec_roots = [cmd_line_spec_parser.parse_spec(spec) for spec in options.target_specs]
     return spec_roots
 
-  @staticmethod
-  def setup_legacy_graph(path_ignore_patterns, symbol_table_cls=None):
+  @classmethod
+  def setup_legacy_graph(cls, path_ignore_patterns, symbol_table_cls=None, engine_cache_dir=None,
+                         engine_cache_max_size=None, io_pool_size=None, io_batch_size=16):
     """Construct and return the components necessary for LegacyBuildGraph construction.
 
     :param list path_ignore_patterns: A list of path ignore patterns for FileSystemProjectTree,
                                       usually taken from the `--pants-ignore` global option.
     :param SymbolTable symbol_table_cls: A SymbolTable class to use for build file parsing, or
                                          None to use the default.
+    :param string engine_cache_dir: A directory to persist the engine's cache in (see
+                                    `engine_cache_dir`), or None to cache in memory only.
+    :param int engine_cache_max_size: The size in bytes that the persistent cache is bounded by.
+    :param int io_pool_size: The number of threads that run filesystem operations, or None for 2
+                             per core.
+    :param int io_batch_size: The maximum number of filesystem operations on sibling paths that
+                              run in a single task of the I/O pool.
     :returns: A tuple of (scheduler, engine, symbol_table_cls, build_graph_cls).
     """
 
@@ -112,7 +182,12 @@ class EngineInitializer(object):
     )
 
     scheduler = LocalScheduler(dict(), tasks, project_tree)
-    engine = LocalSerialEngine(scheduler, Storage.create(debug=False))
+    rules_fingerprint = None
+    if engine_cache_dir is not None:
+      rules_fingerprint = cls.rules_fingerprint(tasks, symbol_table_cls)
+    engine = cls._create_engine(scheduler, engine_cache_dir, engine_cache_max_size,
+                                io_pool_size=io_pool_size, io_batch_size=io_batch_size,
+                                rules_fingerprint=rules_fingerprint)
 
     return LegacyGraphHelper(scheduler, engine, symbol_table_cls, LegacyBuildGraph)
 
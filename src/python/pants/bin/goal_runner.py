@@ -6,6 +6,7 @@ from __future__ import (absolute_import, division, generators, nested_scopes, pr
                         unicode_literals, with_statement)
 
 import logging
+import os
 import sys
 
 from twitter.common.collections import OrderedSet
@@ -18,7 +19,10 @@ from pants.base.workunit import WorkUnit, WorkUnitLabel
 from pants.bin.engine_initializer import EngineInitializer
 from pants.bin.repro import Reproducer
 from pants.build_graph.address_lookup_error import AddressLookupError
+from pants.build_graph.address_map_snapshot import (AddressMapSnapshot,
+                                                   alias_implementation_fingerprint)
 from pants.build_graph.build_file_address_mapper import BuildFileAddressMapper
+from pants.build_graph.build_file_code_cache import BuildFileCodeCache, alias_fingerprint
 from pants.build_graph.build_file_parser import BuildFileParser
 from pants.build_graph.mutable_build_graph import MutableBuildGraph
 from pants.engine.round_engine import RoundEngine
@@ -29,9 +33,11 @@ from pants.help.help_printer import HelpPrinter
 from pants.java.nailgun_executor import NailgunProcessGroup
 from pants.pantsd.subsystem.pants_daemon_launcher import PantsDaemonLauncher
 from pants.reporting.reporting import Reporting
+from pants.source.file_digest_cache import FileDigestCacheConfig
 from pants.source.source_root import SourceRootConfig
 from pants.task.task import QuietTaskMixin
 from pants.util.filtering import create_filters, wrap_filters
+from pants.version import VERSION
 
 
 logger = logging.getLogger(__name__)
@@ -71,13 +77,16 @@ class GoalRunnerFactory(object):
 
     pants_ignore = self._global_options.pants_ignore or []
     self._project_tree = self._get_project_tree(self._global_options.build_file_rev, pants_ignore)
-    self._build_file_parser = BuildFileParser(self._build_config, self._root_dir)
+    self._build_file_parser = BuildFileParser(self._build_config, self._root_dir,
+                                              code_cache=self._get_code_cache())
     build_ignore_patterns = self._global_options.ignore_patterns or []
     self._address_mapper = BuildFileAddressMapper(
       self._build_file_parser,
       self._project_tree,
       build_ignore_patterns,
-      exclude_target_regexps=self._global_options.exclude_target_regexp
+      exclude_target_regexps=self._global_options.exclude_target_regexp,
+      parse_processes=self._global_options.build_file_parse_processes,
+      snapshot=self._get_address_map_snapshot()
     )
     self._build_graph = self._select_buildgraph(self._global_options.enable_v2_engine,
                                                 self._global_options.pants_ignore,
@@ -95,7 +104,15 @@ class GoalRunnerFactory(object):
     elif use_engine:
       root_specs = EngineInitializer.parse_commandline_to_spec_roots(options=self._options,
                                                                      build_root=self._root_dir)
-      graph_helper = EngineInitializer.setup_legacy_graph(path_ignore_patterns)
+      engine_cache_dir = None
+      if self._global_options.engine_cache:
+        engine_cache_dir = EngineInitializer.engine_cache_dir(self._global_options.pants_workdir)
+      graph_helper = EngineInitializer.setup_legacy_graph(
+        path_ignore_patterns,
+        engine_cache_dir=engine_cache_dir,
+        engine_cache_max_size=self._global_options.engine_cache_max_size,
+        io_pool_size=self._global_options.engine_io_pool_size,
+        io_batch_size=self._global_options.engine_io_batch_size)
       return graph_helper.create_graph(root_specs)
     else:
       return MutableBuildGraph(self._address_mapper)
@@ -107,6 +124,27 @@ class GoalRunnerFactory(object):
     else:
       return FileSystemProjectTree(self._root_dir, pants_ignore)
 
+  def _get_code_cache(self):
+    """Creates the persistent cache of compiled BUILD files, if it is enabled."""
+    if not self._global_options.build_file_code_cache:
+      return None
+    path = os.path.join(self._global_options.pants_workdir, 'build_files', 'code.cache')
+    return BuildFileCodeCache(path, alias_fingerprint(self._build_config.registered_aliases()))
+
+  def _get_address_map_snapshot(self):
+    """Creates the persistent snapshot of parsed BUILD files, if it is enabled.
+
+    BUILD files read from an scm revision are not snapshotted, since they have no stats to validate
+    their snapshot with.
+    """
+    if not self._global_options.build_file_snapshot or self._global_options.build_file_rev:
+      return None
+    path = os.path.join(self._global_options.pants_workdir, 'build_files', 'address_maps.snapshot')
+    aliases = self._build_config.registered_aliases()
+    fingerprint = '{}:{}:{}'.format(VERSION, alias_fingerprint(aliases),
+                                    alias_implementation_fingerprint(aliases))
+    return AddressMapSnapshot(path, fingerprint)
+
   def _expand_goals(self, goals):
     """Check and populate the requested goals for a given run."""
     for goal in goals:
@@ -144,6 +182,20 @@ class GoalRunnerFactory(object):
         if tag_filter(target):
           self._targets.append(target)
 
+      self._address_mapper.close_parser_pool()
+
+      # Persist the code of the BUILD files that were compiled to find them.
+      code_cache = self._build_file_parser.code_cache
+      if code_cache is not None:
+        code_cache.save()
+        logger.debug('BUILD file code cache: {} hits, {} misses'
+                     .format(code_cache.hits, code_cache.misses))
+      snapshot = self._address_mapper.snapshot
+      if snapshot is not None:
+        snapshot.save()
+        logger.debug('Address map snapshot: {} hits, {} misses'
+                     .format(snapshot.hits, snapshot.misses))
+
   def _maybe_launch_pantsd(self):
     """Launches pantsd if configured to do so."""
     if self._global_options.enable_pantsd:
@@ -159,6 +211,9 @@ class GoalRunnerFactory(object):
     self._maybe_launch_pantsd()
 
     with self._run_tracker.new_workunit(name='setup', labels=[WorkUnitLabel.SETUP]):
+      # Install the configured cache of source file digests, which targets and tasks share.
+      FileDigestCacheConfig.global_instance().get_file_digest_cache()
+
       self._expand_goals(self._requested_goals)
       self._expand_specs(self._target_specs, self._fail_fast)
 
@@ -178,6 +233,7 @@ class GoalRunnerFactory(object):
                         build_file_parser=self._build_file_parser,
                         address_mapper=self._address_mapper,
                         invalidation_report=invalidation_report)
+      self._run_tracker.register_stats('build_graph_walk_memo', self._build_graph.walk_memo_stats)
 
     return context, invalidation_report
 
@@ -216,7 +272,8 @@ class GoalRunner(object):
   @classmethod
   def subsystems(cls):
     # Subsystems used outside of any task.
-    return {SourceRootConfig, Reporting, Reproducer, RunTracker, PantsDaemonLauncher.Factory}
+    return {FileDigestCacheConfig, SourceRootConfig, Reporting, Reproducer, RunTracker,
+            PantsDaemonLauncher.Factory}
 
   def _execute_engine(self):
     workdir = self._context.options.for_global_scope().pants_workdir
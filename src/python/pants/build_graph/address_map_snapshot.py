@@ -0,0 +1,264 @@
+# coding=utf-8
+# Copyright 2016 Pants project contributors (see CONTRIBUTORS.md).
+# Licensed under the Apache License, Version 2.0 (see LICENSE).
+
+from __future__ import (absolute_import, division, generators, nested_scopes, print_function,
+                        unicode_literals, with_statement)
+
+import hashlib
+import inspect
+import logging
+import marshal
+import os
+import sys
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from pants.base.hash_utils import fingerprint_code
+from pants.build_graph.address import BuildFileAddress
+from pants.build_graph.build_file_parser import BuildFileParser
+from pants.build_graph.indexed_file import IndexedFile
+from pants.source.file_digest_cache import FileDigestCache
+
+
+try:
+  import cPickle as pickle
+except ImportError:
+  import pickle
+
+logger = logging.getLogger(__name__)
+
+
+def pickle_address_map(address_map):
+  """Pickles the address map of a family of BUILD files, without pickling their BuildFiles.
+
+  :param dict address_map: A dict from BuildFileAddress to addressable.
+  :returns: The pickled address map, which `unpickle_address_map` recreates.
+  :raises: Whatever pickle raises for unpicklable addressables.
+  """
+  addressables_by_relpath = defaultdict(list)
+  for address, addressable in address_map.items():
+    addressables_by_relpath[address.build_file.relpath].append((address.target_name, addressable))
+  return pickle.dumps(sorted(addressables_by_relpath.items()), protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def unpickle_address_map(build_files, pickled):
+  """Recreates an address map pickled by `pickle_address_map` for the given BuildFiles.
+
+  :param list build_files: The family of BuildFiles that the address map was parsed from.
+  :param bytes pickled: The pickled address map.
+  :returns: A dict from BuildFileAddress to addressable.
+  """
+  build_files_by_relpath = {build_file.relpath: build_file for build_file in build_files}
+  address_map = {}
+  for relpath, addressables in pickle.loads(pickled):
+    for target_name, addressable in addressables:
+      address_map[BuildFileAddress(build_files_by_relpath[relpath], target_name)] = addressable
+  return address_map
+
+
+_BUILTIN_MODULES = ('__builtin__', 'builtins')
+
+
+def _fingerprint_implementation(hasher, value, visited):
+  if inspect.isclass(value):
+    for cls in inspect.getmro(value):
+      if cls in visited or cls.__module__ in _BUILTIN_MODULES:
+        continue
+      visited.add(cls)
+      hasher.update('class {}.{}\n'.format(cls.__module__, cls.__name__).encode('utf-8'))
+      for name, attr in sorted(cls.__dict__.items()):
+        if isinstance(attr, (staticmethod, classmethod)):
+          funcs = [attr.__func__]
+        elif isinstance(attr, property):
+          funcs = [attr.fget, attr.fset, attr.fdel]
+        else:
+          funcs = [attr]
+        for func in funcs:
+          code = getattr(func, '__code__', None)
+          if code is not None:
+            hasher.update('def {}\n'.format(name).encode('utf-8'))
+            fingerprint_code(hasher, code)
+  elif getattr(value, '__code__', None) is not None:
+    hasher.update('def {}.{}\n'.format(value.__module__, value.__name__).encode('utf-8'))
+    fingerprint_code(hasher, value.__code__)
+  elif type(value).__module__ in _BUILTIN_MODULES:
+    hasher.update('{!r}\n'.format(value).encode('utf-8'))
+  else:
+    _fingerprint_implementation(hasher, type(value), visited)
+
+
+def alias_implementation_fingerprint(aliases):
+  """Returns a fingerprint of the code that implements the given BuildFileAliases.
+
+  Classes are fingerprinted by the code of the methods and properties defined throughout their
+  (non-builtin) mro, functions by their code, other objects by their class, and builtin values by
+  their repr. The code that those call is not fingerprinted.
+
+  :param aliases: The aliases that BUILD files are parsed with.
+  :type aliases: :class:`pants.build_graph.build_file_aliases.BuildFileAliases`
+  :rtype: string
+  """
+  hasher = hashlib.sha1()
+  visited = set()
+  for category in (aliases.target_types, aliases.target_macro_factories, aliases.objects,
+                   aliases.context_aware_object_factories):
+    for alias, value in sorted(category.items()):
+      hasher.update('{}\n'.format(alias).encode('utf-8'))
+      _fingerprint_implementation(hasher, value, visited)
+    hasher.update(b'\n')
+  return hasher.hexdigest()
+
+
+class _RecordingHandler(logging.Handler):
+  def __init__(self):
+    super(_RecordingHandler, self).__init__(level=logging.WARNING)
+    self.records = []
+
+  def emit(self, record):
+    self.records.append(record)
+
+
+@contextmanager
+def recorded_parser_warnings():
+  """Yields a list of the warnings that the BuildFileParser logs within the context."""
+  handler = _RecordingHandler()
+  parser_logger = logging.getLogger(BuildFileParser.__module__)
+  parser_logger.addHandler(handler)
+  try:
+    yield handler.records
+  finally:
+    parser_logger.removeHandler(handler)
+
+
+class AddressMapSnapshot(object):
+  """A persistent snapshot of the address maps parsed from families of BUILD files.
+
+  The address map of each family of sibling BUILD files is stored (in an IndexedFile) with the
+  size, mtime and digest of each of its BUILD files, and of each other file that they read while
+  they were parsed (see `pants.build_graph.build_file_parser.recorded_reads`). When it is looked up,
+  it is valid if those files have the same sizes and mtimes, which is checked without reading them;
+  or else if they have the same content, in which case their new sizes and mtimes are stored.
+  Address maps that are put since the snapshot was loaded are only written when `save` is called.
+
+  As for file digests, a family is not snapshotted if any of its files was modified within
+  `FileDigestCache.RACY_SECONDS`, since a later edit within the granularity of the filesystem's
+  mtimes could leave its size and mtime unchanged.
+
+  BUILD files are not executed when their address map is loaded from the snapshot: so families
+  that log warnings while they are parsed should not be put in it. See `recorded_parser_warnings`.
+  """
+
+  MAGIC = b'PBFADDR2'
+
+  def __init__(self, path, fingerprint, max_entries=100000):
+    """
+    :param string path: The path of the file to store the snapshot in.
+    :param string fingerprint: A fingerprint of the aliases that BUILD files are parsed with (see
+                               `pants.build_graph.build_file_code_cache.alias_fingerprint`) and of
+                               the code that implements them (see
+                               `alias_implementation_fingerprint`).
+    :param int max_entries: The number of address maps past which those that have not been used
+                            since the snapshot was loaded are discarded when it is saved.
+    """
+    self._entries = IndexedFile(path, self.MAGIC, max_entries=max_entries)
+    self._fingerprint = fingerprint
+    self.hits = 0
+    self.misses = 0
+
+  def _key(self, build_files):
+    hasher = hashlib.sha1()
+    for part in (self._fingerprint, sys.version, build_files[0].spec_path):
+      hasher.update(part.encode('utf-8'))
+      hasher.update(b'\0')
+    return hasher.digest()
+
+  @staticmethod
+  def _stat(path):
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime
+
+  @staticmethod
+  def _digest(path):
+    with open(path, 'rb') as fh:
+      return hashlib.sha1(fh.read()).digest()
+
+  def _signature(self, path):
+    return (path,) + self._stat(path) + (self._digest(path),)
+
+  def _is_valid(self, build_files, signatures):
+    """Returns True if the given BUILD files and the files they read match the given signatures,
+    and whether any was read."""
+    paths = [signature[0] for signature in signatures[:len(build_files)]]
+    if [build_file.full_path for build_file in build_files] != paths:
+      return False, False
+    read = False
+    for path, size, mtime, digest in signatures:
+      try:
+        if self._stat(path) == (size, mtime):
+          continue
+        read = True
+        if self._digest(path) != digest:
+          return False, read
+      except (IOError, OSError):
+        return False, read
+    return True, read
+
+  def get(self, build_files):
+    """Returns the address map of the given family of BUILD files, or None if it is not valid.
+
+    :param list build_files: A non-empty list of sibling BuildFiles.
+    :returns: A dict from BuildFileAddress to addressable, or None.
+    """
+    entry = self._entries.get(self._key(build_files))
+    if entry is not None:
+      try:
+        signatures, pickled = marshal.loads(entry)
+        valid, read = self._is_valid(build_files, signatures)
+        if valid:
+          address_map = unpickle_address_map(build_files, pickled)
+          if read:
+            # Some files were touched without being changed: store their new stats.
+            self.put(build_files, address_map,
+                     read_paths=[s[0] for s in signatures[len(build_files):]])
+          self.hits += 1
+          return address_map
+      except Exception as e:
+        # Unfortunately, unpickling can raise nearly anything for stale or corrupt entries.
+        logger.debug('Ignoring unreadable address map snapshot for {}: {}'
+                     .format(build_files[0].spec_path, e))
+    self.misses += 1
+    return None
+
+  def put(self, build_files, address_map, read_paths=()):
+    """Puts the address map parsed from the given family of BUILD files.
+
+    Address maps whose addressables can't be pickled, or whose files were modified too recently to
+    be validated by their stats, are not put.
+
+    :param list build_files: A non-empty list of sibling BuildFiles.
+    :param dict address_map: A dict from BuildFileAddress to addressable.
+    :param read_paths: The paths of the other files that the BUILD files read while they were
+                       parsed, as recorded by `recorded_reads`.
+    """
+    key = self._key(build_files)
+    paths = [build_file.full_path for build_file in build_files]
+    paths.extend(sorted(set(read_paths) - set(paths)))
+    try:
+      pickled = pickle_address_map(address_map)
+      signatures = [self._signature(path) for path in paths]
+      now = time.time()
+      for path, _, mtime, _ in signatures:
+        if now - mtime <= FileDigestCache.RACY_SECONDS:
+          raise ValueError('{} was modified too recently to be validated by its stats'.format(path))
+    except Exception as e:
+      logger.debug('Not snapshotting the address map of {}: {}'
+                   .format(build_files[0].spec_path, e))
+      self._entries.discard(key)
+      return
+    self._entries.put(key, marshal.dumps((signatures, pickled)))
+
+  def save(self):
+    """Writes the address maps that were put since the snapshot was loaded, if there are any."""
+    self._entries.save()
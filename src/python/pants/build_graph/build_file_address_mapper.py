@@ -21,7 +21,9 @@ from pants.base.build_file import BuildFile
 from pants.base.specs import DescendantAddresses, SiblingAddresses, SingleAddress
 from pants.build_graph.address import Address, parse_spec
 from pants.build_graph.address_lookup_error import AddressLookupError
-from pants.build_graph.build_file_parser import BuildFileParser
+from pants.build_graph.address_map_snapshot import recorded_parser_warnings
+from pants.build_graph.build_file_parser import BuildFileParser, recorded_reads
+from pants.build_graph.build_file_parser_pool import BuildFileParserPool
 from pants.util.dirutil import fast_relpath
 
 
@@ -64,11 +66,16 @@ class BuildFileAddressMapper(object):
   # patterns, because the asterisks in its name make it an invalid regexp.
   _UNMATCHED_KEY = '** unmatched **'
 
-  def __init__(self, build_file_parser, project_tree, build_ignore_patterns=None, exclude_target_regexps=None):
+  def __init__(self, build_file_parser, project_tree, build_ignore_patterns=None,
+               exclude_target_regexps=None, parse_processes=0, snapshot=None):
     """Create a BuildFileAddressMapper.
 
     :param build_file_parser: An instance of BuildFileParser
     :param build_file_type: A subclass of BuildFile used to construct and cache BuildFile objects
+    :param int parse_processes: The number of processes to parse the BUILD files found by a scan
+                                with (see `BuildFileParserPool`), or 0 or 1 to parse serially.
+    :param snapshot: An optional AddressMapSnapshot to load the address maps of unchanged BUILD
+                     files from, rather than parsing them, and to put those that are parsed in.
     """
     self._build_file_parser = build_file_parser
     self._spec_path_to_address_map_map = {}  # {spec_path: {address: addressable}} mapping
@@ -77,6 +84,14 @@ class BuildFileAddressMapper(object):
 
     self._exclude_target_regexps = exclude_target_regexps or []
     self._exclude_patterns = [re.compile(pattern) for pattern in self._exclude_target_regexps]
+    self._parse_processes = parse_processes
+    self._parser_pool = None
+    self._snapshot = snapshot
+
+  @property
+  def snapshot(self):
+    """The AddressMapSnapshot of this mapper, or None."""
+    return self._snapshot
 
   @property
   def root_dir(self):
@@ -147,15 +162,77 @@ class BuildFileAddressMapper(object):
         if not build_files:
           raise self.BuildFileScanError("{spec_path} does not contain any BUILD files."
                                         .format(spec_path=os.path.join(self.root_dir, spec_path)))
-        mapping = self._build_file_parser.address_map_from_build_files(build_files)
+        mapping = self._parse_build_files(build_files)
       except BuildFileParser.BuildFileParserError as e:
         raise AddressLookupError("{message}\n Loading addresses from '{spec_path}' failed."
                                  .format(message=e, spec_path=spec_path))
-
-      address_map = {address: (address, addressed) for address, addressed in mapping.items()}
-      self._spec_path_to_address_map_map[spec_path] = address_map
+      self._add_address_map(spec_path, mapping)
     return self._spec_path_to_address_map_map[spec_path]
 
+  def _add_address_map(self, spec_path, mapping):
+    address_map = {address: (address, addressed) for address, addressed in mapping.items()}
+    self._spec_path_to_address_map_map[spec_path] = address_map
+
+  def _parse_build_files(self, build_files):
+    """Returns the address map of the given family of BUILD files, from the snapshot if possible."""
+    if self._snapshot is None:
+      return self._build_file_parser.address_map_from_build_files(build_files)
+
+    mapping = self._snapshot.get(build_files)
+    if mapping is None:
+      with recorded_parser_warnings() as warnings, recorded_reads() as read_paths:
+        mapping = self._build_file_parser.address_map_from_build_files(build_files)
+      # BUILD files are not executed when loaded from the snapshot, so their warnings would be lost.
+      if not warnings:
+        self._snapshot.put(build_files, mapping, read_paths=read_paths)
+    return mapping
+
+  def _parse_spec_paths(self, spec_paths):
+    """Parses the BUILD files of the given spec paths in parallel, if configured to.
+
+    Nothing is raised here: the BUILD files of a spec path that can't be parsed in parallel are
+    left to `_address_map_from_spec_path`, which parses them serially when they are requested.
+    """
+    if self._parse_processes < 2:
+      return
+
+    families = []
+    for spec_path in OrderedSet(spec_paths):
+      if spec_path in self._spec_path_to_address_map_map:
+        continue
+      try:
+        build_files = list(BuildFile.get_build_files_family(self._project_tree, spec_path,
+                                                            self._build_ignore_patterns))
+      except BuildFile.BuildFileError:
+        continue
+      if not build_files:
+        continue
+      mapping = self._snapshot.get(build_files) if self._snapshot is not None else None
+      if mapping is None:
+        families.append(build_files)
+      else:
+        self._add_address_map(spec_path, mapping)
+    if len(families) < 2:
+      return
+
+    if self._parser_pool is None:
+      self._parser_pool = BuildFileParserPool(self._build_file_parser, self._project_tree,
+                                              self._parse_processes)
+    for build_files, mapping, read_paths in self._parser_pool.parse_families(families):
+      if mapping is not None:
+        # The pool only returns the address maps of families that logged no warnings.
+        self._add_address_map(build_files[0].spec_path, mapping)
+        if self._snapshot is not None:
+          self._snapshot.put(build_files, mapping, read_paths=read_paths)
+
+  def close_parser_pool(self):
+    """Terminates the processes that BUILD files were parsed in, if any.
+
+    They are forked again if a later scan needs them.
+    """
+    if self._parser_pool is not None:
+      self._parser_pool.close()
+
   def addresses_in_spec_path(self, spec_path):
     """Returns only the addresses gathered by `address_map_from_spec_path`, with no values."""
     return self._address_map_from_spec_path(spec_path).keys()
@@ -211,9 +288,11 @@ class BuildFileAddressMapper(object):
 
     addresses = set()
     try:
-      for build_file in BuildFile.scan_build_files(self._project_tree,
-                                                   base_relpath=base_path,
-                                                   build_ignore_patterns=self._build_ignore_patterns):
+      build_files = BuildFile.scan_build_files(self._project_tree,
+                                               base_relpath=base_path,
+                                               build_ignore_patterns=self._build_ignore_patterns)
+      self._parse_spec_paths(build_file.spec_path for build_file in build_files)
+      for build_file in build_files:
         for address in self.addresses_in_spec_path(build_file.spec_path):
           addresses.add(address)
     except BuildFile.BuildFileError as e:
@@ -273,6 +352,7 @@ class BuildFileAddressMapper(object):
       except BuildFile.BuildFileError as e:
         raise AddressLookupError(e)
 
+      self._parse_spec_paths(build_file.spec_path for build_file in build_files)
       for build_file in build_files:
         try:
           addresses.update(self.addresses_in_spec_path(build_file.spec_path))
@@ -0,0 +1,118 @@
+# coding=utf-8
+# Copyright 2016 Pants project contributors (see CONTRIBUTORS.md).
+# Licensed under the Apache License, Version 2.0 (see LICENSE).
+
+from __future__ import (absolute_import, division, generators, nested_scopes, print_function,
+                        unicode_literals, with_statement)
+
+import hashlib
+import inspect
+import logging
+import marshal
+import sys
+
+from pants.build_graph.indexed_file import IndexedFile
+
+
+logger = logging.getLogger(__name__)
+
+
+def alias_fingerprint(aliases):
+  """Returns a fingerprint of the names and types of the given BuildFileAliases.
+
+  :param aliases: The aliases that BUILD files are parsed with.
+  :type aliases: :class:`pants.build_graph.build_file_aliases.BuildFileAliases`
+  :rtype: string
+  """
+  def type_name(value):
+    value_type = value if inspect.isclass(value) else type(value)
+    return '{}.{}'.format(value_type.__module__, value_type.__name__)
+
+  hasher = hashlib.sha1()
+  for category in (aliases.target_types, aliases.target_macro_factories, aliases.objects,
+                   aliases.context_aware_object_factories):
+    for alias, value in sorted(category.items()):
+      hasher.update('{}={}\n'.format(alias, type_name(value)).encode('utf-8'))
+    hasher.update(b'\n')
+  return hasher.hexdigest()
+
+
+class BuildFileCodeCache(object):
+  """A persistent cache of the compiled code objects of BUILD files.
+
+  Code objects are marshalled and keyed by the path and content of their BUILD file, the version of
+  the interpreter and a fingerprint of the aliases that BUILD files are parsed with. They are
+  stored in a single IndexedFile, and code objects compiled since it was loaded are only written
+  when `save` is called.
+  """
+
+  MAGIC = b'PBFCODE1'
+
+  def __init__(self, path, fingerprint, max_entries=100000):
+    """
+    :param string path: The path of the file to store the cache in.
+    :param string fingerprint: A fingerprint of the aliases that BUILD files are parsed with: see
+                               `alias_fingerprint`.
+    :param int max_entries: The number of code objects past which those that have not been used
+                            since the cache was loaded are discarded when it is saved.
+    """
+    self._entries = IndexedFile(path, self.MAGIC, max_entries=max_entries)
+    self._fingerprint = fingerprint
+    self.hits = 0
+    self.misses = 0
+
+  @property
+  def path(self):
+    return self._entries.path
+
+  def _key(self, build_file, source):
+    hasher = hashlib.sha1()
+    for part in (self._fingerprint, sys.version, build_file.full_path):
+      hasher.update(part.encode('utf-8'))
+      hasher.update(b'\0')
+    hasher.update(source)
+    return hasher.digest()
+
+  def code(self, build_file):
+    """Returns the code object for the given BUILD file, compiling it only if it is not cached.
+
+    :param build_file: The BUILD file to return the code for.
+    :type build_file: :class:`pants.base.build_file.BuildFile`
+    :raises: Whatever `BuildFile.code` raises for a BUILD file that is not cached.
+    """
+    key = self._key(build_file, build_file.source())
+    entry = self._entries.get(key)
+    if entry is not None:
+      try:
+        code = marshal.loads(entry)
+        self.hits += 1
+        return code
+      except (EOFError, ValueError, TypeError) as e:
+        logger.debug('Ignoring corrupt cached code for {}: {}'.format(build_file, e))
+
+    self.misses += 1
+    code = build_file.code()
+    self._entries.put(key, marshal.dumps(code))
+    return code
+
+  def take_compiled(self):
+    """Returns the marshalled code objects compiled since the cache was loaded, and forgets them.
+
+    This is for caches shared with forked processes, which do not save them: their compiled code
+    objects are returned to the process that saves the cache, which adds them with `add_compiled`.
+
+    :rtype: dict
+    """
+    return self._entries.take_added()
+
+  def add_compiled(self, compiled):
+    """Adds the code objects returned by `take_compiled` in another process, to be saved.
+
+    :param dict compiled: The marshalled code objects.
+    """
+    self.misses += len(compiled)
+    self._entries.put_all(compiled)
+
+  def save(self):
+    """Writes the code objects compiled since the cache was loaded, if there are any."""
+    self._entries.save()
@@ -5,8 +5,12 @@
 from __future__ import (absolute_import, division, generators, nested_scopes, print_function,
                         unicode_literals, with_statement)
 
+import io
 import logging
+import os
+import threading
 import warnings
+from contextlib import contextmanager
 
 import six
 
@@ -14,6 +18,70 @@ import six
 logger = logging.getLogger(__name__)
 
 
+# The state of the recording of the files that BUILD files read, per thread: see `recorded_reads`.
+_reads = threading.local()
+_open_patch_lock = threading.Lock()
+_open_patch_count = 0
+_builtin_open = six.moves.builtins.open
+_io_open = io.open
+
+
+def _recording(opener):
+  def recording_open(name, mode='r', *args, **kwargs):
+    records = getattr(_reads, 'records', None)
+    if records and getattr(_reads, 'executing', False) and isinstance(name, six.string_types):
+      if not any(c in mode for c in 'wax+'):
+        path = os.path.realpath(name)
+        for recorded in records:
+          recorded.add(path)
+    return opener(name, mode, *args, **kwargs)
+  return recording_open
+
+
+@contextmanager
+def recorded_reads():
+  """Yields a set of the paths of the files that BUILD files open for reading while they are
+  executed by this thread within the context.
+
+  BUILD files may read other files as they are executed: `python_requirements()` reads a
+  requirements.txt file, for example. So the result of parsing a BUILD file depends on those files
+  as well as its own content.
+
+  While any thread records, `open` and `io.open` are replaced by functions that record the files
+  that are opened.
+  """
+  global _open_patch_count
+  recorded = set()
+  with _open_patch_lock:
+    if _open_patch_count == 0:
+      six.moves.builtins.open = _recording(_builtin_open)
+      io.open = _recording(_io_open)
+    _open_patch_count += 1
+  records = getattr(_reads, 'records', None)
+  if records is None:
+    records = _reads.records = []
+  records.append(recorded)
+  try:
+    yield recorded
+  finally:
+    records.remove(recorded)
+    with _open_patch_lock:
+      _open_patch_count -= 1
+      if _open_patch_count == 0:
+        six.moves.builtins.open = _builtin_open
+        io.open = _io_open
+
+
+@contextmanager
+def _executing():
+  executing = getattr(_reads, 'executing', False)
+  _reads.executing = True
+  try:
+    yield
+  finally:
+    _reads.executing = executing
+
+
 # Note: Significant effort has been made to keep the types BuildFile, BuildGraph, Address, and
 # Target separated appropriately.  The BuildFileParser is intended to have knowledge of just
 # BuildFile and Address.
@@ -50,14 +118,27 @@ class BuildFileParser(object):
   class ExecuteError(BuildFileParserError):
     """An exception was encountered executing code in the BUILD file"""
 
-  def __init__(self, build_configuration, root_dir):
+  def __init__(self, build_configuration, root_dir, code_cache=None):
+    """
+    :param build_configuration: The BuildConfiguration that BUILD files are parsed with.
+    :param string root_dir: The root directory of the BUILD files.
+    :param code_cache: An optional BuildFileCodeCache to look up the code of BUILD files in, rather
+                       than compiling them.
+    :type code_cache: :class:`pants.build_graph.build_file_code_cache.BuildFileCodeCache`
+    """
     self._build_configuration = build_configuration
     self._root_dir = root_dir
+    self._code_cache = code_cache
 
   @property
   def root_dir(self):
     return self._root_dir
 
+  @property
+  def code_cache(self):
+    """The BuildFileCodeCache of this parser, or None."""
+    return self._code_cache
+
   def registered_aliases(self):
     """Returns a copy of the registered build file aliases this build file parser uses."""
     return self._build_configuration.registered_aliases()
@@ -122,7 +203,10 @@ class BuildFileParser(object):
                  .format(build_file=build_file))
 
     try:
-      build_file_code = build_file.code()
+      if self._code_cache is not None:
+        build_file_code = self._code_cache.code(build_file)
+      else:
+        build_file_code = build_file.code()
     except SyntaxError as e:
       raise self.ParseError(_format_context_msg(e.lineno, e.offset, e.__class__.__name__, e))
     except Exception as e:
@@ -132,7 +216,7 @@ class BuildFileParser(object):
 
     parse_state = self._build_configuration.initialize_parse_state(build_file)
     try:
-      with warnings.catch_warnings(record=True) as warns:
+      with warnings.catch_warnings(record=True) as warns, _executing():
         six.exec_(build_file_code, parse_state.parse_globals)
         for warn in warns:
           logger.warning(_format_context_msg(lineno=warn.lineno,
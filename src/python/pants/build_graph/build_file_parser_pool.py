@@ -0,0 +1,156 @@
+# coding=utf-8
+# Copyright 2016 Pants project contributors (see CONTRIBUTORS.md).
+# Licensed under the Apache License, Version 2.0 (see LICENSE).
+
+from __future__ import (absolute_import, division, generators, nested_scopes, print_function,
+                        unicode_literals, with_statement)
+
+import logging
+import multiprocessing
+import os
+import signal
+import sys
+
+from pants.base.build_file import BuildFile
+from pants.build_graph.address_map_snapshot import pickle_address_map, unpickle_address_map
+from pants.build_graph.build_file_parser import BuildFileParser, recorded_reads
+
+
+class _RecordingHandler(logging.Handler):
+  """Records the messages that a worker would otherwise log, rather than emitting them."""
+
+  def __init__(self):
+    super(_RecordingHandler, self).__init__(level=logging.WARNING)
+    self.records = []
+
+  def emit(self, record):
+    self.records.append(record)
+
+
+# The state of a worker process: its BuildFileParser, ProjectTree and _RecordingHandler.
+_worker_state = None
+
+
+def _initialize_worker(build_file_parser, project_tree):
+  global _worker_state
+  # Exit quietly on sigint, otherwise we get {num_procs} keyboardinterrupt stacktraces spewn.
+  signal.signal(signal.SIGINT, lambda *args: sys.exit())
+
+  # Warnings logged while parsing are reported by the parent, which parses the BUILD files
+  # that logged them again: see `_parse_family`.
+  recorder = _RecordingHandler()
+  parser_logger = logging.getLogger(BuildFileParser.__module__)
+  parser_logger.handlers = [recorder]
+  parser_logger.propagate = False
+  _worker_state = (build_file_parser, project_tree, recorder)
+
+
+def _parse_family(relpaths):
+  """Parses a family of sibling BUILD files in a worker.
+
+  :returns: A tuple of the address map of the family pickled by `pickle_address_map` (or None if
+            the family failed to parse, logged warnings, or parsed to unpicklable addressables), the
+            paths of the other files that the family read (see `recorded_reads`), and the code
+            objects that were compiled to parse it (see `BuildFileCodeCache.take_compiled`).
+  """
+  build_file_parser, project_tree, recorder = _worker_state
+  del recorder.records[:]
+  pickled = None
+  with recorded_reads() as read_paths:
+    try:
+      family = build_file_parser.parse_build_files([BuildFile(project_tree, relpath)
+                                                    for relpath in relpaths])
+    except BuildFileParser.BuildFileParserError:
+      family = None
+  if family is not None and not recorder.records:
+    address_map = {}
+    for build_file_address_map in family.values():
+      address_map.update(build_file_address_map)
+    try:
+      pickled = pickle_address_map(address_map)
+    except Exception:
+      # Unfortunately, pickle can raise things other than PickleError instances.
+      pass
+  return pickled, sorted(read_paths), _take_compiled(build_file_parser)
+
+
+def _take_compiled(build_file_parser):
+  code_cache = build_file_parser.code_cache
+  return code_cache.take_compiled() if code_cache is not None else None
+
+
+class BuildFileParserPool(object):
+  """Parses the BUILD files of many directories at once, in a pool of forked processes.
+
+  The workers are forked from this process, so they share the BuildConfiguration (and so the
+  aliases) of the given BuildFileParser without it being pickled. They return the addressables of
+  each BUILD file family in pickled form, and the BuildFileAddresses of the addressables are
+  recreated here for the BuildFiles of this process. They also return the code objects that they
+  compile, which are added to the code cache of the BuildFileParser here, so that they are saved.
+
+  The workers are forked when families are first parsed, and are reused until the pool is closed.
+
+  A family that fails to parse in a worker (or that logs warnings, or whose addressables can't be
+  pickled) is not reported here: the caller should parse it serially instead, which raises the
+  same error (or logs the same warnings) as if it had never been parsed in parallel.
+  """
+
+  def __init__(self, build_file_parser, project_tree, processes):
+    """
+    :param build_file_parser: The BuildFileParser to parse BUILD files with.
+    :type build_file_parser: :class:`pants.build_graph.build_file_parser.BuildFileParser`
+    :param project_tree: The ProjectTree that BUILD files are read from.
+    :param int processes: The number of worker processes to fork.
+    """
+    self._build_file_parser = build_file_parser
+    self._project_tree = project_tree
+    self._processes = processes
+    self._pool = None
+    self._pool_pid = None
+
+  def _ensure_pool(self):
+    # Workers forked by a parent process (as when pantsd forks to serve a run) are not ours to use.
+    pid = os.getpid()
+    if self._pool_pid != pid:
+      self._pool = multiprocessing.Pool(processes=self._processes,
+                                        initializer=_initialize_worker,
+                                        initargs=(self._build_file_parser, self._project_tree))
+      self._pool_pid = pid
+    return self._pool
+
+  def parse_families(self, families):
+    """Parses the given families of sibling BUILD files.
+
+    :param list families: A list of lists of sibling BuildFiles.
+    :returns: A list of (family, address map, read paths) tuples in the order of the given
+              families, where an address map is a dict from BuildFileAddress to addressable, or
+              None if the family should be parsed serially instead, and read paths are the paths of
+              the other files that the family read while it was parsed.
+    """
+    pool = self._ensure_pool()
+    chunksize = max(1, len(families) // (4 * self._processes))
+    try:
+      results = pool.map(_parse_family,
+                         [[build_file.relpath for build_file in family] for family in families],
+                         chunksize=chunksize)
+    except BaseException:
+      self.close()
+      raise
+
+    code_cache = self._build_file_parser.code_cache
+    address_maps = []
+    for family, (pickled, read_paths, compiled) in zip(families, results):
+      if code_cache is not None and compiled:
+        code_cache.add_compiled(compiled)
+      address_maps.append((family,
+                           None if pickled is None else unpickle_address_map(family, pickled),
+                           read_paths))
+    return address_maps
+
+  def close(self):
+    """Terminates the workers of this pool, if any. They are forked again if they are needed."""
+    if self._pool is not None and self._pool_pid == os.getpid():
+      self._pool.terminate()
+      self._pool.join()
+    self._pool = None
+    self._pool_pid = None
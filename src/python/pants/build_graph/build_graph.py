@@ -49,36 +49,42 @@ class BuildGraph(AbstractClass):
           'Found a manually-defined target at synthetic address {}'.format(addr.spec))
 
   class DepthAgnosticWalk(object):
-    """This is a utility class to aid in graph traversals that don't care about the depth."""
+    """This is a utility class to aid in graph traversals that don't care about the depth.
 
-    def __init__(self):
-      self._worked = set()
-      self._expanded = set()
+    Vertices are the dense integer ids that a BuildGraph assigns to its addresses, so that they are
+    marked in bytearrays rather than sets of Addresses.
+    """
+
+    def __init__(self, vertex_count):
+      # Every worked vertex has been expanded, so the expanded marks are also those to check before
+      # following an edge: see `expanded_or_worked`.
+      self.expanded = bytearray(vertex_count)
+      self._worked = bytearray(vertex_count)
 
     def expanded_or_worked(self, vertex):
       """Returns True if the vertex has been expanded or worked."""
-      return vertex in self._expanded or vertex in self._worked
+      return self.expanded[vertex] == 1
 
     def do_work_once(self, vertex):
       """Returns True exactly once for the given vertex."""
-      if vertex in self._worked:
+      if self._worked[vertex]:
         return False
-      self._worked.add(vertex)
+      self._worked[vertex] = 1
       return True
 
     def expand_once(self, vertex, _):
       """Returns True exactly once for the given vertex."""
-      if vertex in self._expanded:
+      if self.expanded[vertex]:
         return False
-      self._expanded.add(vertex)
+      self.expanded[vertex] = 1
       return True
 
   class DepthAwareWalk(DepthAgnosticWalk):
     """This is a utility class to aid in graph traversals that care about the depth."""
 
-    def __init__(self):
-      super(BuildGraph.DepthAwareWalk, self).__init__()
-      self._expanded = defaultdict(set)
+    def __init__(self, vertex_count):
+      super(BuildGraph.DepthAwareWalk, self).__init__(vertex_count)
+      self._expanded_levels = defaultdict(set)
 
     def expand_once(self, vertex, level):
       """Returns True if this (vertex, level) pair has never been expanded, and False otherwise.
@@ -86,9 +92,10 @@ class BuildGraph(AbstractClass):
       This method marks the (vertex, level) pair as expanded after executing, such that this method
       will return True for a given (vertex, level) pair exactly once.
       """
-      if level in self._expanded[vertex]:
+      if level in self._expanded_levels[vertex]:
         return False
-      self._expanded[vertex].add(level)
+      self._expanded_levels[vertex].add(level)
+      self.expanded[vertex] = 1
       return True
 
   @staticmethod
@@ -99,7 +106,12 @@ class BuildGraph(AbstractClass):
     """
     return Target.closure_for_targets(*vargs, **kwargs)
 
+  # The number of Targets held by memoized walks past which they are discarded: see `memoized_walk`.
+  _WALK_MEMO_MAX_TARGETS = 1000000
+
   def __init__(self):
+    self._walk_memo_hits = 0
+    self._walk_memo_misses = 0
     self.reset()
 
   def reset(self):
@@ -113,6 +125,85 @@ class BuildGraph(AbstractClass):
     self._derived_from_by_derivative_address = {}
     self.synthetic_addresses = set()
 
+    # Walks follow the dependencies and dependees of the dense integer ids of addresses, which are
+    # assigned as addresses are first linked or walked.
+    self._vertex_id_by_address = {}
+    self._vertex_addresses = []
+    self._dependency_ids = []
+    self._dependee_ids = []
+
+    self._walk_memo = {}
+    self._walk_memo_size = 0
+
+  def _vertex_id(self, address):
+    """Returns the dense integer id of the given address, assigning it if it has none."""
+    vertex_id = self._vertex_id_by_address.get(address)
+    if vertex_id is None:
+      vertex_id = len(self._vertex_addresses)
+      self._vertex_id_by_address[address] = vertex_id
+      self._vertex_addresses.append(address)
+      self._dependency_ids.append([])
+      self._dependee_ids.append([])
+    return vertex_id
+
+  def _link(self, dependent, dependency):
+    """Adds a dependency of `dependent` on `dependency`, which must not already be in the graph."""
+    self._invalidate_walks()
+    self._target_dependencies_by_address[dependent].add(dependency)
+    self._target_dependees_by_address[dependency].add(dependent)
+    dependent_id = self._vertex_id(dependent)
+    dependency_id = self._vertex_id(dependency)
+    self._dependency_ids[dependent_id].append(dependency_id)
+    self._dependee_ids[dependency_id].append(dependent_id)
+
+  def _invalidate_walks(self):
+    """Discards the walks memoized by `memoized_walk`, because the graph was mutated."""
+    if self._walk_memo:
+      self._walk_memo = {}
+      self._walk_memo_size = 0
+
+  def memoized_walk(self, key, walk):
+    """Returns the Targets returned by the given walk of the graph, memoized by the given key.
+
+    Walks are memoized until the graph is next mutated by `inject_target` or `inject_dependency`,
+    and walks with unhashable keys are not memoized.
+
+    :API: public
+
+    :param tuple key: A key that identifies the walk, by its kind, its roots and everything that its
+      predicates depend on.
+    :param function walk: A function of no arguments that walks the graph, and returns an iterable
+      of Targets.
+    :returns: A tuple of the Targets returned by the walk.
+    """
+    try:
+      walked = self._walk_memo.get(key)
+    except TypeError:
+      return tuple(walk())
+    if walked is not None:
+      self._walk_memo_hits += 1
+      return walked
+
+    self._walk_memo_misses += 1
+    walked = tuple(walk())
+    self._walk_memo_size += len(walked)
+    if self._walk_memo_size > self._WALK_MEMO_MAX_TARGETS:
+      self._walk_memo = {}
+      self._walk_memo_size = len(walked)
+    self._walk_memo[key] = walked
+    return walked
+
+  def walk_memo_stats(self):
+    """Returns the hits and misses of `memoized_walk`, and the number of walks it holds.
+
+    :API: public
+    """
+    return {
+      'hits': self._walk_memo_hits,
+      'misses': self._walk_memo_misses,
+      'memoized': len(self._walk_memo),
+    }
+
   def contains_address(self, address):
     """
     :API: public
@@ -229,6 +320,7 @@ class BuildGraph(AbstractClass):
       self.synthetic_addresses.add(address)
 
     self._target_by_address[address] = target
+    self._invalidate_walks()
 
     for dependency_address in dependencies:
       self.inject_dependency(dependent=address, dependency=dependency_address)
@@ -269,8 +361,7 @@ class BuildGraph(AbstractClass):
       logger.debug('{dependent} already depends on {dependency}'
                    .format(dependent=dependent, dependency=dependency))
     else:
-      self._target_dependencies_by_address[dependent].add(dependency)
-      self._target_dependees_by_address[dependency].add(dependent)
+      self._link(dependent, dependency)
 
   def targets(self, predicate=None):
     """Returns all the targets in the graph in no particular order.
@@ -311,32 +402,44 @@ class BuildGraph(AbstractClass):
     # Use the DepthAgnosticWalk if we can, because DepthAwareWalk does a bit of extra work that can
     # slow things down by few millis.
     walker = self.DepthAwareWalk if leveled_predicate else self.DepthAgnosticWalk
-    walk = walker()
-    def _walk_rec(addr, level=0):
-      # If we've followed an edge to this address, stop recursing.
-      if not walk.expand_once(addr, level):
-        return
+    root_ids = [self._vertex_id(address) for address in addresses]
+    walk = walker(len(self._vertex_addresses))
+    expanded = walk.expanded
 
-      target = self._target_by_address[addr]
+    # The walk is iterative rather than recursive, so that deep graphs don't hit the recursion limit:
+    # the stack holds each expanded target and the iterator of its dependencies that remain.
+    stack = []
 
-      if predicate and not predicate(target):
+    def expand(vertex_id, level):
+      if not walk.expand_once(vertex_id, level):
         return
 
-      if not postorder and walk.do_work_once(addr):
-        work(target)
+      target = self._target_by_address[self._vertex_addresses[vertex_id]]
 
-      for dep_address in self._target_dependencies_by_address[addr]:
-        if walk.expanded_or_worked(dep_address):
-          continue
-        if not leveled_predicate \
-                or leveled_predicate(self._target_by_address[dep_address], level):
-          _walk_rec(dep_address, level + 1)
+      if predicate and not predicate(target):
+        return
 
-      if postorder and walk.do_work_once(addr):
+      if not postorder and walk.do_work_once(vertex_id):
         work(target)
 
-    for address in addresses:
-      _walk_rec(address)
+      stack.append((vertex_id, level, target, iter(self._dependency_ids[vertex_id])))
+
+    for root_id in root_ids:
+      expand(root_id, 0)
+      while stack:
+        vertex_id, level, target, dependency_ids = stack[-1]
+        for dependency_id in dependency_ids:
+          # If we've followed an edge to this vertex, don't follow another.
+          if expanded[dependency_id]:
+            continue
+          if not leveled_predicate or leveled_predicate(
+              self._target_by_address[self._vertex_addresses[dependency_id]], level):
+            expand(dependency_id, level + 1)
+            break
+        else:
+          stack.pop()
+          if postorder and walk.do_work_once(vertex_id):
+            work(target)
 
   def walk_transitive_dependee_graph(self, addresses, work, predicate=None, postorder=False):
     """Identical to `walk_transitive_dependency_graph`, but walks dependees preorder (or postorder
@@ -347,21 +450,32 @@ class BuildGraph(AbstractClass):
 
     :API: public
     """
-    walked = set()
-
-    def _walk_rec(addr):
-      if addr not in walked:
-        walked.add(addr)
-        target = self._target_by_address[addr]
-        if not predicate or predicate(target):
-          if not postorder:
-            work(target)
-          for dep_address in self._target_dependees_by_address[addr]:
-            _walk_rec(dep_address)
+    root_ids = [self._vertex_id(address) for address in addresses]
+    walked = bytearray(len(self._vertex_addresses))
+    stack = []
+
+    def expand(vertex_id):
+      walked[vertex_id] = 1
+      target = self._target_by_address[self._vertex_addresses[vertex_id]]
+      if not predicate or predicate(target):
+        if not postorder:
+          work(target)
+        stack.append((target, iter(self._dependee_ids[vertex_id])))
+
+    for root_id in root_ids:
+      if walked[root_id]:
+        continue
+      expand(root_id)
+      while stack:
+        target, dependee_ids = stack[-1]
+        for dependee_id in dependee_ids:
+          if not walked[dependee_id]:
+            expand(dependee_id)
+            break
+        else:
+          stack.pop()
           if postorder:
             work(target)
-    for address in addresses:
-      _walk_rec(address)
 
   def transitive_dependees_of_addresses(self, addresses, predicate=None, postorder=False):
     """Returns all transitive dependees of `address`.
@@ -426,24 +540,26 @@ class BuildGraph(AbstractClass):
     # Use the DepthAgnosticWalk if we can, because DepthAwareWalk does a bit of extra work that can
     # slow things down by few millis.
     walker = self.DepthAwareWalk if leveled_predicate else self.DepthAgnosticWalk
-    walk = walker()
-    to_walk = deque((0, addr) for addr in addresses)
+    to_walk = deque((0, self._vertex_id(address)) for address in addresses)
+    walk = walker(len(self._vertex_addresses))
+    expanded = walk.expanded
     while len(to_walk) > 0:
-      level, address = to_walk.popleft()
+      level, vertex_id = to_walk.popleft()
 
-      if not walk.expand_once(address, level):
+      if not walk.expand_once(vertex_id, level):
         continue
 
-      target = self._target_by_address[address]
+      target = self._target_by_address[self._vertex_addresses[vertex_id]]
       if predicate and not predicate(target):
         continue
-      if walk.do_work_once(address):
+      if walk.do_work_once(vertex_id):
         ordered_closure.add(target)
-      for addr in self._target_dependencies_by_address[address]:
-        if walk.expanded_or_worked(addr):
+      for dependency_id in self._dependency_ids[vertex_id]:
+        if expanded[dependency_id]:
           continue
-        if not leveled_predicate or leveled_predicate(self._target_by_address[addr], level):
-          to_walk.append((level + 1, addr))
+        if not leveled_predicate or leveled_predicate(
+            self._target_by_address[self._vertex_addresses[dependency_id]], level):
+          to_walk.append((level + 1, dependency_id))
     return ordered_closure
 
   @abstractmethod
@@ -565,7 +681,16 @@ def sort_targets(targets):
 
   :return: the targets that `targets` depend on sorted from most dependent to least.
   """
+  targets = list(targets)
+  build_graph = targets[0]._build_graph if targets else None
+  if not isinstance(build_graph, BuildGraph) or any(target._build_graph is not build_graph
+                                                    for target in targets):
+    return _sort_targets(targets)
+  key = ('sort_targets', tuple(target.address for target in targets))
+  return list(build_graph.memoized_walk(key, lambda: _sort_targets(targets)))
+
 
+def _sort_targets(targets):
   roots, inverted_deps = invert_dependencies(targets)
   ordered = []
   visited = set()
@@ -0,0 +1,150 @@
+# coding=utf-8
+# Copyright 2016 Pants project contributors (see CONTRIBUTORS.md).
+# Licensed under the Apache License, Version 2.0 (see LICENSE).
+
+from __future__ import (absolute_import, division, generators, nested_scopes, print_function,
+                        unicode_literals, with_statement)
+
+import logging
+import marshal
+import mmap
+import os
+import struct
+
+from pants.util.dirutil import safe_concurrent_creation
+
+
+logger = logging.getLogger(__name__)
+
+
+class IndexedFile(object):
+  """A persistent mapping from byte string keys to byte string values, stored in a single file.
+
+  The file holds a header, the values and then an index from key to the offset and length of each
+  value:
+
+    magic | index offset | value ... | index
+
+  The file is memory mapped when it is first read, so that only the values that are looked up are
+  loaded. Values that are put are only written when `save` is called, which rewrites the file
+  atomically. A file that can't be read is treated as empty.
+  """
+
+  _HEADER = struct.Struct(b'>8sQ')
+
+  def __init__(self, path, magic, max_entries=100000):
+    """
+    :param string path: The path of the file.
+    :param bytes magic: 8 bytes identifying the format of the values of the file.
+    :param int max_entries: The number of values past which those that have not been looked up
+                            since the file was loaded are discarded when it is saved.
+    """
+    self._path = path
+    self._magic = magic
+    self._max_entries = max_entries
+
+    self._mapped = None
+    self._index = None
+    self._used = set()
+    self._added = {}
+
+  @property
+  def path(self):
+    return self._path
+
+  def _load(self):
+    if self._index is not None:
+      return
+    self._index = {}
+    if not os.path.isfile(self._path):
+      return
+    try:
+      with open(self._path, 'rb') as fh:
+        mapped = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+      magic, index_offset = self._HEADER.unpack_from(mapped)
+      if magic != self._magic:
+        raise ValueError('Unrecognized magic: {!r}'.format(magic))
+      index = marshal.loads(mapped[index_offset:])
+      if not isinstance(index, dict):
+        raise ValueError('Unrecognized index: {}'.format(type(index)))
+      self._index = index
+      self._mapped = mapped
+    except Exception as e:
+      logger.debug('Ignoring unreadable file {}: {}'.format(self._path, e))
+      self._index = {}
+
+  def _entry(self, key):
+    offset, length = self._index[key]
+    return self._mapped[offset:offset + length]
+
+  def get(self, key):
+    """Returns the value for the given key, or None."""
+    self._load()
+    value = self._added.get(key)
+    if value is None and key in self._index:
+      value = self._entry(key)
+      self._used.add(key)
+    return value
+
+  def put(self, key, value):
+    """Puts the given value for the given key, replacing any existing value when saved."""
+    self._load()
+    self._added[key] = value
+
+  def take_added(self):
+    """Returns a dict of the values that were put since the file was loaded, and forgets them.
+
+    This is for processes that do not save the file themselves: see `put_all`.
+    """
+    added, self._added = self._added, {}
+    return added
+
+  def put_all(self, values):
+    """Puts the given dict of values, as returned by `take_added` in another process."""
+    self._load()
+    self._added.update(values)
+
+  def discard(self, key):
+    """Removes the value of the given key, if any."""
+    self._load()
+    self._index.pop(key, None)
+    self._added.pop(key, None)
+
+  def save(self):
+    """Writes the values that were put since the file was loaded, if there are any.
+
+    Failures to write are logged rather than raised.
+    """
+    if not self._added:
+      return
+    self._load()
+    keys = [key for key in self._index if key not in self._added]
+    if len(keys) + len(self._added) > self._max_entries:
+      keys = [key for key in keys if key in self._used]
+
+    try:
+      self._write(keys)
+    except (IOError, OSError) as e:
+      logger.warn('Failed to save {}: {}'.format(self._path, e))
+
+    # Subsequent lookups read the file that was written, if any.
+    self._mapped = None
+    self._index = None
+    self._used = set()
+    self._added = {}
+
+  def _write(self, keys):
+    """Writes the given existing values and those that were put, with an index."""
+    index = {}
+    with safe_concurrent_creation(self._path) as tmp_path:
+      with open(tmp_path, 'wb') as fh:
+        fh.write(self._HEADER.pack(self._magic, 0))
+        offset = self._HEADER.size
+        entries = [(key, self._entry(key)) for key in keys] + self._added.items()
+        for key, entry in entries:
+          fh.write(entry)
+          index[key] = (offset, len(entry))
+          offset += len(entry)
+        fh.write(marshal.dumps(index))
+        fh.seek(0)
+        fh.write(self._HEADER.pack(self._magic, offset))
@@ -294,24 +294,31 @@ class Target(AbstractTarget):
     leveled_predicate = cls._closure_predicate(include_scopes=include_scopes,
                                                exclude_scopes=exclude_scopes,
                                                respect_intransitive=respect_intransitive)
-    closure = OrderedSet()
-
-    if not bfs:
-      build_graph.walk_transitive_dependency_graph(
-        addresses=addresses,
-        work=closure.add,
-        postorder=postorder,
-        leveled_predicate=leveled_predicate,
-      )
-    else:
-      closure.update(build_graph.transitive_subgraph_of_addresses_bfs(
-        addresses=addresses,
-        leveled_predicate=leveled_predicate,
-      ))
-
-    # Make sure all the roots made it into the closure.
-    closure.update(target_roots)
-    return closure
+
+    def walk():
+      closure = OrderedSet()
+
+      if not bfs:
+        build_graph.walk_transitive_dependency_graph(
+          addresses=addresses,
+          work=closure.add,
+          postorder=postorder,
+          leveled_predicate=leveled_predicate,
+        )
+      else:
+        closure.update(build_graph.transitive_subgraph_of_addresses_bfs(
+          addresses=addresses,
+          leveled_predicate=leveled_predicate,
+        ))
+
+      # Make sure all the roots made it into the closure.
+      closure.update(target_roots)
+      return closure
+
+    # The scopes are the identity of the leveled predicate, and postorder is ignored by a bfs.
+    key = ('closure', tuple(addresses), include_scopes, exclude_scopes, respect_intransitive,
+           bool(bfs), bool(postorder) and not bfs)
+    return OrderedSet(build_graph.memoized_walk(key, walk))
 
   def __init__(self, name, address, build_graph, type_alias=None, payload=None, tags=None,
                description=None, no_cache=False, scope=None, _transitive=None,
@@ -8,10 +8,18 @@ from __future__ import (absolute_import, division, generators, nested_scopes, pr
 import errno
 import os
 import shutil
+import struct
 import tarfile
+import zlib
+from abc import abstractmethod
+from collections import OrderedDict
+
+import lz4.frame
+import zstandard
 
 from pants.util.contextutil import open_tar
 from pants.util.dirutil import safe_mkdir, safe_mkdir_for, safe_walk
+from pants.util.meta import AbstractClass
 
 
 class ArtifactError(Exception):
@@ -81,55 +89,427 @@ class DirectoryArtifact(Artifact):
 
 
 class TarballArtifact(Artifact):
-  """An artifact stored in a tarball."""
+  """An artifact stored in a tarball, compressed with an `ArtifactCodec`.
+
+  Tarballs are read with whichever codec they were created with, regardless of `codec`.
+  """
 
-  def __init__(self, artifact_root, tarfile_, compression=9):
+  READ_SIZE_BYTES = 4 * 1024 * 1024
+
+  def __init__(self, artifact_root, tarfile_, compression=9, codec=None):
+    """
+    :param string artifact_root: The path under which the artifact's files are read/written.
+    :param string tarfile_: The path of the tarball.
+    :param int compression: The compression level to create the tarball with.
+    :param ArtifactCodec codec: The codec to create the tarball with; gzip if None.
+    """
     super(TarballArtifact, self).__init__(artifact_root)
     self._tarfile = tarfile_
     self._compression = compression
+    self._codec = codec or GZIP
 
   def exists(self):
     return os.path.isfile(self._tarfile)
 
   def collect(self, paths):
-    # In our tests, gzip is slightly less compressive than bzip2 on .class files,
-    # but decompression times are much faster.
-    mode = 'w:gz'
+    with open(self._tarfile, 'wb') as outfile:
+      stream = _CompressingStream(outfile, self._codec.compressor(self._compression))
+      with open_tar(stream, 'w|', dereference=True, errorlevel=2) as tarout:
+        for path in paths or ():
+          # Adds dirs recursively.
+          relpath = os.path.relpath(path, self._artifact_root)
+          tarout.add(path, relpath)
+          self._relpaths.add(relpath)
+      stream.finish()
 
-    tar_kwargs = {'dereference': True, 'errorlevel': 2, 'compresslevel': self._compression}
+  def extract(self):
+    with open(self._tarfile, 'rb') as infile:
+      self.extract_stream(iter(lambda: infile.read(self.READ_SIZE_BYTES), b''))
 
-    with open_tar(self._tarfile, mode, **tar_kwargs) as tarout:
-      for path in paths or ():
-        # Adds dirs recursively.
-        relpath = os.path.relpath(path, self._artifact_root)
-        tarout.add(path, relpath)
-        self._relpaths.add(relpath)
+  def extract_stream(self, chunks, tee=None):
+    """Extract the files in a tarball read from an iterator of byte chunks.
 
-  def extract(self):
+    The tarball is extracted as it is read, so that it need not be written to disk first. Its
+    codec is detected from its leading bytes, and its checksum (if its codec has one) is verified
+    once it has been read in full.
+
+    :param chunks: An iterator over the bytes of the compressed tarball.
+    :param tee: An optional file to also write the compressed tarball to as it is read.
+    :returns: The ArtifactCodec that the tarball was compressed with.
+    """
+    stream = _DecompressingStream(chunks, tee=tee)
     try:
-      with open_tar(self._tarfile, 'r', errorlevel=2) as tarin:
-        # Note: We create all needed paths proactively, even though extractall() can do this for us.
-        # This is because we may be called concurrently on multiple artifacts that share directories,
-        # and there will be a race condition inside extractall(): task T1 A) sees that a directory
-        # doesn't exist and B) tries to create it. But in the gap between A) and B) task T2 creates
-        # the same directory, so T1 throws "File exists" in B).
-        # This actually happened, and was very hard to debug.
-        # Creating the paths here up front allows us to squelch that "File exists" error.
+      with open_tar(stream, 'r|', errorlevel=2) as tarin:
         paths = []
         dirs = set()
-        for tarinfo in tarin.getmembers():
-          paths.append(tarinfo.name)
-          if tarinfo.isdir():
-            dirs.add(tarinfo.name)
-          else:
-            dirs.add(os.path.dirname(tarinfo.name))
-        for d in dirs:
-          try:
-            os.makedirs(os.path.join(self._artifact_root, d))
-          except OSError as e:
-            if e.errno != errno.EEXIST:
-              raise
-        tarin.extractall(self._artifact_root)
-        self._relpaths.update(paths)
+
+        def members():
+          # Note: We create all needed paths proactively, even though extractall() can do this for
+          # us. This is because we may be called concurrently on multiple artifacts that share
+          # directories, and there will be a race condition inside extractall(): task T1 A) sees
+          # that a directory doesn't exist and B) tries to create it. But in the gap between A)
+          # and B) task T2 creates the same directory, so T1 throws "File exists" in B).
+          # This actually happened, and was very hard to debug.
+          # Creating the paths here allows us to squelch that "File exists" error.
+          for tarinfo in tarin:
+            paths.append(tarinfo.name)
+            self._create_dirs(tarinfo.name if tarinfo.isdir() else os.path.dirname(tarinfo.name),
+                              dirs)
+            yield tarinfo
+
+        tarin.extractall(self._artifact_root, members=members())
+      # Read the rest of the stream (e.g.: the tarball's trailing padding) to verify its checksum.
+      stream.read_all()
+      self._relpaths.update(paths)
+      return stream.codec
     except tarfile.ReadError as e:
       raise ArtifactError(str(e))
+
+  def _create_dirs(self, d, created):
+    """Creates the directory `d` under the artifact root unless it is in `created`."""
+    if d not in created:
+      try:
+        os.makedirs(os.path.join(self._artifact_root, d))
+      except OSError as e:
+        if e.errno != errno.EEXIST:
+          raise
+      created.add(d)
+
+
+class ArtifactCodec(AbstractClass):
+  """A compression format for tarball artifacts.
+
+  Compressed formats are recognized by the magic bytes they start with, so that artifacts can be
+  read without knowing which codec created them.
+  """
+
+  # The bytes that streams compressed by this codec start with, or None if there are none.
+  magic = None
+
+  # The compression levels this codec accepts, or None if it ignores the level.
+  levels = None
+
+  def __init__(self, name, extension):
+    """
+    :param string name: The name that options refer to this codec by.
+    :param string extension: The file extension of the tarballs this codec creates.
+    """
+    self.name = name
+    self.extension = extension
+
+  def validate_level(self, level):
+    """Raises a ValueError if this codec does not accept the given compression level."""
+    if self.levels is not None and level not in self.levels:
+      raise ValueError('The compression level for {} must be an integer {}-{}: {}'
+                       .format(self.name, self.levels[0], self.levels[-1], level))
+
+  @abstractmethod
+  def compressor(self, level):
+    """Returns an object that compresses a stream at the given level.
+
+    The object has a `compress(data)` method returning the next compressed bytes, and a `flush()`
+    method returning the final compressed bytes.
+    """
+
+  @abstractmethod
+  def decompressor(self):
+    """Returns an object that decompresses a stream.
+
+    The object has a `decompress(data)` method returning the next decompressed bytes, and a
+    `finish()` method returning the final decompressed bytes once all of the compressed bytes have
+    been passed in. Either raises an ArtifactError if the stream is found to be corrupt or
+    truncated. Its `needs_input` attribute is False while it has more decompressed bytes to return
+    from what it has been passed: `decompress(b'')` returns the next of them.
+    """
+
+
+class GzipCodec(ArtifactCodec):
+  """Compresses artifacts with gzip, whose trailer carries a CRC-32 of the tarball."""
+
+  magic = b'\x1f\x8b'
+
+  levels = range(10)
+
+  def compressor(self, level):
+    return zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+  def decompressor(self):
+    return _GzipDecompressor()
+
+
+class _GzipDecompressor(object):
+  _TRAILER = struct.Struct(b'<II')
+
+  # The maximum number of bytes to decompress at once, since a small amount of compressed data may
+  # decompress to a very large amount.
+  MAX_DECOMPRESSED_BYTES = 1024 * 1024
+
+  def __init__(self):
+    self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    self._tail = b''
+    self._crc = 0
+    self._size = 0
+    self.needs_input = True
+
+  def decompress(self, data):
+    self._tail = (self._tail + data[-self._TRAILER.size:])[-self._TRAILER.size:]
+    try:
+      data = self._decompressor.decompress(self._decompressor.unconsumed_tail + data,
+                                           self.MAX_DECOMPRESSED_BYTES)
+    except zlib.error as e:
+      raise ArtifactError('Corrupt gzip stream: {}'.format(e))
+    # If the limit was reached, zlib may hold more output even once all of its input is consumed.
+    self.needs_input = (not self._decompressor.unconsumed_tail and
+                        len(data) < self.MAX_DECOMPRESSED_BYTES)
+    return self._checksum(data)
+
+  def finish(self):
+    try:
+      data = self._checksum(self._decompressor.flush())
+    except zlib.error as e:
+      raise ArtifactError('Corrupt gzip stream: {}'.format(e))
+    # zlib verifies the trailer if it reaches it, but not that it does.
+    if len(self._tail) < self._TRAILER.size:
+      raise ArtifactError('Truncated gzip stream.')
+    if self._TRAILER.unpack(self._tail) != (self._crc & 0xffffffff, self._size & 0xffffffff):
+      raise ArtifactError('Checksum mismatch in gzip stream: it may be corrupt or truncated.')
+    return data
+
+  def _checksum(self, data):
+    self._crc = zlib.crc32(data, self._crc)
+    self._size += len(data)
+    return data
+
+
+class ZstdCodec(ArtifactCodec):
+  """Compresses artifacts with zstandard, with a checksum of the tarball."""
+
+  magic = b'\x28\xb5\x2f\xfd'
+
+  levels = range(1, 23)
+
+  def compressor(self, level):
+    return zstandard.ZstdCompressor(level=level, write_checksum=True).compressobj()
+
+  def decompressor(self):
+    return _ZstdDecompressor()
+
+
+class _ZstdDecompressor(object):
+  needs_input = True
+
+  def __init__(self):
+    self._decompressor = zstandard.ZstdDecompressor().decompressobj()
+
+  def decompress(self, data):
+    try:
+      return self._decompressor.decompress(data)
+    except zstandard.ZstdError as e:
+      raise ArtifactError('Corrupt zstd stream: {}'.format(e))
+
+  def finish(self):
+    # A decompressobj may not be used once it has decompressed a whole frame, which is the only
+    # way it reveals that it has done so.
+    try:
+      self._decompressor.decompress(b'')
+    except zstandard.ZstdError:
+      return b''
+    raise ArtifactError('Truncated zstd stream.')
+
+
+class Lz4Codec(ArtifactCodec):
+  """Compresses artifacts with lz4 frames, with a checksum of the tarball."""
+
+  magic = b'\x04\x22\x4d\x18'
+
+  levels = range(17)
+
+  def compressor(self, level):
+    return _Lz4Compressor(level)
+
+  def decompressor(self):
+    return _Lz4Decompressor()
+
+
+class _Lz4Compressor(object):
+  def __init__(self, level):
+    self._compressor = lz4.frame.LZ4FrameCompressor(compression_level=level, content_checksum=True)
+    self._header = self._compressor.begin()
+
+  def compress(self, data):
+    header, self._header = self._header, b''
+    return header + self._compressor.compress(data)
+
+  def flush(self):
+    header, self._header = self._header, b''
+    return header + self._compressor.flush()
+
+
+class _Lz4Decompressor(object):
+  needs_input = True
+
+  def __init__(self):
+    self._decompressor = lz4.frame.LZ4FrameDecompressor()
+
+  def decompress(self, data):
+    try:
+      return self._decompressor.decompress(data)
+    except RuntimeError as e:  # lz4 raises RuntimeErrors for corrupt frames.
+      raise ArtifactError('Corrupt lz4 stream: {}'.format(e))
+
+  def finish(self):
+    if not self._decompressor.eof:
+      raise ArtifactError('Truncated lz4 stream.')
+    return b''
+
+
+class UncompressedCodec(ArtifactCodec):
+  """Leaves artifacts uncompressed: they are plain tarballs, with only tar's header checksums."""
+
+  def compressor(self, level):
+    return _Uncompressed()
+
+  def decompressor(self):
+    return _Uncompressed()
+
+
+class _Uncompressed(object):
+  needs_input = True
+
+  def compress(self, data):
+    return data
+
+  def flush(self):
+    return b''
+
+  def decompress(self, data):
+    return data
+
+  def finish(self):
+    return b''
+
+
+GZIP = GzipCodec('gzip', '.tgz')
+ZSTD = ZstdCodec('zstd', '.tar.zst')
+LZ4 = Lz4Codec('lz4', '.tar.lz4')
+UNCOMPRESSED = UncompressedCodec('none', '.tar')
+
+_CODEC_BY_NAME = OrderedDict((codec.name, codec) for codec in (GZIP, ZSTD, LZ4, UNCOMPRESSED))
+
+CODEC_NAMES = tuple(_CODEC_BY_NAME.keys())
+
+# The file extensions of tarballs created by any codec.
+TARBALL_EXTENSIONS = tuple(codec.extension for codec in _CODEC_BY_NAME.values())
+
+
+def codec(name):
+  """Returns the ArtifactCodec with the given name: one of `CODEC_NAMES`."""
+  codec = _CODEC_BY_NAME.get(name)
+  if not codec:
+    raise ValueError('No artifact codec named {!r}'.format(name))
+  return codec
+
+
+def detect_codec(prefix):
+  """Returns the ArtifactCodec that compressed the stream starting with the given bytes."""
+  for codec in _CODEC_BY_NAME.values():
+    if codec.magic and prefix.startswith(codec.magic):
+      return codec
+  return UNCOMPRESSED
+
+
+_MAX_MAGIC_SIZE = max(len(codec.magic or b'') for codec in _CODEC_BY_NAME.values())
+
+
+class _CompressingStream(object):
+  """A writable file-like object that compresses what is written to it into another file."""
+
+  def __init__(self, fileobj, compressor):
+    self._fileobj = fileobj
+    self._compressor = compressor
+
+  def write(self, data):
+    self._fileobj.write(self._compressor.compress(data))
+
+  def finish(self):
+    """Writes the final compressed bytes: nothing may be written after this."""
+    self._fileobj.write(self._compressor.flush())
+
+
+class _DecompressingStream(object):
+  """A readable file-like object over the decompressed bytes of an iterator of compressed chunks.
+
+  The codec of the chunks is detected from their leading bytes, and is available as `codec` once
+  the stream has been read from.
+  """
+
+  # The maximum number of compressed bytes to decompress at once. Along with codecs' own limits
+  # (see `needs_input`), this bounds the number of decompressed bytes buffered.
+  DECOMPRESS_SIZE_BYTES = 64 * 1024
+
+  def __init__(self, chunks, tee=None):
+    self._chunks = iter(chunks)
+    self._tee = tee
+    self._decompressor = None
+    self.codec = None
+    # The compressed bytes not yet decompressed start at `_pending_pos`, and the decompressed bytes
+    # not yet read start at `_buffer_pos`.
+    self._pending = b''
+    self._pending_pos = 0
+    self._buffer = b''
+    self._buffer_pos = 0
+    self._eof = False
+
+  def read(self, size):
+    data = []
+    while size > 0 and self._fill():
+      data.append(self._buffer[self._buffer_pos:self._buffer_pos + size])
+      self._buffer_pos += len(data[-1])
+      size -= len(data[-1])
+    return b''.join(data)
+
+  def read_all(self):
+    while self.read(self.DECOMPRESS_SIZE_BYTES):
+      pass
+
+  def _next_chunk(self):
+    chunk = next(self._chunks, None)
+    if chunk is not None and self._tee is not None:
+      self._tee.write(chunk)
+    return chunk
+
+  def _fill(self):
+    """Ensures that there are decompressed bytes to read, returning False if there are no more."""
+    if self._decompressor is None:
+      prefix = b''
+      while len(prefix) < _MAX_MAGIC_SIZE:
+        chunk = self._next_chunk()
+        if chunk is None:
+          break
+        prefix += chunk
+      self.codec = detect_codec(prefix)
+      self._decompressor = self.codec.decompressor()
+      self._pending = prefix
+
+    while self._buffer_pos == len(self._buffer):
+      if self._eof:
+        return False
+      if not self._decompressor.needs_input:
+        # Read what the decompressor holds before passing it any more.
+        self._buffer = self._decompressor.decompress(b'')
+        self._buffer_pos = 0
+        continue
+      if self._pending_pos == len(self._pending):
+        chunk = self._next_chunk()
+        if chunk is None:
+          self._buffer = self._decompressor.finish()
+          self._buffer_pos = 0
+          self._eof = True
+          continue
+        self._pending = chunk
+        self._pending_pos = 0
+      end = self._pending_pos + self.DECOMPRESS_SIZE_BYTES
+      self._buffer = self._decompressor.decompress(self._pending[self._pending_pos:end])
+      self._buffer_pos = 0
+      self._pending_pos = min(end, len(self._pending))
+    return True
@@ -0,0 +1,196 @@
+# coding=utf-8
+# Copyright 2016 Pants project contributors (see CONTRIBUTORS.md).
+# Licensed under the Apache License, Version 2.0 (see LICENSE).
+
+from __future__ import (absolute_import, division, generators, nested_scopes, print_function,
+                        unicode_literals, with_statement)
+
+import os
+import time
+from collections import namedtuple
+from struct import Struct as StdlibStruct
+
+from pants.cache.artifact import TARBALL_EXTENSIONS
+from pants.util.dirutil import safe_delete, safe_walk
+from pants.util.lmdbutil import encode_key, open_env
+
+
+# The named databases of an index: `entries` holds the size and last access time of each artifact by
+# path; `lru` holds the size of each artifact by last access time and then path; and `meta` holds
+# the total size of the artifacts, and which one-off updates have been made to the index.
+_Databases = namedtuple('_Databases', ['entries', 'lru', 'meta'])
+
+
+class ArtifactAccessIndex(object):
+  """Records the size and last access time of every artifact file in a local cache store.
+
+  The records are kept in an lmdb database, so that the least recently used artifacts across the
+  whole store can be found and evicted without stat-ing every file in it. The index is shared by
+  the caches of every task under the same store root, and by every process using them.
+
+  Alongside the records, the index keeps them ordered by last access time, and keeps their total
+  size: so eviction only reads the records of the artifacts it evicts.
+
+  Files already in the store when the index is created are recorded the first time it is evicted
+  from, by a one-off scan of the store.
+  """
+
+  # The maximum number of artifacts to evict in one transaction, so that eviction never holds the
+  # write lock for long.
+  EVICT_BATCH_SIZE = 100
+
+  # Packs the size and last access time of an artifact.
+  _ENTRY_STRUCT = StdlibStruct(b'<Qd')
+
+  # Prefixes the path of an artifact with its last access time to order it by use. Big-endian
+  # IEEE doubles sort bytewise in numeric order, for the non-negative times used here.
+  _LRU_PREFIX_STRUCT = StdlibStruct(b'>d')
+
+  _SIZE_STRUCT = StdlibStruct(b'<q')
+
+  _SCANNED_KEY = b'scanned'
+  _TOTAL_SIZE_KEY = b'total_size'
+
+  def __init__(self, path, store_root, suffixes=TARBALL_EXTENSIONS):
+    """
+    :param string path: The directory to keep the index in.
+    :param string store_root: The directory holding the artifact files to index.
+    :param tuple suffixes: The suffixes of the artifact files under `store_root`.
+    """
+    self._path = os.path.realpath(path)
+    self._store_root = os.path.realpath(store_root)
+    self._suffixes = suffixes
+
+  def _open(self):
+    env = open_env(self._path, max_dbs=3)
+    return env, _Databases(env.open_db(b'entries'), env.open_db(b'lru'), env.open_db(b'meta'))
+
+  def record(self, path, size):
+    """Records that the artifact file at path, of the given size, was just written."""
+    env, dbs = self._open()
+    with env.begin(write=True) as txn:
+      self._put(txn, dbs, encode_key(path), size, time.time())
+
+  def touch(self, path):
+    """Records that the artifact file at path was just read, if it is indexed."""
+    env, dbs = self._open()
+    key = encode_key(path)
+    with env.begin(write=True) as txn:
+      value = txn.get(key, db=dbs.entries)
+      if value is not None:
+        size, _ = self._ENTRY_STRUCT.unpack(value)
+        self._put(txn, dbs, key, size, time.time())
+
+  def remove(self, paths):
+    """Forgets the artifact files at the given paths."""
+    env, dbs = self._open()
+    with env.begin(write=True) as txn:
+      for path in paths:
+        self._delete(txn, dbs, encode_key(path))
+
+  def retain_under(self, directory):
+    """Forgets the artifact files in the given directory that no longer exist."""
+    env, dbs = self._open()
+    prefix = encode_key(os.path.join(directory, ''))
+    with env.begin(db=dbs.entries) as txn:
+      cursor = txn.cursor()
+      indexed = []
+      if cursor.set_range(prefix):
+        for key in cursor.iternext(values=False):
+          if not key.startswith(prefix):
+            break
+          indexed.append(key)
+    present = set(encode_key(os.path.join(directory, name)) for name in os.listdir(directory))
+    self.remove([key for key in indexed if key not in present])
+
+  def total_size(self):
+    """Returns the total size of the indexed artifact files."""
+    env, dbs = self._open()
+    with env.begin() as txn:
+      return self._total_size(txn, dbs)
+
+  def evict(self, max_size):
+    """Deletes the least recently used artifact files until they take at most max_size bytes.
+
+    Artifacts are evicted in batches, each in its own short transaction. An artifact read or
+    rewritten since eviction began is not evicted.
+
+    :returns: The number of artifact files evicted.
+    """
+    self._scan_once()
+    env, dbs = self._open()
+    victims = []
+    with env.begin() as txn:
+      total_size = self._total_size(txn, dbs)
+      if total_size <= max_size:
+        return 0
+      for lru_key, value in txn.cursor(db=dbs.lru):
+        if total_size <= max_size:
+          break
+        victims.append(lru_key)
+        total_size -= self._SIZE_STRUCT.unpack(value)[0]
+
+    num_evicted = 0
+    for i in range(0, len(victims), self.EVICT_BATCH_SIZE):
+      evicted = []
+      with env.begin(write=True) as txn:
+        for lru_key in victims[i:i + self.EVICT_BATCH_SIZE]:
+          # The artifact was used since eviction began if it is no longer in the same position.
+          if txn.get(lru_key, db=dbs.lru) is not None:
+            key = lru_key[self._LRU_PREFIX_STRUCT.size:]
+            self._delete(txn, dbs, key)
+            evicted.append(key)
+      for key in evicted:
+        safe_delete(key.decode('utf-8'))
+      num_evicted += len(evicted)
+    return num_evicted
+
+  def _lru_key(self, key, atime):
+    return self._LRU_PREFIX_STRUCT.pack(max(atime, 0.0)) + key
+
+  def _total_size(self, txn, dbs):
+    value = txn.get(self._TOTAL_SIZE_KEY, db=dbs.meta)
+    return self._SIZE_STRUCT.unpack(value)[0] if value is not None else 0
+
+  def _add_to_total_size(self, txn, dbs, size):
+    txn.put(self._TOTAL_SIZE_KEY, self._SIZE_STRUCT.pack(self._total_size(txn, dbs) + size),
+            db=dbs.meta)
+
+  def _put(self, txn, dbs, key, size, atime):
+    """Records the artifact at key, replacing any record of it."""
+    self._delete(txn, dbs, key)
+    txn.put(key, self._ENTRY_STRUCT.pack(size, atime), db=dbs.entries)
+    txn.put(self._lru_key(key, atime), self._SIZE_STRUCT.pack(size), db=dbs.lru)
+    self._add_to_total_size(txn, dbs, size)
+
+  def _delete(self, txn, dbs, key):
+    """Forgets the artifact at key, if it is recorded."""
+    value = txn.pop(key, db=dbs.entries)
+    if value is not None:
+      size, atime = self._ENTRY_STRUCT.unpack(value)
+      txn.delete(self._lru_key(key, atime), db=dbs.lru)
+      self._add_to_total_size(txn, dbs, -size)
+
+  def _scan_once(self):
+    """Records the artifact files already in the store when the index was created."""
+    env, dbs = self._open()
+    with env.begin(db=dbs.meta) as txn:
+      if txn.get(self._SCANNED_KEY):
+        return
+    records = []
+    for root, _, files in safe_walk(self._store_root):
+      for name in files:
+        if name.endswith(self._suffixes):
+          path = os.path.join(root, name)
+          try:
+            stat = os.stat(path)
+          except OSError:
+            continue
+          records.append((encode_key(path), stat.st_size, stat.st_mtime))
+    with env.begin(write=True) as txn:
+      for key, size, mtime in records:
+        # Don't clobber a record written since the scan began.
+        if txn.get(key, db=dbs.entries) is None:
+          self._put(txn, dbs, key, size, mtime)
+      txn.put(self._SCANNED_KEY, b'1', db=dbs.meta)
+
@@ -75,7 +75,7 @@ class ArtifactCache(object):
     """
     pass
 
-  def insert(self, cache_key, paths, overwrite=False):
+  def insert(self, cache_key, paths, overwrite=False, raise_nonfatal=False):
     """Cache the output of a build.
 
     By default, checks cache.has(key) first, only proceeding to create and insert an artifact
@@ -86,6 +86,8 @@ class ArtifactCache(object):
     :param list<str> paths: List of absolute paths to generated dirs/files.
                             These must be under the artifact_root.
     :param bool overwrite: Skip check for existing, insert even if already in cache.
+    :param bool raise_nonfatal: Raise NonfatalArtifactCacheErrors (e.g. so that the insert can be
+                                retried), rather than logging them and returning False.
     """
     missing_files = filter(lambda f: not os.path.exists(f), paths)
     if missing_files:
@@ -100,6 +102,8 @@ class ArtifactCache(object):
       self.try_insert(cache_key, paths)
       return True
     except NonfatalArtifactCacheError as e:
+      if raise_nonfatal:
+        raise
       logger.error('Error while writing to artifact cache: {0}'.format(e))
       return False
 
@@ -114,6 +118,16 @@ class ArtifactCache(object):
   def has(self, cache_key):
     pass
 
+  def has_many(self, cache_keys):
+    """Check for the presence of many artifacts at once.
+
+    Implementations may override this to probe for all of the keys in bulk.
+
+    :param list cache_keys: A list of CacheKey objects.
+    :returns: A list of booleans, in the same order as `cache_keys`.
+    """
+    return [bool(self.has(cache_key)) for cache_key in cache_keys]
+
   def use_cached_files(self, cache_key, results_dir=None):
     """Use the files cached for the given key.
 
@@ -135,6 +149,18 @@ class ArtifactCache(object):
     """
     pass
 
+  def use_cached_files_many(self, items):
+    """Use the files cached for many keys at once, if this cache can fetch them concurrently.
+
+    Caches that can't return None, and callers should instead call `use_cached_files` for each key
+    concurrently from a pool of processes (see `call_use_cached_files`).
+
+    :param list items: A list of (CacheKey, results_dir) pairs, as passed to `use_cached_files`.
+    :returns: A list of the results of `use_cached_files` for each item, in the same order as
+              `items`; or None.
+    """
+    return None
+
   def delete(self, cache_key):
     """Delete the artifacts for the specified key.
 
@@ -143,6 +169,17 @@ class ArtifactCache(object):
     """
     pass
 
+  def evict(self):
+    """Evict artifacts until the cache fits in its size bound, if it has one.
+
+    Eviction may be slow, so callers should call this in the background.
+    """
+    pass
+
+  def store_stats(self):
+    """Returns a dict describing the size of the cache's backing store, or None if unknown."""
+    return None
+
 
 def call_use_cached_files(tup):
   """Importable helper for multi-proc calling of ArtifactCache.use_cached_files on a cache instance.
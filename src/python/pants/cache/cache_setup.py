@@ -13,7 +13,10 @@ from collections import namedtuple
 from six.moves import range
 
 from pants.base.build_environment import get_buildroot
+from pants.cache.artifact import CODEC_NAMES, codec
+from pants.cache.artifact_access_index import ArtifactAccessIndex
 from pants.cache.artifact_cache import ArtifactCacheError
+from pants.cache.content_addressed_artifact_cache import ContentAddressedArtifactCache
 from pants.cache.local_artifact_cache import LocalArtifactCache, TempLocalArtifactCache
 from pants.cache.pinger import BestUrlSelector, Pinger
 from pants.cache.resolver import NoopResolver, Resolver, RESTfulResolver
@@ -72,9 +75,31 @@ class CacheSetup(Subsystem):
                   'alternate caches to choose from. This list is also used as input to '
                   'the resolver. When resolver is \'none\' list is used as is.')
     register('--compression-level', advanced=True, type=int, default=5,
-             help='The gzip compression level (0-9) for created artifacts.')
+             help='The compression level for created artifacts, as interpreted by their codec: '
+                  '0-9 for gzip, 1-22 for zstd and 0-16 for lz4. Ignored for none.')
+    register('--local-codec', advanced=True, choices=list(CODEC_NAMES), default='gzip',
+             help='The codec to compress artifacts created for local caches with. Artifacts are '
+                  'read with whichever codec created them.')
+    register('--remote-codec', advanced=True, choices=list(CODEC_NAMES), default='gzip',
+             help='The codec to compress artifacts created for remote caches with. Artifacts are '
+                  'read with whichever codec created them.')
     register('--max-entries-per-target', advanced=True, type=int, default=8,
              help='Maximum number of old cache files to keep per task target pair')
+    register('--local-store', advanced=True, choices=['tarball', 'content-addressed'],
+             default='tarball',
+             help='How local caches store artifacts. tarball: one compressed tarball per target '
+                  'and cache key. content-addressed: one manifest of file digests per target and '
+                  'cache key, with each distinct file stored once in a store shared by all tasks.')
+    register('--local-store-max-size', advanced=True, type=int, default=None,
+             help='The number of bytes of artifacts to keep in a local cache, across all tasks. '
+                  'The least recently used artifacts are evicted beyond this, in the background. '
+                  'Unbounded if unset.')
+    register('--local-store-materialization', advanced=True,
+             choices=list(ContentAddressedArtifactCache.MATERIALIZATIONS), default='reflink',
+             help='How files are placed in the workdir when read from a content-addressed local '
+                  'store. reflink and hardlink fall back to copying where the filesystem does not '
+                  'support them. hardlink only links files that were read-only (0444) when stored, '
+                  'and reflinks or copies the rest so that they keep their own modes.')
     register('--pinger-timeout', advanced=True, type=float, default=0.5,
              help='number of seconds before pinger times out')
     register('--pinger-tries', advanced=True, type=int, default=2,
@@ -90,6 +115,12 @@ class CacheSetup(Subsystem):
 
 class CacheFactory(object):
 
+  # The directory under a local cache path holding the content-addressed store shared by all tasks.
+  CONTENT_ADDRESSED_STORE_DIR = 'content_addressed'
+
+  # The directory under a local cache path holding the index of artifact uses shared by all tasks.
+  ACCESS_INDEX_DIR = 'access_index'
+
   def __init__(self, options, log, stable_name, pinger=None, resolver=None):
     """Create a cache factory from settings.
 
@@ -247,17 +278,40 @@ class CacheFactory(object):
       - A list or tuple of two specs, local, then remote, each as described above
     """
     compression = self._options.compression_level
-    if compression not in range(10):
-      raise ValueError('compression_level must be an integer 0-9: {}'.format(compression))
     artifact_root = self._options.pants_workdir
+    local_codec = codec(self._options.local_codec)
+    remote_codec = codec(self._options.remote_codec)
+    if spec.local:
+      local_codec.validate_level(compression)
+    if spec.remote:
+      remote_codec.validate_level(compression)
 
     def create_local_cache(parent_path):
+      if self._options.local_store == 'content-addressed':
+        path = os.path.join(parent_path, self.CONTENT_ADDRESSED_STORE_DIR)
+        self._log.debug('{0} {1} content-addressed local artifact cache at {2}'
+                        .format(self._stable_name, action, path))
+        return ContentAddressedArtifactCache(
+          artifact_root, path, self._stable_name, compression,
+          max_size=self._options.local_store_max_size,
+          materialization=self._options.local_store_materialization,
+          permissions=self._options.write_permissions,
+          codec=local_codec)
+
       path = os.path.join(parent_path, self._stable_name)
       self._log.debug('{0} {1} local artifact cache at {2}'
                       .format(self._stable_name, action, path))
+      max_size = self._options.local_store_max_size
+      access_index = None
+      if max_size is not None:
+        access_index = ArtifactAccessIndex(os.path.join(parent_path, self.ACCESS_INDEX_DIR),
+                                           parent_path)
       return LocalArtifactCache(artifact_root, path, compression,
                                 self._options.max_entries_per_target,
-                                permissions=self._options.write_permissions)
+                                permissions=self._options.write_permissions,
+                                codec=local_codec,
+                                max_size=max_size,
+                                access_index=access_index)
 
     def create_remote_cache(remote_spec, local_cache):
       urls = self.get_available_urls(remote_spec.split('|'))
@@ -265,8 +319,10 @@ class CacheFactory(object):
       if len(urls) > 0:
         best_url_selector = BestUrlSelector(['{}/{}'.format(url.rstrip('/'), self._stable_name)
                                              for url in urls])
-        local_cache = local_cache or TempLocalArtifactCache(artifact_root, compression)
-        return RESTfulArtifactCache(artifact_root, best_url_selector, local_cache)
+        local_cache = local_cache or TempLocalArtifactCache(artifact_root, compression,
+                                                            codec=remote_codec)
+        return RESTfulArtifactCache(artifact_root, best_url_selector, local_cache,
+                                    codec=remote_codec)
 
     local_cache = create_local_cache(spec.local) if spec.local else None
     remote_cache = create_remote_cache(spec.remote, local_cache) if spec.remote else None
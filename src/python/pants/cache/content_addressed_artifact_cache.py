@@ -0,0 +1,380 @@
+# coding=utf-8
+# Copyright 2016 Pants project contributors (see CONTRIBUTORS.md).
+# Licensed under the Apache License, Version 2.0 (see LICENSE).
+
+from __future__ import (absolute_import, division, generators, nested_scopes, print_function,
+                        unicode_literals, with_statement)
+
+import errno
+import json
+import logging
+import os
+import shutil
+import stat
+import time
+import uuid
+from contextlib import contextmanager
+from hashlib import sha1
+
+from fasteners import InterProcessLock
+
+from pants.cache.artifact import TarballArtifact
+from pants.cache.artifact_cache import UnreadableArtifact
+from pants.cache.local_artifact_cache import BaseLocalArtifactCache
+from pants.util.dirutil import (safe_delete, safe_mkdir, safe_mkdir_for, safe_open, safe_rmtree,
+                                safe_walk)
+from pants.util.fileutil import reflink
+
+
+logger = logging.getLogger(__name__)
+
+
+class ContentAddressedArtifactCache(BaseLocalArtifactCache):
+  """A local artifact cache that stores each distinct file only once.
+
+  Where `LocalArtifactCache` stores one tarball per (target, key), this cache stores an artifact as
+  a manifest of the relative paths, modes and sha1 digests of its files, and the files themselves
+  as blobs named by their digest in a store shared by every task using the same store root. Files
+  that are unchanged between keys, or duplicated between targets, are stored only once.
+
+  Artifacts are materialized by cloning (on filesystems that support reflinks), hardlinking or
+  copying their blobs into place. Blobs are read-only, so only files whose mode was exactly that of
+  the blobs when they were stored are hardlinked: writing to, or changing the mode of, a hardlink
+  would change its blob.
+
+  When the blobs exceed `max_size` bytes, the least recently used artifacts across the whole store
+  are evicted and the blobs no longer referenced by any artifact are deleted. This walks the whole
+  store, so it is done by `evict` (which the write-behind queue calls in the background once it is
+  idle) rather than on insert.
+
+  Layout under the store root:
+    blobs/<first two digits of digest>/<digest>
+    manifests/<namespace>/<cache key id>/<cache key hash>.json
+  """
+
+  MATERIALIZATIONS = ('reflink', 'hardlink', 'copy')
+
+  # The minimum number of seconds between garbage collections of the store.
+  GC_INTERVAL_SECS = 60
+
+  # Unreferenced blobs younger than this may belong to an artifact being inserted concurrently, so
+  # they are not collected.
+  GC_GRACE_SECS = 10 * 60
+
+  _READ_SIZE_BYTES = 64 * 1024
+
+  _BLOB_MODE = stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH
+
+  _BLOBS_DIR = 'blobs'
+  _MANIFESTS_DIR = 'manifests'
+  _TMP_DIR = 'tmp'
+  _STATS_FILE = 'stats.json'
+
+  def __init__(self, artifact_root, store_root, namespace, compression, max_size=None,
+               materialization='reflink', permissions=None, codec=None):
+    """
+    :param str artifact_root: The path under which cacheable products will be read/written.
+    :param str store_root: The directory holding the blobs and manifests. It may be shared by the
+                           caches of many tasks.
+    :param str namespace: Distinguishes this cache's artifacts from those of other caches sharing
+                          the store, typically the task's stable name.
+    :param int compression: The compression level of tarballs created for remote caches.
+    :param int max_size: The number of bytes of blobs to keep in the store, or None for no bound.
+    :param str materialization: How files are placed in the artifact root: one of
+                                `MATERIALIZATIONS`. 'reflink' and 'hardlink' fall back to copying
+                                when the filesystem does not support them.
+    :param str permissions: File permissions to use when creating manifest files.
+    :param ArtifactCodec codec: The codec of tarballs created for remote caches; gzip if None.
+    """
+    if materialization not in self.MATERIALIZATIONS:
+      raise ValueError('materialization must be one of {}: {}'
+                       .format(self.MATERIALIZATIONS, materialization))
+    super(ContentAddressedArtifactCache, self).__init__(
+      artifact_root,
+      compression,
+      permissions=int(permissions.strip(), base=8) if permissions else None,
+      codec=codec,
+    )
+    self._store_root = os.path.realpath(os.path.expanduser(store_root))
+    self._namespace = namespace
+    self._max_size = max_size
+    self._materialization = materialization
+    # Temporary files are created alongside the blobs, so that they can be renamed into place.
+    self._cache_root = os.path.join(self._store_root, self._TMP_DIR)
+    safe_mkdir(self._cache_root)
+
+  @property
+  def store_root(self):
+    return self._store_root
+
+  def has(self, cache_key):
+    return os.path.isfile(self._manifest_path(cache_key))
+
+  def try_insert(self, cache_key, paths):
+    entries = {}
+    for path in paths:
+      self._add_entries(path, entries)
+    manifest = {'entries': [entries[relpath] for relpath in sorted(entries)]}
+
+    manifest_path = self._manifest_path(cache_key)
+    tmp_path = self._tmp_path()
+    with safe_open(tmp_path, 'w') as fp:
+      json.dump(manifest, fp)
+    if self._permissions:
+      os.chmod(tmp_path, self._permissions)
+    safe_mkdir_for(manifest_path)
+    os.rename(tmp_path, manifest_path)
+
+  @contextmanager
+  def insert_paths(self, cache_key, paths):
+    """Insert paths into the store, and yield the path to a tarball of them (e.g. for uploading)."""
+    self.try_insert(cache_key, paths)
+    with self._tmpfile(cache_key, 'write') as tmp:
+      self._artifact(tmp.name).collect(paths)
+      yield tmp.name
+
+  def store_and_use_artifact(self, cache_key, src, results_dir=None):
+    if results_dir is not None:
+      safe_rmtree(results_dir)
+
+    artifact = TarballArtifact(self.artifact_root, None)
+    artifact.extract_stream(src)
+    self.try_insert(cache_key, [path for path in artifact.get_paths() if os.path.isfile(path)])
+    return True
+
+  def use_cached_files(self, cache_key, results_dir=None):
+    manifest_path = self._manifest_path(cache_key)
+    try:
+      with open(manifest_path, 'r') as fp:
+        manifest = json.load(fp)
+    except IOError as e:
+      if e.errno == errno.ENOENT:
+        return False
+      raise
+    except ValueError as e:
+      # A manifest truncated by a crash, say: treat it as a miss.
+      logger.debug('Deleting unreadable manifest {0}: {1}'.format(manifest_path, e))
+      safe_delete(manifest_path)
+      return False
+
+    try:
+      if results_dir is not None:
+        safe_rmtree(results_dir)
+      for relpath, digest, mode in manifest['entries']:
+        path = os.path.join(self.artifact_root, relpath)
+        if digest is None:
+          safe_mkdir(path)
+        else:
+          self._materialize(self._blob_path(digest), path, mode)
+      # Record the use, for LRU eviction.
+      os.utime(manifest_path, None)
+      return True
+    except Exception as e:
+      logger.warn('Error while reading {0} from local artifact cache: {1}'
+                  .format(manifest_path, e))
+      safe_delete(manifest_path)
+      return UnreadableArtifact(cache_key, e)
+
+  def delete(self, cache_key):
+    safe_delete(self._manifest_path(cache_key))
+
+  def prune(self):
+    """Evict the least recently used artifacts until the store fits in its size bound."""
+    self.gc()
+
+  def evict(self):
+    self._maybe_gc()
+
+  def gc(self):
+    """Evict the least recently used artifacts across the whole store until its blobs take at most
+    `max_size` bytes, and delete the blobs that are no longer referenced.
+
+    Records the resulting size of the store, which is returned by `store_stats`.
+    """
+    manifests = []
+    for path in self._manifest_paths():
+      try:
+        mtime = os.path.getmtime(path)
+        with open(path, 'r') as fp:
+          entries = json.load(fp)['entries']
+      except (IOError, OSError, ValueError):
+        # Concurrently deleted, or corrupt.
+        continue
+      digests = [digest for _, digest, _ in entries if digest]
+      manifests.append((mtime, path, len(digests), set(digests)))
+
+    blob_sizes = {}
+    for digest, path in self._blobs():
+      try:
+        blob_sizes[digest] = os.path.getsize(path)
+      except OSError:
+        pass
+
+    refcounts = {}
+    for _, _, _, digests in manifests:
+      for digest in digests:
+        refcounts[digest] = refcounts.get(digest, 0) + 1
+    referenced_size = sum(blob_sizes.get(digest, 0) for digest in refcounts)
+
+    # Evict artifacts from least to most recently used, until the blobs they reference fit.
+    manifests.sort()
+    num_evicted = 0
+    if self._max_size is not None:
+      for _, path, _, digests in manifests:
+        if referenced_size <= self._max_size:
+          break
+        safe_delete(path)
+        num_evicted += 1
+        for digest in digests:
+          refcounts[digest] -= 1
+          if not refcounts[digest]:
+            del refcounts[digest]
+            referenced_size -= blob_sizes.get(digest, 0)
+    manifests = manifests[num_evicted:]
+
+    grace_cutoff = time.time() - self.GC_GRACE_SECS
+    num_blobs = 0
+    blob_bytes = 0
+    for digest, size in blob_sizes.items():
+      path = self._blob_path(digest)
+      if digest not in refcounts:
+        try:
+          if os.path.getmtime(path) < grace_cutoff:
+            safe_delete(path)
+            continue
+        except OSError:
+          continue
+      num_blobs += 1
+      blob_bytes += size
+
+    stats = {
+      'num_artifacts': len(manifests),
+      'num_files': sum(num_files for _, _, num_files, _ in manifests),
+      'num_blobs': num_blobs,
+      'blob_bytes': blob_bytes,
+      'evicted_artifacts': num_evicted,
+    }
+    tmp_path = self._tmp_path()
+    with safe_open(tmp_path, 'w') as fp:
+      json.dump(stats, fp)
+    os.rename(tmp_path, os.path.join(self._store_root, self._STATS_FILE))
+    return stats
+
+  def store_stats(self):
+    """Returns the size of the store as of its last garbage collection, or None if unknown."""
+    try:
+      with open(os.path.join(self._store_root, self._STATS_FILE), 'r') as fp:
+        return json.load(fp)
+    except (IOError, ValueError):
+      return None
+
+  def _maybe_gc(self):
+    """Collect garbage if the store has not been collected within `GC_INTERVAL_SECS`.
+
+    Only one process collects at a time: others skip collection rather than wait.
+    """
+    stamp_path = os.path.join(self._store_root, 'gc.stamp')
+    try:
+      if time.time() - os.path.getmtime(stamp_path) < self.GC_INTERVAL_SECS:
+        return
+    except OSError:
+      pass
+    lock = InterProcessLock(os.path.join(self._store_root, 'gc.lock'))
+    if not lock.acquire(blocking=False):
+      return
+    try:
+      with open(stamp_path, 'a'):
+        os.utime(stamp_path, None)
+      self.gc()
+    finally:
+      lock.release()
+
+  def _add_entries(self, path, entries):
+    """Store the file or directory tree at path, recording a manifest entry for each path in it.
+
+    Entries are (relpath, digest, mode) lists, with a digest of None for directories. As when
+    creating tarballs, symlinks are followed.
+    """
+    relpath = os.path.relpath(path, self.artifact_root)
+    if os.path.isdir(path):
+      entries[relpath] = [relpath, None, None]
+      for root, dirs, files in safe_walk(path, followlinks=True):
+        for name in dirs:
+          dir_path = os.path.join(root, name)
+          dir_relpath = os.path.relpath(dir_path, self.artifact_root)
+          entries[dir_relpath] = [dir_relpath, None, None]
+        for name in files:
+          file_path = os.path.join(root, name)
+          file_relpath = os.path.relpath(file_path, self.artifact_root)
+          entries[file_relpath] = [file_relpath, self._store_blob(file_path),
+                                   stat.S_IMODE(os.stat(file_path).st_mode)]
+    else:
+      entries[relpath] = [relpath, self._store_blob(path), stat.S_IMODE(os.stat(path).st_mode)]
+
+  def _store_blob(self, path):
+    """Store the content of the file at path as a blob, if it is not already stored.
+
+    :returns: The digest of the file's content.
+    """
+    hasher = sha1()
+    with open(path, 'rb') as fp:
+      for chunk in iter(lambda: fp.read(self._READ_SIZE_BYTES), b''):
+        hasher.update(chunk)
+    digest = hasher.hexdigest()
+
+    blob_path = self._blob_path(digest)
+    if os.path.isfile(blob_path):
+      # Mark the blob as recently stored, so that it is not collected before the manifest
+      # referencing it is written.
+      os.utime(blob_path, None)
+    else:
+      tmp_path = self._tmp_path()
+      shutil.copyfile(path, tmp_path)
+      os.chmod(tmp_path, self._BLOB_MODE)
+      safe_mkdir_for(blob_path)
+      # Concurrent stores of the same blob store the same content, so the last one to rename wins.
+      os.rename(tmp_path, blob_path)
+    return digest
+
+  def _materialize(self, blob_path, path, mode):
+    safe_mkdir_for(path)
+    safe_delete(path)
+    if self._materialization == 'hardlink' and mode == self._BLOB_MODE:
+      try:
+        os.link(blob_path, path)
+        return
+      except OSError as e:
+        if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK):
+          raise
+    if self._materialization != 'copy' and reflink(blob_path, path):
+      os.chmod(path, mode)
+      return
+    shutil.copyfile(blob_path, path)
+    os.chmod(path, mode)
+
+  def _tmp_path(self):
+    return os.path.join(self._cache_root, uuid.uuid4().hex)
+
+  def _blob_path(self, digest):
+    return os.path.join(self._store_root, self._BLOBS_DIR, digest[:2], digest)
+
+  def _blobs(self):
+    """Yields the (digest, path) of each blob in the store."""
+    blobs_dir = os.path.join(self._store_root, self._BLOBS_DIR)
+    for root, _, files in safe_walk(blobs_dir):
+      for name in files:
+        yield name, os.path.join(root, name)
+
+  def _manifest_path(self, cache_key):
+    # Note: it's important to use the id as well as the hash, because two different targets
+    # may have the same hash if both have no sources, but we may still want to differentiate them.
+    return os.path.join(self._store_root, self._MANIFESTS_DIR, self._namespace, cache_key.id,
+                        cache_key.hash) + '.json'
+
+  def _manifest_paths(self):
+    """Yields the path of every manifest in the store, across all namespaces."""
+    manifests_dir = os.path.join(self._store_root, self._MANIFESTS_DIR)
+    for root, _, files in safe_walk(manifests_dir):
+      for name in files:
+        if name.endswith('.json'):
+          yield os.path.join(root, name)
@@ -9,7 +9,7 @@ import logging
 import os
 from contextlib import contextmanager
 
-from pants.cache.artifact import TarballArtifact
+from pants.cache.artifact import GZIP, TarballArtifact
 from pants.cache.artifact_cache import ArtifactCache, UnreadableArtifact
 from pants.util.contextutil import temporary_file
 from pants.util.dirutil import (safe_delete, safe_mkdir, safe_mkdir_for,
@@ -21,20 +21,30 @@ logger = logging.getLogger(__name__)
 
 class BaseLocalArtifactCache(ArtifactCache):
 
-  def __init__(self, artifact_root, compression, permissions=None):
+  def __init__(self, artifact_root, compression, permissions=None, codec=None):
     """
     :param str artifact_root: The path under which cacheable products will be read/written.
-    :param int compression: The gzip compression level for created artifacts.
-                            Valid values are 0-9.
+    :param int compression: The compression level for created artifacts, which `codec` must
+                            accept.
     :param string permissions: File permissions to use when creating artifact files.
+    :param ArtifactCodec codec: The codec to compress created artifacts with; gzip if None.
     """
     super(BaseLocalArtifactCache, self).__init__(artifact_root)
     self._compression = compression
     self._cache_root = None
     self._permissions = permissions
+    self._codec = codec or GZIP
+
+  @property
+  def compression(self):
+    return self._compression
+
+  @property
+  def codec(self):
+    return self._codec
 
   def _artifact(self, path):
-    return TarballArtifact(self.artifact_root, path, self._compression)
+    return TarballArtifact(self.artifact_root, path, self._compression, codec=self._codec)
 
   @contextmanager
   def _tmpfile(self, cache_key, use):
@@ -51,18 +61,24 @@ class BaseLocalArtifactCache(ArtifactCache):
       yield self._store_tarball(cache_key, tmp.name)
 
   def store_and_use_artifact(self, cache_key, src, results_dir=None):
-    """Read the content of a tarball from an iterator and return an artifact stored in the cache."""
-    with self._tmpfile(cache_key, 'read') as tmp:
-      for chunk in src:
-        tmp.write(chunk)
-      tmp.close()
-      tarball = self._store_tarball(cache_key, tmp.name)
-      artifact = self._artifact(tarball)
+    """Read the content of a tarball from an iterator and return an artifact stored in the cache.
 
+    The tarball is extracted as it is read, and is stored in the cache in the same pass. If it was
+    compressed with a codec other than this cache's, it is recompressed before being stored, so that
+    every tarball in the cache is named for its codec.
+    """
+    with self._tmpfile(cache_key, 'read') as tmp:
       if results_dir is not None:
         safe_rmtree(results_dir)
 
-      artifact.extract()
+      artifact = self._artifact(tmp.name)
+      codec = artifact.extract_stream(src, tee=tmp)
+      tmp.close()
+      if codec is not self._codec:
+        # Directories are collected recursively, so only collect the outermost extracted paths.
+        paths = set(artifact.get_paths())
+        artifact.collect(sorted(path for path in paths if os.path.dirname(path) not in paths))
+      self._store_tarball(cache_key, tmp.name)
       return True
 
   def _store_tarball(self, cache_key, src):
@@ -74,21 +90,30 @@ class LocalArtifactCache(BaseLocalArtifactCache):
   """An artifact cache that stores the artifacts in local files."""
 
   def __init__(self, artifact_root, cache_root, compression, max_entries_per_target=None,
-               permissions=None):
+               permissions=None, codec=None, max_size=None, access_index=None):
     """
     :param str artifact_root: The path under which cacheable products will be read/written.
     :param str cache_root: The locally cached files are stored under this directory.
-    :param int compression: The gzip compression level for created artifacts (1-9 or false-y).
+    :param int compression: The compression level for created artifacts, which `codec` must
+                            accept.
     :param int max_entries_per_target: The maximum number of old cache files to leave behind on a cache miss.
     :param str permissions: File permissions to use when creating artifact files.
+    :param ArtifactCodec codec: The codec to compress created artifacts with; gzip if None.
+    :param int max_size: The number of bytes of artifacts to keep across the store indexed by
+                         `access_index` when `evict` is called, or None for no bound.
+    :param ArtifactAccessIndex access_index: An index to record the sizes and uses of artifacts in,
+                                             which may be shared with the caches of other tasks.
     """
     super(LocalArtifactCache, self).__init__(
       artifact_root,
       compression,
       permissions=int(permissions.strip(), base=8) if permissions else None,
+      codec=codec,
     )
     self._cache_root = os.path.realpath(os.path.expanduser(cache_root))
     self._max_entries_per_target = max_entries_per_target
+    self._max_size = max_size
+    self._access_index = access_index
     safe_mkdir(self._cache_root)
 
   def prune(self, root):
@@ -103,6 +128,16 @@ class LocalArtifactCache(BaseLocalArtifactCache):
     max_entries_per_target = self._max_entries_per_target
     if os.path.isdir(root) and max_entries_per_target:
       safe_rm_oldest_items_in_dir(root, max_entries_per_target)
+      if self._access_index:
+        self._access_index.retain_under(root)
+
+  def evict(self):
+    """Evict the least recently used artifacts across the indexed store until it fits in
+    `max_size` bytes."""
+    if self._access_index and self._max_size is not None:
+      num_evicted = self._access_index.evict(self._max_size)
+      if num_evicted:
+        logger.debug('Evicted {0} artifacts from local artifact cache.'.format(num_evicted))
 
   def has(self, cache_key):
     return self._artifact_for(cache_key).exists()
@@ -118,11 +153,15 @@ class LocalArtifactCache(BaseLocalArtifactCache):
         if results_dir is not None:
           safe_rmtree(results_dir)
         artifact.extract()
+        if self._access_index:
+          self._access_index.touch(tarfile)
         return True
     except Exception as e:
       # TODO(davidt): Consider being more granular in what is caught.
       logger.warn('Error while reading {0} from local artifact cache: {1}'.format(tarfile, e))
       safe_delete(tarfile)
+      if self._access_index:
+        self._access_index.remove([tarfile])
       return UnreadableArtifact(cache_key, e)
 
     return False
@@ -132,7 +171,10 @@ class LocalArtifactCache(BaseLocalArtifactCache):
       pass
 
   def delete(self, cache_key):
-    safe_delete(self._cache_file_for_key(cache_key))
+    tarfile = self._cache_file_for_key(cache_key)
+    safe_delete(tarfile)
+    if self._access_index:
+      self._access_index.remove([tarfile])
 
   def _store_tarball(self, cache_key, src):
     dest = self._cache_file_for_key(cache_key)
@@ -140,13 +182,15 @@ class LocalArtifactCache(BaseLocalArtifactCache):
     os.rename(src, dest)
     if self._permissions:
       os.chmod(dest, self._permissions)
+    if self._access_index:
+      self._access_index.record(dest, os.path.getsize(dest))
     self.prune(os.path.dirname(dest))  # Remove old cache files.
     return dest
 
   def _cache_file_for_key(self, cache_key):
     # Note: it's important to use the id as well as the hash, because two different targets
     # may have the same hash if both have no sources, but we may still want to differentiate them.
-    return os.path.join(self._cache_root, cache_key.id, cache_key.hash) + '.tgz'
+    return os.path.join(self._cache_root, cache_key.id, cache_key.hash) + self._codec.extension
 
 
 class TempLocalArtifactCache(BaseLocalArtifactCache):
@@ -156,16 +200,24 @@ class TempLocalArtifactCache(BaseLocalArtifactCache):
   actually stores files between calls, but is useful for handling file IO for a remote cache.
   """
 
-  def __init__(self, artifact_root, compression, permissions=None):
+  def __init__(self, artifact_root, compression, permissions=None, codec=None):
     """
     :param str artifact_root: The path under which cacheable products will be read/written.
     """
     super(TempLocalArtifactCache, self).__init__(artifact_root, compression=compression,
-                                                 permissions=permissions)
+                                                 permissions=permissions, codec=codec)
 
   def _store_tarball(self, cache_key, src):
     return src
 
+  def store_and_use_artifact(self, cache_key, src, results_dir=None):
+    # Nothing is stored, so the tarball is only extracted and never written to disk.
+    if results_dir is not None:
+      safe_rmtree(results_dir)
+
+    self._artifact(None).extract_stream(src)
+    return True
+
   def has(self, cache_key):
     return False
 
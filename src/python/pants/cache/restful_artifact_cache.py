@@ -6,11 +6,15 @@ from __future__ import (absolute_import, division, generators, nested_scopes, pr
                         unicode_literals, with_statement)
 
 import logging
+from multiprocessing.pool import ThreadPool
 
 import requests
 from requests import RequestException
+from requests.adapters import HTTPAdapter
 
-from pants.cache.artifact_cache import ArtifactCache, NonfatalArtifactCacheError, UnreadableArtifact
+from pants.cache.artifact_cache import (ArtifactCache, NonfatalArtifactCacheError, UnreadableArtifact,
+                                        call_use_cached_files)
+from pants.cache.local_artifact_cache import TempLocalArtifactCache
 
 
 logger = logging.getLogger(__name__)
@@ -21,47 +25,126 @@ logging.getLogger('requests').setLevel(logging.WARNING)
 
 
 class RequestsSession(object):
+  # The number of keep-alive connections to pool per host, which bounds concurrent requests.
+  MAX_CONNECTIONS = 16
+
   _session = None
 
   @classmethod
   def instance(cls):
     if cls._session is None:
       cls._session = requests.Session()
+      adapter = HTTPAdapter(pool_maxsize=cls.MAX_CONNECTIONS)
+      cls._session.mount('http://', adapter)
+      cls._session.mount('https://', adapter)
     return cls._session
 
 
 class RESTfulArtifactCache(ArtifactCache):
-  """An artifact cache that stores the artifacts on a RESTful service."""
+  """An artifact cache that stores the artifacts on a RESTful service.
+
+  In addition to GET, HEAD, PUT and DELETE of individual artifacts, the service may support
+  probing for many artifacts in one request: a POST to `BULK_HAS_PATH` under the cache's url whose
+  body lists artifact paths relative to the cache's url, one per line, answered with a 200 whose
+  body lists the subset of those paths that are present, with a Content-Type of
+  `BULK_HAS_CONTENT_TYPE`. Services that do not support it (including those that answer the POST
+  with any other Content-Type, as servers and proxies that accept any POST may) are probed with one
+  HEAD request per artifact instead, sent concurrently.
+
+  Many artifacts are fetched at once by `use_cached_files_many`, which streams them concurrently
+  over the keep-alive connections pooled by `RequestsSession`, extracting each as it is read.
+  """
 
   READ_SIZE_BYTES = 4 * 1024 * 1024
 
-  def __init__(self, artifact_root, best_url_selector, local):
+  # Artifacts always live two path segments below the cache's url, so this cannot collide with one.
+  BULK_HAS_PATH = '_has'
+
+  # The Content-Type of answers to bulk probes, which distinguishes them from unrelated answers.
+  BULK_HAS_CONTENT_TYPE = 'application/x-pants-artifact-paths'
+
+  # The maximum number of paths to probe for in a single bulk request.
+  BULK_HAS_BATCH_SIZE = 1000
+
+  def __init__(self, artifact_root, best_url_selector, local, codec=None):
     """
     :param string artifact_root: The path under which cacheable products will be read/written.
     :param BestUrlSelector best_url_selector: Url selector that supports fail-over. Each returned
       url represents prefix for some RESTful service. We must be able to PUT and GET to any path
       under this base.
     :param BaseLocalArtifactCache local: local cache instance for storing and creating artifacts
+    :param ArtifactCodec codec: The codec to compress uploaded artifacts with, if it differs from
+      the local cache's.
     """
     super(RESTfulArtifactCache, self).__init__(artifact_root)
 
     self.best_url_selector = best_url_selector
     self._timeout_secs = 4.0
     self._localcache = local
+    # Creates the artifacts to upload when they must be compressed differently than local ones.
+    self._uploadcache = None
+    if codec and codec is not local.codec:
+      self._uploadcache = TempLocalArtifactCache(artifact_root, local.compression, codec=codec)
+    # Whether the service supports bulk probes; None until we know.
+    self._bulk_has_supported = None
 
   def try_insert(self, cache_key, paths):
     # Delegate creation of artifact to local cache.
     with self._localcache.insert_paths(cache_key, paths) as tarfile:
-      # Upload local artifact to remote cache.
-      with open(tarfile, 'rb') as infile:
-        if not self._request('PUT', cache_key, body=infile):
-          raise NonfatalArtifactCacheError('Failed to PUT {0}.'.format(cache_key))
+      if self._uploadcache is None:
+        # Upload local artifact to remote cache.
+        self._upload(cache_key, tarfile)
+      else:
+        with self._uploadcache.insert_paths(cache_key, paths) as upload_tarfile:
+          self._upload(cache_key, upload_tarfile)
+
+  def _upload(self, cache_key, tarfile):
+    with open(tarfile, 'rb') as infile:
+      if not self._request('PUT', cache_key, body=infile):
+        raise NonfatalArtifactCacheError('Failed to PUT {0}.'.format(cache_key))
 
   def has(self, cache_key):
     if self._localcache.has(cache_key):
       return True
     return self._request('HEAD', cache_key) is not None
 
+  def has_many(self, cache_keys):
+    present = [self._localcache.has(cache_key) for cache_key in cache_keys]
+    remote_keys = [cache_key for cache_key, is_local in zip(cache_keys, present) if not is_local]
+    if remote_keys:
+      remotely_present = dict(zip(remote_keys, self._remote_has_many(remote_keys)))
+      present = [is_local or remotely_present[cache_key]
+                 for cache_key, is_local in zip(cache_keys, present)]
+    return present
+
+  def _remote_has_many(self, cache_keys):
+    if self._bulk_has_supported is not False:
+      present = self._bulk_has(cache_keys)
+      if present is not None:
+        return present
+    return self._map_concurrently(lambda cache_key: self._request('HEAD', cache_key) is not None,
+                                  cache_keys)
+
+  def _bulk_has(self, cache_keys):
+    """Returns whether each key is present using bulk probes, or None if they are unsupported."""
+    present_paths = set()
+    for start in range(0, len(cache_keys), self.BULK_HAS_BATCH_SIZE):
+      paths = [self._path_for_key(cache_key)
+               for cache_key in cache_keys[start:start + self.BULK_HAS_BATCH_SIZE]]
+      response = self._request_path('POST', self.BULK_HAS_PATH, body='\n'.join(paths),
+                                    unsupported_ok=True)
+      if response is None or not self._is_bulk_has_response(response):
+        logger.debug('Bulk probes are unsupported, falling back to probing artifacts one by one.')
+        self._bulk_has_supported = False
+        return None
+      self._bulk_has_supported = True
+      present_paths.update(line.strip() for line in response.text.splitlines())
+    return [self._path_for_key(cache_key) in present_paths for cache_key in cache_keys]
+
+  def _is_bulk_has_response(self, response):
+    content_type = response.headers.get('Content-Type', '').split(';')[0].strip()
+    return content_type == self.BULK_HAS_CONTENT_TYPE
+
   def use_cached_files(self, cache_key, results_dir=None):
     if self._localcache.has(cache_key):
       return self._localcache.use_cached_files(cache_key, results_dir)
@@ -79,20 +162,50 @@ class RESTfulArtifactCache(ArtifactCache):
 
     return False
 
+  def use_cached_files_many(self, items):
+    # Threads rather than processes, so that every fetch shares the session's connections: most of
+    # a fetch is spent waiting on the network, and decompression releases the GIL.
+    return self._map_concurrently(lambda item: call_use_cached_files((self,) + tuple(item)), items)
+
+  @staticmethod
+  def _map_concurrently(func, items):
+    """Maps func over items with as many threads as there are pooled connections to a host."""
+    if len(items) <= 1:
+      return [func(item) for item in items]
+    pool = ThreadPool(processes=min(RequestsSession.MAX_CONNECTIONS, len(items)))
+    try:
+      return pool.map(func, items)
+    finally:
+      pool.close()
+      pool.join()
+
   def delete(self, cache_key):
     self._localcache.delete(cache_key)
     self._request('DELETE', cache_key)
 
+  def evict(self):
+    self._localcache.evict()
+
+  def store_stats(self):
+    return self._localcache.store_stats()
+
   # Returns a response if we get a 200, None if we get a 404 and raises an exception otherwise.
   def _request(self, method, cache_key, body=None):
+    return self._request_path(method, self._path_for_key(cache_key), body=body)
+
+  # Like `_request`, but for a path relative to the cache's url. If `unsupported_ok`, a response
+  # indicating that the request is not supported also returns None.
+  def _request_path(self, method, path, body=None, unsupported_ok=False):
 
     session = RequestsSession.instance()
     with self.best_url_selector.select_best_url() as best_url:
-      url = self._url_for_key(best_url, cache_key)
+      url = self._url_for_path(best_url, path)
       logger.debug('Sending {0} request to {1}'.format(method, url))
       try:
         if 'PUT' == method:
           response = session.put(url, data=body, timeout=self._timeout_secs)
+        elif 'POST' == method:
+          response = session.post(url, data=body, timeout=self._timeout_secs)
         elif 'GET' == method:
           response = session.get(url, timeout=self._timeout_secs, stream=True)
         elif 'HEAD' == method:
@@ -110,12 +223,18 @@ class RESTfulArtifactCache(ArtifactCache):
       elif response.status_code == 404:
         logger.debug('404 returned for {0} request to {1}'.format(method, url))
         return None
+      elif unsupported_ok and response.status_code in (405, 501):
+        logger.debug('{0} returned for {1} request to {2}'.format(response.status_code, method, url))
+        return None
       else:
         raise NonfatalArtifactCacheError('Failed to {0} {1}. Error: {2} {3}'
                                          .format(method, url,
                                                  response.status_code, response.reason))
 
-  def _url_for_key(self, url, cache_key):
+  def _path_for_key(self, cache_key):
+    codec = (self._uploadcache or self._localcache).codec
+    return '{0}/{1}{2}'.format(cache_key.id, cache_key.hash, codec.extension)
+
+  def _url_for_path(self, url, path):
     path_prefix = url.path.rstrip(b'/')
-    path = '{0}/{1}/{2}.tgz'.format(path_prefix, cache_key.id, cache_key.hash)
-    return '{0}://{1}{2}'.format(url.scheme, url.netloc, path)
+    return '{0}://{1}{2}/{3}'.format(url.scheme, url.netloc, path_prefix, path)
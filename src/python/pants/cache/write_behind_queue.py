@@ -0,0 +1,307 @@
+# coding=utf-8
+# Copyright 2016 Pants project contributors (see CONTRIBUTORS.md).
+# Licensed under the Apache License, Version 2.0 (see LICENSE).
+
+from __future__ import (absolute_import, division, generators, nested_scopes, print_function,
+                        unicode_literals, with_statement)
+
+import logging
+import random
+import threading
+import time
+from collections import OrderedDict
+
+from pants.cache.artifact_cache import NonfatalArtifactCacheError
+
+
+logger = logging.getLogger(__name__)
+
+
+class _Upload(object):
+  def __init__(self, cache, cache_key, paths, overwrite):
+    self.cache = cache
+    self.cache_key = cache_key
+    self.paths = paths
+    self.overwrite = overwrite
+    self.submitted_at = time.time()
+
+
+class _LatencyStats(object):
+  def __init__(self):
+    self.count = 0
+    self.total = 0.0
+    self.max = 0.0
+
+  def add(self, secs):
+    self.count += 1
+    self.total += secs
+    self.max = max(self.max, secs)
+
+  def get(self):
+    return {
+      'count': self.count,
+      'mean': self.total / self.count if self.count else 0.0,
+      'max': self.max,
+    }
+
+
+class ArtifactWriteBehindQueue(object):
+  """Inserts artifacts into artifact caches asynchronously, on a dedicated pool of threads.
+
+  Creating and uploading artifacts is taken off the critical path of the work producing them:
+  `submit` returns as soon as the upload is queued. The queue holds at most `max_pending` uploads,
+  beyond which `submit` blocks until there is room, so that a slow cache throttles its producers
+  rather than accumulating unbounded work. Uploads of a key that is already queued for the same
+  cache are coalesced into the queued one.
+
+  Queued uploads are taken in batches, so that the cache can be probed for the presence of all of
+  a batch's artifacts at once. Uploads that fail with a NonfatalArtifactCacheError are retried with
+  jittered exponential backoff. Each cache uploaded to is evicted from once the queue is idle.
+
+  A queue with no workers inserts artifacts synchronously in `submit`.
+
+  Uploads run on threads rather than processes: they spend most of their time compressing (which
+  zlib, zstd and lz4 do without holding the GIL) and in network I/O. See
+  tests/python/pants_test/cache/write_behind_queue_benchmark.py for a comparison with inserting
+  in a pool of processes.
+  """
+
+  def __init__(self, num_workers=4, max_pending=256, batch_size=100, max_attempts=3,
+               retry_delay_secs=0.5):
+    """
+    :param int num_workers: The number of threads to upload with, or 0 to upload synchronously.
+    :param int max_pending: The number of uploads to queue before `submit` blocks.
+    :param int batch_size: The maximum number of uploads to probe the cache for at once.
+    :param int max_attempts: The number of times to try an upload before giving up on it.
+    :param float retry_delay_secs: The mean delay before the first retry of an upload, which
+                                   doubles with each further retry.
+    """
+    self._num_workers = num_workers
+    self._max_pending = max_pending
+    self._batch_size = batch_size
+    self._max_attempts = max_attempts
+    self._retry_delay_secs = retry_delay_secs
+
+    # Protects all of the state below, and is notified whenever it changes.
+    self._cond = threading.Condition()
+    # Maps (cache, cache_key) to the _Upload queued for it.
+    self._pending = OrderedDict()
+    self._in_flight = 0
+    self._closed = False
+    # Set while a flush that timed out waits for the uploads already started to finish.
+    self._abandoning = threading.Event()
+    self._workers = []
+    # The caches uploaded to since the queue was last idle, to evict from when it is.
+    self._caches_to_evict = OrderedDict()
+
+    self._submitted = 0
+    self._coalesced = 0
+    self._skipped = 0
+    self._uploaded = 0
+    self._failed = 0
+    self._retries = 0
+    self._abandoned = 0
+    self._max_queue_depth = 0
+    self._blocked = _LatencyStats()
+    self._queue_latency = _LatencyStats()
+    self._upload_latency = _LatencyStats()
+
+  def submit(self, cache, cache_key, paths, overwrite=False):
+    """Queues the given paths for insertion into the cache under the given key.
+
+    :param ArtifactCache cache: The cache to insert into.
+    :param CacheKey cache_key: The key to insert the artifact under.
+    :param list paths: The absolute paths of the files and directories in the artifact.
+    :param bool overwrite: Whether to insert the artifact even if the cache already has it.
+    """
+    upload = _Upload(cache, cache_key, paths, overwrite)
+    with self._cond:
+      self._submitted += 1
+      if self._num_workers > 0 and not self._closed:
+        queued = self._pending.get((cache, cache_key))
+        if queued is not None:
+          queued.paths = paths
+          queued.overwrite = queued.overwrite or overwrite
+          self._coalesced += 1
+          return
+
+        if len(self._pending) >= self._max_pending:
+          start = time.time()
+          while len(self._pending) >= self._max_pending and not self._closed:
+            self._cond.wait()
+          self._blocked.add(time.time() - start)
+
+        if not self._closed:
+          self._pending[(cache, cache_key)] = upload
+          self._max_queue_depth = max(self._max_queue_depth, len(self._pending))
+          self._start_workers()
+          self._cond.notify_all()
+          return
+
+    # There are no workers to upload with: upload synchronously.
+    self._upload_batch([upload])
+    self._evict(cache)
+
+  def flush(self, timeout_secs=None):
+    """Waits for the queued uploads to complete, and stops accepting new ones.
+
+    If the timeout expires, the uploads that have not started are abandoned, but those that have
+    are waited for: interrupting an insert could leave a partial artifact in the cache. Their
+    retries are cut short, so each is only waited for until its current attempt ends.
+
+    Uploads submitted once the queue is flushed are performed synchronously.
+
+    :param float timeout_secs: The maximum number of seconds to wait for uploads to start, or None
+                               to wait indefinitely.
+    :returns: The number of uploads abandoned because the timeout expired.
+    """
+    deadline = None if timeout_secs is None else time.time() + timeout_secs
+    with self._cond:
+      abandoned_before = self._abandoned
+      self._closed = True
+      self._cond.notify_all()
+      while self._pending or self._in_flight:
+        if deadline is None:
+          self._cond.wait()
+        else:
+          remaining = deadline - time.time()
+          if remaining <= 0:
+            break
+          self._cond.wait(remaining)
+      if self._pending or self._in_flight:
+        self._abandoning.set()
+        self._abandoned += len(self._pending)
+        self._pending.clear()
+        while self._in_flight:
+          self._cond.wait()
+        self._abandoning.clear()
+      return self._abandoned - abandoned_before
+
+  def get_stats(self):
+    """Returns a dict of the queue's counters and latencies, for the run's stats."""
+    with self._cond:
+      return {
+        'queue_depth': len(self._pending),
+        'max_queue_depth': self._max_queue_depth,
+        'submitted': self._submitted,
+        'coalesced': self._coalesced,
+        'skipped': self._skipped,
+        'uploaded': self._uploaded,
+        'failed': self._failed,
+        'retries': self._retries,
+        'abandoned': self._abandoned,
+        'blocked_secs': self._blocked.get(),
+        'queue_latency_secs': self._queue_latency.get(),
+        'upload_latency_secs': self._upload_latency.get(),
+      }
+
+  def _start_workers(self):
+    # Called with the lock held.
+    while len(self._workers) < min(self._num_workers, len(self._pending) + self._in_flight):
+      worker = threading.Thread(target=self._work,
+                                name='artifact-write-behind-{}'.format(len(self._workers)))
+      # Uploads still queued at exit are abandoned: see `flush`.
+      worker.daemon = True
+      worker.start()
+      self._workers.append(worker)
+
+  def _work(self):
+    while True:
+      with self._cond:
+        while not self._pending and not self._closed:
+          self._cond.wait()
+        if not self._pending:
+          return
+        batch = self._take_batch()
+        self._in_flight += len(batch)
+        self._cond.notify_all()
+
+      caches_to_evict = []
+      try:
+        self._upload_batch(batch)
+      finally:
+        with self._cond:
+          self._caches_to_evict[batch[0].cache] = True
+          if (not self._pending and self._in_flight == len(batch) and
+              not self._abandoning.is_set()):
+            caches_to_evict = list(self._caches_to_evict)
+            self._caches_to_evict.clear()
+        try:
+          for cache in caches_to_evict:
+            self._evict(cache)
+        finally:
+          with self._cond:
+            self._in_flight -= len(batch)
+            self._cond.notify_all()
+
+  def _take_batch(self):
+    """Takes the oldest queued upload, and others queued for the same cache, up to a batch."""
+    # Called with the lock held.
+    cache = next(iter(self._pending.values())).cache
+    keys = [key for key in self._pending if key[0] is cache][:self._batch_size]
+    now = time.time()
+    batch = []
+    for key in keys:
+      upload = self._pending.pop(key)
+      self._queue_latency.add(now - upload.submitted_at)
+      batch.append(upload)
+    return batch
+
+  def _upload_batch(self, batch):
+    cache = batch[0].cache
+    probed = [upload for upload in batch if not upload.overwrite]
+    present = set()
+    if probed:
+      try:
+        present = set(upload.cache_key for upload, is_present
+                      in zip(probed, cache.has_many([upload.cache_key for upload in probed]))
+                      if is_present)
+      except NonfatalArtifactCacheError as e:
+        logger.debug('Failed to probe the artifact cache: {}'.format(e))
+    for i, upload in enumerate(batch):
+      with self._cond:
+        if self._abandoning.is_set():
+          self._abandoned += len(batch) - i
+          return
+        if upload.cache_key in present and not upload.overwrite:
+          self._skipped += 1
+          continue
+      self._upload(upload)
+
+  def _upload(self, upload):
+    for attempt in range(self._max_attempts):
+      start = time.time()
+      try:
+        # Inserting with overwrite skips the per-key probe: the batch was probed already.
+        inserted = upload.cache.insert(upload.cache_key, upload.paths, overwrite=True,
+                                       raise_nonfatal=True)
+      except NonfatalArtifactCacheError as e:
+        if attempt + 1 < self._max_attempts and not self._abandoning.is_set():
+          with self._cond:
+            self._retries += 1
+          delay = self._retry_delay_secs * (2 ** attempt) * random.uniform(0.5, 1.5)
+          logger.debug('Retrying write of {} to artifact cache in {:.2f} secs: {}'
+                       .format(upload.cache_key, delay, e))
+          # A flush that times out wakes the wait, and the retry is given up on.
+          if not self._abandoning.wait(delay):
+            continue
+        logger.error('Error while writing {} to artifact cache: {}'.format(upload.cache_key, e))
+        inserted = False
+      except Exception as e:
+        # Don't let one bad artifact kill the worker.
+        logger.error('Error while writing {} to artifact cache: {}'.format(upload.cache_key, e))
+        inserted = False
+      with self._cond:
+        if inserted:
+          self._uploaded += 1
+          self._upload_latency.add(time.time() - start)
+        else:
+          self._failed += 1
+      return
+
+  def _evict(self, cache):
+    try:
+      cache.evict()
+    except Exception as e:
+      # Eviction is best-effort: the cache is merely left larger than its bound.
+      logger.warn('Failed to evict from the artifact cache: {}'.format(e))
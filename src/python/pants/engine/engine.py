@@ -8,18 +8,21 @@ from __future__ import (absolute_import, division, generators, nested_scopes, pr
 import functools
 import logging
 import multiprocessing
+import os
+import time
 import traceback
 from abc import abstractmethod
+from collections import OrderedDict, defaultdict, deque
 from Queue import Queue
 
 from concurrent.futures import ThreadPoolExecutor
 from twitter.common.collections.orderedset import OrderedSet
 
 from pants.base.exceptions import TaskError
+from pants.engine.nodes import FilesystemNode, Throw
 from pants.engine.objects import SerializationError
 from pants.engine.processing import StatefulPool
-from pants.engine.storage import Cache, Storage
-from pants.util.memo import memoized_method
+from pants.engine.storage import Cache, Storage, StorageFullError
 from pants.util.meta import AbstractClass
 from pants.util.objects import datatype
 
@@ -70,7 +73,7 @@ class Engine(AbstractClass):
       """
       return cls(error=error, root_products=None)
 
-  def __init__(self, scheduler, storage=None, cache=None):
+  def __init__(self, scheduler, storage=None, cache=None, use_cache=False):
     """
     :param scheduler: The local scheduler for creating execution graphs.
     :type scheduler: :class:`pants.engine.scheduler.LocalScheduler`
@@ -79,10 +82,12 @@ class Engine(AbstractClass):
     :param cache: The cache instance for storing execution results, by default it uses the same
       Storage instance if not specified.
     :type cache: :class:`pants.engine.storage.Cache`
+    :param bool use_cache: `True` to look up and store the results of cacheable Nodes in the cache.
     """
     self._scheduler = scheduler
     self._storage = storage or Storage.create()
     self._cache = cache or Cache.create(storage)
+    self._use_cache = use_cache
 
   def execute(self, execution_request):
     """Executes the requested build.
@@ -111,9 +116,8 @@ class Engine(AbstractClass):
     """Returns cache stats for the engine."""
     return self._cache.get_stats()
 
-  @memoized_method
   def _should_cache(self, step_request):
-    return step_request.node.is_cacheable
+    return self._use_cache and step_request.node.is_cacheable
 
   def _maybe_cache_get(self, step_request):
     """If caching is enabled for the given StepRequest, create a keyed request and perform a lookup.
@@ -125,12 +129,31 @@ class Engine(AbstractClass):
     """
     if not self._should_cache(step_request):
       return None, None
-    keyed_request = self._storage.key_for_request(step_request)
-    return keyed_request, self._cache.get(keyed_request)
+    try:
+      keyed_request = self._storage.key_for_request(step_request)
+      return keyed_request, self._cache.get(keyed_request)
+    except SerializationError as e:
+      # The inputs of this step can't be stored, so neither can its result: just run it.
+      logger.debug('Not caching {}: {}'.format(step_request.node, e))
+    except StorageFullError as e:
+      self._stop_caching(e)
+    return None, None
 
   def _maybe_cache_put(self, keyed_request, step_result):
-    if keyed_request is not None:
+    # Failures are not cached: the exceptions they hold may be environmental, and may not survive
+    # a round trip through storage.
+    if keyed_request is None or not self._use_cache or type(step_result.state) is Throw:
+      return
+    try:
       self._cache.put(keyed_request, step_result)
+    except SerializationError as e:
+      logger.debug('Not caching the result of {}: {}'.format(keyed_request.node, e))
+    except StorageFullError as e:
+      self._stop_caching(e)
+
+  def _stop_caching(self, error):
+    logger.warn('Caching disabled for the rest of the run: {}'.format(error))
+    self._use_cache = False
 
   @abstractmethod
   def reduce(self, execution_request):
@@ -167,9 +190,98 @@ def _try_pickle(obj):
     raise SerializationError('Failed to pickle {}: {}'.format(obj, e))
 
 
+class PoolUtilization(object):
+  """Records the number of Steps in flight in a pool, and waiting for it, over one reduction."""
+
+  def __init__(self, pool_size):
+    self._pool_size = pool_size
+    self._samples = []
+
+  def sample(self, in_flight, pending):
+    self._samples.append((time.time(), in_flight, pending))
+
+  @property
+  def samples(self):
+    """A list of (timestamp, in flight count, pending count) tuples, oldest first."""
+    return list(self._samples)
+
+  def summary(self):
+    """Returns a dict of the time-weighted mean utilization of the pool, and its peaks."""
+    busy = elapsed = 0.0
+    for (start, in_flight, _), (end, _, _) in zip(self._samples, self._samples[1:]):
+      busy += in_flight * (end - start)
+      elapsed += end - start
+    return {
+      'pool_size': self._pool_size,
+      'samples': len(self._samples),
+      'mean_utilization': busy / (elapsed * self._pool_size) if elapsed else 0.0,
+      'max_in_flight': max(s[1] for s in self._samples) if self._samples else 0,
+      'max_pending': max(s[2] for s in self._samples) if self._samples else 0,
+    }
+
+
+class LatencyHistogram(object):
+  """Counts latencies in buckets whose upper bounds are powers of two milliseconds."""
+
+  def __init__(self):
+    self._buckets = defaultdict(int)
+    self._count = 0
+    self._total = 0.0
+    self._max = 0.0
+
+  def record(self, secs):
+    millis = secs * 1000
+    # Bucket `i` holds latencies of less than 2^i milliseconds (and at least 2^(i-1), for i > 0).
+    self._buckets[int(millis).bit_length()] += 1
+    self._count += 1
+    self._total += millis
+    self._max = max(self._max, millis)
+
+  @property
+  def buckets(self):
+    """A list of (upper bound in milliseconds, count) tuples for non-empty buckets, ascending."""
+    return [(2 ** i, count) for i, count in sorted(self._buckets.items())]
+
+  def summary(self):
+    """Returns a dict of the count, mean and max of the recorded latencies, and their buckets."""
+    return {
+      'count': self._count,
+      'mean_ms': self._total / self._count if self._count else 0.0,
+      'max_ms': self._max,
+      'buckets': self.buckets,
+    }
+
+
 class ConcurrentEngine(Engine):
+
+  def __init__(self, scheduler, storage=None, cache=None, use_cache=False, eager=False,
+               concurrency_limits=None):
+    """
+    :param bool eager: `True` to submit each Step as soon as it is ready, rather than waiting for
+      the scheduler to produce a batch of them.
+    :param dict concurrency_limits: When eager, an optional dict from Node type to the maximum
+      number of Steps for Nodes of that type that may be submitted at once.
+    """
+    super(ConcurrentEngine, self).__init__(scheduler, storage, cache, use_cache)
+    self._eager = eager
+    self._concurrency_limits = concurrency_limits or {}
+    self._pool_utilization = None
+
+  @property
+  def pool_utilization(self):
+    """The PoolUtilization of the most recent reduction, or None."""
+    return self._pool_utilization
+
   def reduce(self, execution_request):
     """The main reduction loop."""
+    self._pool_utilization = PoolUtilization(self._pool_size)
+    if self._eager:
+      self._reduce_eagerly(execution_request)
+    else:
+      self._reduce_in_batches(execution_request)
+    logger.debug('pool utilization: {}'.format(self._pool_utilization.summary()))
+
+  def _reduce_in_batches(self, execution_request):
     # 1. Whenever we don't have enough work to saturate the pool, request more.
     # 2. Whenever the pool is not saturated, submit currently pending work.
 
@@ -177,8 +289,17 @@ class ConcurrentEngine(Engine):
     pending_submission = OrderedSet()
     in_flight = dict()  # Dict from step id to a Promise for Steps that have been submitted.
 
-    submit_until = functools.partial(self._submit_until, pending_submission, in_flight)
-    await_one = functools.partial(self._await_one, in_flight)
+    def sample():
+      self._pool_utilization.sample(self._in_flight_count(in_flight), len(pending_submission))
+
+    def submit_until(n):
+      submitted = self._submit_until(pending_submission, in_flight, n)
+      sample()
+      return submitted
+
+    def await_one():
+      self._await_one(in_flight)
+      sample()
 
     for step_batch in self._scheduler.schedule(execution_request):
       if not step_batch:
@@ -201,6 +322,57 @@ class ConcurrentEngine(Engine):
       submit_until(self._pool_size)
       await_one()
 
+  def _reduce_eagerly(self, execution_request):
+    # 1. Whenever a Step completes, ask the scheduler for the Steps that it made ready.
+    # 2. Submit ready Steps immediately, unless their Node type is at its concurrency limit.
+    # 3. Only block on the pool when nothing else can make progress.
+    pending_submission = OrderedSet()
+    in_flight = dict()
+    # Ready Steps of Node types that were at their limit when they became ready, by type.
+    deferred = defaultdict(deque)
+    # The Promises of admitted Steps of limited Node types, by type.
+    admitted = defaultdict(list)
+
+    def admit(step_and_promise):
+      node_type = type(step_and_promise[0].node)
+      limit = self._concurrency_limits.get(node_type)
+      if limit is not None:
+        if len(admitted[node_type]) >= limit:
+          deferred[node_type].append(step_and_promise)
+          return
+        admitted[node_type].append(step_and_promise[1])
+      pending_submission.add(step_and_promise)
+
+    def release():
+      for node_type, promises in admitted.items():
+        promises[:] = [p for p in promises if not p.is_complete()]
+        waiting = deferred[node_type]
+        while waiting and len(promises) < self._concurrency_limits[node_type]:
+          admit(waiting.popleft())
+
+    with self._scheduler.scheduling(execution_request) as scheduling:
+      while True:
+        for step_and_promise in scheduling.next_steps():
+          admit(step_and_promise)
+        if scheduling.is_finished:
+          break
+        release()
+        self._submit_until(pending_submission, in_flight, 0)
+        self._pool_utilization.sample(self._in_flight_count(in_flight),
+                                      len(pending_submission) + sum(len(d) for d in deferred.values()))
+        if scheduling.has_completions:
+          # Steps ran inline: schedule their dependents before blocking on the pool.
+          continue
+        if not in_flight:
+          raise StepBatchException(
+            'Scheduler is not finished, but no work is in progress: {} outstanding.'
+            .format(scheduling.outstanding_count))
+        self._await_one(in_flight)
+
+  def _in_flight_count(self, in_flight):
+    """Returns the number of slots of the pool that are occupied by the given in flight Steps."""
+    return len(in_flight)
+
   @abstractmethod
   def _submit_until(self, pending_submission, in_flight, n):
     """Submit pending while there's capacity, and more than `n` items in pending_submission."""
@@ -214,11 +386,15 @@ class ThreadHybridEngine(ConcurrentEngine):
   """An engine that runs locally but allows nodes to be optionally run concurrently.
 
   The decision to run concurrently or in serial is determined by _is_async_node.
-  For IO bound nodes we will run concurrently using threads.
+  For IO bound nodes (by default, the FilesystemNodes) we will run concurrently using threads.
+
+  The Steps of FilesystemNodes for sibling paths that are ready at the same time are batched into
+  a single task of the pool, and the latency of each threaded Step is recorded by its product.
   """
 
-  def __init__(self, scheduler, storage, cache=None, threaded_node_types=tuple(),
-               pool_size=None, debug=True):
+  def __init__(self, scheduler, storage, cache=None, threaded_node_types=(FilesystemNode,),
+               pool_size=None, debug=True, eager=False, concurrency_limits=None, io_batch_size=16,
+               use_cache=False):
     """
     :param scheduler: The local scheduler for creating execution graphs.
     :type scheduler: :class:`pants.engine.scheduler.LocalScheduler`
@@ -227,39 +403,83 @@ class ThreadHybridEngine(ConcurrentEngine):
     :param cache: The cache instance for storing execution results, by default it uses the same
       Storage instance if not specified.
     :type cache: :class:`pants.engine.storage.Cache`
-    :param tuple threaded_node_types: Node types that will be processed using the thread pool.
-    :param int pool_size: The number of worker processes to use; by default 2 processes per core will
+    :param tuple threaded_node_types: Node types that will be processed using the thread pool; by
+                                      default, the FilesystemNodes that perform I/O.
+    :param int pool_size: The number of worker threads to use; by default 2 threads per core will
                           be used.
     :param bool debug: `True` to turn on pickling error debug mode (slower); True by default.
+    :param bool eager: See `ConcurrentEngine`.
+    :param dict concurrency_limits: See `ConcurrentEngine`.
+    :param int io_batch_size: The maximum number of Steps of FilesystemNodes for paths in the same
+                              directory to run in a single task of the pool.
+    :param bool use_cache: See `Engine`.
     """
-    super(ThreadHybridEngine, self).__init__(scheduler, storage, cache)
+    super(ThreadHybridEngine, self).__init__(scheduler, storage, cache, use_cache=use_cache,
+                                             eager=eager, concurrency_limits=concurrency_limits)
     self._pool_size = pool_size if pool_size and pool_size > 0 else 2 * multiprocessing.cpu_count()
+    self._io_batch_size = max(1, io_batch_size)
 
-    self._pending = set()  # Keep track of futures so we can cleanup at the end.
-    self._processed_queue = Queue()
+    self._keyed_requests = dict()  # Dict from step id to the keyed request of a cacheable Step.
     self._async_nodes = threaded_node_types
     self._node_builder = scheduler.node_builder()
     self._state = (self._node_builder, storage)
-    self._pool = ThreadPoolExecutor(max_workers=self._pool_size)
+    # The pool is created lazily, by the process that uses it: see `_ensure_pool`.
+    self._pool = None
+    self._pool_pid = os.getpid()
+    self._pending = set()  # Keep track of futures so we can cleanup at the end.
+    self._processed_queue = Queue()
+    self._batches_in_flight = 0
     self._debug = debug
+    self._latencies = defaultdict(LatencyHistogram)
+
+  @property
+  def latencies(self):
+    """A dict from product type to a LatencyHistogram of the threaded Steps of the most recent
+    reduction."""
+    return self._latencies
+
+  def _ensure_pool(self):
+    """Creates the pool if this process has not, and returns it.
+
+    The threads of a pool do not survive a fork (as when pantsd forks to serve a run, after using
+    the engine to build its graph), nor do the locks that they might have held: so a forked process
+    discards its parent's pool and the state of the batches submitted to it.
+    """
+    pid = os.getpid()
+    if self._pool_pid != pid:
+      self._pool = None
+      self._pool_pid = pid
+      self._pending = set()
+      self._processed_queue = Queue()
+      self._batches_in_flight = 0
+      self._keyed_requests = dict()
+    if self._pool is None:
+      self._pool = ThreadPoolExecutor(max_workers=self._pool_size)
+    return self._pool
+
+  def reduce(self, execution_request):
+    self._latencies = defaultdict(LatencyHistogram)
+    self._ensure_pool()
+    super(ThreadHybridEngine, self).reduce(execution_request)
+    for product, histogram in self._latencies.items():
+      logger.debug('{} latency: {}'.format(product.__name__, histogram.summary()))
 
   def _is_async_node(self, node):
     """Override default behavior and handle specific nodes asynchronously."""
     return isinstance(node, self._async_nodes)
 
-  def _maybe_cache_step(self, step_request):
-    if self._should_cache(step_request):
-      return step_request.step_id, self._cache.get(step_request)
-    else:
-      return step_request.step_id, None
+  def _batch_key(self, node):
+    """Returns a key that is shared by the Nodes whose Steps may run in the same task of the pool."""
+    if type(node) is FilesystemNode:
+      return os.path.dirname(node.subject.path)
+    return node
 
-  def _execute_step(self, step, cache_save=None, debug=False):
+  def _execute_step(self, step, debug=False):
     """A function to help support local step execution.
 
     Executes the Step for the given node builder and storage, and returns a tuple of step id and
     result or exception.
 
-    :param callable cache_save: Callable used to save cache results. If None skip saving to cache.
     :param bool debug: Determines if we do extra debugging steps.
     :param step: Step to be executed.
     """
@@ -271,9 +491,6 @@ class ThreadHybridEngine(ConcurrentEngine):
       result = resolved_request(node_builder)
       if debug:
         _try_pickle(result)
-      if cache_save:
-        keyed_result = storage.key_for_result(result)
-        cache_save(step, keyed_result)
       return result
 
     try:
@@ -284,54 +501,60 @@ class ThreadHybridEngine(ConcurrentEngine):
       logger.warn(traceback.format_exc())
       return step_id, e
 
-  def _deferred_step(self, step, should_cache):
-    """Create a callable to process a step that is able to be passed to the thread pool
-
-    Deferred method returns (step_id, result) so that it can be processed later.
-    """
-    cache_save = self._self._cache.put if should_cache else None
-    return functools.partial(self._execute_step, step, cache_save = cache_save)
-
-  def _deferred_cache(self, step):
-    """Create a callable to fetch cache that is able to be passed to the thread pool
-
-    Deferred method returns result without corresponding step id
-    """
-    def strip_step_id():
-      # Discard keyed_result
-      _, result = self._maybe_cache_get(step)
-      resolved_result = None if result is None else self._storage.resolve_result(result)
-      return step.step_id, resolved_result
-
-    return strip_step_id
+  def _execute_batch(self, steps):
+    """Executes the given Steps in order, and returns a list of (step id, result, product, secs)."""
+    results = []
+    for step in steps:
+      start = time.time()
+      step_id, result = self._execute_step(step, debug=self._debug)
+      results.append((step_id, result, step.node.product, time.time() - start))
+    return results
 
   def _processed_node_callback(self, finished_future):
     self._processed_queue.put(finished_future)
     self._pending.remove(finished_future)
 
+  def _submit_batch(self, steps):
+    future = self._ensure_pool().submit(self._execute_batch, steps)
+    self._batches_in_flight += 1
+    self._pending.add(future)
+    future.add_done_callback(self._processed_node_callback)
+
+  def _in_flight_count(self, in_flight):
+    return self._batches_in_flight
+
   def _submit_until(self, pending_submission, in_flight, n):
-    """Submit pending while there's capacity, and more than `n` items in pending_submission."""
-    to_submit = min(len(pending_submission) - n, self._pool_size - len(in_flight))
+    """Submit pending while there's capacity, and more than `n` items in pending_submission.
+
+    Async Steps that share a batch key are submitted together, in batches of up to
+    `io_batch_size` Steps that each occupy one slot of the pool.
+    """
+    capacity = self._pool_size - self._batches_in_flight
+    batches = OrderedDict()
     submitted = 0
-    for _ in range(to_submit):
+    while len(pending_submission) > n and capacity > 0:
       step, promise = pending_submission.pop(last=False)
       if self._is_async_node(step.node):
         if step.step_id in in_flight:
           raise InFlightException('{} is already in_flight!'.format(step))
 
+        keyed_request, result = self._maybe_cache_get(step)
+        if result is not None:
+          # Skip in_flight on cache hit.
+          promise.success(result)
+          continue
+        if keyed_request is not None:
+          self._keyed_requests[step.step_id] = keyed_request
         in_flight[step.step_id] = promise
 
-        should_cache = self._should_cache(step)
-        futures = [self._pool.submit(self._deferred_step(step, should_cache))]
-
-        if should_cache:
-          cache_future = self._pool.submit(self.deferred_cache(step))
-          futures.append(cache_future)
-
-        for f in futures:
-          self._pending.add(f)
-          f.add_done_callback(self._processed_node_callback)
-
+        key = self._batch_key(step.node)
+        batch = batches.get(key)
+        if batch is None:
+          batch = batches[key] = []
+          capacity -= 1
+        batch.append(step)
+        if len(batch) == self._io_batch_size:
+          self._submit_batch(batches.pop(key))
         submitted += 1
 
       else:
@@ -341,28 +564,34 @@ class ThreadHybridEngine(ConcurrentEngine):
           self._maybe_cache_put(keyed_request, result)
         promise.success(result)
 
+    for batch in batches.values():
+      self._submit_batch(batch)
     return submitted
 
   def _await_one(self, in_flight):
-    """Await one completed step, and remove it from in_flight."""
+    """Await one completed batch of steps, and remove them from in_flight."""
     if not in_flight:
       raise InFlightException('Awaited an empty pool!')
 
-    # Drop silently None results (these are cache misses).
-    # Also drop steps that have already been handled.
-    step_id = None
-    result = None
-    while not result or (step_id not in in_flight):
-      step_id, result = self._processed_queue.get().result()
-    if isinstance(result, Exception):
-      raise result
-    in_flight.pop(step_id).success(result)
+    results = self._processed_queue.get().result()
+    self._batches_in_flight -= 1
+    for step_id, result, product, secs in results:
+      if isinstance(result, Exception):
+        raise result
+      if step_id not in in_flight:
+        raise InFlightException(
+          'Received unexpected work from the Executor: {} vs {}'.format(step_id, in_flight.keys()))
+      self._latencies[product].record(secs)
+      self._maybe_cache_put(self._keyed_requests.pop(step_id, None), result)
+      in_flight.pop(step_id).success(result)
 
   def close(self):
     """Cleanup thread pool."""
-    for f in self._pending:
-      f.cancel()
-    self._pool.shutdown()  # Wait for pool to cleanup before we cleanup storage.
+    # A pool created by a parent process has no threads in this one to shut down.
+    if self._pool is not None and self._pool_pid == os.getpid():
+      for f in self._pending:
+        f.cancel()
+      self._pool.shutdown()  # Wait for pool to cleanup before we cleanup storage.
     super(ThreadHybridEngine, self).close()
 
 
@@ -404,7 +633,8 @@ def _execute_step(cache_save, debug, process_state, step):
 class LocalMultiprocessEngine(ConcurrentEngine):
   """An engine that runs tasks locally and in parallel when possible using a process pool."""
 
-  def __init__(self, scheduler, storage, cache=None, pool_size=None, debug=True):
+  def __init__(self, scheduler, storage, cache=None, pool_size=None, debug=True, eager=False,
+               concurrency_limits=None):
     """
     :param scheduler: The local scheduler for creating execution graphs.
     :type scheduler: :class:`pants.engine.scheduler.LocalScheduler`
@@ -416,10 +646,13 @@ class LocalMultiprocessEngine(ConcurrentEngine):
     :param int pool_size: The number of worker processes to use; by default 2 processes per core will
                           be used.
     :param bool debug: `True` to turn on pickling error debug mode (slower); True by default.
+    :param bool eager: See `ConcurrentEngine`.
+    :param dict concurrency_limits: See `ConcurrentEngine`.
     """
     # This is the only place where non in-memory storage is needed, create one if not specified.
     storage = storage or Storage.create(in_memory=False)
-    super(LocalMultiprocessEngine, self).__init__(scheduler, storage, cache)
+    super(LocalMultiprocessEngine, self).__init__(scheduler, storage, cache, eager=eager,
+                                                  concurrency_limits=concurrency_limits)
     self._pool_size = pool_size if pool_size and pool_size > 0 else 2 * multiprocessing.cpu_count()
 
     execute_step = functools.partial(_execute_step, self._maybe_cache_put, debug)
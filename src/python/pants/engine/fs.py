@@ -6,12 +6,15 @@ from __future__ import (absolute_import, division, generators, nested_scopes, pr
                         unicode_literals, with_statement)
 
 import errno
+import mmap
+import os
 from abc import abstractproperty
+from contextlib import contextmanager
 from fnmatch import fnmatch
 from hashlib import sha1
 from itertools import chain
 from os import sep as os_sep
-from os.path import basename, join, normpath
+from os.path import basename, dirname, join, normpath
 
 import six
 from twitter.common.collections.orderedset import OrderedSet
@@ -63,8 +66,107 @@ class FilteredPaths(datatype('FilteredPaths', ['paths'])):
   """A wrapper around a Paths object that has been filtered by some pattern."""
 
 
+class MappedContent(object):
+  """The content of a large file, which is read from the file when it is accessed.
+
+  Instances are compared, hashed and pickled by the size and digest of the file, which are computed
+  (by streaming the file, rather than reading it into memory) when they are created. Since the file
+  may change afterward (or, for an unpickled instance, may have changed in another process),
+  accessing the content verifies it against the digest, and raises IOError if it differs.
+  """
+
+  # Files at least this large have their FileContent exposed as MappedContent.
+  THRESHOLD = 1024 * 1024
+
+  _CHUNK_SIZE = 1024 * 1024
+
+  @classmethod
+  def create(cls, abspath):
+    """Digests the given file, without reading it into memory."""
+    hasher = sha1()
+    size = 0
+    with open(abspath, 'rb') as fh:
+      for chunk in iter(lambda: fh.read(cls._CHUNK_SIZE), b''):
+        hasher.update(chunk)
+        size += len(chunk)
+    return cls(abspath, size, hasher.digest())
+
+  def __init__(self, abspath, size, digest):
+    self.abspath = abspath
+    self.size = size
+    self.digest = digest
+
+  def _verify(self, content):
+    if len(content) != self.size or sha1(content).digest() != self.digest:
+      raise IOError('{} changed since it was digested.'.format(self.abspath))
+
+  def read(self):
+    """Returns the content of the file, which is read again each time.
+
+    :raises: IOError if the content of the file has changed since it was digested.
+    """
+    with open(self.abspath, 'rb') as fh:
+      content = fh.read()
+    self._verify(content)
+    return content
+
+  @contextmanager
+  def view(self):
+    """Yields a read-only buffer over a memory map of the file, which does not copy it.
+
+    The mapping is closed when the context exits, so the buffer must not be used after that. As for
+    any mapping, truncating the file while the buffer is in use would fault the process.
+
+    :raises: IOError if the content of the file has changed since it was digested.
+    """
+    with open(self.abspath, 'rb') as fh:
+      mapped = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+      self._verify(mapped)
+      yield buffer(mapped)
+    finally:
+      mapped.close()
+
+  def __len__(self):
+    return self.size
+
+  def __str__(self):
+    return self.read()
+
+  def __eq__(self, other):
+    return type(other) is type(self) and (self.size, self.digest) == (other.size, other.digest)
+
+  def __ne__(self, other):
+    return not (self == other)
+
+  def __hash__(self):
+    return hash(self.digest)
+
+  def __getstate__(self):
+    return (self.abspath, self.size, self.digest)
+
+  def __setstate__(self, state):
+    self.abspath, self.size, self.digest = state
+
+  def __repr__(self):
+    return 'MappedContent(abspath={}, size={})'.format(self.abspath, self.size)
+
+
 class FileContent(datatype('FileContent', ['path', 'content'])):
-  """The content of a file, or None if it did not exist."""
+  """The content of a file, or None if it did not exist.
+
+  The content of a large file is a MappedContent: see `file_content`.
+  """
+
+  @property
+  def digest(self):
+    """The digest of the content, which is computed from the content rather than the file."""
+    if self.content is None:
+      return None
+    elif type(self.content) is MappedContent:
+      return self.content.digest
+    else:
+      return sha1(self.content).digest()
 
   def __repr__(self):
     content_str = '(len:{})'.format(len(self.content)) if self.content is not None else 'None'
@@ -148,13 +250,16 @@ class PathGlob(AbstractClass):
       #  "A trailing '/**' matches everything inside. For example, 'abc/**' matches all files inside
       #   directory "abc", relative to the location of the .gitignore file, with infinite depth."
       #
-      return (PathDirWildcard(canonical_stat, symbolic_path, '*', '**'),
-              PathWildcard(canonical_stat, symbolic_path, '*'))
+      return (PathRecursiveWildcard(canonical_stat, symbolic_path, '*'),)
     elif cls._DOUBLE in parts[0]:
       if parts[0] != cls._DOUBLE:
         raise ValueError('Illegal component "{}" in filespec under {}: {}'
                          .format(parts[0], symbolic_path, filespec))
 
+      # Unless the remainder recurses again, match it against the entire subtree at once.
+      if not any(cls._DOUBLE in part for part in parts[1:]):
+        return (PathRecursiveWildcard(canonical_stat, symbolic_path, join(*parts[1:])),)
+
       # There is a double-wildcard in a dirname of the path: double wildcards are recursive,
       # so there are two remainder possibilities: one with the double wildcard included, and the
       # other without.
@@ -195,6 +300,24 @@ class PathDirWildcard(datatype('PathDirWildcard', ['canonical_stat', 'symbolic_p
   """
 
 
+class PathRecursiveWildcard(datatype('PathRecursiveWildcard',
+                                     ['canonical_stat', 'symbolic_path', 'remainder']),
+                            PathGlob):
+  """A PathGlob matching the remainder at any depth below a directory: ie, `**/remainder`.
+
+  Rather than recursing one directory at a time, the subtree is listed in one step: see
+  `RecursiveDirectoryListing`.
+  """
+
+
+class RecursivePaths(datatype('RecursivePaths', ['paths', 'link_globs'])):
+  """The Paths matching a PathRecursiveWildcard in a RecursiveDirectoryListing.
+
+  Since the listing does not traverse symlinks, `link_globs` holds a PathGlob per Link in the
+  listing, to continue matching below the Link once it has been resolved.
+  """
+
+
 class PathGlobs(datatype('PathGlobs', ['dependencies'])):
   """A set of 'PathGlob' objects.
 
@@ -245,6 +368,14 @@ class DirectoryListing(datatype('DirectoryListing', ['directory', 'dependencies'
   """
 
 
+class RecursiveDirectoryListing(datatype('RecursiveDirectoryListing',
+                                         ['directory', 'dependencies', 'exists'])):
+  """A list of Stat objects representing all paths below a directory, without traversing symlinks.
+
+  If exists=False, then the entries list will be empty.
+  """
+
+
 def scan_directory(project_tree, directory):
   """List Stat objects directly below the given path, relative to the ProjectTree.
 
@@ -259,6 +390,36 @@ def scan_directory(project_tree, directory):
       raise e
 
 
+def scan_directory_recursive(project_tree, directory):
+  """List Stat objects for all paths below the given path, relative to the ProjectTree.
+
+  Ignored paths are neither listed nor descended into, and symlinks are not traversed.
+
+  :returns: A RecursiveDirectoryListing.
+  """
+  try:
+    stats = list(project_tree.scandir(directory.path))
+  except (IOError, OSError) as e:
+    if e.errno == errno.ENOENT:
+      return RecursiveDirectoryListing(directory, tuple(), exists=False)
+    else:
+      raise e
+
+  # Breadth first: extend the listing with the content of each Dir in it.
+  index = 0
+  while index < len(stats):
+    stat = stats[index]
+    index += 1
+    if type(stat) is Dir:
+      try:
+        stats.extend(project_tree.scandir(stat.path))
+      except (IOError, OSError) as e:
+        # The directory was deleted while the listing was in progress.
+        if e.errno != errno.ENOENT:
+          raise e
+  return RecursiveDirectoryListing(directory, tuple(stats), exists=True)
+
+
 def merge_paths(paths_list):
   """Merge Paths lists."""
   return Paths(tuple(p for paths in paths_list for p in paths.dependencies))
@@ -287,6 +448,54 @@ def apply_path_dir_wildcard(dirs, path_dir_wildcard):
   return PathGlobs(tuple(chain.from_iterable(path_globs)))
 
 
+def _join_symbolic(symbolic_path, relpath):
+  return join(symbolic_path, relpath) if relpath else symbolic_path
+
+
+def _escape_wildcard(name):
+  """Escapes a literal name for use as a wildcard."""
+  return ''.join('[{}]'.format(c) if c in '*?[' else c for c in name)
+
+
+def apply_path_recursive_wildcard(listing, path_recursive_wildcard):
+  """Match the given RecursiveDirectoryListing against the given PathRecursiveWildcard."""
+  canonical_path = path_recursive_wildcard.canonical_stat.path
+  symbolic_path = path_recursive_wildcard.symbolic_path
+  remainder = path_recursive_wildcard.remainder
+  wildcards = remainder.split(os_sep)
+
+  paths = []
+  link_globs = []
+  for stat in listing.dependencies:
+    relpath = stat.path[len(canonical_path) + 1:] if canonical_path else stat.path
+    parts = relpath.split(os_sep)
+    if len(parts) >= len(wildcards) and all(fnmatch(part, wildcard) for part, wildcard
+                                            in zip(parts[-len(wildcards):], wildcards)):
+      paths.append(Path(_join_symbolic(symbolic_path, relpath), stat))
+    if type(stat) is Link:
+      # Resolve the Link (like any other PathDirWildcard would), and match again below it: both
+      # the whole remainder at any depth, and each suffix of the remainder that continues from a
+      # wildcard matching the Link itself.
+      link_dir = Dir(dirname(stat.path))
+      link_symbolic_path = _join_symbolic(symbolic_path, dirname(relpath))
+      link_wildcard = _escape_wildcard(basename(stat.path))
+      link_globs.append(PathDirWildcard(link_dir, link_symbolic_path, link_wildcard,
+                                        join(PathGlob._DOUBLE, remainder)))
+      for i in range(min(len(wildcards) - 1, len(parts))):
+        # The first i wildcards match the components above the Link, and the next the Link.
+        if all(fnmatch(part, wildcard)
+               for part, wildcard in zip(parts[len(parts) - 1 - i:], wildcards[:i + 1])):
+          link_globs.append(PathDirWildcard(link_dir, link_symbolic_path, link_wildcard,
+                                            join(*wildcards[i + 1:])))
+  return RecursivePaths(tuple(paths), tuple(link_globs))
+
+
+def merge_recursive_paths(recursive_paths, linked_paths_list):
+  """Merge the Paths matched directly by a PathRecursiveWildcard with those matched via Links."""
+  return Paths(recursive_paths.paths +
+               tuple(p for paths in linked_paths_list for p in paths.dependencies))
+
+
 def _zip_links(links, linked_paths):
   """Given a set of Paths and a resolved collection per Link in the Paths, merge."""
   # Alias the resolved destinations with the symbolic name of the Paths used to resolve them.
@@ -319,21 +528,37 @@ def filter_paths(stats, path_dir_wildcard):
   return FilteredPaths(Paths(paths))
 
 
+def _mapped_content(project_tree, f):
+  """Returns a MappedContent for the given File if it is local and large enough, or else None."""
+  local_path = project_tree.local_path(f.path)
+  if local_path is None or os.path.getsize(local_path) < MappedContent.THRESHOLD:
+    return None
+  return MappedContent.create(local_path)
+
+
 def file_content(project_tree, f):
   """Return a FileContent for a known-existing File.
 
+  The content of a large local file is not held in memory: see `MappedContent`.
+
   NB: This method fails eagerly, because it expects to be executed only after a caller has
   stat'd a path to determine that it is, in fact, an existing File.
   """
-  return FileContent(f.path, project_tree.content(f.path))
+  content = _mapped_content(project_tree, f)
+  if content is None:
+    content = project_tree.content(f.path)
+  return FileContent(f.path, content)
 
 
 def file_digest(project_tree, f):
   """Return a FileDigest for a known-existing File.
 
+  The digest is computed from the same single read of the file as its FileContent would be: a
+  large file is streamed rather than held in memory.
+
   See NB on file_content.
   """
-  return FileDigest(f.path, sha1(project_tree.content(f.path)).digest())
+  return FileDigest(f.path, file_content(project_tree, f).digest)
 
 
 def resolve_link(stats):
@@ -379,6 +604,14 @@ def create_fs_tasks():
      [SelectProjection(DirectoryListing, Dir, ('canonical_stat',), PathDirWildcard),
       Select(PathDirWildcard)],
      filter_paths),
+    (RecursivePaths,
+     [SelectProjection(RecursiveDirectoryListing, Dir, ('canonical_stat',), PathRecursiveWildcard),
+      Select(PathRecursiveWildcard)],
+     apply_path_recursive_wildcard),
+    (Paths,
+     [Select(RecursivePaths),
+      SelectDependencies(Paths, RecursivePaths, field='link_globs')],
+     merge_recursive_paths),
   ] + [
     # Link resolution.
     (Dirs,
@@ -61,8 +61,9 @@ def parse_address_family(address_mapper, path, build_files_content):
     raise ResolveError('Directory "{}" does not contain build files.'.format(path))
   address_maps = []
   for filepath, filecontent in build_files_content.dependencies:
+    # NB: A very large BUILD file might be a MappedContent: parsers expect bytes.
     address_maps.append(AddressMap.parse(filepath,
-                                         filecontent,
+                                         bytes(filecontent),
                                          address_mapper.symbol_table_cls,
                                          address_mapper.parser_cls))
   return AddressFamily.create(path.path, address_maps)
@@ -109,11 +109,13 @@ class LegacyBuildGraph(BuildGraph):
     address = legacy_target.adaptor.address
     target = self._instantiate_target(legacy_target.adaptor)
     self._target_by_address[address] = target
+    self._invalidate_walks()
 
     # Link its declared dependencies, which will be indexed independently.
-    self._target_dependencies_by_address[address].update(legacy_target.dependencies)
+    dependencies = self._target_dependencies_by_address[address]
     for dependency in legacy_target.dependencies:
-      self._target_dependees_by_address[dependency].add(address)
+      if dependency not in dependencies:
+        self._link(address, dependency)
     return target
 
   def _instantiate_target(self, target_adaptor):
@@ -13,8 +13,9 @@ from twitter.common.collections import OrderedSet
 from pants.base.project_tree import Dir, File, Link
 from pants.build_graph.address import Address
 from pants.engine.addressable import parse_variants
-from pants.engine.fs import (DirectoryListing, FileContent, FileDigest, ReadLink, file_content,
-                             file_digest, read_link, scan_directory)
+from pants.engine.fs import (DirectoryListing, FileContent, FileDigest, ReadLink,
+                             RecursiveDirectoryListing, file_content, file_digest, read_link,
+                             scan_directory, scan_directory_recursive)
 from pants.engine.selectors import (Select, SelectDependencies, SelectLiteral, SelectProjection,
                                     SelectVariant)
 from pants.engine.struct import HasProducts, Variants
@@ -348,9 +349,12 @@ class TaskNode(datatype('TaskNode', ['subject', 'product', 'variants', 'func', '
   All dependencies of the function are declared ahead of time in the dependency `clause` of the
   function, so the TaskNode will determine whether the dependencies are available before
   executing the function, and provides a satisfied argument per clause entry to the function.
+
+  Task functions are expected to be pure, so the result of a TaskNode is cacheable: it is keyed by
+  the states of its dependencies, which include the content of any files it reads.
   """
 
-  is_cacheable = False
+  is_cacheable = True
   is_inlineable = False
 
   def step(self, step_context):
@@ -397,6 +401,7 @@ class FilesystemNode(datatype('FilesystemNode', ['subject', 'product', 'variants
       (FileContent, File),
       (FileDigest, File),
       (ReadLink, Link),
+      (RecursiveDirectoryListing, Dir),
     }
 
   _FS_PRODUCT_TYPES = {product for product, subject in _FS_PAIRS}
@@ -419,6 +424,16 @@ class FilesystemNode(datatype('FilesystemNode', ['subject', 'product', 'variants
       # DirectoryListing for parent dirs.
       yield Dir(dirname(f))
 
+  @classmethod
+  def generate_recursive_subjects(cls, filenames):
+    """Given filenames, generate the subjects of the RecursiveDirectoryListings that contain them."""
+    for f in filenames:
+      parent = dirname(f)
+      yield Dir(parent)
+      while parent:
+        parent = dirname(parent)
+        yield Dir(parent)
+
   def step(self, step_context):
     try:
       if self.product is DirectoryListing:
@@ -429,6 +444,8 @@ class FilesystemNode(datatype('FilesystemNode', ['subject', 'product', 'variants
         return Return(file_digest(step_context.project_tree, self.subject))
       elif self.product is ReadLink:
         return Return(read_link(step_context.project_tree, self.subject))
+      elif self.product is RecursiveDirectoryListing:
+        return Return(scan_directory_recursive(step_context.project_tree, self.subject))
       else:
         # This would be caused by a mismatch between _FS_PRODUCT_TYPES and the above switch.
         raise ValueError('Mismatched input value {} for {}'.format(self.subject, self))
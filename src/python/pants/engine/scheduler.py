@@ -5,16 +5,21 @@
 from __future__ import (absolute_import, division, generators, nested_scopes, print_function,
                         unicode_literals, with_statement)
 
+import errno
+import functools
 import logging
 import threading
 import time
+from array import array
 from collections import defaultdict, deque
 from contextlib import contextmanager
+from os.path import dirname
 
+from pants.base.project_tree import Dir, File, Link, ProjectTree
 from pants.base.specs import DescendantAddresses, SiblingAddresses, SingleAddress
 from pants.build_graph.address import Address
 from pants.engine.addressable import Addresses
-from pants.engine.fs import PathGlobs
+from pants.engine.fs import PathGlobs, RecursiveDirectoryListing
 from pants.engine.nodes import (DependenciesNode, FilesystemNode, Node, Noop, Return, SelectNode,
                                 State, StepContext, TaskNode, Throw, Waiting)
 from pants.engine.objects import Closable
@@ -40,23 +45,33 @@ class ProductGraph(object):
     Equality for this object is intentionally `identity` for efficiency purposes: structural
     equality can be implemented by comparing the result of the `structure` method.
     """
-    __slots__ = ('node', 'state', 'dependencies', 'dependents', 'cyclic_dependencies')
+    __slots__ = ('node', 'state', 'dependencies', 'dependents', 'cyclic_dependencies', 'dirty',
+                 'previous_state', 'changed_at', 'verified_at')
 
-    def __init__(self, node):
+    def __init__(self, node, revision=0):
       self.node = node
       # The computed value for a Node: if a Node hasn't been computed yet, it will be None.
       self.state = None
+      # True if the State of the Node might be stale, because one of its transitive dependencies
+      # has been invalidated: see `ProductGraph.mark_dirty`.
+      self.dirty = False
+      # The State of the Node before it was last reset for recomputation, if any.
+      self.previous_state = None
+      # The graph revisions at which the State of this Node last changed, and at which it was last
+      # computed or verified to be current.
+      self.changed_at = revision
+      self.verified_at = revision
       # Sets of dependency/dependent Entry objects.
       self.dependencies = set()
       self.dependents = set()
-      # Illegal/cyclic dependency Nodes. We prevent cyclic dependencies from being introduced into the
-      # dependencies/dependents lists themselves, but track them independently in order to provide
-      # context specific error messages when they are introduced.
+      # Illegal/cyclic dependency Nodes. We prevent cyclic dependencies from being introduced into
+      # the dependencies/dependents lists themselves, but track them independently in order to
+      # provide context specific error messages when they are introduced.
       self.cyclic_dependencies = set()
 
     @property
     def is_complete(self):
-      return self.state is not None
+      return self.state is not None and not self.dirty
 
     def structure(self):
       return (self.node,
@@ -69,6 +84,8 @@ class ProductGraph(object):
     self._validator = validator or Node.validate_node
     # A dict of Node->Entry.
     self._nodes = dict()
+    # Incremented by each call to `mark_dirty`.
+    self._revision = 0
 
   def __len__(self):
     return len(self._nodes)
@@ -95,11 +112,17 @@ class ProductGraph(object):
     if type(state) in [Return, Throw, Noop]:
       # Validate that a completed Node depends only on other completed Nodes.
       for dep in entry.dependencies:
-        if dep.state is None:
+        if not dep.is_complete:
           raise IncompleteDependencyException(
               'Cannot complete {} with {} while it has an incomplete dep:\n  {}'
                 .format(node, state, dep.node))
       entry.state = state
+      # Recomputing a Node to an equal State does not change it, as far as its dirty dependents
+      # are concerned.
+      if entry.previous_state is None or entry.previous_state != state:
+        entry.changed_at = self._revision
+      entry.previous_state = None
+      entry.verified_at = self._revision
     elif type(state) is Waiting:
       self._add_dependencies(entry, state.dependencies)
     else:
@@ -116,7 +139,7 @@ class ProductGraph(object):
     # We disallow adding new edges outbound from completed Nodes, and no completed Node can have
     # a path to an uncompleted Node. Thus, we can truncate our search for cycles at any completed
     # Node.
-    is_not_completed = lambda e: e.state is None
+    is_not_completed = lambda e: not e.is_complete
     for entry in self._walk_entries([dest], entry_predicate=is_not_completed):
       if entry is src:
         return True
@@ -127,7 +150,7 @@ class ProductGraph(object):
     entry = self._nodes.get(node, None)
     if not entry:
       self._validator(node)
-      self._nodes[node] = entry = self.Entry(node)
+      self._nodes[node] = entry = self.Entry(node, self._revision)
     return entry
 
   def _add_dependencies(self, node_entry, dependencies):
@@ -203,10 +226,6 @@ class ProductGraph(object):
       for associated_entry in entry.dependencies:
         associated_entry.dependents.discard(entry)
 
-    def _delete_node(entry):
-      actual_entry = self._nodes.pop(entry.node)
-      assert entry is actual_entry
-
     def all_predicate(node, state): return True
     predicate = predicate or all_predicate
 
@@ -223,20 +242,116 @@ class ProductGraph(object):
     # Delete all nodes based on a backwards walk of the graph from all matching invalidated roots.
     for entry in invalidated_entries:
       logger.debug('invalidating node: %r', entry.node)
-      _delete_node(entry)
+      self._delete_entry(entry)
 
     invalidated_count = len(invalidated_entries)
     logger.info('invalidated {} of {} nodes'.format(invalidated_count, len(self)))
     return invalidated_count
 
-  def invalidate_files(self, filenames):
-    """Given a set of changed filenames, invalidate all related FilesystemNodes in the graph."""
+  def mark_dirty(self, predicate):
+    """Resets Nodes matching the given predicate for recomputation, and marks dependents dirty.
+
+    Unlike `invalidate`, dependents are not deleted: they keep their States and edges. A dirty Node
+    is only recomputed if one of its dependencies changed value since the Node was last computed
+    or verified; otherwise it becomes clean again without running. See `verify_entry`.
+
+    :param func predicate: A predicate that matches Node objects for all nodes in the graph.
+    :returns: The number of Nodes that were reset or marked dirty.
+    """
+    self._revision += 1
+    root_entries = [entry for entry in self._nodes.values() if predicate(entry.node, entry.state)]
+    for entry in root_entries:
+      self._reset(entry)
+
+    # The dependents of a dirty or incomplete Node are already dirty or incomplete themselves, so
+    # the walk stops at them.
+    roots = set(root_entries)
+    is_root_or_complete = lambda e: e in roots or e.is_complete
+    dirtied_count = 0
+    for entry in self._walk_entries(root_entries, is_root_or_complete, dependents=True):
+      if entry not in roots:
+        entry.dirty = True
+        dirtied_count += 1
+
+    logger.info('reset {} and dirtied {} of {} nodes'.format(len(root_entries), dirtied_count,
+                                                             len(self)))
+    return len(root_entries) + dirtied_count
+
+  def verify_entry(self, entry):
+    """Attempts to clean the given dirty Entry without recomputing it.
+
+    Once the dependencies of the Entry are complete, it is clean if none of them changed value
+    since it was last computed or verified ("early cutoff"). Otherwise it is reset, and must be
+    recomputed.
+
+    :returns: A list of the incomplete dependency entries that must complete before the Entry can
+      be verified: if the list is empty, the Entry is either clean or reset.
+    """
+    incomplete_deps = [d for d in entry.dependencies if not d.is_complete]
+    if incomplete_deps:
+      return incomplete_deps
+    if any(d.changed_at > entry.verified_at for d in entry.dependencies):
+      self._reset(entry)
+    else:
+      entry.dirty = False
+      entry.verified_at = self._revision
+    return incomplete_deps
+
+  def _delete_entry(self, entry):
+    actual_entry = self._nodes.pop(entry.node)
+    assert entry is actual_entry
+
+  def _reset(self, entry):
+    """Clears the State and dependencies of the given Entry, so that it will be recomputed."""
+    if entry.state is not None:
+      entry.previous_state = entry.state
+    entry.state = None
+    entry.dirty = False
+    for dependency_entry in entry.dependencies:
+      dependency_entry.dependents.discard(entry)
+    entry.dependencies = set()
+    entry.cyclic_dependencies = set()
+
+  def invalidate_files(self, filenames, incremental=False, stats=None):
+    """Given a set of changed filenames, invalidate all related FilesystemNodes in the graph.
+
+    :param bool incremental: `True` to mark the dependents of the related FilesystemNodes dirty
+      rather than deleting them: see `mark_dirty`.
+    :param dict stats: The current Stat of each filename, or None for a filename that does not
+      exist. The RecursiveDirectoryListings of a filename's ancestors list only the names and types
+      of paths, so they are only invalidated if its Stat in them differs: ie, if it was created,
+      deleted or renamed. Without stats, they are always invalidated.
+    """
     subjects = set(FilesystemNode.generate_subjects(filenames))
+    filenames_by_recursive_subject = defaultdict(list)
+    for filename in filenames:
+      for subject in FilesystemNode.generate_recursive_subjects([filename]):
+        filenames_by_recursive_subject[subject].append(filename)
     logger.debug('generated invalidation subjects: %s', subjects)
 
-    def predicate(node, state):
-      return type(node) is FilesystemNode and node.subject in subjects
+    def listing_changed(subject, state):
+      if stats is None or type(state) is not Return:
+        return True
+      listed = set(state.value.dependencies)
+      for filename in filenames_by_recursive_subject[subject]:
+        if filename not in stats:
+          return True
+        listed_stat = next((stat for stat in (File(filename), Dir(filename), Link(filename))
+                            if stat in listed), None)
+        if listed_stat != stats[filename]:
+          return True
+      return False
 
+    def predicate(node, state):
+      if type(node) is not FilesystemNode:
+        return False
+      if node.product is RecursiveDirectoryListing:
+        return (node.subject in filenames_by_recursive_subject and
+                listing_changed(node.subject, state))
+      return node.subject in subjects
+
+    if incremental:
+      return self.mark_dirty(predicate)
     return self.invalidate(predicate)
 
   def walk(self, roots, predicate=None, dependents=False):
@@ -367,7 +482,8 @@ class ProductGraph(object):
 
       yield '  "{}" [style=filled, fillcolor={}];'.format(node_str, format_color(node, node_state))
 
-      for cyclic, adjacencies in ((False, self.dependencies_of), (True, self.cyclic_dependencies_of)):
+      for cyclic, adjacencies in ((False, self.dependencies_of),
+                                  (True, self.cyclic_dependencies_of)):
         for dep in adjacencies(node):
           dep_state = self.state(dep)
           if not predicate(dep, dep_state):
@@ -377,6 +493,225 @@ class ProductGraph(object):
     yield '}'
 
 
+class CompactProductGraph(ProductGraph):
+  """A ProductGraph that is cheaper to hold and to grow when it contains millions of Nodes.
+
+  Each Node is interned to an integer id, and adjacency is held in arrays of ids (or for entries
+  with many adjacencies, sets of ids) rather than sets of entries. Rather than walking the graph to
+  detect cycles on each new edge, a topological order of the entries is maintained incrementally
+  (Pearce and Kelly, "A Dynamic Topological Sort Algorithm for Directed Acyclic Graphs"): an edge
+  that agrees with the order cannot introduce a cycle, and only the region of the graph between the
+  endpoints of an edge that disagrees with it needs to be walked.
+  """
+
+  # Adjacencies are held in arrays of ids, which are cheap to hold but are searched linearly. An
+  # entry with more adjacencies than this (such as a hub with many dependents) holds them in a set
+  # instead, so that its edges can still be found and removed in constant time.
+  MAX_ARRAY_ADJACENCIES = 32
+
+  @classmethod
+  def _adjacency_ids(cls, ids):
+    """Returns the given ids in the container for their number: an array, or a set if many."""
+    ids = array(b'i', ids)
+    return set(ids) if len(ids) > cls.MAX_ARRAY_ADJACENCIES else ids
+
+  class Adjacencies(object):
+    """A set-like view of an entry's array (or set) of adjacent entry ids, as entries."""
+    __slots__ = ('_entry', '_attr')
+
+    def __init__(self, entry, attr):
+      self._entry = entry
+      self._attr = attr
+
+    def _ids(self):
+      return getattr(self._entry, self._attr)
+
+    def __iter__(self):
+      entries = self._entry._entries
+      return (entries[i] for i in self._ids())
+
+    def __len__(self):
+      return len(self._ids())
+
+    def __contains__(self, entry):
+      return entry.id in self._ids()
+
+    def add(self, entry):
+      self.add_id(entry.id)
+
+    def add_id(self, entry_id):
+      ids = self._ids()
+      if entry_id in ids:
+        return
+      if type(ids) is set:
+        ids.add(entry_id)
+      elif len(ids) < CompactProductGraph.MAX_ARRAY_ADJACENCIES:
+        ids.append(entry_id)
+      else:
+        ids = set(ids)
+        ids.add(entry_id)
+        setattr(self._entry, self._attr, ids)
+
+    def discard(self, entry):
+      ids = self._ids()
+      if type(ids) is set:
+        ids.discard(entry.id)
+      elif entry.id in ids:
+        ids.remove(entry.id)
+
+  class Entry(object):
+    """An entry representing a Node in the CompactProductGraph: see `ProductGraph.Entry`."""
+    __slots__ = ('id', 'order', 'node', 'state', 'dirty', 'previous_state', 'changed_at',
+                 'verified_at', '_entries', '_dependency_ids', '_dependent_ids',
+                 '_cyclic_dependencies')
+
+    def __init__(self, node, revision, entry_id, order, entries):
+      self.id = entry_id
+      # The position of this entry in a topological order of the graph: every entry precedes its
+      # dependencies.
+      self.order = order
+      self.node = node
+      self.state = None
+      self.dirty = False
+      self.previous_state = None
+      self.changed_at = revision
+      self.verified_at = revision
+      # The graph's list of entries by id, with which to resolve adjacent ids.
+      self._entries = entries
+      self._dependency_ids = array(b'i')
+      self._dependent_ids = array(b'i')
+      # Cycles are rare: the set is only allocated when one is introduced.
+      self._cyclic_dependencies = None
+
+    @property
+    def dependencies(self):
+      return CompactProductGraph.Adjacencies(self, '_dependency_ids')
+
+    @dependencies.setter
+    def dependencies(self, entries):
+      self._dependency_ids = CompactProductGraph._adjacency_ids(e.id for e in entries)
+
+    @property
+    def dependents(self):
+      return CompactProductGraph.Adjacencies(self, '_dependent_ids')
+
+    @dependents.setter
+    def dependents(self, entries):
+      self._dependent_ids = CompactProductGraph._adjacency_ids(e.id for e in entries)
+
+    @property
+    def cyclic_dependencies(self):
+      return self._cyclic_dependencies or frozenset()
+
+    @cyclic_dependencies.setter
+    def cyclic_dependencies(self, nodes):
+      self._cyclic_dependencies = set(nodes) or None
+
+    is_complete = ProductGraph.Entry.__dict__['is_complete']
+    structure = ProductGraph.Entry.__dict__['structure']
+
+  def __init__(self, validator=None):
+    super(CompactProductGraph, self).__init__(validator=validator)
+    # A list of entries by id, with None for the ids of deleted entries (which are reused).
+    self._entries = []
+    self._free_ids = []
+    self._next_order = 0
+
+  def ensure_entry(self, node):
+    """Returns the Entry for the given Node, creating it if it does not already exist."""
+    entry = self._nodes.get(node, None)
+    if not entry:
+      self._validator(node)
+      entry_id = self._free_ids.pop() if self._free_ids else len(self._entries)
+      # A new entry has no edges, so it may go anywhere in the order: last is cheapest, because
+      # new entries are usually dependencies of existing ones.
+      entry = self.Entry(node, self._revision, entry_id, self._next_order, self._entries)
+      self._next_order += 1
+      if entry_id == len(self._entries):
+        self._entries.append(entry)
+      else:
+        self._entries[entry_id] = entry
+      self._nodes[node] = entry
+    return entry
+
+  def _delete_entry(self, entry):
+    super(CompactProductGraph, self)._delete_entry(entry)
+    self._entries[entry.id] = None
+    self._free_ids.append(entry.id)
+
+  def _add_dependencies(self, node_entry, dependencies):
+    for dependency in dependencies:
+      dependency_entry = self.ensure_entry(dependency)
+      if dependency_entry.id in node_entry._dependency_ids:
+        continue
+
+      if self._detect_cycle(node_entry, dependency_entry):
+        if node_entry._cyclic_dependencies is None:
+          node_entry._cyclic_dependencies = set()
+        node_entry._cyclic_dependencies.add(dependency)
+      else:
+        node_entry.dependencies.add_id(dependency_entry.id)
+        dependency_entry.dependents.add_id(node_entry.id)
+
+  def _detect_cycle(self, src, dest):
+    """Detect whether adding an edge from src to dest would create a cycle.
+
+    If it would not, the topological order is updated so that the edge may be added.
+
+    :param src: Source entry: must exist in the graph.
+    :param dest: Destination entry: must exist in the graph.
+
+    Returns True if a cycle would be created by adding an edge from src->dest.
+    """
+    lower, upper = dest.order, src.order
+    if lower > upper:
+      # The edge agrees with the order.
+      return False
+    if src is dest:
+      return True
+
+    # Find the entries between dest and src in the order that dest reaches: if src is among them,
+    # the edge would close a cycle.
+    forward = self._walk_region(dest, lambda e: e._dependency_ids, lambda o: o < upper,
+                                stop=src)
+    if forward is None:
+      return True
+    # And the entries between them that reach src.
+    backward = self._walk_region(src, lambda e: e._dependent_ids, lambda o: o > lower)
+
+    # Reassign the orders held by both regions so that all of the entries that reach src precede all
+    # of the entries that dest reaches, while preserving the relative order within each region.
+    backward.sort(key=lambda e: e.order)
+    forward.sort(key=lambda e: e.order)
+    affected = backward + forward
+    for entry, order in zip(affected, sorted(e.order for e in affected)):
+      entry.order = order
+    return False
+
+  def _walk_region(self, root, adjacent_ids, in_region, stop=None):
+    """Returns the entries reachable from root via adjacent_ids whose orders are in_region.
+
+    Returns None if the walk reaches the `stop` entry.
+    """
+    entries = self._entries
+    walked = {root.id}
+    region = [root]
+    stack = [root]
+    while stack:
+      entry = stack.pop()
+      for adjacent_id in adjacent_ids(entry):
+        if adjacent_id in walked:
+          continue
+        adjacent = entries[adjacent_id]
+        if adjacent is stop:
+          return None
+        if in_region(adjacent.order):
+          walked.add(adjacent_id)
+          region.append(adjacent)
+          stack.append(adjacent)
+    return region
+
+
 class ExecutionRequest(datatype('ExecutionRequest', ['roots'])):
   """Holds the roots for an execution, which might have been requested by a user.
 
@@ -391,21 +726,30 @@ class ExecutionRequest(datatype('ExecutionRequest', ['roots'])):
 class Promise(object):
   """An extremely simple _non-threadsafe_ Promise class."""
 
-  def __init__(self):
+  def __init__(self, on_complete=None):
+    """
+    :param on_complete: An optional function to call with no arguments once the Promise completes.
+    """
     self._success = None
     self._failure = None
     self._is_complete = False
+    self._on_complete = on_complete
 
   def is_complete(self):
     return self._is_complete
 
   def success(self, success):
     self._success = success
-    self._is_complete = True
+    self._complete()
 
   def failure(self, exception):
     self._failure = exception
+    self._complete()
+
+  def _complete(self):
     self._is_complete = True
+    if self._on_complete is not None:
+      self._on_complete()
 
   def get(self):
     """Returns the resulting value, or raises the resulting exception."""
@@ -441,7 +785,8 @@ class NodeBuilder(Closable):
         yield TaskNode(subject, product, variants, task, anded_clause)
 
 
-class StepRequest(datatype('Step', ['step_id', 'node', 'dependencies', 'inline_nodes', 'project_tree'])):
+class StepRequest(datatype('Step', ['step_id', 'node', 'dependencies', 'inline_nodes',
+                                   'project_tree'])):
   """Additional inputs needed to run Node.step for the given Node.
 
   TODO: Unclear why this has a ProjectTree reference; should be passed in by the Engine.
@@ -455,7 +800,8 @@ class StepRequest(datatype('Step', ['step_id', 'node', 'dependencies', 'inline_n
 
   def __call__(self, node_builder):
     """Called by the Engine in order to execute this Step."""
-    step_context = StepContext(node_builder, self.project_tree, self.dependencies, self.inline_nodes)
+    step_context = StepContext(node_builder, self.project_tree, self.dependencies,
+                               self.inline_nodes)
     state = self.node.step(step_context)
     return StepResult(state)
 
@@ -485,7 +831,8 @@ class LocalScheduler(object):
                project_tree,
                graph_lock=None,
                inline_nodes=True,
-               graph_validator=None):
+               graph_validator=None,
+               compact_graph=False):
     """
     :param goals: A dict from a goal name to a product type. A goal is just an alias for a
            particular (possibly synthetic) product.
@@ -499,6 +846,8 @@ class LocalScheduler(object):
                          execution history is not recorded in the ProductGraph.
     :param graph_validator: A validator that runs over the entire graph after every scheduling
                             attempt. Very expensive, very experimental.
+    :param compact_graph: Whether to use a CompactProductGraph, which is cheaper for very large
+                          graphs.
     """
     self._products_by_goal = goals
     self._tasks = tasks
@@ -506,7 +855,7 @@ class LocalScheduler(object):
     self._node_builder = NodeBuilder.create(self._tasks)
 
     self._graph_validator = graph_validator
-    self._product_graph = ProductGraph()
+    self._product_graph = CompactProductGraph() if compact_graph else ProductGraph()
     self._product_graph_lock = graph_lock or threading.RLock()
     self._inline_nodes = inline_nodes
     self._step_id = 0
@@ -522,11 +871,13 @@ class LocalScheduler(object):
         fh.write(line)
         fh.write('\n')
 
-  def _create_step(self, node_entry):
+  def _create_step(self, node_entry, on_complete=None):
     """Creates a Step and Promise with the currently available dependencies of the given Node.
 
     If the dependencies of a Node are not available, returns None.
 
+    :param on_complete: An optional function for the Promise to call once it completes.
+
     TODO: Content addressing node and its dependencies should only happen if node is cacheable
       or in a multi-process environment.
     """
@@ -549,7 +900,7 @@ class LocalScheduler(object):
                                deps,
                                self._inline_nodes,
                                self._project_tree)
-    return (step_request, Promise())
+    return (step_request, Promise(on_complete=on_complete))
 
   def node_builder(self):
     """Return the NodeBuilder instance for this Scheduler.
@@ -575,12 +926,12 @@ class LocalScheduler(object):
   def execution_request(self, products, subjects):
     """Create and return an ExecutionRequest for the given products and subjects.
 
-    The resulting ExecutionRequest object will contain keys tied to this scheduler's ProductGraph, and
-    so it will not be directly usable with other scheduler instances without being re-created.
+    The resulting ExecutionRequest object will contain keys tied to this scheduler's ProductGraph,
+    and so it will not be directly usable with other scheduler instances without being re-created.
 
-    An ExecutionRequest for an Address represents exactly one product output, as does SingleAddress. But
-    we differentiate between them here in order to normalize the output for all Spec objects
-    as "list of product".
+    An ExecutionRequest for an Address represents exactly one product output, as does
+    SingleAddress. But we differentiate between them here in order to normalize the output for all
+    Spec objects as "list of product".
 
     :param products: A list of product types to request for the roots.
     :type products: list of types
@@ -625,79 +976,57 @@ class LocalScheduler(object):
     # Update the Node's state in the graph.
     self._product_graph.update_state(node, result)
 
-  def invalidate_files(self, filenames):
+  def invalidate_files(self, filenames, incremental=False):
     """Calls `ProductGraph.invalidate_files()` against an internal ProductGraph instance
     under protection of a scheduler-level lock."""
+    stats = self._current_stats(filenames)
     with self._product_graph_lock:
-      return self._product_graph.invalidate_files(filenames)
+      return self._product_graph.invalidate_files(filenames, incremental=incremental, stats=stats)
 
-  def schedule(self, execution_request):
-    """Yields batches of Steps until the roots specified by the request have been completed.
+  def _current_stats(self, filenames):
+    """Returns a dict of the current Stat of each of the given filenames that can be determined.
+
+    The Stat of a filename is None if it does not exist (or is ignored). Each parent directory is
+    listed once.
+    """
+    stats = dict()
+    stats_by_parent = dict()
+    for filename in filenames:
+      parent = dirname(filename)
+      if parent not in stats_by_parent:
+        try:
+          stats_by_parent[parent] = {stat.path: stat
+                                     for stat in self._project_tree.scandir(parent)}
+        except ProjectTree.AccessIgnoredPathError:
+          stats_by_parent[parent] = dict()
+        except (IOError, OSError) as e:
+          stats_by_parent[parent] = dict() if e.errno == errno.ENOENT else None
+        except ValueError:
+          # A parent below a symlink can't be listed: its filenames' Stats are unknown.
+          stats_by_parent[parent] = None
+      if stats_by_parent[parent] is not None:
+        stats[filename] = stats_by_parent[parent].get(filename)
+    return stats
+
+  @contextmanager
+  def scheduling(self, execution_request):
+    """Holds the graph lock while yielding a Scheduling for the given ExecutionRequest.
 
     This method should be called by exactly one scheduling thread, but the Step objects returned
-    by this method are intended to be executed in multiple threads, and then satisfied by the
+    by the Scheduling are intended to be executed in multiple threads, and then satisfied by the
     scheduling thread.
-    """
 
+    :rtype: :class:`Scheduling`
+    """
     with self._product_graph_lock:
-      # A dict from Node entry to a possibly executing Step. Only one Step exists for a Node at a time.
-      outstanding = {}
-      # Node entries that might need to have Steps created (after any outstanding Step returns).
-      candidates = set(self._product_graph.ensure_entry(r) for r in execution_request.roots)
-
-      # Yield nodes that are ready, and then compute new ones.
-      scheduling_iterations = 0
       start_time = time.time()
-      while True:
-        # Create Steps for candidates that are ready to run, and not already running.
-        ready = dict()
-        for candidate in list(candidates):
-          if candidate in outstanding:
-            # Node is still a candidate, but is currently running.
-            continue
-          if candidate.is_complete:
-            # Node has already completed.
-            candidates.discard(candidate)
-            continue
-          # Create a step if all dependencies are available; otherwise, can assume they are
-          # outstanding, and will cause this Node to become a candidate again later.
-          candidate_step = self._create_step(candidate)
-          if candidate_step is not None:
-            ready[candidate] = candidate_step
-          candidates.discard(candidate)
-
-        if not ready and not outstanding:
-          # Finished.
-          break
-        yield ready.values()
-        scheduling_iterations += 1
-        outstanding.update(ready)
-
-        # Finalize completed Steps.
-        for node_entry, value in outstanding.items()[:]:
-          step, promise = value
-          if not promise.is_complete():
-            continue
-          # The step has completed; see whether the Node is completed.
-          outstanding.pop(node_entry)
-          self._complete_step(step.node, promise.get())
-          if node_entry.is_complete:
-            # The Node is completed: mark any of its dependents as candidates for Steps.
-            candidates.update(d for d in node_entry.dependents)
-          else:
-            # Waiting on dependencies.
-            incomplete_deps = [d for d in node_entry.dependencies if not d.is_complete]
-            if incomplete_deps:
-              # Mark incomplete deps as candidates for Steps.
-              candidates.update(incomplete_deps)
-            else:
-              # All deps are already completed: mark this Node as a candidate for another step.
-              candidates.add(node_entry)
+      scheduling = Scheduling(self, execution_request)
+      yield scheduling
 
       logger.debug(
         'ran %s scheduling iterations in %f seconds. '
         'there have been %s total steps for %s total nodes.',
-        scheduling_iterations,
+        scheduling.iterations,
         time.time() - start_time,
         self._step_id,
         len(self._product_graph)
@@ -705,3 +1034,141 @@ class LocalScheduler(object):
 
       if self._graph_validator is not None:
         self._graph_validator.validate(self._product_graph)
+
+  def schedule(self, execution_request):
+    """Yields batches of Steps until the roots specified by the request have been completed.
+
+    Each batch holds the Steps that became ready once the Steps of the previous batches that had
+    completed were finalized. See `scheduling`.
+    """
+    with self.scheduling(execution_request) as scheduling:
+      while True:
+        ready = scheduling.next_steps()
+        if scheduling.is_finished:
+          break
+        yield ready
+
+
+class Scheduling(object):
+  """The progress of a LocalScheduler through one ExecutionRequest: see `LocalScheduler.scheduling`.
+
+  The Promise of each Step reports back to a completion queue. So rather than waiting for a batch
+  of Steps, callers may ask for the Steps that are ready after any number of completions: even
+  after each one.
+  """
+
+  def __init__(self, scheduler, execution_request):
+    self._scheduler = scheduler
+    # A dict from Node entry to a possibly executing Step. Only one Step exists for a Node at a
+    # time.
+    self._outstanding = {}
+    # Node entries that might need to have Steps created (after any outstanding Step returns).
+    self._candidates = set(scheduler.product_graph.ensure_entry(r)
+                           for r in execution_request.roots)
+    # Node entries that are waiting in this Scheduling for dependencies to complete. Only these are
+    # woken when a dependency completes: other incomplete dependents (such as the dirty roots of
+    # earlier requests) are left for the requests that need them.
+    self._waiting = set()
+    # Node entries whose Step has completed, but not yet been finalized.
+    self._completed = deque()
+    self._is_finished = False
+    self.iterations = 0
+
+  @property
+  def is_finished(self):
+    """Whether the roots of the ExecutionRequest are complete, as of the last `next_steps`."""
+    return self._is_finished
+
+  @property
+  def has_completions(self):
+    """Whether any Steps have completed since the last `next_steps`."""
+    return bool(self._completed)
+
+  @property
+  def outstanding_count(self):
+    """The number of Steps returned by `next_steps` that have yet to be finalized."""
+    return len(self._outstanding)
+
+  def next_steps(self):
+    """Finalizes the Steps that have completed, and returns the Steps that are now ready to run.
+
+    :returns: A list of (StepRequest, Promise) tuples.
+    """
+    self._finalize_completed()
+
+    # Create Steps for candidates that are ready to run, and not already running.
+    ready = dict()
+    to_visit = list(self._candidates)
+    while to_visit:
+      candidate = to_visit.pop()
+      if candidate in self._outstanding:
+        # Node is still a candidate, but is currently running.
+        continue
+      if candidate.dirty:
+        # Node might be stale: verify it once its dependencies are complete.
+        incomplete_deps = self._scheduler.product_graph.verify_entry(candidate)
+        if incomplete_deps:
+          self._candidates.discard(candidate)
+          self._waiting.add(candidate)
+          self._visit(incomplete_deps, to_visit)
+          continue
+        if candidate.is_complete:
+          # Node was clean: wake any dependents that were waiting for it.
+          self._visit(self._wake_dependents(candidate), to_visit)
+      if candidate.is_complete:
+        # Node has already completed.
+        self._candidates.discard(candidate)
+        continue
+      # Create a step if all dependencies are available; otherwise, can assume they are
+      # outstanding, and will cause this Node to become a candidate again later.
+      candidate_step = self._scheduler._create_step(
+        candidate, on_complete=functools.partial(self._completed.append, candidate))
+      if candidate_step is not None:
+        ready[candidate] = candidate_step
+      else:
+        self._waiting.add(candidate)
+        self._visit([d for d in candidate.dependencies if not d.is_complete], to_visit)
+      self._candidates.discard(candidate)
+
+    if not ready and not self._outstanding:
+      self._is_finished = True
+    else:
+      self.iterations += 1
+    self._outstanding.update(ready)
+    return ready.values()
+
+  def _visit(self, entries, to_visit):
+    """Marks the given entries as candidates, and adds the new ones to the `to_visit` list."""
+    for entry in entries:
+      if entry not in self._candidates:
+        self._candidates.add(entry)
+        to_visit.append(entry)
+
+  def _wake_dependents(self, entry):
+    """Returns the dependents of the given entry that were waiting for it in this Scheduling."""
+    woken = [d for d in entry.dependents if d in self._waiting]
+    self._waiting.difference_update(woken)
+    return woken
+
+  def _finalize_completed(self):
+    while self._completed:
+      node_entry = self._completed.popleft()
+      if node_entry not in self._outstanding:
+        # The Promise was completed more than once.
+        continue
+      step, promise = self._outstanding.pop(node_entry)
+      # The step has completed; see whether the Node is completed.
+      self._scheduler._complete_step(step.node, promise.get())
+      if node_entry.is_complete:
+        # The Node is completed: mark its waiting dependents as candidates for Steps.
+        self._candidates.update(self._wake_dependents(node_entry))
+      else:
+        # Waiting on dependencies.
+        incomplete_deps = [d for d in node_entry.dependencies if not d.is_complete]
+        if incomplete_deps:
+          # Mark incomplete deps as candidates for Steps.
+          self._waiting.add(node_entry)
+          self._candidates.update(incomplete_deps)
+        else:
+          # All deps are already completed: mark this Node as a candidate for another step.
+          self._candidates.add(node_entry)
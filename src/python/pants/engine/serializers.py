@@ -0,0 +1,407 @@
+# coding=utf-8
+# Copyright 2016 Pants project contributors (see CONTRIBUTORS.md).
+# Licensed under the Apache License, Version 2.0 (see LICENSE).
+
+from __future__ import (absolute_import, division, generators, nested_scopes, print_function,
+                        unicode_literals, with_statement)
+
+import cPickle as pickle
+import cStringIO as StringIO
+import sys
+from abc import abstractmethod
+from contextlib import closing
+from struct import Struct as StdlibStruct
+
+import six
+
+from pants.engine.objects import SerializationError
+from pants.util.meta import AbstractClass
+
+
+class Serializer(AbstractClass):
+  """Converts objects to and from the blobs that engine Storage holds.
+
+  Storage addresses content by the digest of its blob, so a Serializer must be deterministic: equal
+  objects of the same type should serialize to the same blob.
+  """
+
+  @abstractmethod
+  def dumps_many(self, objs):
+    """Returns a list of the serialized blobs of the given objects.
+
+    :raises: :class:`pants.engine.objects.SerializationError` if an object can't be serialized.
+    """
+
+  @abstractmethod
+  def loads(self, value):
+    """Returns the object serialized in `value`, which is either a bytestring or file-like."""
+
+
+class PickleSerializer(Serializer):
+  """Serializes objects with pickle.
+
+  NB: pickle by default memoizes objects by id and pickle repeated objects by references,
+  for example, (A, A) uses less space than (A, A'), A and A' are equal but not identical.
+  For content addressability we need equality. Use `fast` mode to turn off memo.
+  Longer term see https://github.com/pantsbuild/pants/issues/2969
+  """
+
+  def __init__(self, protocol=None):
+    """
+    :param protocol: Serialization protocol for pickle, if not provided will use the highest one.
+    """
+    self.protocol = protocol if protocol is not None else pickle.HIGHEST_PROTOCOL
+
+  def dumps_many(self, objs):
+    blobs = []
+    with closing(StringIO.StringIO()) as buf:
+      pickler = pickle.Pickler(buf, protocol=self.protocol)
+      pickler.fast = 1
+      for obj in objs:
+        try:
+          buf.seek(0)
+          buf.truncate()
+          pickler.dump(obj)
+        except Exception as e:
+          # Unfortunately, pickle can raise things other than PickleError instances.  For example it
+          # will raise ValueError when handed a lambda; so we handle the otherwise overly-broad
+          # `Exception` type here.
+          raise SerializationError('Failed to pickle {}: {}'.format(obj, e), e)
+        blobs.append(buf.getvalue())
+    return blobs
+
+  def loads(self, value):
+    if isinstance(value, six.binary_type):
+      # Deserialize string values.
+      return pickle.loads(value)
+    # Deserialize values with file interface,
+    return pickle.load(value)
+
+
+_UINT32 = StdlibStruct(b'<I')
+_INT64 = StdlibStruct(b'<q')
+_FLOAT64 = StdlibStruct(b'<d')
+
+_INT64_MIN = -2 ** 63
+_INT64_MAX = 2 ** 63 - 1
+
+
+def _sized(short_tag, long_tag, size):
+  """Returns a tag for a value of the given size, followed by its size.
+
+  Sizes of up to 255 take one byte, and others four.
+  """
+  if size < 256:
+    return short_tag + chr(size)
+  return long_tag + _UINT32.pack(size)
+
+
+class TaggedSerializer(Serializer):
+  """Serializes objects with a compact, tagged binary encoding.
+
+  Each value is encoded as a one byte tag followed by its content. The builtin scalars and
+  containers, the `datatype`s (and other `namedtuple`s) that make up the bulk of engine requests
+  and results, and references to types are encoded natively; anything else is embedded as a
+  pickle. Unlike pickle's output, the encoding of dicts and sets is independent of their iteration
+  order.
+
+  Types are referenced by module and name, so that blobs can be shared with other processes. The
+  encoded reference of each type is computed once, and then reused.
+  """
+
+  def __init__(self, protocol=None):
+    """
+    :param protocol: The pickle protocol used for values that can't be encoded natively.
+    """
+    self._pickle = PickleSerializer(protocol)
+    # Maps types to the function that encodes their instances: populated lazily for types that are
+    # not builtins.
+    self._encoders = {
+      type(None): self._encode_none,
+      bool: self._encode_bool,
+      int: self._encode_int,
+      long: self._encode_long,
+      float: self._encode_float,
+      six.binary_type: self._encode_bytes,
+      six.text_type: self._encode_text,
+      tuple: self._encode_tuple,
+      list: self._encode_list,
+      dict: self._encode_dict,
+      set: self._encode_set,
+      frozenset: self._encode_frozenset,
+    }
+    self._decoders = {
+      b'N': self._decode_none,
+      b'T': self._decode_true,
+      b'F': self._decode_false,
+      b'i': self._decode_small_int,
+      b'I': self._decode_int,
+      b'L': self._decode_long,
+      b'f': self._decode_float,
+      b'b': self._decode_bytes,
+      b'B': self._decode_bytes,
+      b'u': self._decode_text,
+      b'U': self._decode_text,
+      b't': self._decode_tuple,
+      b'y': self._decode_tuple,
+      b'l': self._decode_list,
+      b'm': self._decode_list,
+      b'd': self._decode_dict,
+      b'e': self._decode_dict,
+      b's': self._decode_set,
+      b'S': self._decode_set,
+      b'z': self._decode_frozenset,
+      b'Z': self._decode_frozenset,
+      b'n': self._decode_namedtuple,
+      b'c': self._decode_type,
+      b'p': self._decode_pickle,
+      b'P': self._decode_pickle,
+    }
+    # Maps types to their encoded reference, and encoded references back to their types.
+    self._type_refs = {}
+    self._types = {}
+    # Maps namedtuple types to the encoded tag, type and size that precede their fields.
+    self._namedtuple_headers = {}
+
+  def dumps_many(self, objs):
+    blobs = []
+    for obj in objs:
+      out = []
+      self._encode(obj, out)
+      blobs.append(b''.join(out))
+    return blobs
+
+  def dumps(self, obj):
+    out = []
+    self._encode(obj, out)
+    return b''.join(out)
+
+  def loads(self, value):
+    if not isinstance(value, six.binary_type):
+      value = value.read()
+    try:
+      obj, pos = self._decode(value, 0)
+    except (IndexError, KeyError, ValueError) as e:
+      raise SerializationError('Failed to decode a blob: {!r}'.format(e), e)
+    if pos != len(value):
+      raise SerializationError('Failed to decode a blob: {} trailing bytes.'
+                               .format(len(value) - pos))
+    return obj
+
+  def _encode(self, obj, out):
+    obj_type = type(obj)
+    encoder = self._encoders.get(obj_type)
+    if encoder is None:
+      encoder = self._encoder_for(obj_type)
+    encoder(obj, out)
+
+  def _encoder_for(self, obj_type):
+    if (self._is_namedtuple(obj_type) and len(obj_type._fields) < 256 and
+        self._type_ref(obj_type) is not None):
+      self._namedtuple_headers[obj_type] = (b'n' + self._type_refs[obj_type] +
+                                            chr(len(obj_type._fields)))
+      encoder = self._encode_namedtuple
+    else:
+      encoder = self._encode_pickle
+    self._encoders[obj_type] = encoder
+    return encoder
+
+  @staticmethod
+  def _is_namedtuple(obj_type):
+    if not (issubclass(obj_type, tuple) and hasattr(obj_type, '_fields')):
+      return False
+    # Types that customize their pickling may hold more than their fields.
+    return not any(name in vars(cls)
+                   for cls in obj_type.__mro__ if cls not in (tuple, object)
+                   for name in ('__reduce__', '__reduce_ex__', '__setstate__'))
+
+  def _type_ref(self, obj_type):
+    """Returns the encoded reference of a type, or None if it can't be found by its name."""
+    type_ref = self._type_refs.get(obj_type)
+    if type_ref is None and obj_type not in self._type_refs:
+      module = sys.modules.get(obj_type.__module__)
+      if getattr(module, obj_type.__name__, None) is obj_type:
+        name = '{}:{}'.format(obj_type.__module__, obj_type.__name__).encode('utf-8')
+        type_ref = chr(len(name)) + name if len(name) < 256 else None
+      self._type_refs[obj_type] = type_ref
+      if type_ref is not None:
+        self._types[type_ref[1:]] = obj_type
+    return type_ref
+
+  def _encode_none(self, obj, out):
+    out.append(b'N')
+
+  def _encode_bool(self, obj, out):
+    out.append(b'T' if obj else b'F')
+
+  def _encode_int(self, obj, out):
+    if 0 <= obj < 256:
+      out.append(b'i' + chr(obj))
+    elif _INT64_MIN <= obj <= _INT64_MAX:
+      out.append(b'I' + _INT64.pack(obj))
+    else:
+      self._encode_long_digits(obj, out, b'I')
+
+  def _encode_long(self, obj, out):
+    self._encode_long_digits(obj, out, b'L')
+
+  def _encode_long_digits(self, obj, out, type_tag):
+    # Ints that don't fit in 64 bits (on platforms where that's possible) are encoded like longs,
+    # but keep their type.
+    out.append(b'L' + type_tag)
+    self._encode_bytes(str(obj).encode('ascii'), out)
+
+  def _encode_float(self, obj, out):
+    out.append(b'f' + _FLOAT64.pack(obj))
+
+  def _encode_bytes(self, obj, out):
+    out.append(_sized(b'b', b'B', len(obj)))
+    out.append(obj)
+
+  def _encode_text(self, obj, out):
+    data = obj.encode('utf-8')
+    out.append(_sized(b'u', b'U', len(data)))
+    out.append(data)
+
+  def _encode_tuple(self, obj, out):
+    out.append(_sized(b't', b'y', len(obj)))
+    encode = self._encode
+    for item in obj:
+      encode(item, out)
+
+  def _encode_list(self, obj, out):
+    out.append(_sized(b'l', b'm', len(obj)))
+    encode = self._encode
+    for item in obj:
+      encode(item, out)
+
+  def _encode_unordered(self, encoded_items, short_tag, long_tag, out):
+    # Iteration order depends on the history of a dict or set, so the items are sorted by their
+    # encoding.
+    encoded_items.sort()
+    out.append(_sized(short_tag, long_tag, len(encoded_items)))
+    out.extend(encoded_items)
+
+  def _encode_dict(self, obj, out):
+    self._encode_unordered([self.dumps(k) + self.dumps(v) for k, v in obj.items()], b'd', b'e', out)
+
+  def _encode_set(self, obj, out):
+    self._encode_unordered([self.dumps(item) for item in obj], b's', b'S', out)
+
+  def _encode_frozenset(self, obj, out):
+    self._encode_unordered([self.dumps(item) for item in obj], b'z', b'Z', out)
+
+  def _encode_namedtuple(self, obj, out):
+    out.append(self._namedtuple_headers[type(obj)])
+    encode = self._encode
+    for item in obj:
+      encode(item, out)
+
+  def _encode_pickle(self, obj, out):
+    if isinstance(obj, type):
+      type_ref = self._type_ref(obj)
+      if type_ref is not None:
+        out.append(b'c' + type_ref)
+        return
+    blob = self._pickle.dumps_many([obj])[0]
+    out.append(_sized(b'p', b'P', len(blob)))
+    out.append(blob)
+
+  def _decode(self, data, pos):
+    return self._decoders[data[pos]](data, pos + 1)
+
+  def _decode_size(self, data, pos):
+    """Decodes the size following the tag at `pos - 1`, by the case of the tag."""
+    if data[pos - 1] in b'butldszp':
+      return ord(data[pos]), pos + 1
+    return _UINT32.unpack_from(data, pos)[0], pos + 4
+
+  def _decode_none(self, data, pos):
+    return None, pos
+
+  def _decode_true(self, data, pos):
+    return True, pos
+
+  def _decode_false(self, data, pos):
+    return False, pos
+
+  def _decode_small_int(self, data, pos):
+    return ord(data[pos]), pos + 1
+
+  def _decode_int(self, data, pos):
+    return _INT64.unpack_from(data, pos)[0], pos + 8
+
+  def _decode_long(self, data, pos):
+    type_tag = data[pos]
+    digits, pos = self._decode(data, pos + 1)
+    value = long(digits)
+    return (int(value) if type_tag == b'I' else value), pos
+
+  def _decode_float(self, data, pos):
+    return _FLOAT64.unpack_from(data, pos)[0], pos + 8
+
+  def _decode_bytes(self, data, pos):
+    size, pos = self._decode_size(data, pos)
+    return data[pos:pos + size], pos + size
+
+  def _decode_text(self, data, pos):
+    size, pos = self._decode_size(data, pos)
+    return data[pos:pos + size].decode('utf-8'), pos + size
+
+  def _decode_items(self, data, pos, count):
+    items = []
+    decode = self._decode
+    for _ in range(count):
+      item, pos = decode(data, pos)
+      items.append(item)
+    return items, pos
+
+  def _decode_tuple(self, data, pos):
+    count, pos = self._decode_size(data, pos)
+    items, pos = self._decode_items(data, pos, count)
+    return tuple(items), pos
+
+  def _decode_list(self, data, pos):
+    count, pos = self._decode_size(data, pos)
+    return self._decode_items(data, pos, count)
+
+  def _decode_dict(self, data, pos):
+    count, pos = self._decode_size(data, pos)
+    items, pos = self._decode_items(data, pos, count * 2)
+    return dict(zip(items[::2], items[1::2])), pos
+
+  def _decode_set(self, data, pos):
+    count, pos = self._decode_size(data, pos)
+    items, pos = self._decode_items(data, pos, count)
+    return set(items), pos
+
+  def _decode_frozenset(self, data, pos):
+    count, pos = self._decode_size(data, pos)
+    items, pos = self._decode_items(data, pos, count)
+    return frozenset(items), pos
+
+  def _decode_type_ref(self, data, pos):
+    size = ord(data[pos])
+    start = pos + 1
+    name = data[start:start + size]
+    obj_type = self._types.get(name)
+    if obj_type is None:
+      module_name, _, type_name = name.decode('utf-8').partition(':')
+      __import__(module_name)
+      obj_type = getattr(sys.modules[module_name], type_name)
+      self._types[name] = obj_type
+    return obj_type, start + size
+
+  def _decode_namedtuple(self, data, pos):
+    obj_type, pos = self._decode_type_ref(data, pos)
+    count = ord(data[pos])
+    items, pos = self._decode_items(data, pos + 1, count)
+    # Like pickle, this restores the fields without calling any custom constructor.
+    return tuple.__new__(obj_type, items), pos
+
+  def _decode_type(self, data, pos):
+    return self._decode_type_ref(data, pos)
+
+  def _decode_pickle(self, data, pos):
+    size, pos = self._decode_size(data, pos)
+    return self._pickle.loads(data[pos:pos + size]), pos + size
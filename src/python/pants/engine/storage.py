@@ -7,30 +7,27 @@ from __future__ import (absolute_import, division, generators, nested_scopes, pr
 
 import cPickle as pickle
 import cStringIO as StringIO
+import logging
+import os
 import sys
+import zlib
 from abc import abstractmethod
 from binascii import hexlify
-from collections import Counter
-from contextlib import closing
+from collections import Counter, OrderedDict
 from functools import total_ordering
 from hashlib import sha1
-from struct import Struct as StdlibStruct
 
 import lmdb
 import six
 
-from pants.engine.objects import Closable, SerializationError
+from pants.engine.objects import Closable
 from pants.engine.scheduler import StepRequest, StepResult
-from pants.util.dirutil import safe_mkdtemp
+from pants.engine.serializers import PickleSerializer, TaggedSerializer
+from pants.util.dirutil import safe_mkdtemp, safe_rmtree
 from pants.util.meta import AbstractClass
 
 
-def _unpickle(value):
-  if isinstance(value, six.binary_type):
-    # Deserialize string values.
-    return pickle.loads(value)
-  # Deserialize values with file interface,
-  return pickle.load(value)
+logger = logging.getLogger(__name__)
 
 
 def _identity(value):
@@ -41,11 +38,16 @@ def _copy_bytes(value):
   return bytes(value)
 
 
+def _sha1_digest(blob):
+  return sha1(blob).digest()
+
+
 @total_ordering
 class Key(object):
   """Holds the digest for the object, which uniquely identifies it.
 
-  The `_hash` is a memoized 32 bit integer hashcode computed from the digest.
+  The `_hash` is a memoized 32 bit integer hashcode computed from the digest. Keys are pickled
+  into persistent stores, so it must not depend on the interpreter (as `hash` of a string does).
 
   The `string` field holds the string representation of the object, but is optional (usually only
   used when debugging is enabled).
@@ -55,30 +57,34 @@ class Key(object):
 
   __slots__ = ['_digest', '_type', '_hash', '_string']
 
-  # The digest implementation used for Keys.
-  _DIGEST_IMPL = sha1
-  _DIGEST_SIZE = _DIGEST_IMPL().digest_size
-
-  # A struct.Struct definition for grabbing the first 4 bytes off of a digest of
-  # size DIGEST_SIZE, and discarding the rest.
-  _32_BIT_STRUCT = StdlibStruct(b'<l' + (b'x' * (_DIGEST_SIZE - 4)))
+  # The functions that compute the digest of a blob, by name.
+  #
+  # The 'identity' digest is the blob itself: it skips hashing altogether, at the expense of
+  # larger keys. It is only suitable for stores that keep their contents in memory.
+  DIGESTS = {
+    'sha1': _sha1_digest,
+    'identity': _copy_bytes,
+  }
 
   @classmethod
-  def create(cls, blob, type_, string=None):
+  def create(cls, blob, type_, string=None, digest_fn=_sha1_digest):
     """Given a blob, hash it to construct a Key.
 
     :param blob: Binary content to hash.
     :param type_: Type of the object to be hashed.
     :param string: An optional human-readable representation of the blob for debugging purposes.
+    :param digest_fn: The function to compute the digest of the blob with: one of `DIGESTS`.
     """
-    digest = cls._DIGEST_IMPL(blob).digest()
+    digest = digest_fn(blob)
     hash_ = cls.compute_hash_from_digest(digest)
     return cls(digest, hash_, type_, string)
 
   @classmethod
   def compute_hash_from_digest(cls, digest):
-    """Extract 32 bit hash from digest."""
-    return cls._32_BIT_STRUCT.unpack(digest)[0]
+    """Compute the hash of a Key from its digest, of whatever kind."""
+    # Unlike the first bytes of a sha1, those of an identity digest (often a pickle header) are not
+    # well distributed, so the whole digest is checksummed.
+    return zlib.crc32(digest)
 
   def __init__(self, digest, hash_, type_, string):
     """Not for direct use: construct a Key via `create` instead."""
@@ -121,6 +127,10 @@ class InvalidKeyError(Exception):
   """Indicate an invalid `Key` entry"""
 
 
+class StorageFullError(Exception):
+  """Indicate that a size-bounded store has no room left for a write."""
+
+
 class Storage(Closable):
   """Stores and creates unique keys for input Serializable objects.
 
@@ -138,22 +148,44 @@ class Storage(Closable):
 
   LMDB_KEY_MAPPINGS_DB_NAME = b'_key_mappings_'
 
+  # The serializers that Storage can be created with, by name.
+  SERIALIZERS = {
+    'pickle': PickleSerializer,
+    'tagged': TaggedSerializer,
+  }
+
   @classmethod
-  def create(cls, path=None, in_memory=True, debug=True, protocol=None):
+  def create(cls, path=None, in_memory=True, debug=True, protocol=None, serializer='pickle',
+             digest='sha1', max_size=None):
     """Create a content addressable Storage backed by a key value store.
 
     :param path: If in_memory=False, the path to store the database in.
     :param in_memory: Indicate whether to use the in-memory kvs or an embeded database.
+    :param max_size: If in_memory=False, an optional bound on the size of the database in bytes:
+      see `Lmdb.create`.
     :param debug: A flag to store debug information in the key.
-    :param protocol: Serialization protocol for pickle, if not provided will use ASCII protocol.
+    :param protocol: Serialization protocol for pickle, if not provided will use the highest one.
+    :param serializer: The name of the serializer for contents: one of `SERIALIZERS`.
+    :param digest: The name of the digest for keys: one of `Key.DIGESTS`. The 'identity' digest
+      requires in_memory=True.
     """
+    if serializer not in cls.SERIALIZERS:
+      raise ValueError('Unknown serializer {!r}: expected one of {}'
+                       .format(serializer, sorted(cls.SERIALIZERS)))
+    if digest not in Key.DIGESTS:
+      raise ValueError('Unknown digest {!r}: expected one of {}'.format(digest, sorted(Key.DIGESTS)))
+
     if in_memory:
       content, key_mappings = InMemoryDb(), InMemoryDb()
     else:
+      if digest == 'identity':
+        raise ValueError('The identity digest is only supported by in-memory Storage.')
       content, key_mappings = Lmdb.create(path=path,
-                                          child_databases=[cls.LMDB_KEY_MAPPINGS_DB_NAME])
+                                          child_databases=[cls.LMDB_KEY_MAPPINGS_DB_NAME],
+                                          max_size=max_size)
 
-    return Storage(content, key_mappings, debug=debug, protocol=protocol)
+    return Storage(content, key_mappings, debug=debug, protocol=protocol,
+                   serializer=cls.SERIALIZERS[serializer](protocol), digest=digest)
 
   @classmethod
   def clone(cls, storage):
@@ -161,53 +193,53 @@ class Storage(Closable):
     if isinstance(storage._contents, InMemoryDb):
       contents, key_mappings = storage._contents, storage._key_mappings
     else:
-      contents, key_mappings = Lmdb.create(path=storage._contents.path,
-                                           child_databases=[cls.LMDB_KEY_MAPPINGS_DB_NAME])
+      contents, key_mappings = Lmdb.open(path=storage._contents.path,
+                                         child_databases=[cls.LMDB_KEY_MAPPINGS_DB_NAME],
+                                         map_size=storage._contents.map_size)
 
-    return Storage(contents, key_mappings, debug=storage._debug, protocol=storage._protocol)
+    return Storage(contents, key_mappings, debug=storage._debug, protocol=storage._protocol,
+                   serializer=type(storage._serializer)(storage._protocol), digest=storage._digest)
 
-  def __init__(self, contents, key_mappings, debug=True, protocol=None):
+  def __init__(self, contents, key_mappings, debug=True, protocol=None, serializer=None,
+               digest='sha1'):
     """Not for direct use: construct a Storage via either `create` or `clone`."""
     self._contents = contents
     self._key_mappings = key_mappings
     self._debug = debug
     self._protocol = protocol if protocol is not None else pickle.HIGHEST_PROTOCOL
+    self._serializer = serializer or PickleSerializer(self._protocol)
+    self._digest = digest
+    self._digest_fn = Key.DIGESTS[digest]
 
   def put(self, obj):
-    """Serialize and hash a Serializable, returning a unique key to retrieve it later.
-
-    NB: pickle by default memoizes objects by id and pickle repeated objects by references,
-    for example, (A, A) uses less space than (A, A'), A and A' are equal but not identical.
-    For content addressability we need equality. Use `fast` mode to turn off memo.
-    Longer term see https://github.com/pantsbuild/pants/issues/2969
-    """
-    try:
-      with closing(StringIO.StringIO()) as buf:
-        pickler = pickle.Pickler(buf, protocol=self._protocol)
-        pickler.fast = 1
-        pickler.dump(obj)
-        blob = buf.getvalue()
-        # Hash the blob and store it if it does not exist.
-        key = Key.create(blob, type(obj), str(obj) if self._debug else None)
-
-        self._contents.put(key.digest, blob)
-    except Exception as e:
-      # Unfortunately, pickle can raise things other than PickleError instances.  For example it
-      # will raise ValueError when handed a lambda; so we handle the otherwise overly-broad
-      # `Exception` type here.
-      raise SerializationError('Failed to pickle {}: {}'.format(obj, e), e)
-
-    return key
+    """Serialize and hash a Serializable, returning a unique key to retrieve it later."""
+    return self.puts([obj])[0]
 
   def puts(self, objs):
     """Save objects to storage in bulk.
 
+    All of the objects are serialized in one batch, and written in a single transaction of the
+    underlying store. An object repeated in `objs` is only serialized once, and each distinct blob
+    is only written once.
+
     Keys are returned as a list, ordering is preserved.
     """
-    keys = []
-    for obj in objs:
-      keys.append(self.put(obj))
-    return keys
+    objs = list(objs)
+    # NB: Objects are deduped by identity rather than by equality: equal objects may serialize
+    # differently, eg (1,) and (1.0,). `objs` keeps them alive, so their ids are not reused.
+    unique_objs = list(OrderedDict((id(obj), obj) for obj in objs).values())
+    blobs = self._serializer.dumps_many(unique_objs)
+
+    keys_by_id = {}
+    blobs_by_digest = OrderedDict()
+    for obj, blob in zip(unique_objs, blobs):
+      # Hash the blob, to be stored if it does not exist.
+      key = Key.create(blob, type(obj), str(obj) if self._debug else None, self._digest_fn)
+      keys_by_id[id(obj)] = key
+      blobs_by_digest.setdefault(key.digest, blob)
+
+    self._contents.put_many(blobs_by_digest.items())
+    return [keys_by_id[id(obj)] for obj in objs]
 
   def get(self, key):
     """Given a key, return its deserialized content.
@@ -218,9 +250,22 @@ class Storage(Closable):
     if not isinstance(key, Key):
       raise InvalidKeyError('Not a valid key: {}'.format(key))
 
-    value = self._contents.get(key.digest, _unpickle)
+    value = self._contents.get(key.digest, self._serializer.loads)
     return self._assert_type_matches(value, key.type)
 
+  def gets(self, keys):
+    """Given many keys, return their deserialized contents, reading them in a single transaction.
+
+    Values are returned as a list, ordering is preserved.
+    """
+    keys = list(keys)
+    for key in keys:
+      if not isinstance(key, Key):
+        raise InvalidKeyError('Not a valid key: {}'.format(key))
+
+    values = self._contents.get_many([key.digest for key in keys], self._serializer.loads)
+    return [self._assert_type_matches(value, key.type) for key, value in zip(keys, values)]
+
   def add_mapping(self, from_key, to_key):
     """Establish one to one relationship from one Key to another Key.
 
@@ -266,9 +311,7 @@ class Storage(Closable):
 
     TODO: It is supremely odd that this creates a StepRequest.
     """
-    dependencies = {}
-    for dep, state in step_request.dependencies.items():
-      dependencies[self._to_key(dep)] = self._to_key(state)
+    dependencies = self._translate_dependencies(step_request.dependencies, self._to_keys)
     return StepRequest(step_request.step_id,
                        step_request.node,
                        dependencies,
@@ -284,10 +327,7 @@ class Storage(Closable):
 
     TODO: It is supremely odd that this creates a StepRequest.
     """
-    dependencies = {}
-    for dep, state in step_request.dependencies.items():
-      dependencies[self._from_key(dep)] = self._from_key(state)
-
+    dependencies = self._translate_dependencies(step_request.dependencies, self._from_keys)
     return StepRequest(step_request.step_id,
                        step_request.node,
                        dependencies,
@@ -298,15 +338,28 @@ class Storage(Closable):
     """Resolve state key in step_result."""
     return StepResult(state=self._from_key(step_result.state))
 
+  def _translate_dependencies(self, dependencies, translate):
+    """Translates the nodes and states of a dependencies dict with one bulk call to `translate`."""
+    items = list(dependencies.items())
+    translated = translate([dep for dep, _ in items] + [state for _, state in items])
+    return dict(zip(translated[:len(items)], translated[len(items):]))
+
   def _to_key(self, obj):
-    if isinstance(obj, Key):
-      return obj
-    return self.put(obj)
+    return self._to_keys([obj])[0]
+
+  def _to_keys(self, objs):
+    """Returns a key for each object, storing those that are not already keys in bulk."""
+    unkeyed = [obj for obj in objs if not isinstance(obj, Key)]
+    keys = iter(self.puts(unkeyed))
+    return [obj if isinstance(obj, Key) else next(keys) for obj in objs]
 
   def _from_key(self, obj):
-    if isinstance(obj, Key):
-      return self.get(obj)
-    return obj
+    return self._from_keys([obj])[0]
+
+  def _from_keys(self, objs):
+    """Returns the object for each key, resolving keys in bulk and passing through non-keys."""
+    values = iter(self.gets([obj for obj in objs if isinstance(obj, Key)]))
+    return [next(values) if isinstance(obj, Key) else obj for obj in objs]
 
 
 class Cache(Closable):
@@ -345,8 +398,7 @@ class Cache(Closable):
 
   def put(self, step_request, step_result):
     """Save the StepResult for a given StepResult."""
-    request_key = self._storage.put(self._keyable_fields(step_request))
-    result_key = self._storage.put(step_result)
+    request_key, result_key = self._storage.puts([self._keyable_fields(step_request), step_result])
     return self._storage.add_mapping(from_key=request_key, to_key=result_key)
 
   def get_stats(self):
@@ -437,6 +489,24 @@ class KeyValueStore(Closable, AbstractClass):
       repeated writes of the same key.
     """
 
+  def get_many(self, keys, transform=_identity):
+    """Fetch the values for many keys; by default one by one.
+
+    :param keys: keys in bytestrings.
+    :param transform: as for `get`.
+    :return: a list of values in the order of `keys`, with `None` for keys that do not exist.
+    """
+    return [self.get(key, transform) for key in keys]
+
+  def put_many(self, items, transform=_copy_bytes):
+    """Save many values, each under its key but only once; by default one by one.
+
+    :param items: (key, value) pairs of bytestrings.
+    :param transform: as for `put`.
+    :return: the number of values actually written.
+    """
+    return sum(1 for key, value in items if self.put(key, value, transform))
+
   @abstractmethod
   def items(self):
     """Generator to iterate over items.
@@ -480,25 +550,53 @@ class Lmdb(KeyValueStore):
   USE_SPARSE_FILES = sys.platform != 'darwin'
 
   @classmethod
-  def create(self, path=None, child_databases=None):
+  def create(cls, path=None, child_databases=None, max_size=None):
     """
     :param path: Database directory location, if `None` a temporary location will be provided
       and cleaned up upon process exit.
     :param child_databases: Optional child database names.
+    :param max_size: Optional size in bytes that the database is bounded by. An existing database
+      that has grown beyond `max_size` is emptied before it is opened. Since it is only checked
+      then, the database may grow to twice `max_size`, after which writes fail with a
+      `StorageFullError`.
     :return: List of Lmdb databases, main database under the path is always created,
      plus the child databases requested.
     """
     path = path if path is not None else safe_mkdtemp()
+    if max_size is None:
+      map_size = cls.MAX_DATABASE_SIZE
+    else:
+      map_size = 2 * max_size
+      if cls._size_on_disk(path) > max_size:
+        logger.debug('Emptying {}, which has grown beyond {} bytes.'.format(path, max_size))
+        safe_rmtree(path)
+    return cls.open(path, child_databases=child_databases, map_size=map_size)
+
+  @classmethod
+  def open(cls, path, child_databases=None, map_size=None):
+    """Open the database under the given path, with no further checks: see `create`."""
     child_databases = child_databases or []
-    env = lmdb.open(path, map_size=self.MAX_DATABASE_SIZE,
+    env = lmdb.open(path, map_size=map_size or cls.MAX_DATABASE_SIZE,
                     metasync=False, sync=False, map_async=True,
-                    writemap=self.USE_SPARSE_FILES,
+                    writemap=cls.USE_SPARSE_FILES,
                     max_dbs=1+len(child_databases))
     instances = [Lmdb(env)]
     for child_db in child_databases:
       instances.append(Lmdb(env, env.open_db(child_db)))
     return tuple(instances)
 
+  @staticmethod
+  def _size_on_disk(path):
+    """Return the number of bytes of data in the database under path, or 0 if there is none."""
+    if not os.path.exists(os.path.join(path, 'data.mdb')):
+      return 0
+    env = lmdb.open(path, readonly=True, lock=False, max_dbs=0)
+    try:
+      # Pages up to the last one in use, including freed pages that have yet to be reused.
+      return (env.info()['last_pgno'] + 1) * env.stat()['psize']
+    finally:
+      env.close()
+
   def __init__(self, env, db=None):
     """Not for direct use, use factory method `create`.
 
@@ -511,6 +609,10 @@ class Lmdb(KeyValueStore):
   def path(self):
     return self._env.path()
 
+  @property
+  def map_size(self):
+    return self._env.info()['map_size']
+
   def get(self, key, transform=_identity):
     """Return the value or `None` if the key does not exist.
 
@@ -529,8 +631,31 @@ class Lmdb(KeyValueStore):
 
     No need to do additional transform since value is to be persisted.
     """
-    with self._env.begin(db=self._db, buffers=True, write=True) as txn:
-      return txn.put(key, transform(value), overwrite=False)
+    try:
+      with self._env.begin(db=self._db, buffers=True, write=True) as txn:
+        return txn.put(key, transform(value), overwrite=False)
+    except lmdb.MapFullError as e:
+      raise StorageFullError('No room for more values in {}: {}'.format(self.path, e))
+
+  def get_many(self, keys, transform=_identity):
+    """Return the values of many keys, read in a single transaction."""
+    with self._env.begin(db=self._db, buffers=True) as txn:
+      values = []
+      for key in keys:
+        value = txn.get(key)
+        values.append(None if value is None else transform(StringIO.StringIO(value)))
+      return values
+
+  def put_many(self, items, transform=_identity):
+    """Write many key/values in a single transaction, returning the number actually written."""
+    items = list(items)
+    if not items:
+      return 0
+    try:
+      with self._env.begin(db=self._db, buffers=True, write=True) as txn:
+        return sum(1 for key, value in items if txn.put(key, transform(value), overwrite=False))
+    except lmdb.MapFullError as e:
+      raise StorageFullError('No room for more values in {}: {}'.format(self.path, e))
 
   def items(self):
     with self._env.begin(db=self._db, buffers=True) as txn:
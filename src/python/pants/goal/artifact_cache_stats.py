@@ -25,6 +25,7 @@ class ArtifactCacheStats(object):
     def init_stat():
       return CacheStat([], [])
     self.stats_per_cache = defaultdict(init_stat)
+    self.store_stats_per_cache = {}
     self._dir = dir
     safe_mkdir(self._dir)
 
@@ -35,17 +36,24 @@ class ArtifactCacheStats(object):
   def add_misses(self, cache_name, targets, causes):
     self._add_stat(1, cache_name, targets, causes)
 
+  def add_store_stats(self, cache_name, store_stats):
+    """Records the latest size of the store backing a cache, as returned by its `store_stats`."""
+    self.store_stats_per_cache[cache_name] = store_stats
+
   def get_all(self):
     """Returns the cache stats as a list of dicts."""
     ret = []
     for cache_name, stat in self.stats_per_cache.items():
-      ret.append({
+      cache_stats = {
         'cache_name': cache_name,
         'num_hits': len(stat.hit_targets),
         'num_misses': len(stat.miss_targets),
         'hits': stat.hit_targets,
         'misses': stat.miss_targets
-      })
+      }
+      if cache_name in self.store_stats_per_cache:
+        cache_stats['store'] = self.store_stats_per_cache[cache_name]
+      ret.append(cache_stats)
     return ret
 
   # hit_or_miss is the appropriate index in CacheStat, i.e., 0 for hit, 1 for miss.
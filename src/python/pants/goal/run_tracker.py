@@ -20,6 +20,7 @@ from pants.base.build_environment import get_pants_cachedir
 from pants.base.run_info import RunInfo
 from pants.base.worker_pool import SubprocPool, WorkerPool
 from pants.base.workunit import WorkUnit
+from pants.cache.write_behind_queue import ArtifactWriteBehindQueue
 from pants.goal.aggregated_timings import AggregatedTimings
 from pants.goal.artifact_cache_stats import ArtifactCacheStats
 from pants.reporting.report import Report
@@ -74,6 +75,18 @@ class RunTracker(Subsystem):
              help='Number of threads for background work.')
     register('--stats-local-json-file', advanced=True, default=None,
              help='Write stats to this local json file on run completion.')
+    register('--num-artifact-upload-workers', advanced=True, type=int, default=4,
+             help='Number of threads for writing artifacts to artifact caches in the background. '
+                  'If 0, artifacts are written synchronously.')
+    register('--max-pending-artifact-uploads', advanced=True, type=int, default=256,
+             help='Number of artifact cache writes to queue before the work producing them '
+                  'waits for the queue to drain.')
+    register('--artifact-upload-attempts', advanced=True, type=int, default=3,
+             help='Number of times to try writing an artifact to an artifact cache.')
+    register('--artifact-upload-flush-timeout', advanced=True, type=float, default=300,
+             help='Wait at most this many seconds at the end of the run for queued artifact cache '
+                  'writes to start. Writes not yet started after this are abandoned, while those '
+                  'in progress are allowed to finish.')
 
   def __init__(self, *args, **kwargs):
     """
@@ -138,6 +151,13 @@ class RunTracker(Subsystem):
     self._background_worker_pool = None
     self._background_root_workunit = None
 
+    # For writes to artifact caches.  Created lazily if needed.
+    self._artifact_write_behind_queue = None
+    self._artifact_write_behind_queue_lock = threading.Lock()
+
+    # Functions that return further stats to store at the end of the run, by name.
+    self._stats_sources = {}
+
     # Trigger subproc pool init while our memory image is still clean (see SubprocPool docstring).
     SubprocPool.set_num_processes(self._num_foreground_workers)
     SubprocPool.foreground()
@@ -283,6 +303,14 @@ class RunTracker(Subsystem):
       return False
     return True
 
+  def register_stats(self, name, get_stats):
+    """Registers a function that returns stats to store under the given name at the end of the run.
+
+    :param string name: The key of the stats.
+    :param function get_stats: A function of no arguments that returns json-serializable stats.
+    """
+    self._stats_sources[name] = get_stats
+
   def store_stats(self):
     """Store stats about this run in local and optionally remote stats dbs."""
     stats = {
@@ -292,6 +320,10 @@ class RunTracker(Subsystem):
       'artifact_cache_stats': self.artifact_cache_stats.get_all(),
       'outcomes': self.outcomes
     }
+    if self._artifact_write_behind_queue:
+      stats['artifact_cache_uploads'] = self._artifact_write_behind_queue.get_stats()
+    for name, get_stats in self._stats_sources.items():
+      stats[name] = get_stats()
     # Dump individual stat file.
     # TODO(benjy): Do we really need these, once the statsdb is mature?
     stats_file = os.path.join(get_pants_cachedir(), 'stats',
@@ -327,6 +359,15 @@ class RunTracker(Subsystem):
         self._background_worker_pool.shutdown()
       self.end_workunit(self._background_root_workunit)
 
+    if self._artifact_write_behind_queue:
+      # Background work may have queued writes, so we flush after it is done.
+      self.log(Report.INFO, "Waiting for artifact cache writes to finish.")
+      abandoned = self._artifact_write_behind_queue.flush(
+        timeout_secs=0 if self._aborted else self.get_options().artifact_upload_flush_timeout)
+      if abandoned:
+        self.log(Report.WARN, "Abandoned {} artifact cache writes that had not started."
+                 .format(abandoned))
+
     self.shutdown_worker_pool()
 
     # Run a dummy work unit to write out one last timestamp.
@@ -375,6 +416,20 @@ class RunTracker(Subsystem):
                                                 num_workers=self._num_background_workers)
     return self._background_worker_pool
 
+  def artifact_write_behind_queue(self):
+    """Returns the queue that artifacts are written to artifact caches through.
+
+    :API: public
+    """
+    with self._artifact_write_behind_queue_lock:
+      if self._artifact_write_behind_queue is None:  # Initialize lazily.
+        options = self.get_options()
+        self._artifact_write_behind_queue = ArtifactWriteBehindQueue(
+          num_workers=options.num_artifact_upload_workers,
+          max_pending=options.max_pending_artifact_uploads,
+          max_attempts=options.artifact_upload_attempts)
+      return self._artifact_write_behind_queue
+
   def shutdown_worker_pool(self):
     """Shuts down the SubprocPool.
 
@@ -13,7 +13,8 @@ from collections import namedtuple
 from pants.base.hash_utils import hash_all
 from pants.build_graph.target import Target
 from pants.fs.fs import safe_filename
-from pants.util.dirutil import safe_mkdir
+from pants.util.dirutil import safe_delete, safe_mkdir
+from pants.util.lmdbutil import encode_key, open_env
 
 
 # A CacheKey represents some version of a set of targets.
@@ -117,6 +118,14 @@ class BuildInvalidator(object):
     """
     return self._read_sha(cache_key) != cache_key.hash
 
+  def previous_keys(self, cache_keys):
+    """Batched form of `previous_key`.
+
+    :param cache_keys: A list of CacheKey objects.
+    :returns: A list of the previous cache_keys (or None) in the same order as `cache_keys`.
+    """
+    return [self.previous_key(cache_key) for cache_key in cache_keys]
+
   def update(self, cache_key):
     """Makes cache_key the valid version of the corresponding target set.
 
@@ -124,6 +133,14 @@ class BuildInvalidator(object):
     """
     self._write_sha(cache_key)
 
+  def update_all(self, cache_keys):
+    """Batched form of `update`.
+
+    :param cache_keys: A list of CacheKey objects.
+    """
+    for cache_key in cache_keys:
+      self.update(cache_key)
+
   def force_invalidate_all(self):
     """Force-invalidates all cached items."""
     safe_mkdir(self._root, clean=True)
@@ -157,3 +174,91 @@ class BuildInvalidator(object):
       if e.errno != errno.ENOENT:
         raise
       return None  # File doesn't exist.
+
+
+class IndexedBuildInvalidator(BuildInvalidator):
+  """A BuildInvalidator that keeps all of its records in a single lmdb index.
+
+  Where the `BuildInvalidator` reads and writes one `.hash` file per cache key id, this variant
+  stores every (id -> hash) record in one memory-mapped database under the same root, so that
+  batched reads and writes each cost a single transaction.
+
+  Any `.hash` files left behind by a `BuildInvalidator` under the same root are imported into
+  the index the first time it is opened.
+
+  The index is shared with every other IndexedBuildInvalidator under the same root in this process:
+  see `pants.util.lmdbutil.close_envs` to close it.
+  """
+
+  _INDEX_DIR_NAME = 'index'
+
+  def __init__(self, root):
+    super(IndexedBuildInvalidator, self).__init__(root)
+    self._env = open_env(os.path.join(self._root, self._INDEX_DIR_NAME))
+    self._import_sha_files()
+
+  def previous_keys(self, cache_keys):
+    with self._env.begin() as txn:
+      previous_hashes = [txn.get(encode_key(cache_key.id)) for cache_key in cache_keys]
+    return [CacheKey(cache_key.id, previous_hash) if previous_hash else None
+            for cache_key, previous_hash in zip(cache_keys, previous_hashes)]
+
+  def update_all(self, cache_keys):
+    with self._env.begin(write=True) as txn:
+      for cache_key in cache_keys:
+        txn.put(encode_key(cache_key.id), encode_key(cache_key.hash))
+
+  def force_invalidate_all(self):
+    with self._env.begin(write=True) as txn:
+      txn.drop(self._env.open_db(), delete=False)
+    self._remove_sha_files()
+
+  def force_invalidate(self, cache_key):
+    with self._env.begin(write=True) as txn:
+      txn.delete(encode_key(cache_key.id))
+
+  def _write_sha(self, cache_key):
+    self.update_all([cache_key])
+
+  def _read_sha_by_id(self, id):
+    with self._env.begin() as txn:
+      return txn.get(encode_key(id))
+
+  def _sha_file_names(self):
+    return [name for name in os.listdir(self._root) if name.endswith('.hash')]
+
+  def _import_sha_files(self):
+    """Moves any records stored as `.hash` files by a `BuildInvalidator` into the index."""
+    sha_file_names = self._sha_file_names()
+    if not sha_file_names:
+      return
+    with self._env.begin(write=True) as txn:
+      for sha_file_name in sha_file_names:
+        with open(os.path.join(self._root, sha_file_name), 'rb') as fd:
+          previous_hash = fd.read().strip()
+        # The file name is the `safe_filename` of the id, which is the id itself unless the id was
+        # too long to be a file name. Records for such ids are imported under their digest, and
+        # are never matched again: those targets are simply invalidated once.
+        id = sha_file_name[:-len('.hash')]
+        # Don't clobber a record that was written to the index after the file.
+        txn.put(encode_key(id), previous_hash, overwrite=False)
+    self._remove_sha_files()
+
+  def _remove_sha_files(self):
+    for sha_file_name in self._sha_file_names():
+      safe_delete(os.path.join(self._root, sha_file_name))
+
+
+BUILD_INVALIDATOR_BACKENDS = {
+  'files': BuildInvalidator,
+  'indexed': IndexedBuildInvalidator,
+}
+
+
+def create_build_invalidator(root, backend='files'):
+  """Creates a BuildInvalidator rooted at `root` using the named backend.
+
+  :param string root: The directory to store invalidation records under.
+  :param string backend: One of the keys of `BUILD_INVALIDATOR_BACKENDS`.
+  """
+  return BUILD_INVALIDATOR_BACKENDS[backend](root)
@@ -6,14 +6,15 @@ from __future__ import (absolute_import, division, generators, nested_scopes, pr
                         unicode_literals, with_statement)
 
 import os
-import shutil
 import sys
 from hashlib import sha1
 
 from pants.build_graph.build_graph import sort_targets
 from pants.build_graph.target import Target
-from pants.invalidation.build_invalidator import BuildInvalidator, CacheKeyGenerator
+from pants.invalidation.build_invalidator import CacheKeyGenerator, create_build_invalidator
+from pants.source.payload_fields import SourcesField
 from pants.util.dirutil import relative_symlink, safe_mkdir
+from pants.util.fileutil import clone_tree
 
 
 class VersionedTargetSet(object):
@@ -172,7 +173,8 @@ class VersionedTarget(VersionedTargetSet):
     """Ensures that a results_dir exists under the given root_dir for this versioned target.
 
     If incremental=True, attempts to clone the results_dir for the previous version of this target
-    to the new results dir. Otherwise, simply ensures that the results dir exists.
+    to the new results dir, using the cache manager's `results_dir_clone_strategy`. Otherwise,
+    simply ensures that the results dir exists.
     """
     # Generate unique and stable directory paths for this cache key.
     current_dir = self._results_dir_path(root_dir, self.cache_key, stable=False)
@@ -188,7 +190,8 @@ class VersionedTarget(VersionedTargetSet):
     if previous_dir is not None:
       self.is_incremental = True
       self._previous_results_dir = previous_dir
-      shutil.copytree(previous_dir, current_dir)
+      clone_tree(previous_dir, current_dir,
+                 strategy=self._cache_manager.results_dir_clone_strategy)
     else:
       safe_mkdir(current_dir)
 
@@ -248,7 +251,10 @@ class InvalidationCacheManager(object):
                invalidation_report=None,
                task_name=None,
                task_version=None,
-               artifact_write_callback=lambda _: None):
+               artifact_write_callback=lambda _: None,
+               build_invalidator_backend='files',
+               file_digest_cache=None,
+               results_dir_clone_strategy='reflink'):
     """
     :API: public
     """
@@ -256,22 +262,24 @@ class InvalidationCacheManager(object):
     self._task_name = task_name or 'UNKNOWN'
     self._task_version = task_version or 'Unknown_0'
     self._invalidate_dependents = invalidate_dependents
-    self._invalidator = BuildInvalidator(build_invalidator_dir)
+    self._invalidator = create_build_invalidator(build_invalidator_dir, build_invalidator_backend)
+    # Previous keys read in bulk by `wrap_targets`, consumed as its VersionedTargets are created.
+    self._prefetched_previous_keys = {}
     self._fingerprint_strategy = fingerprint_strategy
     self._artifact_write_callback = artifact_write_callback
+    self._file_digest_cache = file_digest_cache
+    self._results_dir_clone_strategy = results_dir_clone_strategy
     self.invalidation_report = invalidation_report
 
   def update(self, vts):
     """Mark a changed or invalidated VersionedTargetSet as successfully processed."""
-    for vt in vts.versioned_targets:
-      if not vt.valid:
-        self._invalidator.update(vt.cache_key)
-        vt.valid = True
-        self._artifact_write_callback(vt)
-    if not vts.valid:
-      self._invalidator.update(vts.cache_key)
-      vts.valid = True
-      self._artifact_write_callback(vts)
+    invalid_vts = [vt for vt in vts.versioned_targets if not vt.valid]
+    if not vts.valid and vts not in invalid_vts:
+      invalid_vts.append(vts)
+    self._invalidator.update_all([vt.cache_key for vt in invalid_vts])
+    for vt in invalid_vts:
+      vt.valid = True
+      self._artifact_write_callback(vt)
 
   def force_invalidate(self, vts):
     """Force invalidation of a VersionedTargetSet."""
@@ -305,6 +313,10 @@ class InvalidationCacheManager(object):
   def task_version(self):
     return self._task_version
 
+  @property
+  def results_dir_clone_strategy(self):
+    return self._results_dir_clone_strategy
+
   def wrap_targets(self, targets, topological_order=False):
     """Wrap targets and their computed cache keys in VersionedTargets.
 
@@ -313,7 +325,9 @@ class InvalidationCacheManager(object):
 
     Returns a list of VersionedTargets, each representing one input target.
     """
-    def vt_iter():
+    self._digest_sources(targets)
+
+    def keyed_targets():
       if topological_order:
         target_set = set(targets)
         sorted_targets = [t for t in reversed(sort_targets(targets)) if t in target_set]
@@ -322,10 +336,39 @@ class InvalidationCacheManager(object):
       for target in sorted_targets:
         target_key = self._key_for(target)
         if target_key is not None:
-          yield VersionedTarget(self, target, target_key)
-    return list(vt_iter())
+          yield target, target_key
+
+    targets_and_keys = list(keyed_targets())
+    # Read all previous keys in one batch rather than one at a time as each VersionedTarget is
+    # created.
+    cache_keys = [cache_key for _, cache_key in targets_and_keys]
+    self._prefetched_previous_keys = dict(zip(cache_keys,
+                                              self._invalidator.previous_keys(cache_keys)))
+    try:
+      return [VersionedTarget(self, target, cache_key) for target, cache_key in targets_and_keys]
+    finally:
+      self._prefetched_previous_keys = {}
+
+  def _digest_sources(self, targets):
+    """Digests the sources of all of the targets that will be fingerprinted in one batch.
+
+    Fingerprinting then finds each source's digest in the file digest cache, rather than reading
+    the sources serially, target by target.
+    """
+    if self._file_digest_cache is None:
+      return
+    if self._invalidate_dependents:
+      targets = Target.closure_for_targets(targets)
+    paths = []
+    for target in targets:
+      for _, field in target.payload.fields:
+        if isinstance(field, SourcesField):
+          paths.extend(field.unfingerprinted_paths())
+    self._file_digest_cache.digest_all(paths)
 
   def previous_key(self, cache_key):
+    if cache_key in self._prefetched_previous_keys:
+      return self._prefetched_previous_keys[cache_key]
     return self._invalidator.previous_key(cache_key)
 
   def _key_for(self, target):
@@ -13,6 +13,7 @@ from pants.base.build_environment import (get_buildroot, get_default_pants_confi
 from pants.option.arg_splitter import GLOBAL_SCOPE
 from pants.option.optionable import Optionable
 from pants.option.scope import ScopeInfo
+from pants.util.fileutil import CLONE_STRATEGIES
 
 
 class GlobalOptionsRegistrar(Optionable):
@@ -180,11 +181,48 @@ class GlobalOptionsRegistrar(Optionable):
              help='Ignore files that match the specified patterns. '
                   'Entries use the gitignore pattern syntax (https://git-scm.com/docs/gitignore). '
                   'This option is currently experimental.')
+    register('--build-file-code-cache', advanced=True, type=bool, default=True,
+             help='Persist the compiled code of BUILD files under the workdir, so that later runs '
+                  'only compile the BUILD files that changed.')
+    register('--build-file-parse-processes', advanced=True, type=int, default=0,
+             help='The number of processes to parse BUILD files with when scanning for addresses '
+                  '(e.g. for `::` specs). If 0 or 1, BUILD files are parsed serially.')
+    register('--build-file-snapshot', advanced=True, type=bool, default=False,
+             help='Persist the targets parsed from BUILD files under the workdir, so that later '
+                  'runs only parse the BUILD files that changed. BUILD files whose targets are '
+                  'loaded from the snapshot are not executed, so this should not be enabled for '
+                  'repos whose BUILD files have side effects. Only the files that BUILD files '
+                  'open (with open or io.open) are tracked: BUILD files whose targets depend on '
+                  'os.path.exists, os.listdir, glob.glob, os.environ or the like are not reparsed '
+                  'when those change, so this should not be enabled for those repos either.')
+    register('--engine-cache', advanced=True, type=bool, default=False,
+             help='Persist the results of the v2 engine under the workdir, for reuse by later '
+                  'runs. (Beta)')
+    register('--engine-cache-max-size', advanced=True, type=int, default=1024 * 1024 * 1024,
+             metavar='<bytes>',
+             help='The size past which the persistent v2 engine cache is emptied at the start of '
+                  'a run. The cache may grow to twice this size during a run.')
+    register('--engine-io-pool-size', advanced=True, type=int, default=0,
+             help='The number of threads that the v2 engine uses for filesystem operations. '
+                  'If 0, uses 2 threads per core.')
+    register('--engine-io-batch-size', advanced=True, type=int, default=16,
+             help='The maximum number of filesystem operations on files in the same directory '
+                  'that the v2 engine runs together in one of its I/O threads.')
     register('--fail-fast', advanced=True, type=bool, recursive=True,
              help='Exit as quickly as possible on error, rather than attempting to continue '
                   'to process the non-erroneous subset of the input.')
     register('--cache-key-gen-version', advanced=True, default='200', recursive=True,
              help='The cache key generation. Bump this to invalidate every artifact for a scope.')
+    register('--build-invalidator-backend', advanced=True, choices=['files', 'indexed'],
+             default='files',
+             help="How tasks record which versions of their targets are valid. 'files' stores one "
+                  "file per target, 'indexed' stores all of a task's records in a single lmdb "
+                  "index, importing any existing per-target files on first use.")
+    register('--results-dir-clone-strategy', advanced=True, choices=CLONE_STRATEGIES,
+             default='reflink',
+             help="How incremental tasks clone the results of a target's previous build. 'reflink' "
+                  "shares file blocks copy-on-write on filesystems that support it (btrfs, xfs, "
+                  "...), and copies elsewhere. 'copy' always copies.")
     register('--workdir-max-build-entries', advanced=True, type=int, default=None,
              help='Maximum number of previous builds to keep per task target pair in workdir. '
              'If set, minimum 2 will always be kept to support incremental compilation.')
@@ -19,18 +19,21 @@ class SchedulerService(PantsService):
   in memory.
   """
 
-  def __init__(self, fs_event_service, legacy_graph_helper):
+  def __init__(self, fs_event_service, legacy_graph_helper, incremental=False):
     """
     :param FSEventService fs_event_service: An unstarted FSEventService instance for setting up
                                             filesystem event handlers.
     :param LegacyGraphHelper legacy_graph_helper: The LegacyGraphHelper instance for graph
                                                   construction.
+    :param bool incremental: `True` to mark the dependents of changed files dirty, rather than
+                             deleting them from the ProductGraph.
     """
     super(SchedulerService, self).__init__()
     self._fs_event_service = fs_event_service
     self._graph_helper = legacy_graph_helper
     self._scheduler = legacy_graph_helper.scheduler
     self._engine = legacy_graph_helper.engine
+    self._incremental = incremental
 
     self._logger = logging.getLogger(__name__)
     self._event_queue = Queue.Queue(maxsize=64)
@@ -55,7 +58,7 @@ class SchedulerService(PantsService):
       self._logger.debug('no scheduler. ignoring event.')
       return
 
-    self._scheduler.invalidate_files(files)
+    self._scheduler.invalidate_files(files, incremental=self._incremental)
 
   def _process_event_queue(self):
     """File event notification queue processor."""
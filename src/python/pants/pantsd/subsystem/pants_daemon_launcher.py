@@ -39,6 +39,9 @@ class PantsDaemonLauncher(object):
       register('--fs-event-workers', advanced=True, type=int, default=4,
                help='The number of workers to use for the filesystem event service executor pool.'
                     ' Experimental.')
+      register('--incremental-invalidation', advanced=True, type=bool,
+               help='Whether filesystem events should mark dependent nodes dirty for verification, '
+                    'rather than deleting them from the graph. Experimental.')
 
     @classmethod
     def subsystem_dependencies(cls):
@@ -61,7 +64,8 @@ class PantsDaemonLauncher(object):
                                  pailgun_port=options.pailgun_port,
                                  fs_event_enabled=options.fs_event_detection,
                                  fs_event_workers=options.fs_event_workers,
-                                 path_ignore_patterns=options.pants_ignore)
+                                 path_ignore_patterns=options.pants_ignore,
+                                 incremental_invalidation=options.incremental_invalidation)
 
   def __init__(self,
                build_root,
@@ -73,7 +77,8 @@ class PantsDaemonLauncher(object):
                pailgun_port,
                fs_event_enabled,
                fs_event_workers,
-               path_ignore_patterns):
+               path_ignore_patterns,
+               incremental_invalidation=False):
     """
     :param str build_root: The path of the build root.
     :param str pants_workdir: The path of the pants workdir.
@@ -86,6 +91,8 @@ class PantsDaemonLauncher(object):
                                   invalidation.
     :param int fs_event_workers: The number of workers to use for processing the fs event queue.
     :param list path_ignore_patterns: A list of ignore patterns for filesystem operations.
+    :param bool incremental_invalidation: Whether to invalidate the graph incrementally on
+                                          filesystem events.
     """
     self._build_root = build_root
     self._pants_workdir = pants_workdir
@@ -97,6 +104,7 @@ class PantsDaemonLauncher(object):
     self._fs_event_enabled = fs_event_enabled
     self._fs_event_workers = fs_event_workers
     self._path_ignore_patterns = path_ignore_patterns
+    self._incremental_invalidation = incremental_invalidation
     # TODO(kwlzn): Thread filesystem path ignores here to Watchman's subscription registration.
 
     lock_location = os.path.join(self._build_root, '.pantsd.startup')
@@ -127,7 +135,8 @@ class PantsDaemonLauncher(object):
       fs_event_service = FSEventService(watchman, self._build_root, self._fs_event_workers)
 
       legacy_graph_helper = self._engine_initializer.setup_legacy_graph(self._path_ignore_patterns)
-      scheduler_service = SchedulerService(fs_event_service, legacy_graph_helper)
+      scheduler_service = SchedulerService(fs_event_service, legacy_graph_helper,
+                                           incremental=self._incremental_invalidation)
       services.extend((fs_event_service, scheduler_service))
 
     pailgun_service = PailgunService(
@@ -0,0 +1,169 @@
+# coding=utf-8
+# Copyright 2016 Pants project contributors (see CONTRIBUTORS.md).
+# Licensed under the Apache License, Version 2.0 (see LICENSE).
+
+from __future__ import (absolute_import, division, generators, nested_scopes, print_function,
+                        unicode_literals, with_statement)
+
+import multiprocessing
+import os
+import time
+from hashlib import sha1
+from multiprocessing.pool import ThreadPool
+from struct import Struct as StdlibStruct
+
+from pants.subsystem.subsystem import Subsystem
+from pants.util.lmdbutil import encode_key, open_env
+from pants.util.memo import memoized_method
+
+
+class FileDigestCache(object):
+  """Caches the sha1 digests of files, keyed by path and validated by stat.
+
+  A digest is reused for as long as the file's (size, mtime, inode) are unchanged, so unchanged
+  files are never re-read. Digests are held in memory and, if a directory is given, also in an
+  lmdb database there so that they are shared across runs.
+
+  Files modified within `RACY_SECONDS` of being digested are not cached, since a later edit within
+  the resolution of their mtime would go unnoticed.
+  """
+
+  RACY_SECONDS = 2
+
+  # Packs the (size, mtime, inode) a digest is valid for, followed by the digest itself.
+  _ENTRY_STRUCT = StdlibStruct(b'<QdQ20s')
+
+  _global_instance = None
+
+  @classmethod
+  def global_instance(cls):
+    """Returns the cache installed for this run, or a process-wide in-memory cache if none is."""
+    if cls._global_instance is None:
+      cls._global_instance = cls()
+    return cls._global_instance
+
+  @classmethod
+  def set_global_instance(cls, cache):
+    """Installs the given cache as the global instance, closing any previously installed one."""
+    if cls._global_instance is not None and cls._global_instance is not cache:
+      cls._global_instance.close()
+    cls._global_instance = cache
+
+  def __init__(self, path=None, threads=1):
+    """
+    :param string path: A directory to persist digests in, or None to only cache them in memory.
+    :param int threads: The number of threads `digest_all` may read and hash files with.
+    """
+    self._path = os.path.realpath(path) if path else None
+    self._threads = threads
+    self._digests = {}
+    self._env = open_env(self._path) if self._path else None
+
+  @property
+  def path(self):
+    return self._path
+
+  @property
+  def threads(self):
+    return self._threads
+
+  def close(self):
+    """Stops using the underlying database, if any; the cache is in-memory only from then on.
+
+    The database itself is shared by every cache of the same path in this process, so it is left
+    open: see `pants.util.lmdbutil.close_envs`.
+    """
+    self._env = None
+
+  def digest(self, path):
+    """Returns the sha1 digest of the file at the given absolute path.
+
+    :rtype: bytes
+    """
+    return self.digest_all([path])[0]
+
+  def digest_all(self, paths):
+    """Returns the sha1 digests of the files at the given absolute paths, in order.
+
+    Files that must be read are read and hashed concurrently, and any new digests are persisted
+    in a single transaction.
+
+    :rtype: list of bytes
+    """
+    unique_paths = list(set(paths))
+    if len(unique_paths) > 1 and self._threads > 1:
+      pool = ThreadPool(processes=min(self._threads, len(unique_paths)))
+      try:
+        entries = pool.map(self._lookup, unique_paths, chunksize=64)
+      finally:
+        pool.close()
+        pool.join()
+    else:
+      entries = [self._lookup(path) for path in unique_paths]
+
+    new_entries = []
+    digest_by_path = {}
+    for path, stat_key, digest, is_new in entries:
+      digest_by_path[path] = digest
+      if is_new and time.time() - stat_key[1] > self.RACY_SECONDS:
+        self._digests[path] = (stat_key, digest)
+        new_entries.append((path, stat_key, digest))
+    if new_entries and self._env:
+      with self._env.begin(write=True) as txn:
+        for path, stat_key, digest in new_entries:
+          txn.put(encode_key(path), self._ENTRY_STRUCT.pack(*(stat_key + (digest,))))
+    return [digest_by_path[path] for path in paths]
+
+  def _lookup(self, path):
+    """Returns a (path, stat key, digest, is new) tuple for the file at the given path."""
+    stat = os.stat(path)
+    stat_key = (stat.st_size, stat.st_mtime, stat.st_ino)
+
+    cached = self._digests.get(path)
+    if cached is not None and cached[0] == stat_key:
+      return path, stat_key, cached[1], False
+
+    if self._env:
+      with self._env.begin() as txn:
+        value = txn.get(encode_key(path))
+      if value is not None:
+        entry = self._ENTRY_STRUCT.unpack(value)
+        if entry[:3] == stat_key:
+          self._digests[path] = (stat_key, entry[3])
+          return path, stat_key, entry[3], False
+
+    with open(path, 'rb') as fp:
+      digest = sha1(fp.read()).digest()
+    return path, stat_key, digest, True
+
+
+class FileDigestCacheConfig(Subsystem):
+  """Configuration for the cache of source file digests used to fingerprint targets."""
+
+  options_scope = 'file-digest-cache'
+
+  @classmethod
+  def register_options(cls, register):
+    super(FileDigestCacheConfig, cls).register_options(register)
+    register('--persistent', type=bool, default=True, advanced=True,
+             help='Persist file digests across runs, rather than only caching them in memory.')
+    register('--dir', advanced=True,
+             default=os.path.join(register.bootstrap.pants_workdir, 'file_digest_cache'),
+             help='The directory to persist file digests in.')
+    register('--threads', type=int, default=multiprocessing.cpu_count(), advanced=True,
+             help='Number of threads to read and hash source files with.')
+
+  @memoized_method
+  def get_file_digest_cache(self):
+    """Returns the FileDigestCache for this run, installing it as the global instance.
+
+    The installed instance is reused if it is configured identically, so that its in-memory
+    digests survive across runs in the same process (e.g. in pantsd).
+    """
+    options = self.get_options()
+    path = os.path.realpath(options.dir) if options.persistent else None
+    cache = FileDigestCache.global_instance()
+    if cache.path != path or cache.threads != options.threads:
+      cache = FileDigestCache(path=path, threads=options.threads)
+      FileDigestCache.set_global_instance(cache)
+    return cache
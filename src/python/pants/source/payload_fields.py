@@ -8,9 +8,11 @@ from __future__ import (absolute_import, division, generators, nested_scopes, pr
 import os
 from hashlib import sha1
 
+from pants.base.build_environment import get_buildroot
 from pants.base.payload_field import PayloadField
 from pants.source.source_root import SourceRootConfig
-from pants.source.wrapped_globs import Files, FilesetWithSpec, matches_filespec
+from pants.source.wrapped_globs import (Files, FilesetWithSpec, LazyFilesetWithSpec,
+                                        matches_filespec)
 from pants.util.memo import memoized_property
 
 
@@ -66,6 +68,16 @@ class SourcesField(PayloadField):
     """All sources joined with ``self.rel_path``."""
     return [os.path.join(self.rel_path, source) for source in self.source_paths]
 
+  def unfingerprinted_paths(self):
+    """Returns the absolute paths of the files that computing the fingerprint will read.
+
+    Empty if the fingerprint is already computed, or if the sources already carry their digests.
+    """
+    if self._fingerprint_memo is not None or not isinstance(self.sources, LazyFilesetWithSpec):
+      return []
+    root = os.path.join(get_buildroot(), self.rel_path)
+    return [os.path.join(root, source) for source in self.source_paths]
+
   def _compute_fingerprint(self):
     hasher = sha1()
     hasher.update(self.rel_path)
@@ -140,6 +152,11 @@ class DeferredSourcesField(SourcesField):
       raise self.NotPopulatedError()
     return matches_filespec(path, self.filespec)
 
+  def unfingerprinted_paths(self):
+    if not self._populated:
+      return []
+    return super(DeferredSourcesField, self).unfingerprinted_paths()
+
   def _compute_fingerprint(self):
     """A subclass must provide an implementation of _compute_fingerprint that can return a valid
     fingerprint even if the sources aren't unpacked yet.
@@ -8,12 +8,12 @@ from __future__ import (absolute_import, division, generators, nested_scopes, pr
 import fnmatch
 import os
 from abc import abstractmethod, abstractproperty
-from hashlib import sha1
 
 from six import string_types
 from twitter.common.dirutil.fileset import Fileset
 
 from pants.base.build_environment import get_buildroot
+from pants.source.file_digest_cache import FileDigestCache
 from pants.util.memo import memoized_property
 from pants.util.meta import AbstractClass
 
@@ -107,8 +107,8 @@ class LazyFilesetWithSpec(FilesetWithSpec):
     return self._files_calculator()
 
   def file_hash(self, path):
-    with open(os.path.join(get_buildroot(), self.rel_root, path), 'rb') as f:
-      return sha1(f.read()).digest()
+    return FileDigestCache.global_instance().digest(os.path.join(get_buildroot(), self.rel_root,
+                                                                 path))
 
 
 class FilesetRelPathWrapper(AbstractClass):
@@ -157,15 +157,7 @@ class FilesetRelPathWrapper(AbstractClass):
       if cls._is_glob_dir_outside_root(glob, root):
         raise ValueError('Invalid glob {}, points outside BUILD file root {}'.format(glob, root))
 
-    def files_calculator():
-      result = cls.wrapped_fn(root=root, *patterns, **kwargs)
-
-      for ex in excludes:
-        result -= ex
-
-      # BUILD file's filesets should contain only files, not folders.
-      return [path for path in result
-              if not cls.validate_files or os.path.isfile(os.path.join(root, path))]
+    files_calculator = _FilesCalculator(cls, root, patterns, kwargs, excludes)
 
     buildroot = get_buildroot()
     rel_root = os.path.relpath(root, buildroot)
@@ -217,6 +209,31 @@ class FilesetRelPathWrapper(AbstractClass):
     return result
 
 
+class _FilesCalculator(object):
+  """Computes the files matched by a FilesetRelPathWrapper type.
+
+  Unlike a closure, this can be pickled along with the LazyFilesetWithSpec that holds it.
+  """
+
+  def __init__(self, wrapper_type, root, patterns, kwargs, excludes):
+    self._wrapper_type = wrapper_type
+    self._root = root
+    self._patterns = patterns
+    self._kwargs = kwargs
+    self._excludes = excludes
+
+  def __call__(self):
+    cls = self._wrapper_type
+    result = cls.wrapped_fn(root=self._root, *self._patterns, **self._kwargs)
+
+    for ex in self._excludes:
+      result -= ex
+
+    # BUILD file's filesets should contain only files, not folders.
+    return [path for path in result
+            if not cls.validate_files or os.path.isfile(os.path.join(self._root, path))]
+
+
 class Files(FilesetRelPathWrapper):
   """Matches literal files, _without_ confirming that they exist.
 
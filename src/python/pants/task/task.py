@@ -14,14 +14,16 @@ from itertools import repeat
 from pants.base.exceptions import TaskError
 from pants.base.fingerprint_strategy import TaskIdentityFingerprintStrategy
 from pants.base.worker_pool import Work
-from pants.cache.artifact_cache import UnreadableArtifact, call_insert, call_use_cached_files
+from pants.cache.artifact_cache import (NonfatalArtifactCacheError, UnreadableArtifact,
+                                        call_use_cached_files)
 from pants.cache.cache_setup import CacheSetup
-from pants.invalidation.build_invalidator import BuildInvalidator, CacheKeyGenerator
+from pants.invalidation.build_invalidator import CacheKeyGenerator, create_build_invalidator
 from pants.invalidation.cache_manager import InvalidationCacheManager, InvalidationCheck
 from pants.option.optionable import Optionable
 from pants.option.options_fingerprinter import OptionsFingerprinter
 from pants.option.scope import ScopeInfo
 from pants.reporting.reporting_utils import items_to_report_element
+from pants.source.file_digest_cache import FileDigestCache
 from pants.subsystem.subsystem_client_mixin import SubsystemClientMixin
 from pants.util.dirutil import safe_rm_oldest_items_in_dir
 from pants.util.memo import memoized_method, memoized_property
@@ -204,6 +206,10 @@ class TaskBase(SubsystemClientMixin, Optionable, AbstractClass):
       self.context.options.for_global_scope().pants_workdir,
       'build_invalidator',
       self.stable_name())
+    self._build_invalidator_backend = (
+      self.context.options.for_global_scope().build_invalidator_backend)
+    self._results_dir_clone_strategy = (
+      self.context.options.for_global_scope().results_dir_clone_strategy)
 
     self._cache_factory = CacheSetup.create_cache_factory_for_task(self)
 
@@ -271,7 +277,8 @@ class TaskBase(SubsystemClientMixin, Optionable, AbstractClass):
 
   def invalidate(self):
     """Invalidates all targets for this task."""
-    BuildInvalidator(self._build_invalidator_dir).force_invalidate_all()
+    create_build_invalidator(self._build_invalidator_dir,
+                             self._build_invalidator_backend).force_invalidate_all()
 
   def create_cache_manager(self, invalidate_dependents, fingerprint_strategy=None):
     """Creates a cache manager that can be used to invalidate targets on behalf of this task.
@@ -291,7 +298,10 @@ class TaskBase(SubsystemClientMixin, Optionable, AbstractClass):
                                     invalidation_report=self.context.invalidation_report,
                                     task_name=type(self).__name__,
                                     task_version=self.implementation_version_str(),
-                                    artifact_write_callback=self.maybe_write_artifact)
+                                    artifact_write_callback=self.maybe_write_artifact,
+                                    build_invalidator_backend=self._build_invalidator_backend,
+                                    file_digest_cache=FileDigestCache.global_instance(),
+                                    results_dir_clone_strategy=self._results_dir_clone_strategy)
 
   @property
   def create_target_dirs(self):
@@ -391,6 +401,10 @@ class TaskBase(SubsystemClientMixin, Optionable, AbstractClass):
                                                                  uncached_causes)
         if not silent:
           self._report_targets('No cached artifacts for ', uncached_targets, '.')
+      store_stats = self._cache_factory.get_read_cache().store_stats()
+      if store_stats is not None:
+        self.context.run_tracker.artifact_cache_stats.add_store_stats(cache_manager.task_name,
+                                                                      store_stats)
       # Now that we've checked the cache, re-partition whatever is still invalid.
       invalidation_check = \
         InvalidationCheck(invalidation_check.all_vts, uncached_vts)
@@ -490,10 +504,20 @@ class TaskBase(SubsystemClientMixin, Optionable, AbstractClass):
       return [], [], []
 
     read_cache = self._cache_factory.get_read_cache()
-    items = [(read_cache, vt.cache_key, vt.results_dir if vt.has_results_dir else None)
-             for vt in vts]
 
-    res = self.context.subproc_map(call_use_cached_files, items)
+    # Probe for all of the artifacts at once, so that only those present need to be fetched.
+    present = self._probe_artifact_cache(read_cache, [vt.cache_key for vt in vts])
+    if present is None:
+      present = [True] * len(vts)
+    items = [(vt.cache_key, vt.results_dir if vt.has_results_dir else None)
+             for vt, is_present in zip(vts, present) if is_present]
+
+    fetched = read_cache.use_cached_files_many(items) if items else []
+    if fetched is None:
+      fetched = self.context.subproc_map(call_use_cached_files,
+                                         [(read_cache,) + item for item in items])
+    fetched = iter(fetched)
+    res = [next(fetched) if is_present else False for is_present in present]
 
     self._maybe_create_results_dirs(vts)
 
@@ -527,44 +551,38 @@ class TaskBase(SubsystemClientMixin, Optionable, AbstractClass):
       - vts is single VersionedTargetSet.
       - artifactfiles is a list of absolute paths to artifacts for the VersionedTargetSet.
     """
-    update_artifact_cache_work = self._get_update_artifact_cache_work(vts_artifactfiles_pairs)
-    if update_artifact_cache_work:
-      self.context.submit_background_work_chain([update_artifact_cache_work],
-                                                parent_workunit_name='cache')
-
-  def _get_update_artifact_cache_work(self, vts_artifactfiles_pairs):
-    """Create a Work instance to update an artifact cache, if we're configured to.
-
-    vts_artifactfiles_pairs - a list of pairs (vts, artifactfiles) where
-      - vts is single VersionedTargetSet.
-      - artifactfiles is a list of paths to artifacts for the VersionedTargetSet.
-    """
     cache = self._cache_factory.get_write_cache()
-    if cache:
-      if len(vts_artifactfiles_pairs) == 0:
-        return None
-        # Do some reporting.
-      targets = set()
-      for vts, _ in vts_artifactfiles_pairs:
-        targets.update(vts.targets)
-
-      self._report_targets(
-        'Caching artifacts for ',
-        list(targets),
-        '.',
-        logger=self.context.log.debug,
-      )
-
-      always_overwrite = self._cache_factory.overwrite()
-
-      # Cache the artifacts.
-      args_tuples = []
-      for vts, artifactfiles in vts_artifactfiles_pairs:
-        overwrite = always_overwrite or vts.cache_key in self._cache_key_errors
-        args_tuples.append((cache, vts.cache_key, artifactfiles, overwrite))
-
-      return Work(lambda x: self.context.subproc_map(call_insert, x), [(args_tuples,)], 'insert')
-    else:
+    if not cache or not vts_artifactfiles_pairs:
+      return
+
+    targets = set()
+    for vts, _ in vts_artifactfiles_pairs:
+      targets.update(vts.targets)
+
+    self._report_targets(
+      'Caching artifacts for ',
+      list(targets),
+      '.',
+      logger=self.context.log.debug,
+    )
+
+    always_overwrite = self._cache_factory.overwrite()
+
+    # Queue the artifacts to be created and written in the background. The queue probes for
+    # artifacts already in the cache, and evicts from the cache once it is idle.
+    write_behind_queue = self.context.run_tracker.artifact_write_behind_queue()
+    for vts, artifactfiles in vts_artifactfiles_pairs:
+      overwrite = always_overwrite or vts.cache_key in self._cache_key_errors
+      write_behind_queue.submit(cache, vts.cache_key, artifactfiles, overwrite=overwrite)
+
+  def _probe_artifact_cache(self, cache, cache_keys):
+    """Returns whether each of the given keys is present in the cache, or None if unknown."""
+    if not cache_keys:
+      return []
+    try:
+      return cache.has_many(cache_keys)
+    except NonfatalArtifactCacheError as e:
+      self.context.log.debug('Failed to probe the artifact cache: {}'.format(e))
       return None
 
   def _report_targets(self, prefix, targets, suffix, logger=None):
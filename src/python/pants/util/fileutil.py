@@ -5,9 +5,13 @@
 from __future__ import (absolute_import, division, generators, nested_scopes, print_function,
                         unicode_literals, with_statement)
 
+import errno
+import fcntl
 import os
 import random
 import shutil
+import threading
+from multiprocessing.pool import ThreadPool
 
 from pants.util.contextutil import temporary_file
 
@@ -20,6 +24,103 @@ def atomic_copy(src, dst):
     os.rename(tmp_dst.name, dst)
 
 
+# The FICLONE ioctl request, which clones one file into another on Linux (btrfs, xfs, ...).
+_FICLONE = 0x40049409
+
+# The errnos with which cloning fails on filesystems (or platforms) that don't support it.
+_REFLINK_UNSUPPORTED_ERRNOS = frozenset([errno.EOPNOTSUPP, errno.ENOTTY, errno.EXDEV,
+                                         errno.EINVAL, errno.ENOSYS])
+
+
+def reflink(src, dst):
+  """Clone the file src to dst, sharing its blocks until either is written to.
+
+  :returns: True if the file was cloned, or False if the filesystem does not support cloning, in
+            which case dst does not exist.
+  """
+  with open(src, 'rb') as src_fp:
+    with open(dst, 'wb') as dst_fp:
+      try:
+        fcntl.ioctl(dst_fp.fileno(), _FICLONE, src_fp.fileno())
+        return True
+      except (IOError, OSError) as e:
+        if e.errno not in _REFLINK_UNSUPPORTED_ERRNOS:
+          raise
+  os.unlink(dst)
+  return False
+
+
+CLONE_STRATEGIES = ('reflink', 'copy')
+
+# The number of threads to copy files with when cloning a tree by copying.
+CLONE_THREADS = 8
+
+# Whether reflinks work between the filesystems with the given (src, dst) device ids.
+_reflinks_supported = {}
+_reflinks_supported_lock = threading.Lock()
+
+
+def clone_tree(src, dst, strategy='reflink'):
+  """Clone the directory tree at src to dst, preserving modes and modification times.
+
+  Files are cloned using the given strategy, falling back to copying where it is unsupported:
+
+  - 'reflink' shares the blocks of each file between src and dst until either is written to, if
+    the filesystems of src and dst support it.
+  - 'copy' copies files, concurrently.
+
+  Like `shutil.copytree`, symlinks are followed and dst must not already exist.
+  """
+  if strategy not in CLONE_STRATEGIES:
+    raise ValueError('Unknown clone strategy {}, expected one of {}'.format(strategy,
+                                                                              CLONE_STRATEGIES))
+  dir_pairs = []
+  file_pairs = []
+  for root, _, files in os.walk(src, followlinks=True):
+    dst_root = os.path.join(dst, os.path.relpath(root, src))
+    os.makedirs(dst_root)
+    dir_pairs.append((root, dst_root))
+    file_pairs.extend((os.path.join(root, name), os.path.join(dst_root, name)) for name in files)
+
+  copy_pairs = file_pairs
+  if strategy == 'reflink' and _reflinks_supported_between(src, dst, file_pairs):
+    # The first file may already have been cloned when probing for support.
+    copy_pairs = [(s, d) for s, d in file_pairs if not os.path.exists(d) and not reflink(s, d)]
+    # Clones need their metadata copied.
+    for s, d in file_pairs:
+      if os.path.exists(d):
+        shutil.copystat(s, d)
+  _copy_files(copy_pairs)
+
+  # Directory times change as their contents are created, so are copied last.
+  for s, d in reversed(dir_pairs):
+    shutil.copystat(s, d)
+
+
+def _reflinks_supported_between(src, dst, file_pairs):
+  """Returns whether reflinks work from src to dst, probing by reflinking the first file pair."""
+  if not file_pairs:
+    return False
+  devices = (os.stat(src).st_dev, os.stat(dst).st_dev)
+  with _reflinks_supported_lock:
+    if devices not in _reflinks_supported:
+      _reflinks_supported[devices] = reflink(*file_pairs[0])
+    return _reflinks_supported[devices]
+
+
+def _copy_files(file_pairs):
+  if len(file_pairs) < 2:
+    for src, dst in file_pairs:
+      shutil.copy2(src, dst)
+    return
+  pool = ThreadPool(processes=min(CLONE_THREADS, len(file_pairs)))
+  try:
+    pool.map(lambda pair: shutil.copy2(*pair), file_pairs)
+  finally:
+    pool.close()
+    pool.join()
+
+
 def create_size_estimators():
   """Create a dict of name to a function that returns an estimated size for a given target.
 
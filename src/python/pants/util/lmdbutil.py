@@ -0,0 +1,70 @@
+# coding=utf-8
+# Copyright 2016 Pants project contributors (see CONTRIBUTORS.md).
+# Licensed under the Apache License, Version 2.0 (see LICENSE).
+
+from __future__ import (absolute_import, division, generators, nested_scopes, print_function,
+                        unicode_literals, with_statement)
+
+import os
+import threading
+
+import lmdb
+import six
+
+from pants.util.dirutil import safe_mkdir
+
+
+# The default maximum size of an environment. The map is sparse, so this is only an upper bound.
+MAX_MAP_SIZE = 1024 * 1024 * 1024
+
+
+# lmdb environments must not be opened more than once per process, nor used in a process forked
+# from the one that opened them, so they are shared by process and path.
+_envs = {}
+_envs_lock = threading.Lock()
+
+
+def encode_key(value):
+  """Returns the given key or value as bytes, encoding text as utf-8."""
+  return value.encode('utf-8') if isinstance(value, six.text_type) else value
+
+
+def open_env(path, map_size=MAX_MAP_SIZE, max_dbs=0):
+  """Returns the lmdb environment in the given directory, opening it if this process has not.
+
+  Environments are opened with syncing disabled, since they only hold caches that are safe to lose
+  on a crash.
+
+  :param string path: The directory of the environment, which is created if need be.
+  :param int map_size: The maximum size the environment may grow to.
+  :param int max_dbs: The number of named databases the environment may hold.
+  :rtype: :class:`lmdb.Environment`
+  """
+  key = (os.getpid(), os.path.realpath(path))
+  with _envs_lock:
+    env = _envs.get(key)
+    if env is None:
+      safe_mkdir(key[1])
+      env = lmdb.open(key[1], map_size=map_size, max_dbs=max_dbs, metasync=False, sync=False)
+      _envs[key] = env
+    return env
+
+
+def close_envs(under=None):
+  """Closes the environments opened by this process, and forgets those opened by its parents.
+
+  Environments that are in use must not be closed: this is for tests, and for the end of a run.
+
+  :param string under: If given, only the environments in this directory or beneath it.
+  """
+  pid = os.getpid()
+  under = os.path.join(os.path.realpath(under), '') if under else None
+  with _envs_lock:
+    for key in list(_envs):
+      env_pid, path = key
+      if under and not os.path.join(path, '').startswith(under):
+        continue
+      env = _envs.pop(key)
+      # An environment inherited across a fork must not be touched by the child, even to close it.
+      if env_pid == pid:
+        env.close()
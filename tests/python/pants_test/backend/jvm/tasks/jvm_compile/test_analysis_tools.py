@@ -0,0 +1,142 @@
+# coding=utf-8
+# Copyright 2016 Pants project contributors (see CONTRIBUTORS.md).
+# Licensed under the Apache License, Version 2.0 (see LICENSE).
+
+from __future__ import (absolute_import, division, generators, nested_scopes, print_function,
+                        unicode_literals, with_statement)
+
+import os
+import shutil
+import StringIO
+import time
+import unittest
+
+import mock
+import six
+from six.moves import cPickle as pickle
+
+from pants.backend.jvm.tasks.jvm_compile.analysis_tools import AnalysisTools, ParsedAnalysisCache
+from pants.backend.jvm.tasks.jvm_compile.zinc.zinc_analysis import ZincAnalysis
+from pants.backend.jvm.tasks.jvm_compile.zinc.zinc_analysis_parser import ZincAnalysisParser
+from pants.util.contextutil import environment_as, temporary_dir
+
+
+_TEST_DATA_DIR = os.path.join(os.path.dirname(__file__), os.pardir, os.pardir, 'zinc',
+                              'testdata', 'simple')
+
+
+class CountingParser(ZincAnalysisParser):
+  """Counts the analysis files it parses."""
+
+  def __init__(self):
+    super(CountingParser, self).__init__()
+    self.parses = 0
+
+  def parse(self, infile):
+    self.parses += 1
+    return super(CountingParser, self).parse(infile)
+
+  def parse_deps_from_path(self, infile_path):
+    self.parses += 1
+    return super(CountingParser, self).parse_deps_from_path(infile_path)
+
+
+def analysis_text(analysis):
+  buf = StringIO.StringIO()
+  # Sorted, so that equal analyses write identical text.
+  with environment_as(ZINCUTILS_SORTED_ANALYSIS='1'):
+    analysis.write(buf)
+  return buf.getvalue()
+
+
+def pickling_map(f, items):
+  """Maps like a subprocess pool would, sending each item to `f` through a pickle."""
+  return [f(pickle.loads(pickle.dumps(item, pickle.HIGHEST_PROTOCOL))) for item in items]
+
+
+class AnalysisToolsTest(unittest.TestCase):
+
+  def analysis_tools(self, parser, cache_dir=None, map_fn=None):
+    cache = ParsedAnalysisCache(cache_dir) if cache_dir else None
+    return AnalysisTools('/java_home', parser, ZincAnalysis, '/buildroot', '/workdir',
+                         parsed_analysis_cache=cache, map_fn=map_fn)
+
+  def copy_analysis(self, name, dest):
+    shutil.copy(os.path.join(_TEST_DATA_DIR, name), dest)
+    return dest
+
+  def test_parse_cached(self):
+    with temporary_dir() as tmpdir:
+      path = self.copy_analysis('simple.analysis', os.path.join(tmpdir, 'a.analysis'))
+      expected = analysis_text(ZincAnalysisParser().parse_from_path(path))
+
+      parser = CountingParser()
+      tools = self.analysis_tools(parser, cache_dir=os.path.join(tmpdir, 'cache'))
+      self.assertEquals(expected, analysis_text(tools.parse_from_path(path)))
+      self.assertEquals(expected, analysis_text(tools.parse_from_path(path)))
+      self.assertEquals(1, parser.parses)
+
+      # A changed file is parsed again.
+      self.copy_analysis('simple_split0.analysis', path)
+      self.assertEquals(analysis_text(ZincAnalysisParser().parse_from_path(path)),
+                        analysis_text(tools.parse_from_path(path)))
+      self.assertEquals(2, parser.parses)
+
+      # As is a file whose cache entry is corrupt.
+      cache_entries = [os.path.join(root, name)
+                       for root, _, names in os.walk(os.path.join(tmpdir, 'cache'))
+                       for name in names]
+      self.assertEquals(1, len(cache_entries))
+      with open(cache_entries[0], 'wb') as entry:
+        entry.write(b'garbage')
+      tools.parse_from_path(path)
+      self.assertEquals(3, parser.parses)
+
+  def test_unchanged_file_not_read(self):
+    with temporary_dir() as tmpdir:
+      path = self.copy_analysis('simple.analysis', os.path.join(tmpdir, 'a.analysis'))
+      stale = time.time() - 60
+      os.utime(path, (stale, stale))
+      parser = CountingParser()
+      tools = self.analysis_tools(parser, cache_dir=os.path.join(tmpdir, 'cache'))
+      tools.parse_deps_from_path(path)
+
+      # The entry of a file whose stats are unchanged is found without reading the file.
+      real_open = open
+
+      def checked_open(name, *args, **kwargs):
+        self.assertNotEqual(os.path.realpath(path), os.path.realpath(name))
+        return real_open(name, *args, **kwargs)
+
+      with mock.patch.object(six.moves.builtins, 'open', side_effect=checked_open):
+        tools.parse_deps_from_path(path)
+      self.assertEquals(1, parser.parses)
+
+  def test_parse_deps_cached(self):
+    with temporary_dir() as tmpdir:
+      path = self.copy_analysis('simple.analysis', os.path.join(tmpdir, 'a.analysis'))
+      parser = CountingParser()
+      tools = self.analysis_tools(parser, cache_dir=os.path.join(tmpdir, 'cache'))
+      self.assertEquals(ZincAnalysisParser().parse_deps_from_path(path),
+                        tools.parse_deps_from_path(path))
+      tools.parse_deps_from_path(path)
+      tools.parse_from_path(path)
+      self.assertEquals(2, parser.parses)
+
+  def test_parallel(self):
+    with temporary_dir() as tmpdir:
+      paths = [self.copy_analysis(name, os.path.join(tmpdir, name))
+               for name in ('simple_split0.analysis', 'simple_split1.analysis')]
+      parser = ZincAnalysisParser()
+      tools = self.analysis_tools(parser, cache_dir=os.path.join(tmpdir, 'cache'),
+                                  map_fn=pickling_map)
+
+      self.assertEquals([parser.parse_deps_from_path(path) for path in paths],
+                        tools.parse_deps_from_paths(paths))
+      self.assertEquals([parser.parse_products_from_path(path, tmpdir) for path in paths],
+                        tools.parse_products_from_paths([(path, tmpdir) for path in paths]))
+
+      merged = os.path.join(tmpdir, 'merged.analysis')
+      tools.merge_many_from_paths([(paths, merged)])
+      expected = ZincAnalysis.merge([parser.parse_from_path(path) for path in paths])
+      self.assertEquals(analysis_text(expected), analysis_text(parser.parse_from_path(merged)))
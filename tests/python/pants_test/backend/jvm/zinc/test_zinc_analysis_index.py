@@ -0,0 +1,103 @@
+# coding=utf-8
+# Copyright 2016 Pants project contributors (see CONTRIBUTORS.md).
+# Licensed under the Apache License, Version 2.0 (see LICENSE).
+
+from __future__ import (absolute_import, division, generators, nested_scopes, print_function,
+                        unicode_literals, with_statement)
+
+import os
+import time
+import unittest
+
+import mock
+
+from pants.backend.jvm.zinc.zinc_analysis_element_types import Compilations, Relations, Stamps
+from pants.backend.jvm.zinc.zinc_analysis_index import ZincAnalysisIndex
+from pants.backend.jvm.zinc.zinc_analysis_parser import ZincAnalysisParser
+from pants.source.file_digest_cache import FileDigestCache
+from pants.util.contextutil import temporary_dir
+from pants.util.dirutil import read_file, safe_file_dump, touch
+
+
+_SIMPLE_ANALYSIS = os.path.join(os.path.dirname(__file__), 'testdata', 'simple', 'simple.analysis')
+
+
+class ZincAnalysisIndexTest(unittest.TestCase):
+
+  def parse_streamed(self, method, path, *args):
+    with open(path, 'rb') as infile:
+      return getattr(ZincAnalysisParser(), method)(infile, *args)
+
+  def test_parse_products(self):
+    self.assertEquals(self.parse_streamed('parse_products', _SIMPLE_ANALYSIS),
+                      ZincAnalysisParser().parse_products_from_path(_SIMPLE_ANALYSIS))
+
+  def test_parse_deps(self):
+    self.assertEquals(self.parse_streamed('parse_deps', _SIMPLE_ANALYSIS, '/classes'),
+                      ZincAnalysisParser().parse_deps_from_path(_SIMPLE_ANALYSIS, '/classes'))
+
+  def test_ambiguous_headers(self):
+    # Both Relations and Stamps have a 'class names' section.
+    index = ZincAnalysisIndex.for_path(_SIMPLE_ANALYSIS)
+    with index.open_section(_SIMPLE_ANALYSIS, Relations, b'class names') as lines:
+      relations_class_names = ZincAnalysisParser()._parse_section(lines, b'class names')
+    with index.open_section(_SIMPLE_ANALYSIS, Stamps, b'class names') as lines:
+      stamps_class_names = ZincAnalysisParser()._parse_section(lines, b'class names')
+    self.assertNotEquals(relations_class_names, stamps_class_names)
+
+  def test_skips_header_lookalikes(self):
+    with temporary_dir() as tmpdir:
+      path = os.path.join(tmpdir, 'analysis')
+      # A value on its own line that looks like the header of the section after it.
+      content = read_file(_SIMPLE_ANALYSIS).replace(b'FakeSourceInfoForExe\n', b'compilations:\n')
+      safe_file_dump(path, content)
+      index = ZincAnalysisIndex.for_path(path)
+      with index.open_section(path, Compilations, b'compilations') as lines:
+        self.assertEquals(b'compilations:\n', next(lines))
+        self.assertEquals(b'0 items\n', next(lines))
+
+  def test_reindexes_modified_files(self):
+    with temporary_dir() as tmpdir:
+      path = os.path.join(tmpdir, 'analysis')
+      safe_file_dump(path, read_file(_SIMPLE_ANALYSIS))
+      self.make_stale(path)
+      index = ZincAnalysisIndex.for_path(path)
+      self.assertIs(index, ZincAnalysisIndex.for_path(path))
+
+      safe_file_dump(path, b'')
+      self.assertIsNot(index, ZincAnalysisIndex.for_path(path))
+      with self.assertRaises(ZincAnalysisParser.ParseError):
+        ZincAnalysisParser().parse_products_from_path(path)
+
+  def make_stale(self, path):
+    """Backdates the file's mtime past the window in which indexes of it aren't shared."""
+    mtime = time.time() - FileDigestCache.RACY_SECONDS - 10
+    touch(path, (mtime, mtime))
+
+  def test_racy_files_not_shared(self):
+    with temporary_dir() as tmpdir:
+      path = os.path.join(tmpdir, 'analysis')
+      safe_file_dump(path, read_file(_SIMPLE_ANALYSIS))
+      self.assertIsNot(ZincAnalysisIndex.for_path(path), ZincAnalysisIndex.for_path(path))
+
+  def test_bounded(self):
+    with temporary_dir() as tmpdir:
+      paths = [os.path.join(tmpdir, 'analysis{}'.format(i)) for i in range(3)]
+      for path in paths:
+        safe_file_dump(path, read_file(_SIMPLE_ANALYSIS))
+        self.make_stale(path)
+      with mock.patch.object(ZincAnalysisIndex, 'MAX_INDEXES', 2):
+        first = ZincAnalysisIndex.for_path(paths[0])
+        second = ZincAnalysisIndex.for_path(paths[1])
+        # Using the first makes the second the least recently used, which the third displaces.
+        self.assertIs(first, ZincAnalysisIndex.for_path(paths[0]))
+        ZincAnalysisIndex.for_path(paths[2])
+        self.assertIs(first, ZincAnalysisIndex.for_path(paths[0]))
+        self.assertIsNot(second, ZincAnalysisIndex.for_path(paths[1]))
+
+  def test_bad_version(self):
+    with temporary_dir() as tmpdir:
+      path = os.path.join(tmpdir, 'analysis')
+      safe_file_dump(path, b'format version: 1\n')
+      with self.assertRaises(ZincAnalysisParser.ParseError):
+        ZincAnalysisParser().parse_products_from_path(path)
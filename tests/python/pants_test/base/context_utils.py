@@ -13,6 +13,7 @@ from twitter.common.collections import maybe_list
 
 from pants.base.workunit import WorkUnit
 from pants.build_graph.target import Target
+from pants.cache.write_behind_queue import ArtifactWriteBehindQueue
 from pants.goal.context import Context
 from pants_test.option.util.fakes import create_options
 
@@ -53,8 +54,14 @@ class TestContext(Context):
 
       def add_misses(self, cache_name, targets, causes): pass
 
+      def add_store_stats(self, cache_name, store_stats): pass
+
     artifact_cache_stats = DummyArtifactCacheStats()
 
+    def artifact_write_behind_queue(self):
+      # Write artifacts synchronously, so we don't need background threads.
+      return ArtifactWriteBehindQueue(num_workers=0)
+
   @contextmanager
   def new_workunit(self, name, labels=None, cmd='', log_config=None):
     """
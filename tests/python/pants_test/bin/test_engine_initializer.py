@@ -0,0 +1,81 @@
+# coding=utf-8
+# Copyright 2016 Pants project contributors (see CONTRIBUTORS.md).
+# Licensed under the Apache License, Version 2.0 (see LICENSE).
+
+from __future__ import (absolute_import, division, generators, nested_scopes, print_function,
+                        unicode_literals, with_statement)
+
+import os
+import unittest
+
+from pants.base.file_system_project_tree import FileSystemProjectTree
+from pants.bin.engine_initializer import EngineInitializer
+from pants.engine.parser import SymbolTable
+from pants.engine.scheduler import LocalScheduler
+from pants.engine.selectors import Select
+from pants.engine.struct import Struct
+from pants.util.contextutil import temporary_dir
+
+
+class Apple(Struct):
+  pass
+
+
+class Banana(Struct):
+  pass
+
+
+class FruitTable(SymbolTable):
+  @classmethod
+  def table(cls):
+    return {'apple': Apple, 'banana': Banana}
+
+
+class AppleTable(SymbolTable):
+  @classmethod
+  def table(cls):
+    return {'apple': Apple}
+
+
+def peel(banana):
+  return Apple()
+
+
+def peel_carefully(banana):
+  return Apple(careful=True)
+
+
+class EngineInitializerTest(unittest.TestCase):
+
+  def fingerprint(self, tasks, symbol_table_cls=FruitTable):
+    return EngineInitializer.rules_fingerprint(tasks, symbol_table_cls)
+
+  def test_rules_fingerprint_stable(self):
+    tasks = [(Apple, [Select(Banana)], peel)]
+    self.assertEquals(self.fingerprint(tasks), self.fingerprint(list(tasks)))
+
+  def test_rules_fingerprint_changes(self):
+    tasks = [(Apple, [Select(Banana)], peel)]
+    fingerprint = self.fingerprint(tasks)
+    # A changed selector, task function or symbol table each change the fingerprint.
+    self.assertNotEquals(fingerprint, self.fingerprint([(Apple, [Select(Apple)], peel)]))
+    self.assertNotEquals(fingerprint, self.fingerprint([(Apple, [Select(Banana)], peel_carefully)]))
+    self.assertNotEquals(fingerprint, self.fingerprint(tasks, AppleTable))
+    self.assertNotEquals(fingerprint, self.fingerprint(tasks + [(Banana, [], Banana)]))
+
+  def test_engine_cache_keyed_by_rules(self):
+    with temporary_dir() as build_root, temporary_dir() as engine_cache_dir:
+      scheduler = LocalScheduler(dict(), [], FileSystemProjectTree(build_root))
+
+      def cache_names(rules_fingerprint):
+        engine = EngineInitializer._create_engine(scheduler, engine_cache_dir=engine_cache_dir,
+                                                  rules_fingerprint=rules_fingerprint)
+        engine.close()
+        return os.listdir(engine_cache_dir)
+
+      first = cache_names('a' * 40)
+      self.assertEquals(1, len(first))
+      # The cache for other rules is discarded.
+      second = cache_names('b' * 40)
+      self.assertEquals(1, len(second))
+      self.assertNotEquals(first, second)
@@ -0,0 +1,222 @@
+# coding=utf-8
+# Copyright 2016 Pants project contributors (see CONTRIBUTORS.md).
+# Licensed under the Apache License, Version 2.0 (see LICENSE).
+
+from __future__ import (absolute_import, division, generators, nested_scopes, print_function,
+                        unicode_literals, with_statement)
+
+import os
+import time
+import unittest
+
+from pants.base.build_file import BuildFile
+from pants.build_graph.address import Address
+from pants.build_graph.address_map_snapshot import (AddressMapSnapshot,
+                                                   alias_implementation_fingerprint)
+from pants.build_graph.build_file_aliases import BuildFileAliases
+from pants.build_graph.build_file_address_mapper import BuildFileAddressMapper
+from pants.util.dirutil import safe_file_dump
+from pants_test.base_test import BaseTest
+
+
+def _define(source):
+  """Returns the namespace of the given source, as if it were always the same module."""
+  namespace = {'__name__': 'pants_test.build_graph.aliases'}
+  exec(compile(source, 'aliases.py', 'exec'), namespace)
+  return namespace
+
+
+class AliasImplementationFingerprintTest(unittest.TestCase):
+
+  def fingerprint(self, source):
+    namespace = _define(source)
+    return alias_implementation_fingerprint(BuildFileAliases(
+      targets={'thing': namespace['Thing']},
+      objects={'constant': namespace['CONSTANT'], 'instance': namespace['Thing']()},
+      context_aware_object_factories={'factory': namespace['factory']}))
+
+  def test_alias_implementation_fingerprint(self):
+    base_source = """
+from pants.build_graph.target import Target
+
+CONSTANT = 1
+
+class Base(Target):
+  @property
+  def value(self):
+    return 1
+
+class Thing(Base):
+  def __init__(self):
+    pass
+
+def factory(parse_context):
+  return 1
+"""
+    fingerprint = self.fingerprint(base_source)
+    self.assertEquals(fingerprint, self.fingerprint(base_source))
+    for old, new in (('CONSTANT = 1', 'CONSTANT = 2'),
+                     ('    return 1', '    return 2'),
+                     ('    pass', '    self.x = 1'),
+                     ('(parse_context):\n  return 1', '(parse_context):\n  return 2')):
+      changed_source = base_source.replace(old, new)
+      self.assertNotEqual(base_source, changed_source)
+      self.assertNotEqual(fingerprint, self.fingerprint(changed_source))
+
+
+class AddressMapSnapshotTest(BaseTest):
+
+  def setUp(self):
+    super(AddressMapSnapshotTest, self).setUp()
+    self.snapshot_path = os.path.join(self.pants_workdir, 'build_files', 'address_maps.snapshot')
+
+  def create_snapshot(self, fingerprint='aliases'):
+    return AddressMapSnapshot(self.snapshot_path, fingerprint)
+
+  def make_stale(self, *relpaths):
+    """Dates the given files back, so that they are not too recently modified to be snapshotted."""
+    stale = time.time() - 60
+    for relpath in relpaths:
+      os.utime(os.path.join(self.build_root, relpath), (stale, stale))
+
+  def family(self, spec_path):
+    return list(BuildFile.get_build_files_family(self.project_tree, spec_path))
+
+  def parse(self, spec_path):
+    return self.build_file_parser.address_map_from_build_files(self.family(spec_path))
+
+  def snapshot_family(self, spec_path, **kwargs):
+    self.make_stale(*[build_file.relpath for build_file in self.family(spec_path)])
+    snapshot = self.create_snapshot(**kwargs)
+    snapshot.put(self.family(spec_path), self.parse(spec_path))
+    snapshot.save()
+
+  def assert_snapshotted(self, spec_path, expected, **kwargs):
+    snapshot = self.create_snapshot(**kwargs)
+    address_map = snapshot.get(self.family(spec_path))
+    if expected:
+      self.assertEquals((1, 0), (snapshot.hits, snapshot.misses))
+      # Addressables don't define equality, but their reprs include their alias, type and kwargs.
+      expected_map = self.parse(spec_path)
+      self.assertEquals({(address, address.build_file, repr(addressable))
+                         for address, addressable in expected_map.items()},
+                        {(address, address.build_file, repr(addressable))
+                         for address, addressable in address_map.items()})
+    else:
+      self.assertEquals((0, 1), (snapshot.hits, snapshot.misses))
+      self.assertIsNone(address_map)
+    return snapshot
+
+  def test_unchanged(self):
+    self.add_to_build_file('a', 'target(name="a")\n')
+    self.create_file('a/BUILD.other', 'target(name="b", dependencies=[":a"])\n')
+    self.assert_snapshotted('a', expected=False)
+    self.snapshot_family('a')
+
+    self.assert_snapshotted('a', expected=True)
+    self.assert_snapshotted('a', expected=False, fingerprint='other')
+
+  def test_changed(self):
+    self.add_to_build_file('a', 'target(name="a")\n')
+    self.snapshot_family('a')
+    self.create_file('a/BUILD', 'target(name="b")\n')
+    self.assert_snapshotted('a', expected=False)
+
+  def test_family_changed(self):
+    self.add_to_build_file('a', 'target(name="a")\n')
+    self.snapshot_family('a')
+    self.create_file('a/BUILD.other', 'target(name="b")\n')
+    self.assert_snapshotted('a', expected=False)
+
+  def test_touched(self):
+    build_file = self.add_to_build_file('a', 'target(name="a")\n')
+    self.snapshot_family('a')
+    os.utime(build_file.full_path, (0, 0))
+
+    # The content of the touched BUILD file is compared, and its new stats stored.
+    snapshot = self.assert_snapshotted('a', expected=True)
+    snapshot.save()
+    snapshot = self.create_snapshot()
+    snapshot._digest = lambda path: self.fail('Unexpectedly read {}'.format(path))
+    snapshot.get(self.family('a'))
+    self.assertEquals(1, snapshot.hits)
+
+  def test_racy(self):
+    self.add_to_build_file('a', 'target(name="a")\n')
+    snapshot = self.create_snapshot()
+    snapshot.put(self.family('a'), self.parse('a'))
+    snapshot.save()
+    # An edit within the granularity of mtimes might not change the stats of the BUILD file.
+    self.assert_snapshotted('a', expected=False)
+
+  def test_unreadable(self):
+    self.add_to_build_file('a', 'target(name="a")\n')
+    safe_file_dump(self.snapshot_path, AddressMapSnapshot.MAGIC + b'garbage')
+    self.assert_snapshotted('a', expected=False)
+    self.snapshot_family('a')
+    self.assert_snapshotted('a', expected=True)
+
+  def test_address_mapper(self):
+    self.add_to_build_file('a', 'target(name="a")\n')
+    self.add_to_build_file('warns', 'import warnings\nwarnings.warn("careful")\n'
+                                    'target(name="warns")\n')
+    self.make_stale('a/BUILD', 'warns/BUILD')
+
+    def resolve_all(snapshot):
+      address_mapper = BuildFileAddressMapper(self.build_file_parser, self.project_tree,
+                                              snapshot=snapshot)
+      for spec in ('a', 'warns'):
+        address_mapper.resolve(Address.parse(spec))
+      snapshot.save()
+      return snapshot.hits, snapshot.misses
+
+    self.assertEquals((0, 2), resolve_all(self.create_snapshot()))
+    # BUILD files that log warnings are not snapshotted, so that their warnings are not lost.
+    self.assertEquals((1, 1), resolve_all(self.create_snapshot()))
+
+  def read_file_families(self):
+    """Creates families that each name a target after the content of a file that they read."""
+    for spec_path in ('a', 'b'):
+      name_file = os.path.join(self.build_root, spec_path, 'name.txt')
+      self.create_file(os.path.join(spec_path, 'name.txt'), spec_path)
+      self.add_to_build_file(spec_path, 'with open({!r}) as fh:\n'
+                                        '  target(name=fh.read())\n'.format(name_file))
+      self.make_stale(os.path.join(spec_path, 'BUILD'), os.path.join(spec_path, 'name.txt'))
+
+  def rename_target(self, spec_path, name):
+    relpath = os.path.join(spec_path, 'name.txt')
+    self.create_file(relpath, name)
+    stale = time.time() - 120
+    os.utime(os.path.join(self.build_root, relpath), (stale, stale))
+
+  def test_read_file_changed(self):
+    self.read_file_families()
+
+    def resolve(spec):
+      snapshot = self.create_snapshot()
+      address_mapper = BuildFileAddressMapper(self.build_file_parser, self.project_tree,
+                                              snapshot=snapshot)
+      address_mapper.resolve(Address.parse(spec))
+      snapshot.save()
+      return snapshot.hits, snapshot.misses
+
+    self.assertEquals((0, 1), resolve('a'))
+    self.assertEquals((1, 0), resolve('a'))
+    # The file that the BUILD file read is validated along with it.
+    self.rename_target('a', 'c')
+    self.assertEquals((0, 1), resolve('a:c'))
+
+  def test_read_file_changed_parallel(self):
+    self.read_file_families()
+    snapshot = self.create_snapshot()
+    address_mapper = BuildFileAddressMapper(self.build_file_parser, self.project_tree,
+                                            parse_processes=2, snapshot=snapshot)
+    try:
+      address_mapper._parse_spec_paths(['a', 'b'])
+    finally:
+      address_mapper.close_parser_pool()
+    snapshot.save()
+
+    self.assert_snapshotted('b', expected=True)
+    self.rename_target('b', 'c')
+    self.assert_snapshotted('b', expected=False)
@@ -14,7 +14,11 @@ from pants.base.specs import DescendantAddresses
 from pants.build_graph.address import Address, BuildFileAddress
 from pants.build_graph.address_lookup_error import AddressLookupError
 from pants.build_graph.build_file_address_mapper import BuildFileAddressMapper
+from pants.build_graph.build_file_aliases import BuildFileAliases
+from pants.build_graph.build_file_code_cache import BuildFileCodeCache
+from pants.build_graph.build_file_parser import BuildFileParser
 from pants.build_graph.target import Target
+from pants.source.wrapped_globs import Globs
 from pants_test.base_test import BaseTest
 
 
@@ -279,3 +283,73 @@ Invalid BUILD files for \[::\]$""", re.DOTALL)
 
     self.assertEqual(sort(Address.parse(addr) for addr in expected),
                      sort(address_mapper.scan_specs(specs)))
+
+
+class ParallelBuildFileAddressMapperScanTest(BuildFileAddressMapperScanTest):
+  """Runs the scan tests, whose errors must be identical, with BUILD files parsed in parallel."""
+
+  @property
+  def alias_groups(self):
+    return BuildFileAliases(targets={'target': Target},
+                            context_aware_object_factories={'globs': Globs})
+
+  def setUp(self):
+    super(ParallelBuildFileAddressMapperScanTest, self).setUp()
+    self.address_mapper = BuildFileAddressMapper(self.build_file_parser, self.project_tree,
+                                                 parse_processes=2)
+
+  def tearDown(self):
+    self.address_mapper.close_parser_pool()
+    super(ParallelBuildFileAddressMapperScanTest, self).tearDown()
+
+  def parsed_spec_paths(self, spec_paths):
+    self.address_mapper._parse_spec_paths(spec_paths)
+    return set(self.address_mapper._spec_path_to_address_map_map)
+
+  def test_parsed_in_parallel(self):
+    self.add_to_build_file('c', 'target(name="c", sources=globs("*.txt"))\n')
+    self.create_file('c/1.txt')
+    self.assertEquals({'', 'a', 'a/b', 'c'}, self.parsed_spec_paths(['', 'a', 'a/b', 'c']))
+
+    address, addressable = self.address_mapper.resolve(Address.parse('c'))
+    self.assertEquals(['1.txt'], list(addressable._kwargs['sources']))
+    # Addresses refer to the BuildFiles of this process.
+    self.assertIs(list(self.address_mapper.scan_build_files('c'))[0], address.build_file)
+
+  def test_parsed_serially(self):
+    self.add_to_build_file('bad/a', 'a_is_bad')
+    self.add_to_build_file('warns', 'import warnings\nwarnings.warn("careful")\n'
+                                    'target(name="warns")\n')
+    # BUILD files that fail or warn are left to be parsed serially, when they are requested.
+    self.assertEquals({'', 'a'}, self.parsed_spec_paths(['', 'a', 'bad/a', 'warns']))
+    self.assert_scanned(['warns'], expected=['warns'])
+
+  def test_pool_reused(self):
+    self.add_to_build_file('c', 'target(name="c")\n')
+    self.add_to_build_file('d', 'target(name="d")\n')
+    self.parsed_spec_paths(['', 'a'])
+    parser_pool = self.address_mapper._parser_pool
+    workers = parser_pool._pool
+    self.assertEquals({'', 'a', 'c', 'd'}, self.parsed_spec_paths(['c', 'd']))
+    self.assertIs(workers, self.address_mapper._parser_pool._pool)
+
+    self.address_mapper.close_parser_pool()
+    self.assertIsNone(parser_pool._pool)
+
+  def test_compiled_code_cached(self):
+    cache_path = os.path.join(self.pants_workdir, 'build_files', 'code.cache')
+    code_cache = BuildFileCodeCache(cache_path, 'aliases')
+    build_file_parser = BuildFileParser(self._build_configuration, self.build_root,
+                                        code_cache=code_cache)
+    self.address_mapper = BuildFileAddressMapper(build_file_parser, self.project_tree,
+                                                 parse_processes=2)
+    self.parsed_spec_paths(['', 'a', 'a/b'])
+    # The code compiled by the workers is returned to be saved here.
+    self.assertEquals(3, code_cache.misses)
+    code_cache.save()
+
+    code_cache = BuildFileCodeCache(cache_path, 'aliases')
+    build_file_parser = BuildFileParser(self._build_configuration, self.build_root,
+                                        code_cache=code_cache)
+    build_file_parser.parse_build_file(list(self.address_mapper.scan_build_files('a'))[0])
+    self.assertEquals((1, 0), (code_cache.hits, code_cache.misses))
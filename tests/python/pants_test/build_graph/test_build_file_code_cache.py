@@ -0,0 +1,116 @@
+# coding=utf-8
+# Copyright 2016 Pants project contributors (see CONTRIBUTORS.md).
+# Licensed under the Apache License, Version 2.0 (see LICENSE).
+
+from __future__ import (absolute_import, division, generators, nested_scopes, print_function,
+                        unicode_literals, with_statement)
+
+import os
+
+from pants.base.build_file import BuildFile
+from pants.build_graph.build_file_aliases import BuildFileAliases
+from pants.build_graph.build_file_code_cache import BuildFileCodeCache, alias_fingerprint
+from pants.build_graph.build_file_parser import BuildFileParser
+from pants.build_graph.target import Target
+from pants.util.dirutil import safe_file_dump
+from pants_test.base_test import BaseTest
+
+
+class BuildFileCodeCacheTest(BaseTest):
+
+  def setUp(self):
+    super(BuildFileCodeCacheTest, self).setUp()
+    self.cache_path = os.path.join(self.pants_workdir, 'build_file_code', 'code.cache')
+
+  def create_cache(self, fingerprint='aliases', **kwargs):
+    return BuildFileCodeCache(self.cache_path, fingerprint, **kwargs)
+
+  def build_file(self, relpath, content):
+    self.create_file(relpath, content)
+    return BuildFile(self.project_tree, relpath)
+
+  def assert_code(self, cache, build_file, hits, misses):
+    namespace = {}
+    exec(cache.code(build_file), namespace)
+    self.assertEquals(build_file.relpath, namespace['name'])
+    self.assertEquals((hits, misses), (cache.hits, cache.misses))
+
+  def test_persisted(self):
+    a = self.build_file('a/BUILD', 'name = "a/BUILD"\n')
+    b = self.build_file('b/BUILD', 'name = "b/BUILD"\n')
+
+    cache = self.create_cache()
+    self.assert_code(cache, a, 0, 1)
+    self.assert_code(cache, a, 1, 1)
+    cache.save()
+
+    cache = self.create_cache()
+    self.assert_code(cache, a, 1, 0)
+    self.assert_code(cache, b, 1, 1)
+    cache.save()
+
+    cache = self.create_cache()
+    self.assert_code(cache, b, 1, 0)
+    self.assert_code(cache, a, 2, 0)
+
+  def test_invalidated(self):
+    a = self.build_file('a/BUILD', 'name = "a/BUILD"\n')
+    cache = self.create_cache()
+    self.assert_code(cache, a, 0, 1)
+    cache.save()
+
+    # Each of the content of the BUILD file and the aliases it is parsed with are part of the key.
+    self.assert_code(self.create_cache(fingerprint='other'), a, 0, 1)
+    self.create_file('a/BUILD', 'name = "a/BUILD"  # Changed.\n')
+    self.assert_code(self.create_cache(), a, 0, 1)
+
+  def test_unused_discarded(self):
+    a = self.build_file('a/BUILD', 'name = "a/BUILD"\n')
+    b = self.build_file('b/BUILD', 'name = "b/BUILD"\n')
+    c = self.build_file('c/BUILD', 'name = "c/BUILD"\n')
+    cache = self.create_cache()
+    self.assert_code(cache, a, 0, 1)
+    self.assert_code(cache, b, 0, 2)
+    cache.save()
+
+    # Past its max size, code that was not used by this cache is discarded.
+    cache = self.create_cache(max_entries=2)
+    self.assert_code(cache, a, 1, 0)
+    self.assert_code(cache, c, 1, 1)
+    cache.save()
+
+    cache = self.create_cache()
+    self.assert_code(cache, a, 1, 0)
+    self.assert_code(cache, c, 2, 0)
+    self.assert_code(cache, b, 2, 1)
+
+  def test_unreadable(self):
+    a = self.build_file('a/BUILD', 'name = "a/BUILD"\n')
+    safe_file_dump(self.cache_path, BuildFileCodeCache.MAGIC + b'garbage')
+    cache = self.create_cache()
+    self.assert_code(cache, a, 0, 1)
+    cache.save()
+    self.assert_code(self.create_cache(), a, 1, 0)
+
+  def test_syntax_error(self):
+    bad = self.build_file('bad/BUILD', 'target(\n')
+    parser = BuildFileParser(self._build_configuration, self.build_root,
+                             code_cache=self.create_cache())
+    with self.assertRaises(BuildFileParser.ParseError):
+      parser.parse_build_file(bad)
+    self.assertEquals(1, parser.code_cache.misses)
+
+  def test_parse(self):
+    build_file = self.add_to_build_file('a', 'target(name="a")\ntarget(name="b")\n')
+    parser = BuildFileParser(self._build_configuration, self.build_root,
+                             code_cache=self.create_cache())
+    self.assertEquals(self.build_file_parser.parse_build_file(build_file).keys(),
+                      parser.parse_build_file(build_file).keys())
+    self.assertEquals(1, parser.code_cache.misses)
+
+  def test_alias_fingerprint(self):
+    aliases = BuildFileAliases(targets={'target': Target})
+    self.assertEquals(alias_fingerprint(aliases),
+                      alias_fingerprint(BuildFileAliases(targets={'target': Target})))
+    self.assertNotEquals(alias_fingerprint(aliases),
+                         alias_fingerprint(BuildFileAliases(targets={'other': Target})))
@@ -5,6 +5,8 @@
 from __future__ import (absolute_import, division, generators, nested_scopes, print_function,
                         unicode_literals, with_statement)
 
+import random
+import sys
 from collections import defaultdict
 
 import six
@@ -13,9 +15,12 @@ from pants.backend.jvm.targets.jar_dependency import JarDependency
 from pants.backend.jvm.targets.jar_library import JarLibrary
 from pants.build_graph.address import Address, parse_spec
 from pants.build_graph.address_lookup_error import AddressLookupError
-from pants.build_graph.build_graph import BuildGraph
+from pants.build_graph.build_graph import BuildGraph, sort_targets
 from pants.build_graph.target import Target
+from pants.build_graph.target_scopes import Scope
 from pants_test.base_test import BaseTest
+from pants_test.build_graph.walk_benchmark import (recursive_walk_transitive_dependee_graph,
+                                                   recursive_walk_transitive_dependency_graph)
 
 
 # TODO(Eric Ayers) There are many untested methods in BuildGraph left to be tested.
@@ -368,3 +373,88 @@ class BuildGraphTest(BaseTest):
     check_funcs({b, d}, {b, d}, leveled_predicate=only_indirect_a)
     check_funcs({a, b, c, d}, {c, d}, leveled_predicate=only_indirect_a)
     check_funcs({a, b, c}, {c}, leveled_predicate=only_indirect_a)
+
+  def test_walk_deep_graph(self):
+    count = sys.getrecursionlimit() * 2
+    targets = [self.make_target(spec='deep:t0')]
+    for i in range(1, count):
+      targets.append(self.make_target(spec='deep:t{}'.format(i), dependencies=[targets[-1]]))
+
+    self.assertEquals(targets, list(self.build_graph.transitive_subgraph_of_addresses(
+      [targets[-1].address], postorder=True)))
+    self.assertEquals(targets, list(self.build_graph.transitive_dependees_of_addresses(
+      [targets[0].address])))
+
+  def test_walks_match_recursive_walks(self):
+    rng = random.Random(1234)
+    targets = []
+    for i in range(200):
+      dependencies = rng.sample(targets, min(len(targets), rng.randint(0, 4)))
+      targets.append(self.make_target(spec='random:t{}'.format(i), dependencies=dependencies))
+    trimmed = set(rng.sample(targets, 20))
+
+    def predicate(target):
+      return target not in trimmed
+
+    def leveled_predicate(target, level):
+      return level < 4 or target not in trimmed
+
+    for _ in range(20):
+      roots = [target.address for target in rng.sample(targets, 3)]
+      for kwargs in ({}, {'postorder': True}, {'predicate': predicate},
+                     {'leveled_predicate': leveled_predicate},
+                     {'leveled_predicate': leveled_predicate, 'postorder': True}):
+        walked, expected = [], []
+        self.build_graph.walk_transitive_dependency_graph(roots, walked.append, **kwargs)
+        recursive_walk_transitive_dependency_graph(self.build_graph, roots, expected.append,
+                                                   **kwargs)
+        self.assertEquals(expected, walked)
+
+      for kwargs in ({}, {'postorder': True}, {'predicate': predicate}):
+        # Dependees are unordered, so only the walked targets are comparable.
+        walked, expected = [], []
+        self.build_graph.walk_transitive_dependee_graph(roots, walked.append, **kwargs)
+        recursive_walk_transitive_dependee_graph(self.build_graph, roots, expected.append,
+                                                 **kwargs)
+        self.assertEquals(sorted(expected), sorted(walked))
+        self.assertEquals(len(expected), len(walked))
+
+  def test_memoized_closures(self):
+    a = self.make_target(spec='memo:a')
+    b = self.make_target(spec='memo:b', dependencies=[a])
+    c = self.make_target(spec='memo:c', dependencies=[b])
+
+    base_stats = self.build_graph.walk_memo_stats()
+
+    def assert_memo(hits, misses):
+      stats = self.build_graph.walk_memo_stats()
+      self.assertEquals((hits, misses), (stats['hits'] - base_stats['hits'],
+                                         stats['misses'] - base_stats['misses']))
+
+    self.assertEquals([c, b, a], list(c.closure()))
+    self.assertEquals([c, b, a], list(c.closure()))
+    assert_memo(1, 1)
+
+    # Each of the kind of walk and the scopes it is walked with are part of the key.
+    self.assertEquals([a, b, c], list(c.closure(postorder=True)))
+    self.assertEquals([c], list(c.closure(include_scopes=Scope('other'))))
+    self.assertEquals([c, b, a], sort_targets([a, b, c]))
+    self.assertEquals([c, b, a], sort_targets([a, b, c]))
+    assert_memo(2, 4)
+
+    # The returned closures are copies, which callers may mutate.
+    c.closure().add(self.make_target(spec='memo:unrelated'))
+    self.assertEquals([c, b, a], list(c.closure()))
+    assert_memo(3, 5)
+
+    # Injecting a target or a dependency invalidates all memoized walks.
+    d = self.make_target(spec='memo:d')
+    self.build_graph.inject_dependency(a.address, d.address)
+    self.assertEquals([c, b, a, d], list(c.closure()))
+    self.assertEquals([c, b, a, d], sort_targets([a, b, c, d]))
+    assert_memo(3, 7)
+
+    # A duplicate dependency does not mutate the graph.
+    self.build_graph.inject_dependency(a.address, d.address)
+    self.assertEquals([c, b, a, d], list(c.closure()))
+    assert_memo(4, 7)
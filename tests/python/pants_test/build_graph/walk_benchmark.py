@@ -0,0 +1,155 @@
+# coding=utf-8
+# Copyright 2016 Pants project contributors (see CONTRIBUTORS.md).
+# Licensed under the Apache License, Version 2.0 (see LICENSE).
+
+from __future__ import (absolute_import, division, generators, nested_scopes, print_function,
+                        unicode_literals, with_statement)
+
+import multiprocessing
+import resource
+import sys
+import threading
+import time
+
+from pants.build_graph.address import Address
+from pants.build_graph.mutable_build_graph import MutableBuildGraph
+from pants.build_graph.target import Target
+
+
+def recursive_walk_transitive_dependency_graph(build_graph, addresses, work, predicate=None,
+                                               postorder=False, leveled_predicate=None):
+  """The recursive implementation of `BuildGraph.walk_transitive_dependency_graph`, for reference.
+
+  It tracks the vertices it has walked in sets of Addresses.
+  """
+  expanded = set()
+  expanded_levels = set()
+  worked = set()
+
+  def _walk_rec(addr, level=0):
+    if leveled_predicate:
+      if (addr, level) in expanded_levels:
+        return
+      expanded_levels.add((addr, level))
+    elif addr in expanded:
+      return
+    expanded.add(addr)
+
+    target = build_graph.get_target(addr)
+    if target is None:
+      raise KeyError(addr)
+
+    if predicate and not predicate(target):
+      return
+
+    if not postorder and addr not in worked:
+      worked.add(addr)
+      work(target)
+
+    for dep_address in build_graph.dependencies_of(addr):
+      if dep_address in expanded or dep_address in worked:
+        continue
+      if not leveled_predicate or leveled_predicate(build_graph.get_target(dep_address), level):
+        _walk_rec(dep_address, level + 1)
+
+    if postorder and addr not in worked:
+      worked.add(addr)
+      work(target)
+
+  for address in addresses:
+    _walk_rec(address)
+
+
+def recursive_walk_transitive_dependee_graph(build_graph, addresses, work, predicate=None,
+                                             postorder=False):
+  """The recursive implementation of `BuildGraph.walk_transitive_dependee_graph`, for reference."""
+  walked = set()
+
+  def _walk_rec(addr):
+    if addr not in walked:
+      walked.add(addr)
+      target = build_graph.get_target(addr)
+      if not predicate or predicate(target):
+        if not postorder:
+          work(target)
+        for dep_address in build_graph.dependents_of(addr):
+          _walk_rec(dep_address)
+        if postorder:
+          work(target)
+
+  for address in addresses:
+    _walk_rec(address)
+
+
+def example_address(i):
+  return Address('src/java/org/pantsbuild/example{}'.format(i // 100), 'target{}'.format(i))
+
+
+def example_graph(count):
+  """Returns a graph of `count` Targets, where Target i depends on Targets 2i+1, 2i+2 and i+1.
+
+  The edges to i+1 make the graph roughly as deep as it is large (so some walks need the recursion
+  limit to be raised), and make most Targets reachable by several paths.
+  """
+  build_graph = MutableBuildGraph(address_mapper=None)
+  addresses = [example_address(i) for i in range(count)]
+  for address in reversed(addresses):
+    build_graph.inject_target(Target(name=address.target_name, address=address,
+                                     build_graph=build_graph))
+  for i, address in enumerate(addresses):
+    for dependency in (2 * i + 1, 2 * i + 2, i + 1):
+      if dependency < count:
+        build_graph.inject_dependency(address, addresses[dependency])
+  return build_graph
+
+
+WALKS = {
+  'iterative': lambda build_graph, addresses, work, **kwargs:
+      build_graph.walk_transitive_dependency_graph(addresses, work, **kwargs),
+  'recursive': lambda build_graph, addresses, work, **kwargs:
+      recursive_walk_transitive_dependency_graph(build_graph, addresses, work, **kwargs),
+}
+
+
+def benchmark(walk_type, count, postorder):
+  """Walks a graph in this process, and returns the Targets walked, the seconds it took and the KB
+  that the walk used.
+  """
+  build_graph = example_graph(count)
+  walked = []
+  rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+  start = time.time()
+  # The recursive walk would overflow the stack of the main thread on a large graph.
+  thread = threading.Thread(target=WALKS[walk_type],
+                            args=(build_graph, [example_address(0)], walked.append),
+                            kwargs={'postorder': postorder})
+  thread.start()
+  thread.join()
+  secs = time.time() - start
+  rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before
+  return len(walked), secs, rss_kb
+
+
+def main():
+  """Compares the time and memory to walk a large graph with each walk implementation.
+
+  Each graph is walked in its own process, so that the memory of one doesn't affect the other.
+
+  Usage: walk_benchmark.py [count]
+  """
+  count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+  # The recursive walk recurses once per Target in the worst case.
+  sys.setrecursionlimit(max(sys.getrecursionlimit(), 2 * count))
+  threading.stack_size(min(count * 4096, 1 << 30))
+  for postorder in (False, True):
+    for walk_type in sorted(WALKS):
+      pool = multiprocessing.Pool(1)
+      target_count, secs, rss_kb = pool.apply(benchmark, (walk_type, count, postorder))
+      pool.close()
+      print('{:>9} ({}): {} targets in {:7.2f}s, {:8d}KB'
+            .format(walk_type, 'postorder' if postorder else 'preorder', target_count, secs,
+                    rss_kb))
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,158 @@
+# coding=utf-8
+# Copyright 2016 Pants project contributors (see CONTRIBUTORS.md).
+# Licensed under the Apache License, Version 2.0 (see LICENSE).
+
+from __future__ import (absolute_import, division, generators, nested_scopes, print_function,
+                        unicode_literals, with_statement)
+
+import os
+import posixpath
+from contextlib import contextmanager
+from threading import Thread
+
+from six.moves import SimpleHTTPServer, socketserver
+
+from pants.cache.restful_artifact_cache import RESTfulArtifactCache
+from pants.util.contextutil import pushd, temporary_dir
+from pants.util.dirutil import safe_mkdir
+
+
+# A very trivial server that serves files under the cwd.
+class SimpleRESTHandler(SimpleHTTPServer.SimpleHTTPRequestHandler):
+  # Keep connections alive, as a real cache would.
+  protocol_version = 'HTTP/1.1'
+
+  def __init__(self, request, client_address, server):
+    # The base class implements GET and HEAD.
+    # Old-style class, so we must invoke __init__ this way.
+    SimpleHTTPServer.SimpleHTTPRequestHandler.__init__(self, request, client_address, server)
+
+  def log_message(self, format, *args):
+    pass
+
+  def _send_empty_response(self, code):
+    self.send_response(code)
+    self.send_header('Content-Length', '0')
+    self.end_headers()
+
+  def do_HEAD(self):
+    return SimpleHTTPServer.SimpleHTTPRequestHandler.do_HEAD(self)
+
+  def do_PUT(self):
+    path = self.translate_path(self.path)
+    content_length = int(self.headers.getheader('content-length'))
+    content = self.rfile.read(content_length)
+    safe_mkdir(os.path.dirname(path))
+    with open(path, 'wb') as outfile:
+      outfile.write(content)
+    self._send_empty_response(200)
+
+  def do_DELETE(self):
+    path = self.translate_path(self.path)
+    if os.path.exists(path):
+      os.unlink(path)
+      self._send_empty_response(200)
+    else:
+      self.send_error(404, 'File not found')
+
+
+class BulkRESTHandler(SimpleRESTHandler):
+  """Additionally supports the bulk probes described on `RESTfulArtifactCache`."""
+
+  def do_POST(self):
+    prefix, name = posixpath.split(self.path)
+    if name != RESTfulArtifactCache.BULK_HAS_PATH:
+      self.send_error(404, 'File not found')
+      return
+    content_length = int(self.headers.getheader('content-length'))
+    paths = self.rfile.read(content_length).splitlines()
+    present = [path for path in paths
+               if os.path.isfile(self.translate_path(posixpath.join(prefix, path)))]
+    body = '\n'.join(present).encode('utf-8')
+    self.send_response(200)
+    self.send_header('Content-Type', RESTfulArtifactCache.BULK_HAS_CONTENT_TYPE)
+    self.send_header('Content-Length', str(len(body)))
+    self.end_headers()
+    self.wfile.write(body)
+
+
+class AcceptPostRESTHandler(SimpleRESTHandler):
+  """Answers every POST with an unrelated 200, as some servers and proxies do."""
+
+  def do_POST(self):
+    body = b'OK'
+    self.send_response(200)
+    self.send_header('Content-Type', 'text/plain')
+    self.send_header('Content-Length', str(len(body)))
+    self.end_headers()
+    self.wfile.write(body)
+
+
+class FailRESTHandler(SimpleHTTPServer.SimpleHTTPRequestHandler):
+  """Reject all requests"""
+
+  def __init__(self, request, client_address, server):
+    # Old-style class, so we must invoke __init__ this way.
+    SimpleHTTPServer.SimpleHTTPRequestHandler.__init__(self, request, client_address, server)
+
+  def log_message(self, format, *args):
+    pass
+
+  def _return_failed(self):
+    self.send_response(401, 'Forced test failure')
+    self.end_headers()
+
+  def do_HEAD(self):
+    return self._return_failed()
+
+  def do_GET(self):
+    return self._return_failed()
+
+  def do_PUT(self):
+    return self._return_failed()
+
+  def do_POST(self):
+    return self._return_failed()
+
+  def do_DELETE(self):
+    return self._return_failed()
+
+
+class ThreadingTCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+  daemon_threads = True
+
+
+@contextmanager
+def cache_server(return_failed=False, bulk_has=True, cache_root=None, accept_post=False):
+  """Runs a stand-in RESTful artifact cache.
+
+  :param bool return_failed: Reject all requests.
+  :param bool bulk_has: Support bulk probes for artifacts.
+  :param string cache_root: The directory to serve artifacts from; a temporary directory if None.
+  :param bool accept_post: Answer every POST with an unrelated 200, if bulk probes are unsupported.
+  :returns: The base url of the cache.
+  """
+  httpd = None
+  httpd_thread = None
+  try:
+    with temporary_dir() as tmp_cache_root:
+      with pushd(cache_root or tmp_cache_root):  # SimpleRESTHandler serves from the cwd.
+        if return_failed:
+          handler = FailRESTHandler
+        elif bulk_has:
+          handler = BulkRESTHandler
+        elif accept_post:
+          handler = AcceptPostRESTHandler
+        else:
+          handler = SimpleRESTHandler
+        httpd = ThreadingTCPServer(('localhost', 0), handler)
+        port = httpd.server_address[1]
+        httpd_thread = Thread(target=httpd.serve_forever)
+        httpd_thread.start()
+        yield 'http://localhost:{0}'.format(port)
+  finally:
+    if httpd:
+      httpd.shutdown()
+      httpd.server_close()
+    if httpd_thread:
+      httpd_thread.join()
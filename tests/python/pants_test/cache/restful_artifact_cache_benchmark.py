@@ -0,0 +1,88 @@
+# coding=utf-8
+# Copyright 2016 Pants project contributors (see CONTRIBUTORS.md).
+# Licensed under the Apache License, Version 2.0 (see LICENSE).
+
+from __future__ import (absolute_import, division, generators, nested_scopes, print_function,
+                        unicode_literals, with_statement)
+
+import os
+import shutil
+import sys
+
+from pants.cache.artifact_cache import call_use_cached_files
+from pants.cache.local_artifact_cache import LocalArtifactCache, TempLocalArtifactCache
+from pants.cache.pinger import BestUrlSelector
+from pants.cache.restful_artifact_cache import RESTfulArtifactCache
+from pants.invalidation.build_invalidator import CacheKey
+from pants.util.contextutil import Timer, temporary_dir
+from pants.util.dirutil import safe_file_dump, safe_mkdir_for
+from pants_test.cache.cache_server import cache_server
+
+
+def example_keys(count):
+  return [CacheKey('src.java.org.pantsbuild.synthetic.target{}'.format(i), 'fake_hash')
+          for i in range(count)]
+
+
+def populate(cache_root, keys):
+  """Stores the same small artifact under each of the given keys in a stand-in cache's root."""
+  with temporary_dir() as artifact_root:
+    with temporary_dir() as local_root:
+      path = os.path.join(artifact_root, 'a.class')
+      safe_file_dump(path, b'muppet' * 100)
+      local = LocalArtifactCache(artifact_root, local_root, compression=1)
+      local.insert(keys[0], [path])
+      tarball = local._cache_file_for_key(keys[0])
+      for key in keys:
+        artifact = os.path.join(cache_root, key.id, '{}.tgz'.format(key.hash))
+        safe_mkdir_for(artifact)
+        shutil.copyfile(tarball, artifact)
+
+
+def probe(url, keys, artifact_root):
+  # A cold local cache, so that every probe goes to the remote cache.
+  artifact_cache = RESTfulArtifactCache(artifact_root, BestUrlSelector([url]),
+                                        TempLocalArtifactCache(artifact_root, 0))
+  return artifact_cache.has_many(keys)
+
+
+def fetch_concurrently(url, keys, artifact_root):
+  artifact_cache = RESTfulArtifactCache(artifact_root, BestUrlSelector([url]),
+                                        TempLocalArtifactCache(artifact_root, 0))
+  return artifact_cache.use_cached_files_many([(key, None) for key in keys])
+
+
+def fetch_one_by_one(url, keys, artifact_root):
+  artifact_cache = RESTfulArtifactCache(artifact_root, BestUrlSelector([url]),
+                                        TempLocalArtifactCache(artifact_root, 0))
+  return [call_use_cached_files((artifact_cache, key, None)) for key in keys]
+
+
+def timed(name, action, url, keys):
+  with temporary_dir() as artifact_root:
+    with Timer() as timer:
+      results = action(url, keys, artifact_root)
+  print('{:>30}: {} of {} artifacts in {:7.2f}s'
+        .format(name, sum(1 for result in results if result), len(keys), timer.elapsed))
+
+
+def main():
+  """Measures the latency of probing for and fetching the artifacts of many targets from a cold
+  cache, with a stand-in RESTful cache server on localhost.
+
+  Usage: restful_artifact_cache_benchmark.py [count]
+  """
+  count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+  keys = example_keys(count)
+  with temporary_dir() as cache_root:
+    populate(cache_root, keys)
+    with cache_server(bulk_has=True, cache_root=cache_root) as url:
+      timed('probe in bulk', probe, url, keys)
+    with cache_server(bulk_has=False, cache_root=cache_root) as url:
+      timed('probe one by one', probe, url, keys)
+      timed('fetch concurrently', fetch_concurrently, url, keys)
+      timed('fetch one by one', fetch_one_by_one, url, keys)
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,69 @@
+# coding=utf-8
+# Copyright 2016 Pants project contributors (see CONTRIBUTORS.md).
+# Licensed under the Apache License, Version 2.0 (see LICENSE).
+
+from __future__ import (absolute_import, division, generators, nested_scopes, print_function,
+                        unicode_literals, with_statement)
+
+import os
+import pkgutil
+import random
+import sys
+
+from pants.cache.artifact import CODEC_NAMES, TarballArtifact, codec
+from pants.util.contextutil import Timer, temporary_dir
+from pants.util.dirutil import safe_open, safe_rmtree
+
+
+def write_classes(artifact_root, count):
+  """Writes `count` .class files under the given root.
+
+  A real .class file is perturbed for each, so that they are not trivially compressible copies of
+  each other.
+  """
+  template = bytearray(pkgutil.get_data('pants.java.distribution', 'SystemProperties.class'))
+  rng = random.Random(0)
+  for i in range(count):
+    content = bytearray(template)
+    for j in range(0, len(content), 16):
+      content[j] = rng.randint(0, 255)
+    path = os.path.join(artifact_root, 'org', 'pantsbuild', 'pkg{}'.format(i % 50),
+                        'Class{}.class'.format(i))
+    with safe_open(path, 'wb') as f:
+      f.write(bytes(content))
+
+
+def benchmark(artifact_codec, count, compression):
+  """Inserts and extracts `count` classes, and returns the tarball's size and the seconds each
+  took."""
+  with temporary_dir() as tmpdir:
+    artifact_root = os.path.join(tmpdir, 'artifacts')
+    write_classes(artifact_root, count)
+    tarball = os.path.join(tmpdir, 'classes' + artifact_codec.extension)
+    artifact = TarballArtifact(artifact_root, tarball, compression=compression,
+                               codec=artifact_codec)
+    with Timer() as insert_timer:
+      artifact.collect([os.path.join(artifact_root, 'org')])
+
+    safe_rmtree(artifact_root)
+    with Timer() as extract_timer:
+      TarballArtifact(artifact_root, tarball).extract()
+    return os.path.getsize(tarball), insert_timer.elapsed, extract_timer.elapsed
+
+
+def main():
+  """Compares the size of the artifact of a tree of classes, and the time to insert and extract
+  it, with each codec.
+
+  Usage: tarball_artifact_benchmark.py [count] [compression level]
+  """
+  count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+  compression = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+  for name in CODEC_NAMES:
+    size, insert_secs, extract_secs = benchmark(codec(name), count, compression)
+    print('{:>5}: {} classes to {:10d} bytes, inserted in {:6.2f}s, extracted in {:6.2f}s'
+          .format(name, count, size, insert_secs, extract_secs))
+
+
+if __name__ == '__main__':
+  main()
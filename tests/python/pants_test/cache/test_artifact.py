@@ -7,10 +7,12 @@ from __future__ import (absolute_import, division, generators, nested_scopes, pr
 
 import os
 import unittest
+from contextlib import contextmanager
 
-from pants.cache.artifact import DirectoryArtifact, TarballArtifact
-from pants.util.contextutil import temporary_dir
-from pants.util.dirutil import safe_mkdir, safe_open
+from pants.cache.artifact import (GZIP, LZ4, UNCOMPRESSED, ZSTD, ArtifactError, DirectoryArtifact,
+                                  TarballArtifact, _GzipDecompressor, detect_codec)
+from pants.util.contextutil import temporary_dir, temporary_file
+from pants.util.dirutil import read_file, safe_mkdir, safe_open, safe_rmtree
 
 
 class TarballArtifactTest(unittest.TestCase):
@@ -49,6 +51,98 @@ class TarballArtifactTest(unittest.TestCase):
 
       self.assertTrue(artifact.exists())
 
+  def test_extract(self):
+    for codec in (GZIP, ZSTD, LZ4, UNCOMPRESSED):
+      with self.setup_tarball(codec) as (artifact_root, tarball, _):
+        # The codec is detected, rather than taken from the artifact.
+        artifact = TarballArtifact(artifact_root, tarball, codec=GZIP)
+        artifact.extract()
+        self.assert_extracted(artifact_root, artifact)
+
+  def test_extract_stream(self):
+    for codec in (GZIP, ZSTD, LZ4, UNCOMPRESSED):
+      with self.setup_tarball(codec) as (artifact_root, tarball, content):
+        with temporary_file() as tee:
+          artifact = TarballArtifact(artifact_root, None)
+          artifact.extract_stream(self.chunked(content), tee=tee)
+          tee.close()
+
+          self.assertEquals(read_file(tarball), read_file(tee.name))
+        self.assert_extracted(artifact_root, artifact)
+
+  def test_extract_stream_truncated(self):
+    for codec in (GZIP, ZSTD, LZ4):
+      with self.setup_tarball(codec) as (artifact_root, _, content):
+        with self.assertRaises(ArtifactError):
+          TarballArtifact(artifact_root, None).extract_stream(self.chunked(content[:-1]))
+
+  def test_extract_stream_corrupt(self):
+    for codec in (GZIP, ZSTD, LZ4):
+      with self.setup_tarball(codec) as (artifact_root, _, content):
+        # Corrupt the recorded checksum (or for gzip, size) of the uncompressed tarball.
+        content = bytearray(content)
+        content[-1] ^= 0xff
+        with self.assertRaises(ArtifactError):
+          TarballArtifact(artifact_root, None).extract_stream(self.chunked(bytes(content)))
+
+  def test_detect_codec(self):
+    for codec in (GZIP, ZSTD, LZ4, UNCOMPRESSED):
+      with self.setup_tarball(codec) as (_, _, content):
+        self.assertIs(codec, detect_codec(content))
+
+  def test_extract_stream_codec(self):
+    for codec in (GZIP, ZSTD, LZ4, UNCOMPRESSED):
+      with self.setup_tarball(codec) as (artifact_root, _, content):
+        self.assertIs(codec, TarballArtifact(artifact_root, None).extract_stream([content]))
+
+  def test_gzip_decompression_is_bounded(self):
+    compressor = GZIP.compressor(9)
+    content = compressor.compress(b'\0' * (10 * _GzipDecompressor.MAX_DECOMPRESSED_BYTES))
+    content += compressor.flush()
+    decompressor = GZIP.decompressor()
+    decompressed = [decompressor.decompress(content)]
+    while not decompressor.needs_input:
+      decompressed.append(decompressor.decompress(b''))
+    decompressed.append(decompressor.finish())
+    self.assertTrue(all(len(data) <= _GzipDecompressor.MAX_DECOMPRESSED_BYTES
+                        for data in decompressed))
+    self.assertEquals(10 * _GzipDecompressor.MAX_DECOMPRESSED_BYTES,
+                      sum(len(data) for data in decompressed))
+
+  def test_validate_level(self):
+    GZIP.validate_level(9)
+    ZSTD.validate_level(22)
+    LZ4.validate_level(16)
+    UNCOMPRESSED.validate_level(22)
+    for codec, level in ((GZIP, 10), (ZSTD, 0), (LZ4, 17)):
+      with self.assertRaises(ValueError):
+        codec.validate_level(level)
+
+  @contextmanager
+  def setup_tarball(self, codec=GZIP):
+    """Yields an emptied artifact root, and the path and content of a tarball of its files."""
+    with temporary_dir() as tmpdir:
+      artifact_root = os.path.join(tmpdir, 'artifacts')
+      path = os.path.join(artifact_root, 'a', 'b', 'some.file')
+      with safe_open(path, 'w') as f:
+        f.write('some content')
+      tarball = os.path.join(tmpdir, 'some.tgz')
+      TarballArtifact(artifact_root, tarball, codec=codec).collect([os.path.join(artifact_root,
+                                                                                'a')])
+      safe_rmtree(artifact_root)
+
+      yield artifact_root, tarball, read_file(tarball)
+
+  def assert_extracted(self, artifact_root, artifact):
+    self.assertEquals(sorted(os.path.join(artifact_root, *p) for p in [('a',), ('a', 'b'),
+                                                                       ('a', 'b', 'some.file')]),
+                      sorted(artifact.get_paths()))
+    self.assertEquals('some content', read_file(os.path.join(artifact_root, 'a', 'b',
+                                                            'some.file')))
+
+  def chunked(self, content):
+    return (content[i:i + 7] for i in range(0, len(content), 7))
+
   def touch_file_in(self, artifact_root):
     path = os.path.join(artifact_root, 'some.file')
     with safe_open(path, 'w') as f:
@@ -0,0 +1,92 @@
+# coding=utf-8
+# Copyright 2016 Pants project contributors (see CONTRIBUTORS.md).
+# Licensed under the Apache License, Version 2.0 (see LICENSE).
+
+from __future__ import (absolute_import, division, generators, nested_scopes, print_function,
+                        unicode_literals, with_statement)
+
+import os
+import unittest
+from contextlib import contextmanager
+
+from pants.cache.artifact_access_index import ArtifactAccessIndex
+from pants.util.contextutil import temporary_dir
+from pants.util.dirutil import safe_file_dump
+from pants.util.lmdbutil import close_envs
+
+
+class ArtifactAccessIndexTest(unittest.TestCase):
+
+  @contextmanager
+  def setup_index(self):
+    with temporary_dir() as store_root:
+      store_root = os.path.realpath(store_root)
+      try:
+        yield store_root, ArtifactAccessIndex(os.path.join(store_root, 'index'), store_root)
+      finally:
+        close_envs(store_root)
+
+  def write(self, index, path, size):
+    safe_file_dump(path, b'x' * size)
+    index.record(path, size)
+
+  def test_evict_least_recently_used(self):
+    with self.setup_index() as (store_root, index):
+      paths = [os.path.join(store_root, 'task', name + '.tgz') for name in ('a', 'b', 'c')]
+      for path in paths:
+        self.write(index, path, 10)
+      index.touch(paths[0])
+
+      self.assertEquals(30, index.total_size())
+      self.assertEquals(2, index.evict(15))
+      self.assertEquals([True, False, False], [os.path.exists(path) for path in paths])
+      self.assertEquals(10, index.total_size())
+      self.assertEquals(0, index.evict(15))
+
+  def test_scans_existing_artifacts(self):
+    with self.setup_index() as (store_root, index):
+      safe_file_dump(os.path.join(store_root, 'task', 'old.tgz'), b'x' * 10)
+      new = os.path.join(store_root, 'task', 'new.tgz')
+      self.write(index, new, 10)
+
+      self.assertEquals(1, index.evict(10))
+      self.assertFalse(os.path.exists(os.path.join(store_root, 'task', 'old.tgz')))
+      self.assertTrue(os.path.exists(new))
+
+  def test_retain_under(self):
+    with self.setup_index() as (store_root, index):
+      directory = os.path.join(store_root, 'task', 'target')
+      kept = os.path.join(directory, 'kept.tgz')
+      deleted = os.path.join(directory, 'deleted.tgz')
+      self.write(index, kept, 10)
+      self.write(index, deleted, 10)
+      os.unlink(deleted)
+
+      index.retain_under(directory)
+      self.assertEquals(10, index.total_size())
+
+  def test_remove(self):
+    with self.setup_index() as (store_root, index):
+      path = os.path.join(store_root, 'task', 'a.tgz')
+      self.write(index, path, 10)
+      index.remove([path])
+      self.assertEquals(0, index.total_size())
+
+  def test_total_size(self):
+    with self.setup_index() as (store_root, index):
+      paths = [os.path.join(store_root, 'task', name + '.tgz') for name in ('a', 'b', 'c')]
+      for path, size in zip(paths, (10, 20, 30)):
+        self.write(index, path, size)
+      self.assertEquals(60, index.total_size())
+
+      self.write(index, paths[0], 5)
+      index.touch(paths[2])
+      self.assertEquals(55, index.total_size())
+      os.unlink(paths[1])
+      index.remove([paths[1], paths[1]])
+      self.assertEquals(35, index.total_size())
+
+      # a was rewritten before c was read, so it is evicted first.
+      self.assertEquals(1, index.evict(30))
+      self.assertEquals([False, False, True], [os.path.exists(path) for path in paths])
+      self.assertEquals(30, index.total_size())
@@ -6,74 +6,19 @@ from __future__ import (absolute_import, division, generators, nested_scopes, pr
                         unicode_literals, with_statement)
 
 import os
-import SimpleHTTPServer
-import SocketServer
 import unittest
 from contextlib import contextmanager
-from threading import Thread
 
+from pants.cache.artifact import LZ4, ZSTD, detect_codec
+from pants.cache.artifact_access_index import ArtifactAccessIndex
 from pants.cache.artifact_cache import (NonfatalArtifactCacheError, call_insert,
                                         call_use_cached_files)
 from pants.cache.local_artifact_cache import LocalArtifactCache, TempLocalArtifactCache
 from pants.cache.pinger import BestUrlSelector, InvalidRESTfulCacheProtoError
 from pants.cache.restful_artifact_cache import RESTfulArtifactCache
 from pants.invalidation.build_invalidator import CacheKey
-from pants.util.contextutil import pushd, temporary_dir, temporary_file, temporary_file_path
-from pants.util.dirutil import safe_mkdir
-
-
-# A very trivial server that serves files under the cwd.
-class SimpleRESTHandler(SimpleHTTPServer.SimpleHTTPRequestHandler):
-  def __init__(self, request, client_address, server):
-    # The base class implements GET and HEAD.
-    # Old-style class, so we must invoke __init__ this way.
-    SimpleHTTPServer.SimpleHTTPRequestHandler.__init__(self, request, client_address, server)
-
-  def do_HEAD(self):
-    return SimpleHTTPServer.SimpleHTTPRequestHandler.do_HEAD(self)
-
-  def do_PUT(self):
-    path = self.translate_path(self.path)
-    content_length = int(self.headers.getheader('content-length'))
-    content = self.rfile.read(content_length)
-    safe_mkdir(os.path.dirname(path))
-    with open(path, 'wb') as outfile:
-      outfile.write(content)
-    self.send_response(200)
-    self.end_headers()
-
-  def do_DELETE(self):
-    path = self.translate_path(self.path)
-    if os.path.exists(path):
-      os.unlink(path)
-      self.send_response(200)
-    else:
-      self.send_error(404, 'File not found')
-    self.end_headers()
-
-
-class FailRESTHandler(SimpleHTTPServer.SimpleHTTPRequestHandler):
-  """Reject all requests"""
-
-  def __init__(self, request, client_address, server):
-    # Old-style class, so we must invoke __init__ this way.
-    SimpleHTTPServer.SimpleHTTPRequestHandler.__init__(self, request, client_address, server)
-
-  def _return_failed(self):
-    self.send_response(401, 'Forced test failure')
-    self.end_headers()
-
-  def do_HEAD(self):
-    return self._return_failed()
-
-  def do_GET(self):
-    return self._return_failed()
-
-  def do_PUT(self):
-    return self._return_failed()
-
-  def do_DELETE(self):
-    return self._return_failed()
+from pants.util.contextutil import temporary_dir, temporary_file, temporary_file_path
+from pants_test.cache.cache_server import cache_server
 
 
 TEST_CONTENT1 = b'muppet'
@@ -88,32 +33,17 @@ class TestArtifactCache(unittest.TestCase):
         yield LocalArtifactCache(artifact_root, cache_root, compression=0)
 
   @contextmanager
-  def setup_server(self, return_failed=False):
-    httpd = None
-    httpd_thread = None
-    try:
-      with temporary_dir() as cache_root:
-        with pushd(cache_root):  # SimpleRESTHandler serves from the cwd.
-          if return_failed:
-            handler = FailRESTHandler
-          else:
-            handler = SimpleRESTHandler
-          httpd = SocketServer.TCPServer(('localhost', 0), handler)
-          port = httpd.server_address[1]
-          httpd_thread = Thread(target=httpd.serve_forever)
-          httpd_thread.start()
-          yield 'http://localhost:{0}'.format(port)
-    finally:
-      if httpd:
-        httpd.shutdown()
-      if httpd_thread:
-        httpd_thread.join()
+  def setup_server(self, return_failed=False, bulk_has=True, accept_post=False):
+    with cache_server(return_failed=return_failed, bulk_has=bulk_has,
+                      accept_post=accept_post) as base_url:
+      yield base_url
 
   @contextmanager
-  def setup_rest_cache(self, local=None, return_failed=False):
+  def setup_rest_cache(self, local=None, return_failed=False, bulk_has=True, accept_post=False):
     with temporary_dir() as artifact_root:
       local = local or TempLocalArtifactCache(artifact_root, 0)
-      with self.setup_server(return_failed=return_failed) as base_url:
+      with self.setup_server(return_failed=return_failed, bulk_has=bulk_has,
+                             accept_post=accept_post) as base_url:
         yield RESTfulArtifactCache(artifact_root, BestUrlSelector([base_url]), local)
 
   @contextmanager
@@ -178,6 +108,60 @@ class TestArtifactCache(unittest.TestCase):
       artifact_cache.delete(key)
       self.assertFalse(artifact_cache.has(key))
 
+  def test_has_many(self):
+    with self.setup_local_cache() as artifact_cache:
+      self.do_test_has_many(artifact_cache)
+
+    with self.setup_rest_cache() as artifact_cache:
+      self.do_test_has_many(artifact_cache)
+
+    with self.setup_rest_cache(bulk_has=False) as artifact_cache:
+      self.do_test_has_many(artifact_cache)
+      self.assertFalse(artifact_cache._bulk_has_supported)
+
+    # An unrelated answer to a bulk probe is not taken to mean that every artifact is missing.
+    with self.setup_rest_cache(bulk_has=False, accept_post=True) as artifact_cache:
+      self.do_test_has_many(artifact_cache)
+      self.assertFalse(artifact_cache._bulk_has_supported)
+
+  def do_test_has_many(self, artifact_cache):
+    keys = [CacheKey('muppet_key{}'.format(i), 'fake_hash') for i in range(3)]
+    with self.setup_test_file(artifact_cache.artifact_root) as path:
+      self.assertEqual([False, False, False], artifact_cache.has_many(keys))
+      artifact_cache.insert(keys[0], [path])
+      artifact_cache.insert(keys[2], [path])
+      self.assertEqual([True, False, True], artifact_cache.has_many(keys))
+
+  def test_has_many_failed(self):
+    with self.setup_rest_cache(return_failed=True) as artifact_cache:
+      with self.assertRaises(NonfatalArtifactCacheError):
+        artifact_cache.has_many([CacheKey('muppet_key', 'fake_hash')])
+
+  def test_use_cached_files_many(self):
+    with self.setup_local_cache() as artifact_cache:
+      self.assertIsNone(artifact_cache.use_cached_files_many([]))
+
+    with self.setup_rest_cache() as artifact_cache:
+      keys = [CacheKey('muppet_key{}'.format(i), 'fake_hash') for i in range(3)]
+      with self.setup_test_file(artifact_cache.artifact_root) as path:
+        artifact_cache.insert(keys[0], [path])
+        artifact_cache.insert(keys[2], [path])
+        with open(path, 'w') as outfile:
+          outfile.write(TEST_CONTENT2)
+
+        fetched = artifact_cache.use_cached_files_many([(key, None) for key in keys])
+        self.assertEqual([True, False, True], [bool(result) for result in fetched])
+        with open(path, 'r') as infile:
+          self.assertEquals(TEST_CONTENT1, infile.read())
+
+  def test_use_cached_files_many_failed(self):
+    with self.setup_rest_cache(return_failed=True) as artifact_cache:
+      keys = [CacheKey('muppet_key{}'.format(i), 'fake_hash') for i in range(2)]
+      self.assertEqual([False, False],
+                       [bool(result)
+                        for result in artifact_cache.use_cached_files_many([(key, None)
+                                                                            for key in keys])])
+
   def test_local_backed_remote_cache(self):
     """make sure that the combined cache finds what it should and that it backfills"""
     with self.setup_server() as url:
@@ -221,6 +205,34 @@ class TestArtifactCache(unittest.TestCase):
           self.assertTrue(local.has(key))
           self.assertTrue(bool(local.use_cached_files(key)))
 
+  def test_local_backed_remote_cache_with_other_codec(self):
+    """Artifacts are named for their codec, and recompressed when backfilled with another."""
+    with self.setup_server() as url:
+      with temporary_dir() as artifact_root:
+        with temporary_dir() as cache_root:
+          local = LocalArtifactCache(artifact_root, cache_root, compression=1, codec=LZ4)
+          combined = RESTfulArtifactCache(artifact_root, BestUrlSelector([url]), local, codec=ZSTD)
+          key = CacheKey('muppet_key', 'fake_hash')
+          with self.setup_test_file(artifact_root) as path:
+            combined.insert(key, [path])
+            self.assertTrue(local._cache_file_for_key(key).endswith('.tar.lz4'))
+            self.assertEquals('muppet_key/fake_hash.tar.zst', combined._path_for_key(key))
+
+            local.delete(key)
+            with open(path, 'w') as outfile:
+              outfile.write(TEST_CONTENT2)
+            self.assertTrue(bool(combined.use_cached_files(key)))
+            with open(path, 'r') as infile:
+              self.assertEquals(TEST_CONTENT1, infile.read())
+            with open(local._cache_file_for_key(key), 'rb') as infile:
+              self.assertIs(LZ4, detect_codec(infile.read()))
+
+            # The recompressed artifact holds the same file.
+            os.unlink(path)
+            self.assertTrue(bool(local.use_cached_files(key)))
+            with open(path, 'r') as infile:
+              self.assertEquals(TEST_CONTENT1, infile.read())
+
   def test_multiproc(self):
     key = CacheKey('muppet_key', 'fake_hash')
 
@@ -280,6 +292,26 @@ class TestArtifactCache(unittest.TestCase):
             [False])
           self.assertTrue(os.path.exists(canary))
 
+  def test_local_cache_evict(self):
+    with temporary_dir() as artifact_root:
+      with temporary_dir() as store_root:
+        access_index = ArtifactAccessIndex(os.path.join(store_root, 'index'), store_root)
+        caches = [LocalArtifactCache(artifact_root, os.path.join(store_root, task), compression=0,
+                                     max_size=1, access_index=access_index)
+                  for task in ('task1', 'task2')]
+        keys = [CacheKey('muppet_key{}'.format(i), 'fake_hash') for i in range(2)]
+        with self.setup_test_file(artifact_root) as path:
+          caches[0].insert(keys[0], [path])
+          caches[1].insert(keys[1], [path])
+          self.assertTrue(caches[0].use_cached_files(keys[0]))
+
+          # The least recently used artifact across both caches is evicted first.
+          access_index.EVICT_BATCH_SIZE = 1
+          tarball_size = os.path.getsize(caches[0]._cache_file_for_key(keys[0]))
+          caches[0]._max_size = tarball_size
+          caches[0].evict()
+          self.assertEquals([True, False], [caches[0].has(keys[0]), caches[1].has(keys[1])])
+
   def test_corruptted_cached_file_cleaned_up(self):
     key = CacheKey('muppet_key', 'fake_hash')
 
@@ -296,3 +328,4 @@ class TestArtifactCache(unittest.TestCase):
 
         self.assertFalse(artifact_cache.use_cached_files(key))
         self.assertFalse(os.path.exists(tarfile))
+
@@ -9,10 +9,12 @@ import os
 
 from mock import Mock
 
+from pants.cache.artifact import LZ4, UNCOMPRESSED, ZSTD
 from pants.cache.cache_setup import (CacheFactory, CacheSetup, CacheSpec, CacheSpecFormatError,
                                      EmptyCacheSpecError, InvalidCacheSpecError,
                                      LocalCacheSpecRequiredError, RemoteCacheSpecRequiredError,
                                      TooManyCacheSpecsError)
+from pants.cache.content_addressed_artifact_cache import ContentAddressedArtifactCache
 from pants.cache.local_artifact_cache import LocalArtifactCache
 from pants.cache.resolver import Resolver
 from pants.cache.restful_artifact_cache import RESTfulArtifactCache
@@ -76,6 +78,10 @@ class TestCacheSetup(BaseTest):
     options.read_from = [self.EMPTY_URI]
     options.write_to = [self.EMPTY_URI]
     options.compression_level = 1
+    options.local_codec = 'gzip'
+    options.remote_codec = 'gzip'
+    options.local_store = 'tarball'
+    options.local_store_max_size = None
     self.cache_factory = CacheFactory(options=options, log=MockLogger(),
                                  stable_name='test', resolver=self.resolver)
 
@@ -179,6 +185,48 @@ class TestCacheSetup(BaseTest):
       with self.assertRaises(TooManyCacheSpecsError):
         mk_cache([tmpdir, self.REMOTE_URI_1, self.REMOTE_URI_2])
 
+  def test_codecs(self):
+    with temporary_dir() as tmpdir:
+      self.set_options_for_scope(CacheSetup.subscope(DummyTask.options_scope),
+                                 read_from=[tmpdir, 'http://localhost/bar'],
+                                 local_codec='lz4', remote_codec='zstd')
+      self.context(for_task_types=[DummyTask])  # Force option initialization.
+      cache = CacheSetup.create_cache_factory_for_task(DummyTask,
+                                                       pinger=self.pinger).get_read_cache()
+      self.assertIsInstance(cache, RESTfulArtifactCache)
+      self.assertIs(LZ4, cache._localcache.codec)
+      self.assertIs(ZSTD, cache._uploadcache.codec)
+
+  def test_compression_level(self):
+    def mk_cache(local_codec, compression_level):
+      self.set_options_for_scope(CacheSetup.subscope(DummyTask.options_scope),
+                                 read_from=[tmpdir], local_codec=local_codec,
+                                 compression_level=compression_level)
+      self.context(for_task_types=[DummyTask])  # Force option initialization.
+      return CacheSetup.create_cache_factory_for_task(DummyTask,
+                                                      pinger=self.pinger).get_read_cache()
+
+    with temporary_dir() as tmpdir:
+      self.assertIs(ZSTD, mk_cache('zstd', 19).codec)
+      self.assertIs(UNCOMPRESSED, mk_cache('none', 19).codec)
+      with self.assertRaises(ValueError):
+        mk_cache('gzip', 19)
+      with self.assertRaises(ValueError):
+        mk_cache('zstd', 0)
+
+  def test_content_addressed_local_store(self):
+    with temporary_dir() as tmpdir:
+      self.set_options_for_scope(CacheSetup.subscope(DummyTask.options_scope),
+                                 read_from=[tmpdir], local_store='content-addressed',
+                                 local_store_max_size=1024)
+      self.context(for_task_types=[DummyTask])  # Force option initialization.
+      cache = CacheSetup.create_cache_factory_for_task(DummyTask,
+                                                       pinger=self.pinger).get_read_cache()
+      self.assertIsInstance(cache, ContentAddressedArtifactCache)
+      self.assertEquals(os.path.join(os.path.realpath(tmpdir),
+                                     CacheFactory.CONTENT_ADDRESSED_STORE_DIR),
+                        cache.store_root)
+
   def test_read_cache_available(self):
     self.assertEquals(None, self.cache_factory.read_cache_available())
 
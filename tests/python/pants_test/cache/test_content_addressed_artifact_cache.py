@@ -0,0 +1,194 @@
+# coding=utf-8
+# Copyright 2016 Pants project contributors (see CONTRIBUTORS.md).
+# Licensed under the Apache License, Version 2.0 (see LICENSE).
+
+from __future__ import (absolute_import, division, generators, nested_scopes, print_function,
+                        unicode_literals, with_statement)
+
+import os
+import stat
+import unittest
+from contextlib import contextmanager
+
+from pants.cache.artifact_cache import call_insert, call_use_cached_files
+from pants.cache.content_addressed_artifact_cache import ContentAddressedArtifactCache
+from pants.cache.pinger import BestUrlSelector
+from pants.cache.restful_artifact_cache import RESTfulArtifactCache
+from pants.invalidation.build_invalidator import CacheKey
+from pants.util.contextutil import temporary_dir
+from pants.util.dirutil import read_file, safe_file_dump, safe_rmtree
+from pants_test.cache.cache_server import cache_server
+
+
+class ContentAddressedArtifactCacheTest(unittest.TestCase):
+
+  @contextmanager
+  def setup_cache(self, namespace='task', **kwargs):
+    with temporary_dir() as artifact_root:
+      with temporary_dir() as store_root:
+        yield ContentAddressedArtifactCache(artifact_root, store_root, namespace, 0, **kwargs)
+
+  def write_results(self, artifact_root, name, files):
+    results_dir = os.path.join(artifact_root, name)
+    for relpath, content in files.items():
+      safe_file_dump(os.path.join(results_dir, relpath), content)
+    return results_dir
+
+  def blobs(self, cache):
+    return sorted(digest for digest, _ in cache._blobs())
+
+  def test_insert_and_use(self):
+    for materialization in ContentAddressedArtifactCache.MATERIALIZATIONS:
+      with self.setup_cache(materialization=materialization) as cache:
+        key = CacheKey('a', 'hash')
+        results_dir = self.write_results(cache.artifact_root, 'a', {'A.class': 'a',
+                                                                    'pkg/B.class': 'b'})
+        os.mkdir(os.path.join(results_dir, 'empty'))
+
+        self.assertFalse(cache.has(key))
+        self.assertFalse(cache.use_cached_files(key))
+        cache.insert(key, [results_dir])
+        self.assertTrue(cache.has(key))
+
+        safe_rmtree(results_dir)
+        self.assertTrue(cache.use_cached_files(key, results_dir))
+        self.assertEquals('a', read_file(os.path.join(results_dir, 'A.class')))
+        self.assertEquals('b', read_file(os.path.join(results_dir, 'pkg', 'B.class')))
+        self.assertTrue(os.path.isdir(os.path.join(results_dir, 'empty')))
+
+        cache.delete(key)
+        self.assertFalse(cache.has(key))
+
+  def test_hardlinks_only_read_only_files(self):
+    with self.setup_cache(materialization='hardlink') as cache:
+      key = CacheKey('a', 'hash')
+      results_dir = self.write_results(cache.artifact_root, 'a', {'A.class': 'a', 'B.class': 'b',
+                                                                  'c': 'c'})
+      os.chmod(os.path.join(results_dir, 'B.class'), 0o444)
+      os.chmod(os.path.join(results_dir, 'c'), 0o555)
+      cache.insert(key, [results_dir])
+
+      safe_rmtree(results_dir)
+      self.assertTrue(cache.use_cached_files(key, results_dir))
+      self.assertEquals(2, os.stat(os.path.join(results_dir, 'B.class')).st_nlink)
+
+      # Read-only files of other modes are not linked, so they keep their mode.
+      c_stat = os.stat(os.path.join(results_dir, 'c'))
+      self.assertEquals((1, 0o555), (c_stat.st_nlink, stat.S_IMODE(c_stat.st_mode)))
+
+      # Writable files are not linked to their blob, so writing to them leaves the store intact.
+      self.assertEquals(1, os.stat(os.path.join(results_dir, 'A.class')).st_nlink)
+      safe_file_dump(os.path.join(results_dir, 'A.class'), 'changed')
+      safe_rmtree(results_dir)
+      self.assertTrue(cache.use_cached_files(key, results_dir))
+      self.assertEquals('a', read_file(os.path.join(results_dir, 'A.class')))
+
+  def test_insert_does_not_gc(self):
+    with self.setup_cache(max_size=0) as cache:
+      cache.gc = lambda: self.fail('Unexpectedly collected garbage on insert.')
+      key = CacheKey('a', 'hash')
+      cache.insert(key, [self.write_results(cache.artifact_root, 'a', {'A.class': 'a'})])
+      self.assertTrue(cache.has(key))
+
+      del cache.gc
+      cache.evict()
+      self.assertFalse(cache.has(key))
+
+  def test_dedup(self):
+    with self.setup_cache() as cache:
+      first = self.write_results(cache.artifact_root, 'first', {'A.class': 'a', 'B.class': 'b'})
+      second = self.write_results(cache.artifact_root, 'second', {'A.class': 'a', 'C.class': 'c'})
+      cache.insert(CacheKey('first', 'hash'), [first])
+      cache.insert(CacheKey('second', 'hash'), [second])
+
+      # The identical A.class is stored once.
+      self.assertEquals(3, len(self.blobs(cache)))
+
+  def test_shared_store(self):
+    with self.setup_cache(namespace='one') as one:
+      two = ContentAddressedArtifactCache(one.artifact_root, one.store_root, 'two', 0)
+      key = CacheKey('a', 'hash')
+      results_dir = self.write_results(one.artifact_root, 'a', {'A.class': 'a'})
+      one.insert(key, [results_dir])
+
+      # Artifacts are distinguished by namespace, but their blobs are shared.
+      self.assertFalse(two.has(key))
+      two.insert(key, [results_dir])
+      self.assertEquals(1, len(self.blobs(one)))
+
+  def test_corrupt_manifest(self):
+    with self.setup_cache() as cache:
+      key = CacheKey('a', 'hash')
+      cache.insert(key, [self.write_results(cache.artifact_root, 'a', {'A.class': 'a'})])
+      manifest_path = cache._manifest_path(key)
+      with open(manifest_path, 'r+') as fp:
+        fp.truncate(10)
+
+      self.assertFalse(cache.use_cached_files(key))
+      self.assertFalse(os.path.exists(manifest_path))
+
+  def test_missing_blob(self):
+    with self.setup_cache() as cache:
+      key = CacheKey('a', 'hash')
+      results_dir = self.write_results(cache.artifact_root, 'a', {'A.class': 'a'})
+      cache.insert(key, [results_dir])
+      for _, path in cache._blobs():
+        os.unlink(path)
+
+      self.assertFalse(cache.use_cached_files(key))
+      self.assertFalse(cache.has(key))
+
+  def test_gc_evicts_least_recently_used(self):
+    with self.setup_cache(max_size=3) as cache:
+      keys = [CacheKey(name, 'hash') for name in ('a', 'b', 'c')]
+      for i, key in enumerate(keys):
+        results_dir = self.write_results(cache.artifact_root, key.id, {'X.class': key.id * 2})
+        cache.insert(key, [results_dir])
+        # Order the uses explicitly, rather than relying on mtime resolution.
+        os.utime(cache._manifest_path(key), (i, i))
+      os.utime(cache._manifest_path(keys[0]), (10, 10))
+      # Let unreferenced blobs be collected immediately.
+      cache.GC_GRACE_SECS = -1
+
+      stats = cache.gc()
+
+      self.assertEquals([True, False, False], [cache.has(key) for key in keys])
+      self.assertEquals(1, len(self.blobs(cache)))
+      self.assertEquals({'num_artifacts': 1, 'num_files': 1, 'num_blobs': 1, 'blob_bytes': 2,
+                         'evicted_artifacts': 2},
+                        stats)
+      self.assertEquals(stats, cache.store_stats())
+
+  def test_gc_keeps_recent_unreferenced_blobs(self):
+    with self.setup_cache() as cache:
+      key = CacheKey('a', 'hash')
+      cache.insert(key, [self.write_results(cache.artifact_root, 'a', {'A.class': 'a'})])
+      cache.delete(key)
+
+      # The blob may belong to an artifact being inserted concurrently.
+      cache.gc()
+      self.assertEquals(1, len(self.blobs(cache)))
+
+  def test_multiproc(self):
+    with self.setup_cache() as cache:
+      key = CacheKey('a', 'hash')
+      results_dir = self.write_results(cache.artifact_root, 'a', {'A.class': 'a'})
+      self.assertEquals([False], map(call_use_cached_files, [(cache, key, None)]))
+      map(call_insert, [(cache, key, [results_dir], False)])
+      self.assertEquals([True], map(call_use_cached_files, [(cache, key, None)]))
+
+  def test_backs_remote_cache(self):
+    with cache_server() as url:
+      with self.setup_cache() as local:
+        remote = RESTfulArtifactCache(local.artifact_root, BestUrlSelector([url]), local)
+        key = CacheKey('a', 'hash')
+        results_dir = self.write_results(local.artifact_root, 'a', {'A.class': 'a'})
+        remote.insert(key, [results_dir])
+        self.assertTrue(local.has(key))
+
+        # A hit in the remote cache backfills the store.
+        local.delete(key)
+        safe_rmtree(results_dir)
+        self.assertTrue(remote.use_cached_files(key))
+        self.assertTrue(local.has(key))
+        self.assertEquals('a', read_file(os.path.join(results_dir, 'A.class')))
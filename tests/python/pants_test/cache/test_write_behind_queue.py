@@ -0,0 +1,176 @@
+# coding=utf-8
+# Copyright 2016 Pants project contributors (see CONTRIBUTORS.md).
+# Licensed under the Apache License, Version 2.0 (see LICENSE).
+
+from __future__ import (absolute_import, division, generators, nested_scopes, print_function,
+                        unicode_literals, with_statement)
+
+import threading
+import time
+import unittest
+
+from pants.cache.artifact_cache import ArtifactCache, NonfatalArtifactCacheError
+from pants.cache.write_behind_queue import ArtifactWriteBehindQueue
+from pants.invalidation.build_invalidator import CacheKey
+
+
+class RecordingCache(ArtifactCache):
+  """An in-memory cache that records its inserts, and can be made to fail or block them."""
+
+  def __init__(self, failures=0):
+    super(RecordingCache, self).__init__('/does/not/exist')
+    self.inserted = []
+    self.evictions = 0
+    self.failures = failures
+    self.present = set()
+    self.unblocked = threading.Event()
+    self.unblocked.set()
+
+  def has(self, cache_key):
+    return cache_key in self.present
+
+  def insert(self, cache_key, paths, overwrite=False, raise_nonfatal=False):
+    self.unblocked.wait()
+    if self.failures:
+      self.failures -= 1
+      raise NonfatalArtifactCacheError('Failed to insert {}.'.format(cache_key))
+    self.inserted.append((cache_key, paths))
+    self.present.add(cache_key)
+    return True
+
+  def evict(self):
+    self.evictions += 1
+
+
+class ArtifactWriteBehindQueueTest(unittest.TestCase):
+
+  def key(self, i):
+    return CacheKey('target{}'.format(i), 'fake_hash')
+
+  def test_uploads(self):
+    cache = RecordingCache()
+    queue = ArtifactWriteBehindQueue(num_workers=2)
+    for i in range(10):
+      queue.submit(cache, self.key(i), ['path{}'.format(i)])
+    self.assertEquals(0, queue.flush(timeout_secs=10))
+
+    self.assertEquals(sorted((self.key(i), ['path{}'.format(i)]) for i in range(10)),
+                      sorted(cache.inserted))
+    self.assertGreaterEqual(cache.evictions, 1)
+    stats = queue.get_stats()
+    self.assertEquals(10, stats['uploaded'])
+    self.assertEquals(10, stats['upload_latency_secs']['count'])
+
+  def test_coalesces_duplicate_keys(self):
+    cache = RecordingCache()
+    cache.unblocked.clear()
+    queue = ArtifactWriteBehindQueue(num_workers=1, batch_size=1)
+    # The first upload is taken by the worker, which blocks on it; the rest queue behind it.
+    queue.submit(cache, self.key(0), ['first'])
+    queue.submit(cache, self.key(1), ['stale'])
+    queue.submit(cache, self.key(1), ['fresh'])
+    cache.unblocked.set()
+    queue.flush(timeout_secs=10)
+
+    self.assertIn((self.key(1), ['fresh']), cache.inserted)
+    self.assertNotIn((self.key(1), ['stale']), cache.inserted)
+    self.assertEquals(1, queue.get_stats()['coalesced'])
+
+  def test_skips_present_artifacts(self):
+    cache = RecordingCache()
+    cache.present.add(self.key(0))
+    queue = ArtifactWriteBehindQueue(num_workers=0)
+    queue.submit(cache, self.key(0), ['path'])
+    queue.submit(cache, self.key(1), ['path'])
+    queue.submit(cache, self.key(0), ['path'], overwrite=True)
+
+    self.assertEquals([self.key(1), self.key(0)], [key for key, _ in cache.inserted])
+    self.assertEquals(1, queue.get_stats()['skipped'])
+
+  def test_retries(self):
+    cache = RecordingCache(failures=2)
+    queue = ArtifactWriteBehindQueue(num_workers=0, max_attempts=3, retry_delay_secs=0)
+    queue.submit(cache, self.key(0), ['path'])
+
+    self.assertEquals([(self.key(0), ['path'])], cache.inserted)
+    stats = queue.get_stats()
+    self.assertEquals(2, stats['retries'])
+    self.assertEquals(1, stats['uploaded'])
+
+  def test_gives_up(self):
+    cache = RecordingCache(failures=2)
+    queue = ArtifactWriteBehindQueue(num_workers=0, max_attempts=2, retry_delay_secs=0)
+    queue.submit(cache, self.key(0), ['path'])
+
+    self.assertEquals([], cache.inserted)
+    self.assertEquals(1, queue.get_stats()['failed'])
+
+  def test_back_pressure(self):
+    cache = RecordingCache()
+    cache.unblocked.clear()
+    queue = ArtifactWriteBehindQueue(num_workers=1, max_pending=1, batch_size=1)
+    queue.submit(cache, self.key(0), ['path'])
+    queue.submit(cache, self.key(1), ['path'])
+
+    # The queue is full, so this submit blocks until the worker takes an upload from it.
+    submitted = threading.Event()
+
+    def submit():
+      queue.submit(cache, self.key(2), ['path'])
+      submitted.set()
+    threading.Thread(target=submit).start()
+    self.assertFalse(submitted.wait(0.1))
+
+    cache.unblocked.set()
+    self.assertTrue(submitted.wait(10))
+    queue.flush(timeout_secs=10)
+    self.assertEquals(3, len(cache.inserted))
+    self.assertEquals(1, queue.get_stats()['max_queue_depth'])
+
+  def test_flush_timeout(self):
+    cache = RecordingCache()
+    cache.unblocked.clear()
+    queue = ArtifactWriteBehindQueue(num_workers=1, batch_size=1)
+    # The first upload is started by the worker, which blocks on it; the second is never started.
+    queue.submit(cache, self.key(0), ['path'])
+    queue.submit(cache, self.key(1), ['path'])
+    unblock = threading.Timer(0.5, cache.unblocked.set)
+    unblock.start()
+    self.addCleanup(unblock.cancel)
+
+    # Only the upload that had not started is abandoned: the started one is waited for.
+    self.assertEquals(1, queue.flush(timeout_secs=0.1))
+    self.assertEquals([(self.key(0), ['path'])], cache.inserted)
+    stats = queue.get_stats()
+    self.assertEquals(1, stats['abandoned'])
+    self.assertEquals(1, stats['uploaded'])
+
+  def test_flush_timeout_abandons_rest_of_batch(self):
+    cache = RecordingCache()
+    cache.unblocked.clear()
+    queue = ArtifactWriteBehindQueue(num_workers=1, batch_size=10)
+    queue._start_workers = lambda: None
+    for i in range(3):
+      queue.submit(cache, self.key(i), ['path'])
+    # Start the worker only once all three uploads are queued, so that it takes them as one batch.
+    del queue._start_workers
+    with queue._cond:
+      queue._start_workers()
+    while queue.get_stats()['queue_depth']:
+      time.sleep(0.01)
+    unblock = threading.Timer(0.5, cache.unblocked.set)
+    unblock.start()
+    self.addCleanup(unblock.cancel)
+
+    self.assertEquals(2, queue.flush(timeout_secs=0.1))
+    self.assertEquals([(self.key(0), ['path'])], cache.inserted)
+
+  def test_flush_timeout_cuts_retries_short(self):
+    cache = RecordingCache(failures=10)
+    queue = ArtifactWriteBehindQueue(num_workers=1, max_attempts=10, retry_delay_secs=60)
+    queue.submit(cache, self.key(0), ['path'])
+
+    # The upload is waiting to retry, which the flush interrupts rather than waiting a minute.
+    self.assertEquals(0, queue.flush(timeout_secs=0.1))
+    self.assertEquals([], cache.inserted)
+    self.assertEquals(1, queue.get_stats()['failed'])
@@ -0,0 +1,84 @@
+# coding=utf-8
+# Copyright 2016 Pants project contributors (see CONTRIBUTORS.md).
+# Licensed under the Apache License, Version 2.0 (see LICENSE).
+
+from __future__ import (absolute_import, division, generators, nested_scopes, print_function,
+                        unicode_literals, with_statement)
+
+import multiprocessing
+import os
+import sys
+
+from pants.cache.artifact_cache import call_insert
+from pants.cache.local_artifact_cache import LocalArtifactCache
+from pants.cache.write_behind_queue import ArtifactWriteBehindQueue
+from pants.invalidation.build_invalidator import CacheKey
+from pants.util.contextutil import Timer, temporary_dir
+from pants_test.cache.tarball_artifact_benchmark import write_classes
+
+
+def example_artifacts(artifact_root, count, classes_per_artifact):
+  """Writes `count` artifacts of classes under the given root, and returns their keys and paths."""
+  artifacts = []
+  for i in range(count):
+    classes_root = os.path.join(artifact_root, 'target{}'.format(i))
+    write_classes(classes_root, classes_per_artifact)
+    artifacts.append((CacheKey('target{}'.format(i), 'fake_hash'), [classes_root]))
+  return artifacts
+
+
+def insert_with_processes(cache, artifacts, workers):
+  """Inserts the artifacts in a pool of processes, as tasks did before the write-behind queue.
+
+  Returns the seconds the caller was blocked for.
+  """
+  pool = multiprocessing.Pool(workers)
+  try:
+    with Timer() as timer:
+      pool.map(call_insert, [(cache, key, paths, True) for key, paths in artifacts])
+    return timer.elapsed
+  finally:
+    pool.close()
+    pool.join()
+
+
+def insert_with_threads(cache, artifacts, workers):
+  """Inserts the artifacts through a write-behind queue.
+
+  Returns the seconds the caller was blocked for by submitting, and the seconds until the queue was
+  flushed.
+  """
+  queue = ArtifactWriteBehindQueue(num_workers=workers)
+  with Timer() as timer:
+    for key, paths in artifacts:
+      queue.submit(cache, key, paths, overwrite=True)
+    submitted = timer.elapsed
+    queue.flush()
+  return submitted, timer.elapsed
+
+
+def main():
+  """Compares inserting artifacts in a pool of processes with inserting them through the
+  write-behind queue's threads.
+
+  Usage: write_behind_queue_benchmark.py [count] [classes per artifact] [workers]
+  """
+  count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+  classes_per_artifact = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+  workers = int(sys.argv[3]) if len(sys.argv) > 3 else multiprocessing.cpu_count()
+  with temporary_dir() as artifact_root:
+    artifacts = example_artifacts(artifact_root, count, classes_per_artifact)
+    with temporary_dir() as cache_root:
+      cache = LocalArtifactCache(artifact_root, cache_root, compression=5)
+      secs = insert_with_processes(cache, artifacts, workers)
+      print('{:>9}: {} artifacts, {} workers: blocked for {:7.2f}s'
+            .format('processes', count, workers, secs))
+    with temporary_dir() as cache_root:
+      cache = LocalArtifactCache(artifact_root, cache_root, compression=5)
+      submitted_secs, flushed_secs = insert_with_threads(cache, artifacts, workers)
+      print('{:>9}: {} artifacts, {} workers: blocked for {:7.2f}s, flushed in {:7.2f}s'
+            .format('threads', count, workers, submitted_secs, flushed_secs))
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,75 @@
+# coding=utf-8
+# Copyright 2016 Pants project contributors (see CONTRIBUTORS.md).
+# Licensed under the Apache License, Version 2.0 (see LICENSE).
+
+from __future__ import (absolute_import, division, generators, nested_scopes, print_function,
+                        unicode_literals, with_statement)
+
+import multiprocessing
+import resource
+import sys
+import time
+
+from pants.build_graph.address import Address
+from pants.engine.nodes import Return, SelectNode, Waiting
+from pants.engine.scheduler import CompactProductGraph, ProductGraph
+from pants_test.engine.examples.planners import Classpath, JavaSources
+
+
+GRAPHS = {
+  'default': ProductGraph,
+  'compact': CompactProductGraph,
+}
+
+
+def example_node(i):
+  """Returns the i'th Node of the benchmark graph, alternating between example product types."""
+  address = Address('src/java/org/pantsbuild/example{}'.format(i // 100), 'target{}'.format(i))
+  return SelectNode(address, Classpath if i % 2 else JavaSources, None, None)
+
+
+def build_graph(graph, count):
+  """Builds a graph of `count` Nodes the way the scheduler would, and returns it.
+
+  Each Node first waits on two children (as a binary tree), and every right child also waits on
+  its left sibling: that edge points at a Node that was created earlier, but is not an ancestor.
+  Nodes are then completed bottom up, one level of the tree at a time.
+  """
+  nodes = [example_node(i) for i in range(count)]
+  for i, node in enumerate(nodes):
+    dependencies = [nodes[c] for c in (2 * i + 1, 2 * i + 2) if c < count]
+    if i > 0 and i % 2 == 0:
+      dependencies.append(nodes[i - 1])
+    graph.update_state(node, Waiting(dependencies))
+  for i in sorted(range(count), key=lambda i: (-(i + 1).bit_length(), i)):
+    graph.update_state(nodes[i], Return(nodes[i].product))
+  return graph
+
+
+def benchmark(graph_type, count):
+  """Builds a graph in this process, and returns its size, the seconds it took and the KB it used."""
+  rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+  start = time.time()
+  graph = build_graph(GRAPHS[graph_type](), count)
+  secs = time.time() - start
+  rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before
+  return len(graph), secs, rss_kb
+
+
+def main():
+  """Compares the time and memory to build a large graph with each ProductGraph implementation.
+
+  Each graph is built in its own process, so that the memory of one doesn't affect the other.
+
+  Usage: graph_benchmark.py [count]
+  """
+  count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+  for graph_type in sorted(GRAPHS):
+    pool = multiprocessing.Pool(1)
+    node_count, secs, rss_kb = pool.apply(benchmark, (graph_type, count))
+    pool.close()
+    print('{:>8}: {} nodes in {:7.2f}s, {:8d}KB'.format(graph_type, node_count, secs, rss_kb))
+
+
+if __name__ == '__main__':
+  main()
@@ -405,7 +405,7 @@ class ExampleTable(SymbolTable):
             'inferred_scala': ScalaInferredDepsSources}
 
 
-def setup_json_scheduler(build_root, inline_nodes=True):
+def setup_json_scheduler(build_root, inline_nodes=True, compact_graph=False):
   """Return a build graph and scheduler configured for BLD.json files under the given build root.
 
   :rtype :class:`pants.engine.scheduler.LocalScheduler`
@@ -514,4 +514,5 @@ def setup_json_scheduler(build_root, inline_nodes=True):
                         project_tree,
                         graph_lock=None,
                         inline_nodes=inline_nodes,
-                        graph_validator=GraphValidator(symbol_table_cls))
+                        graph_validator=GraphValidator(symbol_table_cls),
+                        compact_graph=compact_graph)
@@ -0,0 +1,63 @@
+# coding=utf-8
+# Copyright 2016 Pants project contributors (see CONTRIBUTORS.md).
+# Licensed under the Apache License, Version 2.0 (see LICENSE).
+
+from __future__ import (absolute_import, division, generators, nested_scopes, print_function,
+                        unicode_literals, with_statement)
+
+import sys
+import timeit
+
+from pants.base.project_tree import Dir, File
+from pants.build_graph.address import Address
+from pants.engine.fs import DirectoryListing, Files, Path, Paths
+from pants.engine.nodes import FilesystemNode, Return, SelectNode
+from pants.engine.storage import Key, Storage
+
+
+def engine_objects(count):
+  """Returns a list of objects resembling the nodes and states that the engine stores."""
+  objs = []
+  for i in range(count):
+    directory = Dir('src/python/pants/engine/dir{}'.format(i))
+    paths = tuple(Path('{}/file{}.py'.format(directory.path, j),
+                       File('{}/file{}.py'.format(directory.path, j)))
+                  for j in range(10))
+    objs.append(FilesystemNode(directory, DirectoryListing, None))
+    objs.append(Return(DirectoryListing(directory, paths, True)))
+    objs.append(SelectNode(directory, Paths, None, None))
+    objs.append(SelectNode(Address('src/python/pants/engine', 'target{}'.format(i)), Files,
+                           (('java', 'java8'),), 'java'))
+  return objs
+
+
+def benchmark(objs, serializer, digest, repeat):
+  """Returns the best times to put and to get the given objects, in seconds, and their size."""
+  storage = Storage.create(debug=False, serializer=serializer, digest=digest)
+  keys = storage.puts(objs)
+  put_secs = min(timeit.repeat(
+    lambda: Storage.create(debug=False, serializer=serializer, digest=digest).puts(objs),
+    number=1, repeat=repeat))
+  get_secs = min(timeit.repeat(lambda: storage.gets(keys), number=1, repeat=repeat))
+  size = sum(len(storage._contents.get(key.digest)) for key in keys)
+  return put_secs, get_secs, size
+
+
+def main():
+  """Compares the time to put and get engine objects with each serializer and digest.
+
+  Usage: storage_benchmark.py [count] [repeat]
+  """
+  count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+  repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+  objs = engine_objects(count)
+  print('{} objects, best of {}:'.format(len(objs), repeat))
+  for serializer in sorted(Storage.SERIALIZERS):
+    for digest in sorted(Key.DIGESTS):
+      put_secs, get_secs, size = benchmark(objs, serializer, digest, repeat)
+      print('  {:>7} {:>9}: put {:7.2f}ms  get {:7.2f}ms  {:9d} bytes'
+            .format(serializer, digest, put_secs * 1000, get_secs * 1000, size))
+
+
+if __name__ == '__main__':
+  main()
@@ -6,6 +6,7 @@ from __future__ import (absolute_import, division, generators, nested_scopes, pr
                         unicode_literals, with_statement)
 
 import os
+import signal
 import unittest
 from contextlib import closing, contextmanager
 
@@ -13,11 +14,14 @@ from concurrent.futures import Future
 from mock import call, create_autospec
 
 from pants.build_graph.address import Address
-from pants.engine.engine import (LocalMultiprocessEngine, LocalSerialEngine, SerializationError,
-                                 ThreadHybridEngine)
+from pants.base.project_tree import Dir, File
+from pants.engine.engine import (LatencyHistogram, LocalMultiprocessEngine, LocalSerialEngine,
+                                 PoolUtilization, SerializationError, ThreadHybridEngine)
+from pants.engine.fs import DirectoryListing, FileContent
 from pants.engine.nodes import FilesystemNode, Return, SelectNode
 from pants.engine.scheduler import Promise
 from pants.engine.storage import Cache, Storage
+from pants.util.contextutil import temporary_dir
 from pants_test.engine.examples.planners import Classpath, setup_json_scheduler
 
 
@@ -49,13 +53,15 @@ class EngineTest(unittest.TestCase):
       yield e
 
   @contextmanager
-  def hybrid_engine(self, pool_size=None):
+  def hybrid_engine(self, pool_size=None, eager=False, concurrency_limits=None, io_batch_size=16):
     async_nodes = (FilesystemNode,)
     storage = Storage.create(debug=True, in_memory=False)
     cache = Cache.create(storage=storage)
     with closing(ThreadHybridEngine(self.scheduler, storage,
                                     threaded_node_types=async_nodes, cache=cache,
-                                    pool_size=pool_size, debug=True)) as e:
+                                    pool_size=pool_size, debug=True, eager=eager,
+                                    concurrency_limits=concurrency_limits,
+                                    io_batch_size=io_batch_size)) as e:
       e.start()
       yield e
 
@@ -63,6 +69,21 @@ class EngineTest(unittest.TestCase):
     with closing(LocalSerialEngine(self.scheduler)) as engine:
       self.assert_engine(engine)
 
+  def test_serial_engine_persistent_cache(self):
+    with temporary_dir() as cache_dir:
+      with closing(LocalSerialEngine(self.scheduler, Storage.create(path=cache_dir, in_memory=False),
+                                     use_cache=True)) as engine:
+        self.assert_engine(engine)
+        self.assertEquals(0, engine.cache_stats().hits)
+        self.assertGreater(engine.cache_stats().misses, 0)
+
+      # A fresh scheduler and engine find the results of the first one in the cache.
+      self.setUp()
+      with closing(LocalSerialEngine(self.scheduler, Storage.create(path=cache_dir, in_memory=False),
+                                     use_cache=True)) as engine:
+        self.assert_engine(engine)
+        self.assertGreater(engine.cache_stats().hits, 0)
+
   @unittest.skip('https://github.com/pantsbuild/pants/issues/3510')
   def test_multiprocess_engine_multi(self):
     with self.multiprocessing_engine() as engine:
@@ -89,30 +110,106 @@ class EngineTest(unittest.TestCase):
     with self.hybrid_engine(pool_size=2) as engine:
       self.assert_engine(engine)
 
-  def test_second_pending_future(self):
-    """Validate we handle cache/step correctly
-
-    Verify we don't raise a key error when 1 Node finishes cache/step
-    before another Node.  Also verify that success is only called once
-    for each Node.
-    """
-    result_cache = create_autospec(Future)
-    result_cache2 = create_autospec(Future)
-    result_step = create_autospec(Future)
-    result_cache2.result.return_value = (2, 'cache 2')
-    result_cache.result.return_value = (1, 'cache 1')
-    result_step.result.return_value = (1, 'step 1')
+  def test_hybrid_engine_eager(self):
+    with self.hybrid_engine(pool_size=2, eager=True) as engine:
+      self.assert_engine(engine)
+      summary = engine.pool_utilization.summary()
+      self.assertGreater(summary['samples'], 0)
+      self.assertLessEqual(summary['max_in_flight'], 2)
+
+  def test_hybrid_engine_eager_concurrency_limits(self):
+    with self.hybrid_engine(pool_size=4, eager=True,
+                            concurrency_limits={FilesystemNode: 1}) as engine:
+      self.assert_engine(engine)
+      self.assertEquals(1, engine.pool_utilization.summary()['max_in_flight'])
+
+  def test_pool_utilization(self):
+    utilization = PoolUtilization(pool_size=2)
+    self.assertEquals(0.0, utilization.summary()['mean_utilization'])
+    utilization._samples = [(0.0, 2, 3), (1.0, 1, 0), (3.0, 0, 0)]
+    summary = utilization.summary()
+    # Two slots busy for one second, then one slot busy for two seconds: 4 of 6 slot-seconds.
+    self.assertAlmostEqual(4 / 6, summary['mean_utilization'])
+    self.assertEquals(2, summary['max_in_flight'])
+    self.assertEquals(3, summary['max_pending'])
+
+  def test_hybrid_engine_default_threaded_node_types(self):
+    with closing(ThreadHybridEngine(self.scheduler, Storage.create(debug=False))) as engine:
+      self.assertTrue(engine._is_async_node(FilesystemNode(Dir('a'), DirectoryListing, None)))
+      self.assertFalse(engine._is_async_node(SelectNode(self.java, Classpath, None, None)))
+      self.assert_engine(engine)
+
+  def test_hybrid_engine_after_fork(self):
+    # As pantsd does, use the engine (which starts its pool) and then fork and use it in the child.
+    with closing(ThreadHybridEngine(self.scheduler, Storage.create(debug=False),
+                                    pool_size=2)) as engine:
+      self.assert_engine(engine)
+      pid = os.fork()
+      if pid == 0:
+        status = 1
+        try:
+          # The parent's pool has no threads in the child: a hang would be killed by the alarm.
+          signal.alarm(30)
+          self.scheduler.product_graph.invalidate()
+          self.assert_engine(engine)
+          engine.close()
+          status = 0
+        finally:
+          os._exit(status)
+      _, status = os.waitpid(pid, 0)
+      self.assertTrue(os.WIFEXITED(status))
+      self.assertEquals(0, os.WEXITSTATUS(status))
+
+      # The parent's pool is unaffected.
+      self.scheduler.product_graph.invalidate()
+      self.assert_engine(engine)
+
+  def test_hybrid_engine_latencies(self):
+    with self.hybrid_engine(pool_size=2) as engine:
+      self.assert_engine(engine)
+      self.assertIn(DirectoryListing, engine.latencies)
+      self.assertGreater(engine.latencies[DirectoryListing].summary()['count'], 0)
+
+  def test_hybrid_engine_unbatched(self):
+    with self.hybrid_engine(pool_size=2, io_batch_size=1) as engine:
+      self.assert_engine(engine)
+
+  def test_batch_key(self):
+    with self.hybrid_engine(pool_size=2) as engine:
+      self.assertEquals(engine._batch_key(FilesystemNode(File('a/b/1'), FileContent, None)),
+                        engine._batch_key(FilesystemNode(Dir('a/b/c'), DirectoryListing, None)))
+      self.assertNotEquals(engine._batch_key(FilesystemNode(File('a/b/1'), FileContent, None)),
+                           engine._batch_key(FilesystemNode(File('a/1'), FileContent, None)))
+
+  def test_await_batch(self):
+    """Validate that awaiting a batch completes each of its Steps exactly once."""
+    result_batch = create_autospec(Future)
+    result_batch.result.return_value = [(1, 'step 1', FileContent, 0.001),
+                                        (2, 'step 2', FileContent, 0.002)]
     promise = create_autospec(Promise)
 
     in_flight = {1: promise, 2: promise}
     with self.hybrid_engine(pool_size=2) as engine:
-      engine._processed_queue.put(result_cache)
-      engine._processed_queue.put(result_step)
-      engine._processed_queue.put(result_cache2)
-      engine._await_one(in_flight)
+      engine._batches_in_flight = 1
+      engine._processed_queue.put(result_batch)
       engine._await_one(in_flight)
 
-      promise.success.assert_has_calls([call('cache 1'), call('cache 2')])
+      promise.success.assert_has_calls([call('step 1'), call('step 2')])
+      self.assertEquals({}, in_flight)
+      self.assertEquals(0, engine._batches_in_flight)
+      self.assertEquals(2, engine.latencies[FileContent].summary()['count'])
+
+  def test_latency_histogram(self):
+    histogram = LatencyHistogram()
+    self.assertEquals(0.0, histogram.summary()['mean_ms'])
+    for secs in (0.0005, 0.0015, 0.003, 0.0035):
+      histogram.record(secs)
+    # Buckets are bounded by powers of two milliseconds.
+    self.assertEquals([(1, 1), (2, 1), (4, 2)], histogram.buckets)
+    summary = histogram.summary()
+    self.assertEquals(4, summary['count'])
+    self.assertAlmostEqual(2.125, summary['mean_ms'])
+    self.assertAlmostEqual(3.5, summary['max_ms'])
 
   @unittest.skip('https://github.com/pantsbuild/pants/issues/3510')
   def test_rerun_with_cache(self):
@@ -6,14 +6,18 @@ from __future__ import (absolute_import, division, generators, nested_scopes, pr
                         unicode_literals, with_statement)
 
 import os
+import pickle
 import unittest
 from abc import abstractmethod
 from contextlib import contextmanager
 
-from pants.base.project_tree import Dir, Link
+import mock
+
+from pants.base.project_tree import Dir, File, Link
 from pants.base.scm_project_tree import ScmProjectTree
-from pants.engine.fs import (DirectoryListing, Dirs, Files, FilesContent, FilesDigest, PathGlobs,
-                             ReadLink)
+from pants.engine.fs import (DirectoryListing, Dirs, FileContent, Files, FilesContent, FilesDigest,
+                             MappedContent, PathGlobs, ReadLink, RecursiveDirectoryListing,
+                             file_content, file_digest)
 from pants.engine.nodes import FilesystemNode
 from pants.util.meta import AbstractClass
 from pants_test.engine.scheduler_test_base import SchedulerTestBase
@@ -105,6 +109,12 @@ class FSTestBase(SchedulerTestBase, AbstractClass):
     self.assert_walk(Files, ['**/3.t*t'], ['a/3.txt', 'd.ln/3.txt'])
     self.assert_walk(Files, ['**/*.zzz'], [])
 
+  def test_walk_recursive_through_named_link(self):
+    # Links named by a component of the remainder are matched as well as traversed.
+    self.assert_walk(Files, ['**/c.ln/*'], ['c.ln/1.txt', 'c.ln/2'])
+    self.assert_walk(Files, ['**/d.ln/b/1.txt'], ['d.ln/b/1.txt'])
+    self.assert_walk(Files, ['**/b/*.txt'], ['a/b/1.txt', 'd.ln/b/1.txt'])
+
   def test_walk_recursive_all(self):
     self.assert_walk(Files, ['*', '**/*'], ['4.txt',
                                             'a/3.txt',
@@ -147,6 +157,9 @@ class FSTestBase(SchedulerTestBase, AbstractClass):
     self.assert_walk(Files, ['a/**/b/1.txt'], ['a/b/1.txt'])
     self.assert_walk(Files, ['a/**/2'], ['a/b/2'])
 
+  def test_walk_recursive_nested_doublestar(self):
+    self.assert_walk(Files, ['**/b/**/*.txt'], ['a/b/1.txt', 'd.ln/b/1.txt'])
+
   def test_walk_recursive_directory(self):
     self.assert_walk(Dirs, ['*'], ['a', 'c.ln', 'd.ln'])
     self.assert_walk(Dirs, ['*/*'], ['a/b', 'd.ln/b'])
@@ -196,6 +209,14 @@ class FSTestBase(SchedulerTestBase, AbstractClass):
         (Dir('a/b'), DirectoryListing),
       ])
 
+  def test_nodes_recursive(self):
+    # The subtree below a recursive wildcard is listed in one step.
+    self.assert_fsnodes(Files, ['a/b/**'], [
+        (Dir(''), DirectoryListing),
+        (Dir('a'), DirectoryListing),
+        (Dir('a/b'), RecursiveDirectoryListing),
+      ])
+
   def test_nodes_symlink_globbed_file(self):
     self.assert_fsnodes(Files, ['d.ln/b/*.txt'], [
         # NB: Needs to scandir every Dir on the way down to track whether
@@ -214,6 +235,87 @@ class PosixFSTest(unittest.TestCase, FSTestBase):
   def mk_project_tree(self, build_root_src):
     yield self.mk_fs_tree(build_root_src)
 
+  def test_file_content_mapped(self):
+    project_tree = self.mk_fs_tree(self._original_src)
+    with mock.patch.object(MappedContent, 'THRESHOLD', 1):
+      mapped = file_content(project_tree, File('4.txt'))
+      digest = file_digest(project_tree, File('4.txt'))
+    read = file_content(project_tree, File('4.txt'))
+
+    self.assertIsInstance(mapped.content, MappedContent)
+    self.assertEquals(b'four\n', bytes(mapped.content))
+    with mapped.content.view() as view:
+      self.assertEquals(b'four\n', view[:])
+    self.assertEquals(5, len(mapped.content))
+    self.assertEquals(read.digest, mapped.digest)
+    self.assertEquals(read.digest, digest.digest)
+
+    # Only the digest is pickled, not the content.
+    loaded = pickle.loads(pickle.dumps(mapped))
+    self.assertEquals(mapped, loaded)
+    self.assertEquals(b'four\n', bytes(loaded.content))
+
+  def test_file_content_mapped_changed(self):
+    with self.mk_project_tree(self._original_src) as project_tree:
+      with mock.patch.object(MappedContent, 'THRESHOLD', 1):
+        content = file_content(project_tree, File('4.txt')).content
+      pickled = pickle.dumps(content)
+      # An edit that keeps the size of the file is detected, as well as one that doesn't.
+      for changed in (b'FOUR\n', b'four\nfive\n'):
+        with open(os.path.join(project_tree.build_root, '4.txt'), 'wb') as fh:
+          fh.write(changed)
+        for stale in (content, pickle.loads(pickled)):
+          with self.assertRaises(IOError):
+            stale.read()
+          with self.assertRaises(IOError):
+            with stale.view():
+              pass
+
+  def test_file_content_unmapped(self):
+    project_tree = self.mk_fs_tree(self._original_src)
+    self.assertEquals(FileContent('4.txt', b'four\n'), file_content(project_tree, File('4.txt')))
+
+  def test_recursive_invalidation_subjects(self):
+    self.assertEquals([Dir('a/b'), Dir('a'), Dir(''), Dir('')],
+                      list(FilesystemNode.generate_recursive_subjects(['a/b/1.txt', '4.txt'])))
+
+
+  def test_recursive_listing_invalidation(self):
+    project_tree = self.mk_fs_tree(self._original_src)
+    scheduler = self.mk_scheduler(project_tree=project_tree)
+    listing = FilesystemNode(Dir('a'), RecursiveDirectoryListing, None)
+
+    def list_files():
+      self.execute(scheduler, Files, self.specs('', 'a/**'))
+      self.assertTrue(scheduler.product_graph.is_complete(listing))
+
+    def invalidate(filenames):
+      """Returns whether the listing was invalidated by the given files, and lists again."""
+      scheduler.invalidate_files(filenames, incremental=True)
+      invalidated = not scheduler.product_graph.is_complete(listing)
+      list_files()
+      return invalidated
+
+    list_files()
+
+    # Editing the content of a file doesn't change the listings that contain it.
+    with open(os.path.join(project_tree.build_root, 'a/b/1.txt'), 'ab') as fh:
+      fh.write(b'more\n')
+    self.assertFalse(invalidate(['a/b/1.txt']))
+
+    # But creating, deleting or renaming one does.
+    with open(os.path.join(project_tree.build_root, 'a/b/new.txt'), 'wb') as fh:
+      fh.write(b'new\n')
+    self.assertTrue(invalidate(['a/b/new.txt']))
+    os.unlink(os.path.join(project_tree.build_root, 'a/b/new.txt'))
+    self.assertTrue(invalidate(['a/b/new.txt']))
+    os.rename(os.path.join(project_tree.build_root, 'a/b/1.txt'),
+              os.path.join(project_tree.build_root, 'a/b/renamed.txt'))
+    self.assertTrue(invalidate(['a/b/1.txt', 'a/b/renamed.txt']))
+
+    # A file whose Stat is unknown invalidates them too.
+    scheduler.product_graph.invalidate_files(['a/b/renamed.txt'], incremental=True, stats={})
+    self.assertFalse(scheduler.product_graph.is_complete(listing))
 
 @unittest.skipIf(git_version() < MIN_REQUIRED_GIT_VERSION,
                  'The GitTest requires git >= {}.'.format(MIN_REQUIRED_GIT_VERSION))
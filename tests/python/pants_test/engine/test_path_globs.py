@@ -9,7 +9,8 @@ import unittest
 from os.path import join
 
 from pants.base.project_tree import Dir
-from pants.engine.fs import PathDirWildcard, PathGlobs, PathRoot, PathWildcard
+from pants.engine.fs import (PathDirWildcard, PathGlobs, PathRecursiveWildcard, PathRoot,
+                             PathWildcard)
 
 
 def pw(relative_to, *args):
@@ -20,6 +21,10 @@ def pdw(relative_to, *args):
   return PathDirWildcard(Dir(relative_to), relative_to, *args)
 
 
+def prw(relative_to, *args):
+  return PathRecursiveWildcard(Dir(relative_to), relative_to, *args)
+
+
 class PathGlobsTest(unittest.TestCase):
 
   def assert_pg_equals(self, pathglobs, relative_to, filespecs):
@@ -64,14 +69,25 @@ class PathGlobsTest(unittest.TestCase):
     name = 'Blah.java'
     subdir = 'foo'
     wildcard = '**'
-    self.assert_pg_equals([pdw(subdir, '*', join(wildcard, name)), pw(subdir, name)],
+    self.assert_pg_equals([prw(subdir, name)],
                           subdir,
                           [join(wildcard, name)])
+    self.assert_pg_equals([prw(subdir, join('bar', name))],
+                          subdir,
+                          [join(wildcard, 'bar', name)])
+
+  def test_nested_recursive_dir_wildcard(self):
+    subdir = 'foo'
+    remainder = join('bar', '**', 'Blah.java')
+    self.assert_pg_equals([pdw(subdir, '*', join('**', remainder)),
+                           pdw(subdir, 'bar', join('**', 'Blah.java'))],
+                          subdir,
+                          [join('**', remainder)])
 
   def test_trailing_doublestar(self):
     subdir = 'foo'
     wildcard = '**'
-    self.assert_pg_equals([pdw(subdir, '*', wildcard), pw(subdir, '*')],
+    self.assert_pg_equals([prw(subdir, '*')],
                           subdir,
                           [wildcard])
 
@@ -7,16 +7,19 @@ from __future__ import (absolute_import, division, generators, nested_scopes, pr
 
 import functools
 import os
+import shutil
+import time
 import unittest
 
 from pants.base.cmd_line_spec_parser import CmdLineSpecParser
+from pants.base.specs import SingleAddress
 from pants.build_graph.address import Address
 from pants.engine.addressable import Addresses
 from pants.engine.engine import LocalSerialEngine
 from pants.engine.nodes import (ConflictingProducersError, DependenciesNode, Return, SelectNode,
                                 Throw, Waiting)
-from pants.engine.scheduler import (CompletedNodeException, IncompleteDependencyException,
-                                    ProductGraph)
+from pants.engine.scheduler import (CompactProductGraph, CompletedNodeException,
+                                    IncompleteDependencyException, ProductGraph)
 from pants.util.contextutil import temporary_dir
 from pants_test.engine.examples.planners import (ApacheThriftJavaConfiguration, Classpath, GenGoal,
                                                  Jar, JavaSources, ThriftSources,
@@ -246,6 +249,70 @@ class SchedulerTest(unittest.TestCase):
     # And that an subdirectory address is not.
     self.assertNotIn(self.managed_guava, root_value)
 
+  def test_incremental_invalidation(self):
+    with temporary_dir() as tmpdir:
+      build_root = os.path.join(tmpdir, 'build_root')
+      shutil.copytree(os.path.join(os.path.dirname(__file__), 'examples', 'scheduler_inputs'),
+                      build_root)
+      scheduler = setup_json_scheduler(build_root, inline_nodes=False)
+      engine = LocalSerialEngine(scheduler)
+      build_request = scheduler.build_request(goals=['compile'],
+                                              subjects=[SingleAddress('src/java/codegen/simple',
+                                                                      'simple')])
+
+      def steps_to_execute():
+        step_id = scheduler._step_id
+        result = engine.execute(build_request)
+        self.assertIsNone(result.error)
+        return scheduler._step_id - step_id, result.root_products
+
+      initial_steps, initial_products = steps_to_execute()
+      self.assertEquals((0, initial_products), steps_to_execute())
+
+      # A whitespace-only edit re-reads the file, but nothing that depends on its parsed content.
+      build_file = os.path.join(build_root, 'src/java/codegen/simple/BLD.json')
+      with open(build_file, 'ab') as fp:
+        fp.write(b'\n\n')
+      changed = ['src/java/codegen/simple/BLD.json']
+      self.assertGreater(scheduler.invalidate_files(changed, incremental=True), 0)
+      incremental_steps, incremental_products = steps_to_execute()
+      self.assertEquals(initial_products, incremental_products)
+      self.assertGreater(incremental_steps, 0)
+
+      # A non-incremental invalidation recomputes all of the dependents.
+      scheduler.invalidate_files(changed)
+      invalidated_steps, invalidated_products = steps_to_execute()
+      self.assertEquals(initial_products, invalidated_products)
+      self.assertLess(incremental_steps, invalidated_steps)
+
+  def test_incremental_invalidation_of_unrequested_roots(self):
+    with temporary_dir() as tmpdir:
+      build_root = os.path.join(tmpdir, 'build_root')
+      shutil.copytree(os.path.join(os.path.dirname(__file__), 'examples', 'scheduler_inputs'),
+                      build_root)
+      scheduler = setup_json_scheduler(build_root, inline_nodes=False)
+      engine = LocalSerialEngine(scheduler)
+      subjects = [SingleAddress('src/java/codegen/simple', 'simple')]
+      compile_request = scheduler.build_request(goals=['compile'], subjects=subjects)
+      gen_request = scheduler.build_request(goals=['gen'], subjects=subjects)
+      for build_request in (compile_request, gen_request):
+        self.assertIsNone(engine.execute(build_request).error)
+
+      build_file = os.path.join(build_root, 'src/java/codegen/simple/BLD.json')
+      with open(build_file, 'ab') as fp:
+        fp.write(b'\n\n')
+      scheduler.invalidate_files(['src/java/codegen/simple/BLD.json'], incremental=True)
+      entries = scheduler.product_graph._nodes
+      compile_roots = [entries[root] for root in compile_request.roots]
+      self.assertTrue(all(entry.dirty for entry in compile_roots))
+
+      # Executing one request verifies or recomputes only what it depends on: the roots of the
+      # other stay dirty until they are requested.
+      self.assertIsNone(engine.execute(gen_request).error)
+      self.assertTrue(all(entry.dirty for entry in compile_roots))
+      self.assertIsNone(engine.execute(compile_request).error)
+      self.assertFalse(any(entry.dirty for entry in compile_roots))
+
   def test_scheduler_visualize(self):
     spec = self.spec_parser.parse_spec('3rdparty/jvm:')
     build_request = self.request_specs(['list'], spec)
@@ -380,6 +447,51 @@ class ProductGraphTest(unittest.TestCase):
     invalidated_count = self.pg.invalidate(lambda node, _: node == 'I')
     self.assertEquals(invalidated_count, 9)
 
+  def test_mark_dirty(self):
+    self._mk_chain(self.pg, list('ABC'))
+    self.assertEquals(3, self.pg.mark_dirty(lambda node, _: node == 'C'))
+    entries = self.pg._nodes
+    self.assertIsNone(entries['C'].state)
+    self.assertTrue(entries['B'].dirty)
+    self.assertTrue(entries['A'].dirty)
+    self.assertFalse(self.pg.is_complete('A'))
+
+    # Until C is recomputed, B can't be verified.
+    self.assertEquals([entries['C']], self.pg.verify_entry(entries['B']))
+
+  def test_mark_dirty_early_cutoff(self):
+    self._mk_chain(self.pg, list('ABC'))
+    previous_b_state = self.pg.state('B')
+    self.pg.mark_dirty(lambda node, _: node == 'C')
+
+    # C is recomputed to an equal value: B and then A are clean without recomputation.
+    self.pg.update_state('C', Return([]))
+    entries = self.pg._nodes
+    self.assertEquals([], self.pg.verify_entry(entries['B']))
+    self.assertTrue(self.pg.is_complete('B'))
+    self.assertIs(previous_b_state, self.pg.state('B'))
+    self.assertEquals([], self.pg.verify_entry(entries['A']))
+    self.assertTrue(self.pg.is_complete('A'))
+
+  def test_mark_dirty_changed(self):
+    self._mk_chain(self.pg, list('ABC'))
+    self.pg.mark_dirty(lambda node, _: node == 'C')
+
+    # C is recomputed to a different value: B is reset, and A stays dirty until B completes.
+    self.pg.update_state('C', Return(['changed']))
+    entries = self.pg._nodes
+    self.assertEquals([], self.pg.verify_entry(entries['B']))
+    self.assertIsNone(self.pg.state('B'))
+    self.assertFalse(entries['B'].dirty)
+    self.assertEquals(set(), set(self.pg.dependencies_of('B')))
+    self.assertEquals([entries['B']], self.pg.verify_entry(entries['A']))
+
+    # B is recomputed to its previous value: A is clean.
+    self.pg.update_state('B', Waiting(['C']))
+    self.pg.update_state('B', Return(['C']))
+    self.assertEquals([], self.pg.verify_entry(entries['A']))
+    self.assertTrue(self.pg.is_complete('A'))
+
   def test_invalidate_partial_identity_check(self):
     # Create a graph with a chain from A..Z.
     chain = self._mk_chain(self.pg, list('ABCDEFGHIJKLMNOPQRSTUVWXYZ'))
@@ -404,3 +516,66 @@ class ProductGraphTest(unittest.TestCase):
             associated_entry.node in before_nodes,
             'node:\n{}\nis still associated with:\n{}\nin {}'.format(node, associated_entry.node, entry)
           )
+
+
+class CompactProductGraphTest(ProductGraphTest):
+  def setUp(self):
+    self.pg = CompactProductGraph(validator=lambda _: True)
+
+  def assert_ordered(self):
+    for node, dependencies in self.pg.dependencies():
+      for dependency in dependencies:
+        self.assertLess(self.pg._nodes[node].order, self.pg._nodes[dependency].order)
+
+  def test_order_maintained(self):
+    # Edges are added against the creation order of the Nodes, forcing reorders.
+    chain = list('ABCDEFGH')
+    for node in chain:
+      self.pg.ensure_entry(node)
+    for dependency, dependent in zip(chain, chain[1:]):
+      self.pg.update_state(dependent, Waiting([dependency]))
+      self.assert_ordered()
+    self.pg.update_state('A', Waiting(['H']))
+    self.assertEquals({'H'}, self.pg.cyclic_dependencies_of('A'))
+    self.assert_ordered()
+
+  def test_ids_reused(self):
+    self._mk_chain(self.pg, list('ABC'))
+    ids = {self.pg._nodes[n].id for n in 'ABC'}
+    self.pg.invalidate()
+    self._mk_chain(self.pg, list('DEF'))
+    self.assertEquals(ids, {self.pg._nodes[n].id for n in 'DEF'})
+    self.assertEquals(['E'], list(self.pg.dependencies_of('D')))
+    self.assertEquals(['D'], list(self.pg.dependents_of('E')))
+
+  def test_hub_fan_in(self):
+    # Many dependents of one hub: each edge to the hub must be removable without scanning the rest.
+    dependents = ['dependent{}'.format(i) for i in range(20000)]
+    for dependent in dependents:
+      self.pg.update_state(dependent, Waiting(['hub']))
+    hub_entry = self.pg._nodes['hub']
+    self.assertEquals(set(dependents), set(self.pg.dependents_of('hub')))
+    self.assertIs(set, type(hub_entry._dependent_ids))
+
+    start = time.time()
+    self.pg.mark_dirty(lambda node, _: node != 'hub')
+    # Scanning an array of dependents for each one took minutes for this many.
+    self.assertLess(time.time() - start, 30)
+    self.assertEquals([], list(self.pg.dependents_of('hub')))
+
+    # Edges to the hub can be added again, and it can be invalidated with them.
+    self.pg.update_state(dependents[0], Waiting(['hub']))
+    self.assertEquals([dependents[0]], list(self.pg.dependents_of('hub')))
+    self.assertEquals(2, self.pg.invalidate(lambda node, _: node == 'hub'))
+
+  def test_scheduler(self):
+    build_root = os.path.join(os.path.dirname(__file__), 'examples', 'scheduler_inputs')
+    results = []
+    for compact_graph in (False, True):
+      scheduler = setup_json_scheduler(build_root, inline_nodes=False, compact_graph=compact_graph)
+      build_request = scheduler.build_request(goals=['compile'],
+                                              subjects=[Address.parse('src/java/codegen/simple')])
+      result = LocalSerialEngine(scheduler).execute(build_request)
+      self.assertIsNone(result.error)
+      results.append((result.root_products, dict(scheduler.product_graph.walk(build_request.roots))))
+    self.assertEquals(results[0], results[1])
@@ -0,0 +1,89 @@
+# coding=utf-8
+# Copyright 2016 Pants project contributors (see CONTRIBUTORS.md).
+# Licensed under the Apache License, Version 2.0 (see LICENSE).
+
+from __future__ import (absolute_import, division, generators, nested_scopes, print_function,
+                        unicode_literals, with_statement)
+
+import unittest
+from collections import OrderedDict, namedtuple
+
+from pants.base.project_tree import Dir, File
+from pants.build_graph.address import Address
+from pants.engine.fs import DirectoryListing, Path, Paths
+from pants.engine.nodes import Return, SelectNode
+from pants.engine.objects import SerializationError
+from pants.engine.serializers import PickleSerializer, TaggedSerializer
+from pants.engine.storage import Storage
+
+
+class SerializersTest(unittest.TestCase):
+
+  VALUES = [
+    None, True, False, 0, 255, 256, -1, 2 ** 63 - 1, -2 ** 63, 2 ** 64, 1L, 1.5, -0.0,
+    b'', b'bytes', b'x' * 300, '', 'ünïcode', 'y' * 300,
+    (), (1,), (1.0,), [1, [2, (3,)]], list(range(300)),
+    {}, {'a': 1, b'b': [2]}, set(), {1, 2, 3}, frozenset(['a', 'b']),
+    Dir('a'), File('a/b'), Path('a/b', File('a/b')),
+    Return(DirectoryListing(Dir('a'), (Path('a/b', File('a/b')),), True)),
+    SelectNode(Address('a', 'b'), Paths, None, None),
+    Paths, OrderedDict([('b', 1), ('a', 2)]),
+  ]
+
+  def assert_round_trips(self, serializer, values):
+    for value, blob in zip(values, serializer.dumps_many(values)):
+      loaded = serializer.loads(blob)
+      self.assertEquals(value, loaded)
+      self.assertIs(type(value), type(loaded))
+
+  def test_pickle(self):
+    self.assert_round_trips(PickleSerializer(), self.VALUES)
+
+  def test_tagged(self):
+    self.assert_round_trips(TaggedSerializer(), self.VALUES)
+    # Types are referenced by name, so other instances can load them.
+    blobs = TaggedSerializer().dumps_many(self.VALUES)
+    self.assertEquals(self.VALUES, [TaggedSerializer().loads(blob) for blob in blobs])
+
+  def test_tagged_is_compact(self):
+    value = Return(DirectoryListing(Dir('a'), (Path('a/b', File('a/b')),), True))
+    self.assertLess(len(TaggedSerializer().dumps(value)),
+                    len(PickleSerializer().dumps_many([value])[0]))
+
+  def test_tagged_unordered_is_deterministic(self):
+    serializer = TaggedSerializer()
+    forwards = dict((i, i) for i in range(100))
+    backwards = {}
+    for i in reversed(range(100)):
+      backwards[i] = i
+    self.assertEquals(serializer.dumps(forwards), serializer.dumps(backwards))
+    self.assertEquals(serializer.dumps(set(range(100))), serializer.dumps(set(range(99, -1, -1))))
+
+  def test_tagged_unlocatable_type(self):
+    Local = namedtuple('Local', ['a'])
+    with self.assertRaises(SerializationError):
+      TaggedSerializer().dumps(Local(1))
+
+  def test_tagged_corrupt(self):
+    serializer = TaggedSerializer()
+    blob = serializer.dumps((1, 'a'))
+    with self.assertRaises(SerializationError):
+      serializer.loads(blob[:-1])
+    with self.assertRaises(SerializationError):
+      serializer.loads(blob + b'N')
+
+  def test_storage(self):
+    for serializer in Storage.SERIALIZERS:
+      for digest in ('sha1', 'identity'):
+        storage = Storage.create(serializer=serializer, digest=digest, debug=False)
+        keys = storage.puts(self.VALUES)
+        self.assertEquals(self.VALUES, storage.gets(keys))
+        self.assertEquals(keys, storage.puts(list(self.VALUES)))
+
+  def test_storage_invalid(self):
+    with self.assertRaises(ValueError):
+      Storage.create(serializer='bogus')
+    with self.assertRaises(ValueError):
+      Storage.create(digest='bogus')
+    with self.assertRaises(ValueError):
+      Storage.create(in_memory=False, digest='identity')
@@ -5,12 +5,16 @@
 from __future__ import (absolute_import, division, generators, nested_scopes, print_function,
                         unicode_literals, with_statement)
 
+import os
+import subprocess
+import sys
 import unittest
 from contextlib import closing
 
 from pants.base.project_tree import Dir, File
 from pants.engine.scheduler import StepRequest, StepResult
-from pants.engine.storage import Cache, InvalidKeyError, Key, Lmdb, Storage
+from pants.engine.storage import Cache, InvalidKeyError, Key, Lmdb, Storage, StorageFullError
+from pants.util.contextutil import temporary_dir
 
 
 class StorageTest(unittest.TestCase):
@@ -46,6 +50,68 @@ class StorageTest(unittest.TestCase):
       # Write the same key again will not overwrite.
       self.assertFalse(kvs.put(self.TEST_KEY, self.TEST_VALUE))
 
+  def test_lmdb_key_value_store_many(self):
+    lmdb = Lmdb.create()[0]
+    with closing(lmdb) as kvs:
+      kvs.put(self.TEST_KEY, self.TEST_VALUE)
+
+      # Only keys that do not exist yet are written.
+      written = kvs.put_many([(self.TEST_KEY, b'other'), (b'key2', b'value2')])
+      self.assertEquals(1, written)
+      self.assertEquals(0, kvs.put_many([]))
+
+      values = kvs.get_many([self.TEST_KEY, b'key2', b'missing'])
+      self.assertEquals([self.TEST_VALUE, b'value2'], [v.getvalue() for v in values[:2]])
+      self.assertIsNone(values[2])
+
+  def test_lmdb_max_size(self):
+    with temporary_dir() as path:
+      with closing(Lmdb.create(path=path, max_size=1024 * 1024)[0]) as kvs:
+        kvs.put(self.TEST_KEY, self.TEST_VALUE)
+      # A database within its bound is reopened as is.
+      with closing(Lmdb.create(path=path, max_size=1024 * 1024)[0]) as kvs:
+        self.assertEquals(self.TEST_VALUE, kvs.get(self.TEST_KEY).getvalue())
+        for i in range(40):
+          kvs.put(b'key{}'.format(i), b'x' * 32 * 1024)
+      # One that has outgrown it is emptied.
+      with closing(Lmdb.create(path=path, max_size=1024 * 1024)[0]) as kvs:
+        self.assertIsNone(kvs.get(self.TEST_KEY))
+
+      # Writes beyond twice the bound fail.
+      with closing(Lmdb.create(path=path, max_size=1024 * 1024)[0]) as kvs:
+        with self.assertRaises(StorageFullError):
+          for i in range(128):
+            kvs.put(b'key{}'.format(i), b'x' * 32 * 1024)
+
+  def test_key_hash_deterministic(self):
+    # Keys are persisted, so their hashes must not vary with the interpreter's hash randomization.
+    for digest_name in sorted(Key.DIGESTS):
+      key = Key.create(self.TEST_VALUE, str, digest_fn=Key.DIGESTS[digest_name])
+      script = ('from pants.engine.storage import Key; '
+                'print(hash(Key.create(b"world", str, digest_fn=Key.DIGESTS["{}"])))'
+                .format(digest_name))
+      output = subprocess.check_output([sys.executable, '-R', '-c', script],
+                                       env=dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path)))
+      self.assertEquals(hash(key), int(output))
+
+  def test_storage_puts(self):
+    with closing(self.storage) as storage:
+      objs = [self.TEST_PATH, self.TEST_PATH2, File('/foo'), self.TEST_PATH, (1,), (1.0,), [1, 2]]
+      keys = storage.puts(objs)
+      self.assertEquals(len(objs), len(keys))
+      # Equal objects share a key, unless they serialize differently.
+      self.assertEquals(keys[0], keys[2])
+      self.assertEquals(keys[0], keys[3])
+      self.assertNotEqual(keys[4], keys[5])
+      self.assertEquals(keys, [storage.put(obj) for obj in objs])
+
+      values = storage.gets(keys)
+      self.assertEquals(objs, values)
+      self.assertIsInstance(values[5][0], float)
+
+      with self.assertRaises(InvalidKeyError):
+        storage.gets([keys[0], self.TEST_KEY])
+
   def test_storage(self):
     with closing(self.storage) as storage:
       key = storage.put(self.TEST_PATH)
@@ -72,6 +72,28 @@ class ArtifactCacheStatsTest(BaseTest):
       artifact_cache_stats.add_misses(self.TEST_CACHE_NAME_2, [self.target_a],
                                       [self.TEST_LOCAL_ERROR])
 
+  def test_add_store_stats(self):
+    store_stats = {'num_artifacts': 1, 'num_blobs': 2}
+    expected_stats = [
+      {
+        'cache_name': self.TEST_CACHE_NAME_1,
+        'num_hits': 1,
+        'num_misses': 0,
+        'hits': [(self.TEST_SPEC_B, '')],
+        'misses': [],
+        'store': store_stats,
+      },
+    ]
+
+    with self.mock_artifact_cache_stats(expected_stats,
+                                        expected_hit_or_miss_files={
+                                          '{}.hits'.format(self.TEST_CACHE_NAME_1):
+                                            '{}\n'.format(self.TEST_SPEC_B),
+                                        })\
+        as artifact_cache_stats:
+      artifact_cache_stats.add_hits(self.TEST_CACHE_NAME_1, [self.target_b])
+      artifact_cache_stats.add_store_stats(self.TEST_CACHE_NAME_1, store_stats)
+
   @contextmanager
   def mock_artifact_cache_stats(self,
                                 expected_stats,
@@ -0,0 +1,49 @@
+# coding=utf-8
+# Copyright 2016 Pants project contributors (see CONTRIBUTORS.md).
+# Licensed under the Apache License, Version 2.0 (see LICENSE).
+
+from __future__ import (absolute_import, division, generators, nested_scopes, print_function,
+                        unicode_literals, with_statement)
+
+import hashlib
+import sys
+
+from pants.invalidation.build_invalidator import BUILD_INVALIDATOR_BACKENDS, CacheKey
+from pants.util.contextutil import Timer, temporary_dir
+from pants.util.lmdbutil import close_envs
+
+
+def benchmark(backend, count):
+  """Checks and updates `count` keys with the named backend, and returns the seconds each took."""
+  invalidator_type = BUILD_INVALIDATOR_BACKENDS[backend]
+  cache_keys = [CacheKey('src.java.org.pantsbuild.synthetic.target{}'.format(i),
+                         hashlib.sha1(str(i)).hexdigest())
+                for i in range(count)]
+  with temporary_dir() as root:
+    try:
+      with Timer() as cold:
+        invalidator_type(root).previous_keys(cache_keys)
+      with Timer() as update:
+        invalidator_type(root).update_all(cache_keys)
+      with Timer() as warm:
+        previous_keys = invalidator_type(root).previous_keys(cache_keys)
+      assert cache_keys == previous_keys
+    finally:
+      close_envs(root)
+  return cold.elapsed, update.elapsed, warm.elapsed
+
+
+def main():
+  """Compares the time to check and update many keys with each BuildInvalidator backend.
+
+  Usage: build_invalidator_benchmark.py [count]
+  """
+  count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+  for backend in sorted(BUILD_INVALIDATOR_BACKENDS):
+    cold, update, warm = benchmark(backend, count)
+    print('{:>8}: {} keys checked cold in {:.3f}s, updated in {:.3f}s, checked warm in {:.3f}s'
+          .format(backend, count, cold, update, warm))
+
+
+if __name__ == '__main__':
+  main()
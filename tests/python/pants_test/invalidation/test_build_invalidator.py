@@ -8,10 +8,15 @@ from __future__ import (absolute_import, division, generators, nested_scopes, pr
 import hashlib
 import os
 import tempfile
+import unittest
 from contextlib import contextmanager
 
-from pants.invalidation.build_invalidator import BuildInvalidator, CacheKeyGenerator
+from pants.invalidation.build_invalidator import (BuildInvalidator, CacheKey, CacheKeyGenerator,
+                                                  IndexedBuildInvalidator,
+                                                  create_build_invalidator)
 from pants.util.contextutil import temporary_dir
+from pants.util.dirutil import safe_rmtree
+from pants.util.lmdbutil import close_envs
 
 
 TEST_CONTENT = 'muppet'
@@ -58,3 +63,88 @@ def test_env(content=TEST_CONTENT):
 #     assert cache.needs_update(key)
 #     cache.update(key)
 #     assert not cache.needs_update(key)
+
+
+class BuildInvalidatorTestBase(object):
+  """Tests common to all BuildInvalidator backends; mixed in to a unittest.TestCase."""
+
+  invalidator_type = None
+
+  def setUp(self):
+    super(BuildInvalidatorTestBase, self).setUp()
+    self.root = tempfile.mkdtemp()
+    self.addCleanup(safe_rmtree, self.root)
+    self.addCleanup(close_envs, self.root)
+
+  def invalidator(self):
+    return self.invalidator_type(self.root)
+
+  def test_needs_update_missing_key(self):
+    self.assertTrue(self.invalidator().needs_update(CacheKey('a', 'hash1')))
+
+  def test_update(self):
+    invalidator = self.invalidator()
+    invalidator.update(CacheKey('a', 'hash1'))
+    self.assertFalse(invalidator.needs_update(CacheKey('a', 'hash1')))
+    self.assertTrue(invalidator.needs_update(CacheKey('a', 'hash2')))
+    self.assertEqual(CacheKey('a', 'hash1'), invalidator.previous_key(CacheKey('a', 'hash2')))
+
+  def test_persistent(self):
+    self.invalidator().update(CacheKey('a', 'hash1'))
+    self.assertFalse(self.invalidator().needs_update(CacheKey('a', 'hash1')))
+
+  def test_batched(self):
+    invalidator = self.invalidator()
+    invalidator.update_all([CacheKey('a', 'hash1'), CacheKey('b', 'hash2')])
+    self.assertEqual([CacheKey('a', 'hash1'), None, CacheKey('b', 'hash2')],
+                     invalidator.previous_keys([CacheKey('a', 'hash3'),
+                                                CacheKey('c', 'hash4'),
+                                                CacheKey('b', 'hash5')]))
+
+  def test_force_invalidate(self):
+    invalidator = self.invalidator()
+    invalidator.update_all([CacheKey('a', 'hash1'), CacheKey('b', 'hash2')])
+    invalidator.force_invalidate(CacheKey('a', 'hash1'))
+    self.assertTrue(invalidator.needs_update(CacheKey('a', 'hash1')))
+    self.assertFalse(invalidator.needs_update(CacheKey('b', 'hash2')))
+    invalidator.force_invalidate_all()
+    self.assertTrue(invalidator.needs_update(CacheKey('b', 'hash2')))
+
+
+class BuildInvalidatorTest(BuildInvalidatorTestBase, unittest.TestCase):
+  invalidator_type = BuildInvalidator
+
+
+class IndexedBuildInvalidatorTest(BuildInvalidatorTestBase, unittest.TestCase):
+  invalidator_type = IndexedBuildInvalidator
+
+  def test_imports_hash_files(self):
+    BuildInvalidator(self.root).update_all([CacheKey('a', 'hash1'), CacheKey('b', 'hash2')])
+    invalidator = self.invalidator()
+    self.assertEqual([CacheKey('a', 'hash1'), CacheKey('b', 'hash2')],
+                     invalidator.previous_keys([CacheKey('a', 'hash3'), CacheKey('b', 'hash4')]))
+    # The imported records no longer live in files.
+    self.assertTrue(BuildInvalidator(self.root).needs_update(CacheKey('a', 'hash1')))
+
+  def test_reopened(self):
+    self.invalidator().update(CacheKey('a', 'hash1'))
+    close_envs(self.root)
+    self.assertFalse(self.invalidator().needs_update(CacheKey('a', 'hash1')))
+
+  def test_forked(self):
+    self.invalidator().update(CacheKey('a', 'hash1'))
+    pid = os.fork()
+    if pid == 0:
+      # The child must open its own index rather than use the one it inherited.
+      try:
+        invalidator = self.invalidator()
+        invalidator.update(CacheKey('b', 'hash2'))
+        os._exit(0 if not invalidator.needs_update(CacheKey('a', 'hash1')) else 1)
+      except BaseException:
+        os._exit(2)
+    _, status = os.waitpid(pid, 0)
+    self.assertEqual(0, status)
+    self.assertFalse(self.invalidator().needs_update(CacheKey('b', 'hash2')))
+
+  def test_create_build_invalidator(self):
+    self.assertIsInstance(create_build_invalidator(self.root, 'indexed'), IndexedBuildInvalidator)
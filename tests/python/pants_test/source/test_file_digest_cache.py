@@ -0,0 +1,86 @@
+# coding=utf-8
+# Copyright 2016 Pants project contributors (see CONTRIBUTORS.md).
+# Licensed under the Apache License, Version 2.0 (see LICENSE).
+
+from __future__ import (absolute_import, division, generators, nested_scopes, print_function,
+                        unicode_literals, with_statement)
+
+import os
+import time
+import unittest
+from hashlib import sha1
+
+from pants.source.file_digest_cache import FileDigestCache
+from pants.util.contextutil import temporary_dir
+from pants.util.dirutil import safe_file_dump
+from pants.util.lmdbutil import close_envs
+
+
+class FileDigestCacheTest(unittest.TestCase):
+
+  def _create_file(self, path, contents):
+    safe_file_dump(path, contents)
+    # Backdate the file so that its digest is not considered racy.
+    mtime = int(time.time()) - 10 * FileDigestCache.RACY_SECONDS
+    os.utime(path, (mtime, mtime))
+
+  def test_digest(self):
+    with temporary_dir() as root:
+      path = os.path.join(root, 'a.txt')
+      self._create_file(path, 'a_contents')
+      self.assertEqual(sha1(b'a_contents').digest(), FileDigestCache().digest(path))
+
+  def test_digest_all(self):
+    with temporary_dir() as root:
+      paths = [os.path.join(root, '{}.txt'.format(i)) for i in range(10)]
+      for i, path in enumerate(paths):
+        self._create_file(path, 'contents{}'.format(i))
+      digests = FileDigestCache(threads=4).digest_all(paths + paths[:2])
+      self.assertEqual([sha1(b'contents{}'.format(i)).digest() for i in range(10) + [0, 1]],
+                       digests)
+
+  def test_unchanged_files_are_not_reread(self):
+    with temporary_dir() as root:
+      path = os.path.join(root, 'a.txt')
+      self._create_file(path, 'a_contents')
+      cache = FileDigestCache()
+      cache.digest(path)
+      # Overwrite the file behind the cache's back, leaving its stat unchanged.
+      stat = os.stat(path)
+      with open(path, 'r+b') as fp:
+        fp.write(b'b')
+      os.utime(path, (stat.st_atime, stat.st_mtime))
+      self.assertEqual(sha1(b'a_contents').digest(), cache.digest(path))
+
+  def test_changed_files_are_reread(self):
+    with temporary_dir() as root:
+      path = os.path.join(root, 'a.txt')
+      self._create_file(path, 'a_contents')
+      cache = FileDigestCache()
+      cache.digest(path)
+      self._create_file(path, 'b_contents_longer')
+      self.assertEqual(sha1(b'b_contents_longer').digest(), cache.digest(path))
+
+  def test_racy_files_are_not_cached(self):
+    with temporary_dir() as root:
+      path = os.path.join(root, 'a.txt')
+      safe_file_dump(path, 'a_contents')
+      cache = FileDigestCache()
+      cache.digest(path)
+      # Same size and (likely) the same mtime, but the digest must not have been cached.
+      with open(path, 'r+b') as fp:
+        fp.write(b'b')
+      self.assertEqual(sha1(b'b_contents').digest(), cache.digest(path))
+
+  def test_persistent(self):
+    with temporary_dir() as root:
+      path = os.path.join(root, 'a.txt')
+      self._create_file(path, 'a_contents')
+      cache_dir = os.path.join(root, 'cache')
+      self.addCleanup(close_envs, cache_dir)
+      FileDigestCache(path=cache_dir).digest(path)
+      stat = os.stat(path)
+      with open(path, 'r+b') as fp:
+        fp.write(b'b')
+      os.utime(path, (stat.st_atime, stat.st_mtime))
+      self.assertEqual(sha1(b'a_contents').digest(), FileDigestCache(path=cache_dir).digest(path))
@@ -6,6 +6,7 @@ from __future__ import (absolute_import, division, generators, nested_scopes, pr
                         unicode_literals, with_statement)
 
 import os
+import pickle
 from textwrap import dedent
 
 from pants.base.payload import Payload
@@ -121,6 +122,13 @@ class FilesetRelPathWrapperTest(BaseTest):
     graph = self.context().scan()
     assert ['morx.java'] == list(graph.get_target_from_spec('y').sources_relative_to_source_root())
 
+  def test_glob_pickle(self):
+    exclude = Globs.create_fileset_with_spec('y', 'fleem.java')
+    fileset = Globs.create_fileset_with_spec('y', '*.java', exclude=[exclude])
+    loaded = pickle.loads(pickle.dumps(fileset))
+    self.assertEquals(fileset.filespec, loaded.filespec)
+    self.assertEquals(['morx.java'], list(loaded))
+
   def test_glob_exclude_not_string(self):
     self.add_to_build_file('y/BUILD', dedent("""
       dummy_target(name="y", sources=globs("*.java", exclude="fleem.java"))
@@ -156,3 +156,27 @@ class TaskTest(TaskTestBase):
     self.assertContent(vtB, two)
     self.assertNotEqual(vtA.current_results_dir, vtB.current_results_dir)
     self.assertNotEqual(vtA.results_dir, vtB.results_dir)
+
+
+class NoGlobalSubsystemsTask(DummyTask):
+  """A task that overrides `global_subsystems` without calling super."""
+
+  @classmethod
+  def global_subsystems(cls):
+    return tuple()
+
+
+class NoGlobalSubsystemsTaskTest(TaskTestBase):
+
+  @classmethod
+  def task_type(cls):
+    return NoGlobalSubsystemsTask
+
+  def test_execute(self):
+    self.create_file('f', 'content\n')
+    target = self.make_target(':t', target_type=DummyLibrary, source='f')
+    task = self.create_task(self.context(target_roots=[target]))
+    task._incremental = False
+    vt = task.execute()
+    with open(os.path.join(vt.current_results_dir, 'f'), 'r') as f:
+      self.assertEquals('content\n', f.read())
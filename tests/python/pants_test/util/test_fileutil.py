@@ -9,8 +9,9 @@ import os
 import random
 import unittest
 
-from pants.util.contextutil import temporary_file, temporary_file_path
-from pants.util.fileutil import atomic_copy, create_size_estimators
+from pants.util.contextutil import temporary_dir, temporary_file, temporary_file_path
+from pants.util.dirutil import safe_file_dump
+from pants.util.fileutil import CLONE_STRATEGIES, atomic_copy, clone_tree, create_size_estimators
 
 
 class FileutilTest(unittest.TestCase):
@@ -25,6 +26,43 @@ class FileutilTest(unittest.TestCase):
           self.assertEquals(src.name, new_dst.read())
         self.assertEqual(os.stat(src.name).st_mode, os.stat(dst.name).st_mode)
 
+  def assert_cloned(self, src, dst):
+    for root, dirs, files in os.walk(src):
+      for name in dirs + files:
+        src_path = os.path.join(root, name)
+        dst_path = os.path.join(dst, os.path.relpath(src_path, src))
+        src_stat, dst_stat = os.stat(src_path), os.stat(dst_path)
+        self.assertEqual(src_stat.st_mode, dst_stat.st_mode)
+        self.assertEqual(int(src_stat.st_mtime), int(dst_stat.st_mtime))
+        if name in files:
+          with open(src_path, 'rb') as src_fp, open(dst_path, 'rb') as dst_fp:
+            self.assertEqual(src_fp.read(), dst_fp.read())
+
+  def test_clone_tree(self):
+    for strategy in CLONE_STRATEGIES:
+      with temporary_dir() as src_root, temporary_dir() as dst_root:
+        src = os.path.join(src_root, 'src')
+        for i in range(20):
+          safe_file_dump(os.path.join(src, 'dir{}'.format(i % 3), 'file{}'.format(i)), str(i))
+        os.mkdir(os.path.join(src, 'empty'))
+        os.chmod(os.path.join(src, 'dir0', 'file0'), 0o500)
+        os.utime(os.path.join(src, 'dir1', 'file1'), (0, 0))
+        os.utime(os.path.join(src, 'dir1'), (0, 0))
+
+        dst = os.path.join(dst_root, 'dst')
+        clone_tree(src, dst, strategy=strategy)
+        self.assert_cloned(src, dst)
+
+        # Writing to a clone leaves the original intact.
+        safe_file_dump(os.path.join(dst, 'dir2', 'file2'), 'changed')
+        with open(os.path.join(src, 'dir2', 'file2'), 'rb') as fp:
+          self.assertEqual(b'2', fp.read())
+
+  def test_clone_tree_bad_strategy(self):
+    with temporary_dir() as src:
+      with self.assertRaises(ValueError):
+        clone_tree(src, os.path.join(src, 'dst'), strategy='teleport')
+
   def test_line_count_estimator(self):
     with temporary_file_path() as src:
       self.assertEqual(create_size_estimators()['linecount']([src]), 0)